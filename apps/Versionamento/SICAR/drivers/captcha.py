@@ -8,9 +8,7 @@ Classes:
 """
 
 from abc import ABC, abstractmethod
-import tempfile
 from PIL import Image
-import matplotlib.image as mpimg
 import numpy as np
 import cv2
 
@@ -40,35 +38,25 @@ class Captcha(ABC):
 
         """
 
-    def _png_to_jpg(self, captcha: Image) -> np.ndarray:
+    def _to_grayscale(self, captcha: Image) -> np.ndarray:
         """
-        Convert a PNG image to a JPEG image represented as a NumPy array.
+        Convert the captcha image to a grayscale NumPy array in memory.
 
         Parameters:
-            captcha (Image): The PNG image to convert.
+            captcha (Image): The captcha image (any PIL mode).
 
         Returns:
-            np.ndarray: The converted JPEG image represented as a NumPy array.
+            np.ndarray: The grayscale image as a 2-D uint8 NumPy array.
 
         Note:
-            This method saves the input PNG image to a temporary file with a ".png" suffix. It then converts the PNG image
-            to a JPEG image using matplotlib's `imsave` function, with the grayscale colormap. The resulting JPEG image is
-            saved to another temporary file with a ".jpg" suffix.
-
-            The saved JPEG image is then loaded using OpenCV's `imread` function, and the image data is returned as a NumPy
-            array.
+            Transparent pixels are composited over white, as the previous PNG -> JPEG round-trip through temporary
+            files did, so the thresholding in `_improve_image` sees the same image without the disk I/O (and without
+            JPEG artifacts).
         """
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as png:
-            with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as jpg:
-                captcha.save(png.name)
-                mpimg.imsave(
-                    jpg.name,
-                    mpimg.imread(png.name, 0),
-                    cmap="gray",
-                    vmin=0,
-                    vmax=255,
-                )
-                return cv2.imread(jpg.name, -1)
+        rgba = captcha.convert("RGBA")
+        background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+        rgb = np.asarray(Image.alpha_composite(background, rgba).convert("RGB"))
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
 
     def _improve_image(self, image: np.ndarray):
         """
@@ -102,10 +90,7 @@ class Captcha(ABC):
             np.ndarray: The processed image as a NumPy array.
 
         Note:
-            This method converts the captcha image from PNG to JPEG format, applies grayscale conversion using OpenCV,
-            and performs image enhancement operations such as thresholding, dilation, and erosion to improve the
-            visibility of characters for OCR.
+            This method converts the captcha image to grayscale in memory and performs image enhancement operations
+            such as thresholding, dilation, and erosion to improve the visibility of characters for OCR.
         """
-        return self._improve_image(
-            cv2.cvtColor(self._png_to_jpg(captcha), cv2.COLOR_BGR2GRAY)
-        )
+        return self._improve_image(self._to_grayscale(captcha))
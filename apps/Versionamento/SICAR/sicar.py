@@ -8,10 +8,14 @@ Classes:
 """
 
 import io
+import json
 import os
+import re
 import ssl
 import time
 import random
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import httpx
 from PIL import Image, UnidentifiedImageError
 from bs4 import BeautifulSoup
@@ -67,6 +71,7 @@ class Sicar(Url):
             None
         """
         self._driver = driver()
+        self._headers = headers
         self._create_session(headers=headers)
         self._initialize_cookies()
 
@@ -189,6 +194,51 @@ class Sicar(Url):
 
         return captcha
 
+    def clone(self) -> "Sicar":
+        """
+        Create a new Sicar instance with the same driver and headers but its own session.
+
+        The SICAR server keeps the captcha per session (cookie), so concurrent downloads need one instance each.
+
+        Returns:
+            Sicar: A new instance with a fresh session and cookies.
+        """
+        return type(self)(driver=type(self._driver), headers=self._headers)
+
+    def solve_captcha(self) -> str:
+        """
+        Download a captcha for this session and solve it with the driver.
+
+        Returns:
+            str: The captcha text, or an empty string if it is not a valid 5-character captcha.
+
+        Raises:
+            FailedToDownloadCaptchaException: If the captcha image fails to download.
+        """
+        captcha = self._driver.get_captcha(self._download_captcha())
+        return captcha if len(captcha) == 5 else ""
+
+    @staticmethod
+    def _read_part_meta(meta_path: Path) -> Dict:
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _parse_content_range(value: str):
+        """
+        Parse a `Content-Range: bytes start-end/total` header.
+
+        Returns:
+            tuple: (start, total), with total None when the server sends `*`; (None, None) if malformed.
+        """
+        match = re.match(r"bytes\s+(\d+)-\d+/(\d+|\*)", value or "")
+        if not match:
+            return None, None
+        total = match.group(2)
+        return int(match.group(1)), (int(total) if total != "*" else None)
+
     def _download_polygon(
         self,
         state: State,
@@ -214,44 +264,102 @@ class Sicar(Url):
             FailedToDownloadPolygonException: If the polygon download fails.
 
         Note:
-            This method performs the polygon download by making a GET request to the polygon URL with the specified
-            state code and captcha. The response is then streamed and saved to a file in chunks. A progress bar is displayed
-            during the download. The downloaded file path is returned.
+            The response is streamed into `<state>_<polygon>.zip.part`, with the expected size and validators
+            (ETag/Last-Modified) kept in `<state>_<polygon>.zip.part.json`. If a previous attempt left a `.part`,
+            the request is reissued with `Range: bytes=<size>-` (and `If-Range`) and the new bytes are appended when
+            the server answers 206; a 200 answer means no range support (or a changed file) and the download restarts.
+            A connection error keeps the `.part` for the next attempt. The file is renamed to `.zip` only when its
+            size matches `Content-Length` and it is a readable zip.
         """
 
         query = urlencode(
             {"idEstado": state.value, "tipoBase": polygon.value, "ReCaptcha": captcha}
         )
+        url = f"{self._DOWNLOAD_BASE}?{query}"
+        path = Path(
+            os.path.join(folder, f"{state.value}_{polygon.value}")
+        ).with_suffix(".zip")
+        part = path.with_name(path.name + ".part")
+        meta_path = path.with_name(path.name + ".part.json")
+
+        offset = part.stat().st_size if part.exists() else 0
+        meta = self._read_part_meta(meta_path) if offset else {}
+        if offset and not meta.get("total"):
+            offset = 0
+
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            validator = meta.get("etag") or meta.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
 
-        with self._session.stream("GET", f"{self._DOWNLOAD_BASE}?{query}") as response:
-            try:
-                if response.status_code != httpx.codes.OK:
-                    raise UrlNotOkException(f"{self._DOWNLOAD_BASE}?{query}")
-            except UrlNotOkException as error:
-                raise FailedToDownloadPolygonException() from error
-
-            content_length = int(response.headers.get("Content-Length", 0))
-
-            content_type = response.headers.get("Content-Type", "")
-
-            if content_length == 0 or not content_type.startswith("application/zip"):
-                raise FailedToDownloadPolygonException()
-            path = Path(
-                os.path.join(folder, f"{state.value}_{polygon.value}")
-            ).with_suffix(".zip")
-
-            with open(path, "wb") as fd:
-                with tqdm(
-                    total=content_length,
-                    unit="iB",
-                    unit_scale=True,
-                    desc=f"Downloading polygon '{polygon.value}' for state '{state.value}'",
-                ) as progress_bar:
-                    for chunk in response.iter_bytes():
-                        fd.write(chunk)
-                        progress_bar.update(len(chunk))
+        try:
+            with self._session.stream("GET", url, headers=headers) as response:
+                content_type = response.headers.get("Content-Type", "")
+                content_length = int(response.headers.get("Content-Length", 0))
+
+                if response.status_code == httpx.codes.PARTIAL_CONTENT and offset:
+                    start, total = self._parse_content_range(response.headers.get("Content-Range", ""))
+                    if start != offset or total != meta.get("total"):
+                        # Another range or another version of the file: restart from scratch.
+                        self._discard_part(part, meta_path)
+                        raise FailedToDownloadPolygonException()
+                    mode = "ab"
+                elif response.status_code == httpx.codes.OK:
+                    offset, total, mode = 0, content_length, "wb"
+                elif response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE and offset:
+                    _, total = self._parse_content_range(response.headers.get("Content-Range", ""))
+                    if total is None or total != meta.get("total") or offset != total:
+                        self._discard_part(part, meta_path)
+                        raise FailedToDownloadPolygonException()
+                    content_length, mode = 0, None
+                else:
+                    raise FailedToDownloadPolygonException() from UrlNotOkException(url)
+
+                if mode and (content_length == 0 or not content_type.startswith("application/zip")):
+                    raise FailedToDownloadPolygonException()
+
+                if mode == "wb":
+                    meta = {
+                        "total": total,
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    }
+                    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+                if mode:
+                    with open(part, mode) as fd:
+                        with tqdm(
+                            total=total,
+                            initial=offset,
+                            unit="iB",
+                            unit_scale=True,
+                            desc=f"Downloading polygon '{polygon.value}' for state '{state.value}'",
+                        ) as progress_bar:
+                            for chunk in response.iter_bytes():
+                                fd.write(chunk)
+                                progress_bar.update(len(chunk))
+        except httpx.TransportError as error:
+            # Keep the .part so the next try resumes with Range.
+            raise FailedToDownloadPolygonException() from error
+
+        size = part.stat().st_size
+        if size < total:
+            raise FailedToDownloadPolygonException()
+        if size > total or not zipfile.is_zipfile(part):
+            self._discard_part(part, meta_path)
+            raise FailedToDownloadPolygonException()
+
+        os.replace(part, path)
+        meta_path.unlink(missing_ok=True)
         return path
 
+    @staticmethod
+    def _discard_part(part: Path, meta_path: Path):
+        part.unlink(missing_ok=True)
+        meta_path.unlink(missing_ok=True)
+
     def download_state(
         self,
         state: State | str,
@@ -260,6 +368,7 @@ class Sicar(Url):
         tries: int = 25,
         debug: bool = False,
         chunk_size: int = 1024,
+        captcha: str | None = None,
     ) -> Path | bool:
         """
         Download the polygon or other output format for the specified state.
@@ -271,6 +380,7 @@ class Sicar(Url):
             tries (int, optional): The number of attempts to download the data. Defaults to 25.
             debug (bool, optional): Whether to print debug information. Defaults to False.
             chunk_size (int, optional): The size of each chunk to download. Defaults to 1024.
+            captcha (str, optional): A captcha already solved for this session (see `solve_captcha`), used on the first try. Defaults to None.
 
         Returns:
             Path | bool: The path to the downloaded data if successful, or False if download fails.
@@ -294,12 +404,15 @@ class Sicar(Url):
 
         Path(folder).mkdir(parents=True, exist_ok=True)
 
-        captcha = ""
+        presolved = captcha or ""
         info = f"'{polygon.value}' for '{state.value}'"
 
         while tries > 0:
             try:
-                captcha = self._driver.get_captcha(self._download_captcha())
+                if presolved:
+                    captcha, presolved = presolved, ""
+                else:
+                    captcha = self._driver.get_captcha(self._download_captcha())
 
                 if len(captcha) == 5:
                     if debug:
@@ -337,6 +450,7 @@ class Sicar(Url):
         tries: int = 25,
         debug: bool = False,
         chunk_size: int = 1024,
+        workers: int = 1,
     ):
         """
         Download polygon for the entire country.
@@ -347,6 +461,7 @@ class Sicar(Url):
             tries (int, optional): The number of download attempts allowed per state. Defaults to 25.
             debug (bool, optional): Whether to enable debug mode with additional print statements. Defaults to False.
             chunk_size (int, optional): The size of each chunk to download. Defaults to 1024.
+            workers (int, optional): Number of states downloaded concurrently, each with its own session. Defaults to 1.
 
         Returns:
             Dict: A dictionary containing the results of the download operation.
@@ -354,11 +469,11 @@ class Sicar(Url):
                 Each state's dictionary follows the same structure as the result of the `download_state` method.
                 If a download fails for a state the corresponding value will be False.
         """
-        result = {}
-        for state in State:
+
+        def download(car: "Sicar", state: State):
             Path(os.path.join(folder, f"{state}")).mkdir(parents=True, exist_ok=True)
 
-            result[str(state)] = self.download_state(
+            return car.download_state(
                 state=state,
                 polygon=polygon,
                 folder=folder,
@@ -367,6 +482,16 @@ class Sicar(Url):
                 chunk_size=chunk_size,
             )
 
+        if workers <= 1:
+            return {str(state): download(self, state) for state in State}
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                str(state): pool.submit(lambda s: download(self.clone(), s), state)
+                for state in State
+            }
+            return {state: future.result() for state, future in futures.items()}
+
     def get_release_dates(self) -> Dict:
         """
         Get release date for each state in SICAR system.
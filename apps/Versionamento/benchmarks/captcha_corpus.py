@@ -0,0 +1,71 @@
+"""Corpus de captchas do SICAR para benchmarks.
+
+Um corpus e uma pasta com imagens capturadas do endpoint ReCaptcha, nomeadas pela
+resposta correta (`AbC12.png`; sufixos como `AbC12_3.png` para repetidas). Sem corpus
+gravado, `synthetic_corpus` gera captchas parecidos (5 caracteres, ruido, linhas)
+so para medir latencia do pipeline; taxa de acerto so vale com corpus real.
+"""
+
+import random
+import string
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
+ALPHABET = string.ascii_letters + string.digits
+
+
+def label_from_path(path: Path) -> Optional[str]:
+    label = path.stem.split("_", 1)[0]
+    return label if len(label) == 5 and label.isalnum() else None
+
+
+def load_corpus(corpus_dir: Path) -> List[Tuple[Image.Image, Optional[str], str]]:
+    """(imagem, resposta ou None, nome do arquivo) para cada imagem da pasta."""
+    items = []
+    for path in sorted(Path(corpus_dir).iterdir()):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        with Image.open(path) as img:
+            img.load()
+            items.append((img.copy(), label_from_path(path), path.name))
+    if not items:
+        raise ValueError(f"Nenhuma imagem em {corpus_dir}")
+    return items
+
+
+def synthetic_captcha(text: str, rng: random.Random) -> Image.Image:
+    img = Image.new("RGB", (180, 50), (rng.randint(200, 255),) * 3)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    x = 15
+    for ch in text:
+        color = tuple(rng.randint(0, 90) for _ in range(3))
+        draw.text((x, rng.randint(8, 22)), ch, fill=color, font=font)
+        x += rng.randint(22, 30)
+    for _ in range(6):
+        draw.line(
+            [(rng.randint(0, 180), rng.randint(0, 50)), (rng.randint(0, 180), rng.randint(0, 50))],
+            fill=tuple(rng.randint(60, 160) for _ in range(3)),
+        )
+    for _ in range(300):
+        draw.point((rng.randint(0, 179), rng.randint(0, 49)), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return img.filter(ImageFilter.SMOOTH).resize((360, 100))
+
+
+def synthetic_corpus(count: int, seed: int = 42) -> List[Tuple[Image.Image, Optional[str], str]]:
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        text = "".join(rng.choice(ALPHABET) for _ in range(5))
+        items.append((synthetic_captcha(text, rng), text, f"sintetico_{i:03d}_{text}.png"))
+    return items
+
+
+def save_corpus(items, corpus_dir: Path) -> None:
+    corpus_dir = Path(corpus_dir)
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    for img, label, name in items:
+        img.save(corpus_dir / (f"{label}_{name}" if label else name))
@@ -0,0 +1,107 @@
+"""Benchmark do pre-processamento de captcha (antes do OCR).
+
+Compara o caminho antigo (PNG -> JPEG em NamedTemporaryFile + matplotlib + cv2.imread)
+com o atual em memoria (`Captcha._to_grayscale` + `_improve_image`): tempo por captcha,
+arquivos temporarios deixados para tras e diferenca media (niveis de cinza) da imagem final.
+
+Uso:
+  python benchmarks/captcha_preprocess.py --corpus Dados/captchas --rounds 5
+  python benchmarks/captcha_preprocess.py --synthetic 100
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import cv2
+
+from SICAR.drivers.captcha import Captcha
+
+from benchmarks.captcha_corpus import load_corpus, synthetic_corpus
+
+
+class _Preprocessor(Captcha):
+    def get_captcha(self, captcha) -> str:
+        return ""
+
+
+def legacy_grayscale(captcha) -> np.ndarray:
+    """Copia do `_png_to_jpg` antigo (com os temporarios delete=False), so para comparacao."""
+    import matplotlib.image as mpimg
+
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as png:
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as jpg:
+            captcha.save(png.name)
+            mpimg.imsave(jpg.name, mpimg.imread(png.name, 0), cmap="gray", vmin=0, vmax=255)
+            return cv2.cvtColor(cv2.imread(jpg.name, -1), cv2.COLOR_BGR2GRAY)
+
+
+def _time_per_item(fn, images, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        for img in images:
+            t0 = time.perf_counter()
+            fn(img)
+            samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def run(images, rounds: int) -> dict:
+    pre = _Preprocessor()
+    tmp_root = Path(tempfile.mkdtemp(prefix="captcha_bench_"))
+    previous_tempdir = tempfile.tempdir
+    tempfile.tempdir = str(tmp_root)
+    try:
+        legacy = _time_per_item(lambda img: pre._improve_image(legacy_grayscale(img)), images, rounds)
+        leaked = len(list(tmp_root.iterdir()))
+        current = _time_per_item(pre._process_captcha, images, rounds)
+        leaked_current = len(list(tmp_root.iterdir())) - leaked
+        diffs = [
+            float(np.mean(np.abs(pre._improve_image(legacy_grayscale(img)).astype(np.int16) - pre._process_captcha(img))))
+            for img in images
+        ]
+    finally:
+        tempfile.tempdir = previous_tempdir
+        for path in tmp_root.iterdir():
+            path.unlink()
+        tmp_root.rmdir()
+
+    return {
+        "captchas": len(images),
+        "rounds": rounds,
+        "legacy_ms": statistics.median(legacy),
+        "current_ms": statistics.median(current),
+        "legacy_tmp_files": leaked,
+        "current_tmp_files": leaked_current,
+        "mean_abs_diff": statistics.mean(diffs),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do pre-processamento de captcha SICAR")
+    parser.add_argument("--corpus", type=Path, help="Pasta com captchas capturados")
+    parser.add_argument("--synthetic", type=int, default=50, help="Captchas sinteticos quando nao ha --corpus")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    items = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic)
+    result = run([img for img, _label, _name in items], args.rounds)
+
+    print(f"captchas: {result['captchas']} x {result['rounds']} rodadas")
+    print(f"antigo (temp files): {result['legacy_ms']:.2f} ms/captcha, {result['legacy_tmp_files']} temporarios deixados")
+    print(f"em memoria:          {result['current_ms']:.2f} ms/captcha, {result['current_tmp_files']} temporarios deixados")
+    print(f"speedup: {result['legacy_ms'] / max(result['current_ms'], 1e-9):.1f}x")
+    print(f"diferenca media da imagem final: {result['mean_abs_diff']:.2f} niveis de cinza (artefatos do JPEG antigo)")
+
+
+if __name__ == "__main__":
+    main()
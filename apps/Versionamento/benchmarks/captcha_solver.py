@@ -0,0 +1,165 @@
+"""Benchmark dos drivers de captcha do SICAR (taxa de acerto, latencia e downloads/minuto).
+
+1) Offline: roda `get_captcha` de cada driver sobre o corpus e mede
+   - resolvidos: resposta com 5 caracteres (o que `download_state` aceita tentar);
+   - acerto: resposta igual ao rotulo do arquivo (so com corpus rotulado);
+   - latencia p50/p95 por captcha.
+2) Ponta a ponta: sobe o `FakeSicarServer` com o mesmo corpus e baixa N UFs com
+   `Sicar.download_state`, medindo tentativas por UF e downloads/minuto.
+
+Com o acerto por tentativa `p`, sugere `SICAR_TRIES_PER_STATE` para 99% de chance de
+baixar a UF: menor n com 1 - (1 - p)^n >= 0.99.
+
+Uso:
+  python benchmarks/captcha_solver.py --corpus Dados/captchas --drivers tesseract,paddle
+  python benchmarks/captcha_solver.py --synthetic 30 --states 3 --tries 25
+"""
+
+import argparse
+import math
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.captcha_corpus import load_corpus, synthetic_corpus
+from benchmarks.fake_sicar_server import FakeSicarServer, local_sicar_class, png_corpus
+
+DEFAULT_STATES = ["AC", "AP", "RR", "DF", "SE"]
+
+
+def load_driver(name: str):
+    """Classe do driver (`tesseract`/`paddle`); None se a dependencia nao estiver instalada."""
+    try:
+        if name == "tesseract":
+            from SICAR.drivers.tesseract import Tesseract
+
+            return Tesseract
+        if name == "paddle":
+            from SICAR.drivers.paddle import Paddle
+
+            return Paddle
+    except ImportError as exc:
+        print(f"[{name}] indisponivel: {exc}")
+        return None
+    raise ValueError(f"Driver desconhecido: {name}")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def tries_for_target(success_rate: float, target: float = 0.99) -> Optional[int]:
+    """Tentativas para a UF baixar com probabilidade `target`; None se o driver nunca acerta."""
+    if success_rate <= 0:
+        return None
+    if success_rate >= 1:
+        return 1
+    return math.ceil(math.log(1 - target) / math.log(1 - success_rate))
+
+
+def solve_corpus(driver, items) -> Dict[str, float]:
+    latencies, valid, correct, labelled = [], 0, 0, 0
+    for img, label, _name in items:
+        t0 = time.perf_counter()
+        answer = driver.get_captcha(img)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if len(answer) == 5:
+            valid += 1
+        if label:
+            labelled += 1
+            correct += int(answer == label)
+    total = len(items)
+    return {
+        "captchas": total,
+        "solve_rate": valid / total if total else 0.0,
+        "accuracy": correct / labelled if labelled else None,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": _percentile(latencies, 95),
+    }
+
+
+def end_to_end(driver_cls, items, states: List[str], tries: int, state_size: int, bandwidth_mbps: float) -> Dict[str, float]:
+    from SICAR.polygon import Polygon
+
+    with FakeSicarServer(png_corpus(items), state_size=state_size, bandwidth_mbps=bandwidth_mbps) as server:
+        car = local_sicar_class(server.base_url)(driver=driver_cls)
+        ok = 0
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix="sicar_bench_") as tmp:
+            for uf in states:
+                if car.download_state(state=uf, polygon=Polygon.AREA_PROPERTY, folder=tmp, tries=tries):
+                    ok += 1
+        elapsed = time.perf_counter() - started
+        stats = dict(server.stats)
+    return {
+        "states": len(states),
+        "downloads_ok": ok,
+        "captchas_per_state": stats["captchas"] / len(states) if states else 0.0,
+        "captcha_rejected": stats["captcha_rejected"],
+        "downloads_per_minute": ok / elapsed * 60 if elapsed else 0.0,
+        "elapsed_s": elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark dos drivers de captcha SICAR")
+    parser.add_argument("--corpus", type=Path, help="Pasta com captchas rotulados (<resposta>.png)")
+    parser.add_argument("--synthetic", type=int, default=30, help="Captchas sinteticos quando nao ha --corpus")
+    parser.add_argument("--drivers", default="tesseract,paddle")
+    parser.add_argument("--states", type=int, default=len(DEFAULT_STATES), help="UFs no teste ponta a ponta (0 desliga)")
+    parser.add_argument("--tries", type=int, default=25, help="Tentativas por UF (SICAR_TRIES_PER_STATE)")
+    parser.add_argument("--state-size-mb", type=float, default=0.5)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="Limite de banda do servidor fake (0 = sem limite)")
+    args = parser.parse_args()
+
+    items = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic)
+    if not args.corpus:
+        print("Aviso: corpus sintetico; acerto/tentativas so sao representativos com captchas reais gravados.")
+    states = (DEFAULT_STATES * (args.states // len(DEFAULT_STATES) + 1))[: args.states]
+
+    for name in [d.strip() for d in args.drivers.split(",") if d.strip()]:
+        driver_cls = load_driver(name)
+        if driver_cls is None:
+            continue
+        try:
+            offline = solve_corpus(driver_cls(), items)
+        except Exception as exc:
+            print(f"[{name}] falhou ao resolver captchas: {exc}")
+            continue
+        accuracy = offline["accuracy"]
+        print(
+            f"[{name}] {offline['captchas']} captchas | resolvidos {offline['solve_rate']:.0%} | "
+            f"acerto {'n/d' if accuracy is None else f'{accuracy:.0%}'} | "
+            f"latencia p50 {offline['p50_ms']:.0f} ms, p95 {offline['p95_ms']:.0f} ms"
+        )
+        if accuracy is not None:
+            suggested = tries_for_target(accuracy)
+            print(f"[{name}] SICAR_TRIES_PER_STATE sugerido (99%): {suggested if suggested else 'driver nunca acerta'}")
+        if args.states > 0:
+            e2e = end_to_end(
+                driver_cls,
+                items,
+                states,
+                args.tries,
+                int(args.state_size_mb * 1024 * 1024),
+                args.bandwidth_mbps,
+            )
+            print(
+                f"[{name}] ponta a ponta: {e2e['downloads_ok']}/{e2e['states']} UFs em {e2e['elapsed_s']:.0f}s | "
+                f"{e2e['captchas_per_state']:.1f} captchas/UF | {e2e['downloads_per_minute']:.1f} downloads/min"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Servidor HTTP local que imita os endpoints do SICAR usados por `SICAR.Sicar`.
+
+Endpoints (mesmos caminhos de `SICAR.url.Url`, sob `/publico`):
+  /imoveis/index          -> 200 + cookie de sessao
+  /municipios/ReCaptcha   -> PNG do corpus; a resposta esperada fica guardada na sessao
+  /estados/downloadBase   -> zip da UF se `ReCaptcha` bate com o ultimo captcha da sessao
+                             (suporta Range; pode cortar a conexao para exercitar retomada)
+  /estados/downloads      -> HTML com a data de disponibilizacao por UF
+
+Uso direto (para apontar o job ou outro cliente):
+  python benchmarks/fake_sicar_server.py --port 8765 --corpus <pasta>
+"""
+
+import argparse
+import io
+import random
+import re
+import threading
+import time
+import uuid
+import zipfile
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+COOKIE_NAME = "JSESSIONID"
+CHUNK_SIZE = 64 * 1024
+
+
+def _state_zip(uf: str, size: int) -> bytes:
+    buf = io.BytesIO()
+    rng = random.Random(uf)
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr(f"AREA_IMOVEL_{uf}.shp", rng.randbytes(max(size, 1)))
+        zf.writestr(f"AREA_IMOVEL_{uf}.dbf", b"dbf")
+        zf.writestr(f"AREA_IMOVEL_{uf}.shx", b"shx")
+    return buf.getvalue()
+
+
+class FakeSicarServer:
+    """Servidor fake com estatisticas; use como context manager.
+
+    `captchas` e uma lista de (bytes PNG, resposta). `release_dates` mapeia UF -> "dd/mm/aaaa".
+    `cut_probability` corta o download no meio (apos metade do corpo) com essa probabilidade.
+    """
+
+    def __init__(
+        self,
+        captchas: List[Tuple[bytes, str]],
+        release_dates: Optional[Dict[str, str]] = None,
+        state_size: int = 256 * 1024,
+        bandwidth_mbps: float = 0.0,
+        cut_probability: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 42,
+    ):
+        if not captchas:
+            raise ValueError("corpus de captchas vazio")
+        self.captchas = captchas
+        self.release_dates = dict(release_dates or {})
+        self.state_size = state_size
+        self.bandwidth_mbps = bandwidth_mbps
+        self.cut_probability = cut_probability
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_captcha = 0
+        self._sessions: Dict[str, str] = {}
+        self._zips: Dict[str, bytes] = {}
+        self.stats = {
+            "sessions": 0,
+            "captchas": 0,
+            "downloads_ok": 0,
+            "captcha_rejected": 0,
+            "bytes_sent": 0,
+            "range_requests": 0,
+            "cuts": 0,
+        }
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/publico"
+
+    def start(self) -> "FakeSicarServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-sicar", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "FakeSicarServer":
+        return self.start()
+
+    def __exit__(self, *_exc) -> None:
+        self.stop()
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def _issue_captcha(self, session: str) -> bytes:
+        with self._lock:
+            png, answer = self.captchas[self._next_captcha % len(self.captchas)]
+            self._next_captcha += 1
+            self._sessions[session] = answer
+            self.stats["captchas"] += 1
+        return png
+
+    def _check_captcha(self, session: str, captcha: str) -> bool:
+        with self._lock:
+            expected = self._sessions.pop(session, None)
+        return expected is not None and captcha == expected
+
+    def _zip_for(self, uf: str) -> bytes:
+        with self._lock:
+            if uf not in self._zips:
+                self._zips[uf] = _state_zip(uf, self.state_size)
+            return self._zips[uf]
+
+    def _should_cut(self) -> bool:
+        with self._lock:
+            return self.cut_probability > 0 and self._rng.random() < self.cut_probability
+
+    def _release_html(self) -> bytes:
+        blocks = "".join(
+            '<div class="listagem-estados">'
+            f'<button class="btn-abrir-modal-download-base-poligono" data-estado="{uf}"></button>'
+            f'<div class="data-disponibilizacao">{date}</div>'
+            "</div>"
+            for uf, date in sorted(self.release_dates.items())
+        )
+        return f"<html><body>{blocks}</body></html>".encode("utf-8")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_args):
+                return None
+
+            def _session(self) -> Tuple[str, bool]:
+                cookie = SimpleCookie(self.headers.get("Cookie", ""))
+                if COOKIE_NAME in cookie:
+                    return cookie[COOKIE_NAME].value, False
+                server._count("sessions")
+                return uuid.uuid4().hex, True
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                session, new = self._session()
+                cookie = {"Set-Cookie": f"{COOKIE_NAME}={session}; Path=/"} if new else {}
+
+                if parsed.path == "/publico/imoveis/index":
+                    self._send(200, b"<html>index</html>", "text/html", cookie)
+                elif parsed.path == "/publico/municipios/ReCaptcha":
+                    self._send(200, server._issue_captcha(session), "image/png", cookie)
+                elif parsed.path == "/publico/estados/downloads":
+                    self._send(200, server._release_html(), "text/html; charset=utf-8", cookie)
+                elif parsed.path == "/publico/estados/downloadBase":
+                    self._download(session, query)
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def _download(self, session: str, query: dict):
+                if not server._check_captcha(session, query.get("ReCaptcha", "")):
+                    server._count("captcha_rejected")
+                    self._send(200, b"<html>Captcha invalido</html>", "text/html")
+                    return
+                payload = server._zip_for(query.get("idEstado", "XX"))
+                start = 0
+                match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+                if match and int(match.group(1)) < len(payload):
+                    start = int(match.group(1))
+                    server._count("range_requests")
+                body = payload[start:]
+                self.send_response(206 if start else 200)
+                self.send_header("Content-Type", "application/zip")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", f'"{len(payload)}"')
+                if start:
+                    self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+                self.end_headers()
+
+                cut_at = len(body) // 2 if server._should_cut() else None
+                delay = CHUNK_SIZE / (server.bandwidth_mbps * 1024 * 1024 / 8) if server.bandwidth_mbps > 0 else 0
+                for offset in range(0, len(body), CHUNK_SIZE):
+                    if cut_at is not None and offset >= cut_at:
+                        server._count("cuts")
+                        self.close_connection = True
+                        return
+                    chunk = body[offset : offset + CHUNK_SIZE]
+                    self.wfile.write(chunk)
+                    server._count("bytes_sent", len(chunk))
+                    if delay:
+                        time.sleep(delay)
+                server._count("downloads_ok")
+
+        return Handler
+
+
+def local_sicar_class(base_url: str):
+    """Subclasse de `SICAR.Sicar` apontando para `base_url` (ex.: `FakeSicarServer.base_url`)."""
+    from SICAR.sicar import Sicar
+
+    class LocalSicar(Sicar):
+        _BASE = base_url
+        _INDEX = f"{base_url}/imoveis/index"
+        _DOWNLOAD_BASE = f"{base_url}/estados/downloadBase"
+        _RECAPTCHA = f"{base_url}/municipios/ReCaptcha"
+        _RELEASE_DATE = f"{base_url}/estados/downloads"
+
+    return LocalSicar
+
+
+def png_corpus(items) -> List[Tuple[bytes, str]]:
+    """Converte itens de `captcha_corpus` (imagem, resposta, nome) em (PNG, resposta); ignora sem resposta."""
+    out = []
+    for img, label, _name in items:
+        if not label:
+            continue
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        out.append((buf.getvalue(), label))
+    return out
+
+
+def main() -> None:
+    import sys
+    from pathlib import Path
+
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from benchmarks.captcha_corpus import load_corpus, synthetic_corpus
+
+    parser = argparse.ArgumentParser(description="Servidor SICAR fake para testes/benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--corpus", type=Path)
+    parser.add_argument("--synthetic", type=int, default=50)
+    parser.add_argument("--state-size-mb", type=float, default=1.0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0)
+    parser.add_argument("--cut-probability", type=float, default=0.0)
+    args = parser.parse_args()
+
+    items = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic)
+    server = FakeSicarServer(
+        png_corpus(items),
+        state_size=int(args.state_size_mb * 1024 * 1024),
+        bandwidth_mbps=args.bandwidth_mbps,
+        cut_probability=args.cut_probability,
+        port=args.port,
+    )
+    print(f"SICAR fake em {server.base_url} (Ctrl+C para parar)")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
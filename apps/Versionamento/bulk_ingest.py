@@ -1,23 +1,34 @@
 import argparse
+import codecs
 import csv
 import datetime as dt
+import io
 import json
 import os
 import re
+import struct
 import subprocess
 import sys
 import time
+import threading
 import random
-from hashlib import sha1
+import hashlib
+import math
+from decimal import Decimal
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 import shutil
+from contextlib import contextmanager
+from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 
 import psycopg2
 from dotenv import load_dotenv
 from psycopg2 import sql
 from urllib.parse import urlparse
 
+import source_fingerprint
+
 
 # ============================================================
 # Config e logging
@@ -92,6 +103,36 @@ OGR2OGR_ENABLE_METADATA = os.environ.get("LANDWATCH_OGR2OGR_ENABLE_METADATA", "0
 )
 OGR2OGR_LOG_DIR = os.environ.get("LANDWATCH_OGR2OGR_LOG_DIR", "logs").strip()
 OGR2OGR_NLT = os.environ.get("LANDWATCH_OGR2OGR_NLT", "GEOMETRY").strip()
+# ogr2ogr (default) ou pyogrio (leitura Arrow + COPY binário na mesma conexão).
+STAGING_ENGINE = os.environ.get("LANDWATCH_STAGING_ENGINE", "ogr2ogr").strip().lower() or "ogr2ogr"
+# Formatos vetoriais aceitos (FlatGeobuf vem do download WFS em streaming); o resto é CSV.
+SPATIAL_SUFFIXES = (".shp", ".fgb")
+PYOGRIO_BATCH_SIZE = int(os.environ.get("LANDWATCH_PYOGRIO_BATCH_SIZE", "50000").strip() or "50000")
+# copy (default: stg_raw texto + to_jsonb) ou stream (CSV -> stg_payload direto, COPY binário).
+CSV_STAGING_ENGINE = os.environ.get("LANDWATCH_CSV_STAGING_ENGINE", "copy").strip().lower() or "copy"
+CSV_STREAM_BATCH_ROWS = int(os.environ.get("LANDWATCH_CSV_STREAM_BATCH_ROWS", "50000").strip() or "50000")
+# Limite do csv.reader por campo (padrão do Python: 131072); WKT de polígonos grandes passa disso. 0 = sem limite.
+CSV_FIELD_SIZE_LIMIT = int(os.environ.get("LANDWATCH_CSV_FIELD_SIZE_LIMIT", "0").strip() or "0")
+# Hashes + dedup no cliente (só nos engines Python: pyogrio e CSV stream).
+CLIENT_HASHING = _env_bool("LANDWATCH_CLIENT_HASHING", False)
+# md5 = compatível com lw_feature_state existente. blake2b troca só os hashes de
+# comparação (attr_compare_hash/tooltip_hash; uma rodada marca tudo como CHANGED).
+# feature_key, attr_hash (lw_attr_pack) e geom_hash (lw_geom_store) são sempre md5.
+CLIENT_HASH_ALGO = os.environ.get("LANDWATCH_CLIENT_HASH_ALGO", "md5").strip().lower() or "md5"
+# Hash do WKB cru antes de validar: geometrias já presentes no lw_geom_store
+# pulam ST_IsValid/ST_MakeValid (só as novas passam pelo GEOS).
+GEOM_FAST_PATH = _env_bool("LANDWATCH_GEOM_FAST_PATH", True)
+# Steps do ingest.sql (`-- @step <nome>`) com EXPLAIN (ANALYZE, BUFFERS): lista
+# separada por vírgula ou "all". Métricas vão para lw_ingest_step_metric (se existir).
+INGEST_SQL_EXPLAIN = {
+    s.strip().lower()
+    for s in os.environ.get("LANDWATCH_INGEST_SQL_EXPLAIN", "").split(",")
+    if s.strip()
+}
+INGEST_STEP_METRICS = _env_bool("LANDWATCH_INGEST_STEP_METRICS", True)
+# Cria a partição quente do dataset (sql/feature_hist_partition_apply.sql) antes
+# do ingest; no-op enquanto a migração não foi aplicada.
+ENSURE_PARTITIONS = _env_bool("LANDWATCH_ENSURE_PARTITIONS", True)
 OGR2OGR_STALL_SECONDS = int(
     os.environ.get("LANDWATCH_OGR2OGR_STALL_SECONDS", "900").strip() or "900"
 )
@@ -106,12 +147,24 @@ DB_RETRY_JITTER = float(os.environ.get("LANDWATCH_DB_RETRY_JITTER", "0.3").strip
 MV_REFRESH_CONCURRENTLY = _env_bool("LANDWATCH_MV_REFRESH_CONCURRENTLY", False)
 MV_ANALYZE_AFTER_REFRESH = _env_bool("LANDWATCH_MV_ANALYZE_AFTER_REFRESH", True)
 CACHE_DELTA_MAX_RATIO = float(os.environ.get("LANDWATCH_CACHE_DELTA_MAX_RATIO", "0.35").strip() or "0.35")
+INGEST_WORKERS = int(os.environ.get("LANDWATCH_INGEST_WORKERS", "1").strip() or "1")
+REFRESH_WORKERS = int(os.environ.get("LANDWATCH_REFRESH_WORKERS", "1").strip() or "1")
+DB_POOL_SIZE = int(os.environ.get("LANDWATCH_DB_POOL_SIZE", "4").strip() or "4")
+STAGING_ORPHAN_HOURS = float(os.environ.get("LANDWATCH_STAGING_ORPHAN_HOURS", "24").strip() or "24")
 ATTR_HASH_EXCLUDE_KEYS = [
     key.strip()
     for key in os.environ.get("LANDWATCH_ATTR_HASH_EXCLUDE_KEYS", "row_id").split(",")
     if key.strip()
 ]
 _LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
+# Prefixo opcional dos logs; usado pelos workers do modo --workers para que as
+# linhas intercaladas de datasets diferentes continuem identificáveis.
+_LOG_CONTEXT = ""
+
+
+def _set_log_context(context: Optional[str]) -> None:
+    global _LOG_CONTEXT
+    _LOG_CONTEXT = f"[{context}] " if context else ""
 
 
 def _should_log(level: str) -> bool:
@@ -120,22 +173,22 @@ def _should_log(level: str) -> bool:
 
 def log_debug(msg: str):
     if _should_log("DEBUG"):
-        print(f"[DEBUG] {msg}")
+        print(f"[DEBUG] {_LOG_CONTEXT}{msg}")
 
 
 def log_info(msg: str):
     if _should_log("INFO"):
-        print(f"[INFO] {msg}")
+        print(f"[INFO] {_LOG_CONTEXT}{msg}")
 
 
 def log_warn(msg: str):
     if _should_log("WARN"):
-        print(f"[WARN] {msg}")
+        print(f"[WARN] {_LOG_CONTEXT}{msg}")
 
 
 def log_error(msg: str):
     if _should_log("ERROR"):
-        print(f"[ERROR] {msg}")
+        print(f"[ERROR] {_LOG_CONTEXT}{msg}")
 
 
 def _retry_delay(attempt: int) -> float:
@@ -215,7 +268,14 @@ def next_ogr_group_size(current: int) -> int:
     return reduced
 
 
+# Resolvido uma vez por processo: cada tentativa roda `ogr2ogr --formats`.
+_RESOLVED_OGR2OGR: Optional[str] = None
+
+
 def resolve_ogr2ogr() -> Optional[str]:
+    global _RESOLVED_OGR2OGR
+    if _RESOLVED_OGR2OGR:
+        return _RESOLVED_OGR2OGR
     candidates: List[str] = []
     if OGR2OGR_PATH:
         candidates.append(OGR2OGR_PATH)
@@ -235,6 +295,7 @@ def resolve_ogr2ogr() -> Optional[str]:
             continue
         if _ogr_has_postgres_driver(exe):
             log_info(f"Usando ogr2ogr: {exe}")
+            _RESOLVED_OGR2OGR = exe
             return exe
 
     if candidates:
@@ -272,8 +333,118 @@ def get_db_params() -> Dict[str, str]:
     }
 
 
+class _ConnectionPool:
+    """Pool simples para o modo in-process (`ingest_files`).
+
+    `get_conn()` continua sendo usado como `with get_conn() as conn:`; com o pool
+    ativo a conexão devolvida é de uma subclasse cujo `__exit__` faz o
+    commit/rollback normal do psycopg2 e a devolve ao pool (sem temp tables nem
+    SETs de sessão) em vez de deixá-la para o GC.
+    """
+
+    def __init__(self, max_idle: int):
+        self.max_idle = max(0, max_idle)
+        self._idle: List[object] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        base = psycopg2.extensions.connection
+        pool = self
+
+        class _PooledConnection(base):
+            def __exit__(self, exc_type, exc, tb):
+                try:
+                    return super().__exit__(exc_type, exc, tb)
+                finally:
+                    pool.release(self)
+
+        self.connection_factory = _PooledConnection
+
+    def acquire(self):
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.closed:
+                    return conn
+        return None
+
+    def release(self, conn) -> None:
+        if conn.closed:
+            return
+        try:
+            conn.rollback()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("DISCARD TEMP")
+                cur.execute("RESET ALL")
+                cur.execute("SET search_path TO landwatch, public")
+            conn.autocommit = False
+        except Exception as e:
+            log_debug(f"Conexão descartada do pool: {e}")
+            conn.close()
+            return
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def drain(self) -> None:
+        """Fecha as conexões ociosas; o pool continua ativo."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close_all(self) -> None:
+        with self._lock:
+            self._closed = True
+        self.drain()
+
+
+_CONN_POOL: Optional[_ConnectionPool] = None
+# Pools herdados do pai via fork: só referenciados para o GC não fechar os sockets do pai.
+_INHERITED_POOLS: List[_ConnectionPool] = []
+
+
+def _enable_connection_pool() -> None:
+    """Initializer dos workers do ProcessPool no modo in-process.
+
+    Sempre cria um pool novo. Com fork, o `_CONN_POOL` herdado guarda conexões
+    cujos sockets são do processo pai; fechá-las aqui mandaria Terminate no
+    socket compartilhado. Elas ficam só referenciadas (o worker sai via os._exit).
+    """
+    global _CONN_POOL
+    if _CONN_POOL is not None:
+        _INHERITED_POOLS.append(_CONN_POOL)
+    _CONN_POOL = _ConnectionPool(DB_POOL_SIZE)
+
+
+@contextmanager
+def connection_pool():
+    """Reaproveita conexões entre chamadas de `get_conn()` dentro do bloco."""
+    global _CONN_POOL
+    if _CONN_POOL is not None:
+        yield _CONN_POOL
+        return
+    _CONN_POOL = _ConnectionPool(DB_POOL_SIZE)
+    try:
+        yield _CONN_POOL
+    finally:
+        pool, _CONN_POOL = _CONN_POOL, None
+        pool.close_all()
+
+
 def get_conn():
+    pool = _CONN_POOL
+    if pool is not None:
+        pooled = pool.acquire()
+        if pooled is not None:
+            return pooled
     params = get_db_params()
+    extra = {"connection_factory": pool.connection_factory} if pool is not None else {}
     conn = psycopg2.connect(
         user=params["user"],
         password=params["password"],
@@ -281,6 +452,7 @@ def get_conn():
         port=params["port"],
         dbname=params["dbname"],
         sslmode="require",
+        **extra,
     )
     # Evita "set_session cannot be used inside a transaction"
     # Configura search_path fora de transação.
@@ -313,17 +485,12 @@ def _build_skip_log_path(shp_path: Path) -> Optional[Path]:
 # Fingerprint
 # ============================================================
 def _sha1_file(path: Path, chunk_bytes: int = 8 * 1024 * 1024) -> str:
-    h = sha1()
-    with path.open("rb") as f:
-        while True:
-            b = f.read(chunk_bytes)
-            if not b:
-                break
-            h.update(b)
-    return h.hexdigest()
+    return source_fingerprint.sha1_file(path, chunk_bytes)
 
 
 def _shapefile_component_paths(shp_path: Path) -> List[Path]:
+    if shp_path.suffix.lower() != ".shp":
+        return [shp_path] if shp_path.exists() else []
     stem = shp_path.stem
     parent = shp_path.parent
     exts = [
@@ -341,17 +508,13 @@ def _shapefile_component_paths(shp_path: Path) -> List[Path]:
 
 
 def compute_source_fingerprint(path: Path) -> str:
-    if path.suffix.lower() == ".shp":
+    if path.suffix.lower() in SPATIAL_SUFFIXES:
         files = _shapefile_component_paths(path)
     else:
         files = [path]
 
-    manifest = {}
-    for fp in files:
-        manifest[fp.name] = {"sha1": _sha1_file(fp), "size": int(fp.stat().st_size)}
-
-    manifest_json = json.dumps(manifest, sort_keys=True, ensure_ascii=False)
-    return sha1(manifest_json.encode("utf-8")).hexdigest()
+    # Componentes em paralelo e digests cacheados (o job ja calculou os mesmos arquivos).
+    return source_fingerprint.fingerprint_files(files)
 
 
 # ============================================================
@@ -463,6 +626,35 @@ def load_dataset_config(conn, dataset_id: int) -> dict:
     return dict(zip(keys, row))
 
 
+def ensure_dataset_partitions(conn, dataset_id: int) -> int:
+    """Garante a partição dedicada do dataset nas tabelas de histórico/estado.
+
+    Só datasets quentes (CAR_<UF>) ganham partição; os demais ficam na DEFAULT.
+    Transação própria e curta: falha (ex.: lock_timeout com outro worker) só
+    gera aviso e o dataset segue na DEFAULT até a próxima rodada.
+    """
+    row = fetch_one(
+        conn,
+        "SELECT to_regprocedure('landwatch.ensure_feature_partitions(bigint,boolean)') IS NOT NULL",
+    )
+    conn.commit()
+    if not row or row[0] is not True:
+        return 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = '10s'")
+            cur.execute("SELECT landwatch.ensure_feature_partitions(%s)", (dataset_id,))
+            created = int(cur.fetchone()[0] or 0)
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        log_warn(f"Particao do dataset {dataset_id} nao criada (segue na DEFAULT): {e}")
+        return 0
+    if created:
+        log_info(f"Particoes criadas para o dataset {dataset_id}: {created}.")
+    return created
+
+
 def get_last_good_fingerprint(conn, dataset_id: int) -> Optional[str]:
     row = fetch_one(
         conn,
@@ -549,24 +741,182 @@ def finish_dataset_version(conn, version_id: int, status: str, error_message: Op
     )
 
 
+def _version_lock_key(version_id: int) -> str:
+    return f"landwatch.lw_dataset_version:{int(version_id)}"
+
+
+@contextmanager
+def running_version_lock(conn, version_id: int):
+    """Advisory lock de sessão enquanto a versão está RUNNING neste processo.
+
+    É o sinal de vida do ingest: se o worker morre (OOM/sinal), a sessão cai,
+    o lock é liberado e `fail_dead_running_versions` pode fechar a versão.
+    """
+    exec_sql(conn, "SELECT pg_advisory_lock(hashtext(%s))", (_version_lock_key(version_id),))
+    conn.commit()
+    try:
+        yield
+    finally:
+        try:
+            conn.rollback()
+            exec_sql(conn, "SELECT pg_advisory_unlock(hashtext(%s))", (_version_lock_key(version_id),))
+            conn.commit()
+        except Exception as e:
+            log_debug(f"Falha ao liberar lock da versão {version_id}: {e}")
+
+
+def fail_dead_running_versions(conn, max_age_hours: float = STAGING_ORPHAN_HOURS) -> List[int]:
+    """Marca FAILED as versões RUNNING antigas cujo ingest não está mais vivo.
+
+    Vivo = sessão segurando o lock de `running_version_lock`; sem ele (worker
+    morto), a versão ficaria RUNNING para sempre, já que o próximo run costuma
+    ter outro snapshot/version_label.
+    """
+    rows = fetch_all(
+        conn,
+        """
+        SELECT version_id
+        FROM landwatch.lw_dataset_version
+        WHERE status = 'RUNNING'
+          AND loaded_at < now() - make_interval(secs => %s)
+        ORDER BY version_id
+        """,
+        (float(max_age_hours) * 3600.0,),
+    )
+    failed: List[int] = []
+    for (version_id,) in rows:
+        key = _version_lock_key(version_id)
+        locked = fetch_one(conn, "SELECT pg_try_advisory_lock(hashtext(%s))", (key,))
+        if not (locked and locked[0]):
+            continue
+        try:
+            exec_sql(
+                conn,
+                """
+                UPDATE landwatch.lw_dataset_version
+                SET status = 'FAILED', error_message = %s
+                WHERE version_id = %s AND status = 'RUNNING'
+                """,
+                ("orphaned: worker died", version_id),
+            )
+            conn.commit()
+            failed.append(int(version_id))
+        finally:
+            exec_sql(conn, "SELECT pg_advisory_unlock(hashtext(%s))", (key,))
+            conn.commit()
+    if failed:
+        log_warn(f"Versões RUNNING sem ingest vivo marcadas FAILED: {', '.join(map(str, failed))}")
+    return failed
+
+
 # ============================================================
 # Staging helpers
 # ============================================================
+STG_RAW_TABLE = "landwatch.stg_raw"
+STG_PAYLOAD_TABLE = "landwatch.stg_payload"
+# Hashes opcionais do staging (preenchidos só no hashing no cliente).
+STG_PAYLOAD_HASH_COLUMNS = ["feature_key", "attr_hash", "attr_compare_hash", "tooltip_hash", "geom_hash"]
+_STG_PAYLOAD_NULL_HASHES = ", ".join(f"NULL::text AS {c}" for c in STG_PAYLOAD_HASH_COLUMNS)
+
+
+def staging_table_names(suffix: Optional[str] = None) -> Tuple[str, str]:
+    """Retorna (stg_raw, stg_payload); com sufixo, cada ingest ganha tabelas próprias."""
+    if not suffix:
+        return STG_RAW_TABLE, STG_PAYLOAD_TABLE
+    safe = re.sub(r"[^a-z0-9_]+", "_", str(suffix).lower()).strip("_")
+    if not safe:
+        return STG_RAW_TABLE, STG_PAYLOAD_TABLE
+    return f"{STG_RAW_TABLE}_{safe}", f"{STG_PAYLOAD_TABLE}_{safe}"
+
+
+def version_staging_tables(version_id: int) -> Tuple[str, str]:
+    """Staging exclusivo da versão: ingests concorrentes nunca compartilham tabelas."""
+    return staging_table_names(f"v{int(version_id)}")
+
+
+def _split_table(full_table: str) -> Tuple[str, str]:
+    schema, _, name = full_table.rpartition(".")
+    return schema or "public", name
+
+
 def drop_table(conn, full_table: str):
     exec_sql(conn, f"DROP TABLE IF EXISTS {full_table}")
 
 
+def _drop_staging_tables(staging: Tuple[str, str]) -> None:
+    try:
+        with get_conn() as conn:
+            conn.autocommit = True
+            for table in staging:
+                drop_table(conn, table)
+    except Exception as e:
+        log_warn(f"Falha ao remover staging {', '.join(staging)}: {e}")
+
+
+def cleanup_orphan_staging_tables(conn, max_age_hours: float = STAGING_ORPHAN_HOURS) -> List[str]:
+    """Remove stg_raw_v<id>/stg_payload_v<id> de versões que não estão mais rodando.
+
+    Antes, versões RUNNING há mais de `max_age_hours` sem ingest vivo viram
+    FAILED (`fail_dead_running_versions`). Órfã = versão inexistente ou com
+    status final. Tabelas ainda travadas por outra sessão são ignoradas
+    (lock_timeout curto) para nunca derrubar um ingest vivo.
+    """
+    try:
+        fail_dead_running_versions(conn, max_age_hours)
+    except Exception as e:
+        conn.rollback()
+        log_warn(f"Falha ao fechar versões RUNNING órfãs (seguindo): {e}")
+    rows = fetch_all(
+        conn,
+        """
+        SELECT
+          t.schemaname,
+          t.tablename,
+          v.version_id IS NULL OR v.status <> 'RUNNING' AS orphan
+        FROM pg_tables t
+        LEFT JOIN landwatch.lw_dataset_version v
+          ON v.version_id = substring(t.tablename from '_v([0-9]+)$')::bigint
+        WHERE t.schemaname = 'landwatch'
+          AND t.tablename ~ '^stg_(raw|payload)_v[0-9]+$'
+        ORDER BY t.tablename
+        """,
+    )
+    dropped: List[str] = []
+    for schema, name, orphan in rows:
+        if not orphan:
+            continue
+        full_table = f"{schema}.{name}"
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = '2s'")
+                cur.execute(f"DROP TABLE IF EXISTS {full_table}")
+            conn.commit()
+            dropped.append(full_table)
+        except Exception as e:
+            conn.rollback()
+            log_debug(f"Staging {full_table} em uso; mantida ({e}).")
+    if dropped:
+        log_info(f"Staging órfã removida: {len(dropped)} tabela(s).")
+    return dropped
+
+
+def _raise_csv_field_size_limit() -> None:
+    limit = CSV_FIELD_SIZE_LIMIT if CSV_FIELD_SIZE_LIMIT > 0 else sys.maxsize
+    try:
+        csv.field_size_limit(limit)
+    except OverflowError:
+        # C long de 32 bits (Windows).
+        csv.field_size_limit(2**31 - 1)
+
+
 def _read_csv_header(csv_path: Path, encoding: str, delimiter: str) -> List[str]:
+    _raise_csv_field_size_limit()
     with csv_path.open("r", encoding=encoding, errors="replace", newline="") as f:
         reader = csv.reader(f, delimiter=delimiter)
         return next(reader)
 
 
-def create_stg_raw_csv(conn, csv_path: Path, delimiter: str, encoding: str) -> Tuple[str, List[str]]:
-    table = "landwatch.stg_raw"
-    drop_table(conn, table)
-
-    header = _read_csv_header(csv_path, encoding, delimiter)
+def _csv_column_names(header: List[str]) -> List[str]:
     cols = []
     seen = set()
     for c in header:
@@ -580,20 +930,36 @@ def create_stg_raw_csv(conn, csv_path: Path, delimiter: str, encoding: str) -> T
             i += 1
         seen.add(name)
         cols.append(name)
+    return cols
+
+
+def create_stg_raw_csv(
+    conn,
+    csv_path: Path,
+    delimiter: str,
+    encoding: str,
+    table: str = STG_RAW_TABLE,
+) -> Tuple[str, List[str]]:
+    drop_table(conn, table)
+
+    header = _read_csv_header(csv_path, encoding, delimiter)
+    cols = _csv_column_names(header)
     col_idents = [sql.Identifier(c) for c in cols]
+    table_ident = sql.Identifier(*_split_table(table))
 
     with conn.cursor() as cur:
-        cur.execute("CREATE UNLOGGED TABLE landwatch.stg_raw ()")
+        cur.execute(sql.SQL("CREATE UNLOGGED TABLE {} ()").format(table_ident))
         for col in col_idents:
             cur.execute(
-                sql.SQL("ALTER TABLE landwatch.stg_raw ADD COLUMN {} TEXT").format(col)
+                sql.SQL("ALTER TABLE {} ADD COLUMN {} TEXT").format(table_ident, col)
             )
 
     with conn.cursor() as cur, csv_path.open("rb") as f:
         cur.execute(sql.SQL("SET client_encoding TO {}").format(sql.Literal(encoding)))
         copy_sql = sql.SQL(
-            "COPY landwatch.stg_raw FROM STDIN WITH (FORMAT csv, DELIMITER {}, HEADER true)"
+            "COPY {} FROM STDIN WITH (FORMAT csv, DELIMITER {}, HEADER true)"
         ).format(
+            table_ident,
             sql.Literal(delimiter),
         )
         cur.copy_expert(copy_sql, f)
@@ -617,6 +983,9 @@ def detect_shp_encoding(
     shp_path: Path,
     preferred_encoding: Optional[str] = None,
 ) -> Tuple[Optional[str], str]:
+    if shp_path.suffix.lower() != ".shp":
+        # FlatGeobuf é sempre UTF-8; -oo ENCODING só existe no driver de shapefile.
+        return None, f"format:{shp_path.suffix.lower().lstrip('.')}"
     cpg_path = shp_path.with_suffix(".cpg")
     if cpg_path.exists():
         raw = cpg_path.read_bytes()
@@ -646,6 +1015,7 @@ def _build_ogr_cmd(
     group_size: int,
     use_makevalid: bool,
     shp_encoding: Optional[str],
+    table: str = STG_RAW_TABLE,
 ) -> List[str]:
     ogr2ogr = resolve_ogr2ogr()
     if not ogr2ogr:
@@ -659,7 +1029,7 @@ def _build_ogr_cmd(
         conn_str,
         str(shp_path),
         "-nln",
-        "landwatch.stg_raw",
+        table,
         "-lco",
         "GEOMETRY_NAME=geom",
         "-lco",
@@ -692,9 +1062,21 @@ def create_stg_raw_shp(
     shp_path: Path,
     file_size_bytes: int,
     preferred_encoding: Optional[str] = None,
+    table: str = STG_RAW_TABLE,
+    srid: Optional[int] = None,
 ):
-    drop_table(conn, "landwatch.stg_raw")
+    drop_table(conn, table)
     conn.commit()
+    if STAGING_ENGINE == "pyogrio":
+        shp_encoding, encoding_source = detect_shp_encoding(
+            shp_path,
+            preferred_encoding=preferred_encoding,
+        )
+        log_info(f"Staging SHP via pyogrio (encoding={shp_encoding or 'auto'}, source={encoding_source})")
+        create_stg_raw_shp_native(conn, shp_path, shp_encoding, table=table, srid=srid)
+        return
+    if STAGING_ENGINE != "ogr2ogr":
+        log_warn(f"LANDWATCH_STAGING_ENGINE='{STAGING_ENGINE}' desconhecido; usando ogr2ogr.")
     ogr_env = os.environ.copy()
     if GDAL_DATA:
         ogr_env["GDAL_DATA"] = GDAL_DATA
@@ -731,6 +1113,7 @@ def create_stg_raw_shp(
             current_group_size,
             use_makevalid,
             shp_encoding=shp_encoding,
+            table=table,
         )
         log_info("Executando ogr2ogr para staging SHP...")
         log_debug(f"ogr2ogr cmd: {' '.join([_mask_pg_conn_str(p) for p in ogr_cmd])}")
@@ -820,7 +1203,6 @@ def _run_ogr2ogr_streaming(
         bufsize=1,
     )
 
-    import threading
     t_out = threading.Thread(target=_stream_lines, args=("[ogr2ogr] ", proc.stdout, _log_line), daemon=True)
     t_err = threading.Thread(target=_stream_lines, args=("[ogr2ogr] ", proc.stderr, _log_line), daemon=True)
     t_out.start()
@@ -876,9 +1258,14 @@ def _is_skipinvalid_line(line: str) -> bool:
         or "geometry has invalid" in text
     )
 
-
-def create_stg_payload_from_raw_csv(conn, geom_col: Optional[str], srid: int):
-    drop_table(conn, "landwatch.stg_payload")
+def create_stg_payload_from_raw_csv(
+    conn,
+    geom_col: Optional[str],
+    srid: int,
+    raw_table: str = STG_RAW_TABLE,
+    payload_table: str = STG_PAYLOAD_TABLE,
+):
+    drop_table(conn, payload_table)
     # stg_payload expõe `geom geometry` (não mais WKT texto). Para CSV a geom vem
     # de uma coluna WKT, então parseamos UMA vez aqui com a MESMA função safe
     # (mesmo SRID, NULL em erro) que o ingest.sql usava — comportamento idêntico.
@@ -889,22 +1276,28 @@ def create_stg_payload_from_raw_csv(conn, geom_col: Optional[str], srid: int):
         geom_select = f"pg_temp.safe_geom_from_wkt(t.{col}, {int(srid)}) AS geom"
 
     query = f"""
-        CREATE UNLOGGED TABLE landwatch.stg_payload AS
+        CREATE UNLOGGED TABLE {payload_table} AS
         SELECT
           row_number() OVER ()::bigint AS row_id,
           to_jsonb(t) AS payload,
           {geom_select},
-          NULL::text AS feature_key_override
-        FROM landwatch.stg_raw t
+          NULL::text AS feature_key_override,
+          {_STG_PAYLOAD_NULL_HASHES}
+        FROM {raw_table} t
     """
     exec_sql(conn, query)
 
 
-def create_stg_payload_from_raw_shp(conn, natural_id_col: Optional[str]):
-    drop_table(conn, "landwatch.stg_payload")
+def create_stg_payload_from_raw_shp(
+    conn,
+    natural_id_col: Optional[str],
+    raw_table: str = STG_RAW_TABLE,
+    payload_table: str = STG_PAYLOAD_TABLE,
+):
+    drop_table(conn, payload_table)
     feature_expr = "NULL::text AS feature_key_override"
     if natural_id_col:
-        col = resolve_stg_column(conn, natural_id_col)
+        col = resolve_stg_column(conn, natural_id_col, raw_table)
         if col:
             feature_expr = f"t.{sql.Identifier(col).as_string(conn)}::text AS feature_key_override"
         else:
@@ -913,28 +1306,39 @@ def create_stg_payload_from_raw_shp(conn, natural_id_col: Optional[str]):
     # geometry válida). Sem ST_AsText/round-trip WKT. O geom_hash final é idêntico
     # (round-trip WKT verificado lossless), então o delta não muda.
     query = """
-        CREATE UNLOGGED TABLE landwatch.stg_payload AS
+        CREATE UNLOGGED TABLE {payload_table} AS
         SELECT
           row_number() OVER ()::bigint AS row_id,
           to_jsonb(t) - 'geom' AS payload,
           t.geom AS geom,
-          {feature_expr}
-        FROM landwatch.stg_raw t
-    """.format(feature_expr=feature_expr)
+          {feature_expr},
+          {null_hashes}
+        FROM {raw_table} t
+    """.format(
+        payload_table=payload_table,
+        feature_expr=feature_expr,
+        null_hashes=_STG_PAYLOAD_NULL_HASHES,
+        raw_table=raw_table,
+    )
     exec_sql(conn, query)
 
 
-def resolve_stg_column(conn, preferred: str) -> Optional[str]:
+def resolve_stg_column(conn, preferred: str, table: str = STG_RAW_TABLE) -> Optional[str]:
+    schema, name = _split_table(table)
     rows = fetch_all(
         conn,
         """
         SELECT column_name
         FROM information_schema.columns
-        WHERE table_schema = 'landwatch'
-          AND table_name = 'stg_raw'
+        WHERE table_schema = %s
+          AND table_name = %s
         """,
+        (schema, name),
     )
-    cols = {r[0] for r in rows}
+    return _match_column_name(preferred, {r[0] for r in rows})
+
+
+def _match_column_name(preferred: str, cols) -> Optional[str]:
     if preferred in cols:
         return preferred
     low = preferred.lower()
@@ -946,6 +1350,869 @@ def resolve_stg_column(conn, preferred: str) -> Optional[str]:
     return None
 
 
+# ============================================================
+# Staging nativo (COPY binário: pyogrio para SHP, stream para CSV)
+# ============================================================
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack("!h", -1)
+_PGCOPY_NULL = struct.pack("!i", -1)
+_PG_EPOCH_DATE = dt.date(2000, 1, 1)
+_PG_EPOCH_TS = dt.datetime(2000, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def _arrow_pg_type(arrow_type) -> str:
+    """Tipo PG equivalente ao que o ogr2ogr cria com -lco PRECISION=NO."""
+    name = str(arrow_type)
+    if name == "int32":
+        return "integer"
+    if name == "int64":
+        return "bigint"
+    if name in ("int16", "int8"):
+        return "smallint"
+    if name == "double":
+        return "double precision"
+    if name == "float":
+        return "real"
+    if name == "bool":
+        return "boolean"
+    if name.startswith("date"):
+        return "date"
+    if name.startswith("timestamp"):
+        return "timestamp with time zone"
+    if name.startswith("time"):
+        return "time"
+    return "character varying"
+
+
+def _pg_date_days(value) -> int:
+    if isinstance(value, str):
+        value = dt.date.fromisoformat(value[:10])
+    if isinstance(value, dt.datetime):
+        value = value.date()
+    return (value - _PG_EPOCH_DATE).days
+
+
+def _pg_timestamp_micros(value) -> int:
+    if isinstance(value, str):
+        value = dt.datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt.timezone.utc)
+    delta = value - _PG_EPOCH_TS
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _pg_time_micros(value) -> int:
+    if isinstance(value, str):
+        value = dt.time.fromisoformat(value)
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond
+
+
+_PGCOPY_ENCODERS: Dict[str, Callable[[object], bytes]] = {
+    "smallint": struct.Struct("!h").pack,
+    "integer": struct.Struct("!i").pack,
+    "bigint": struct.Struct("!q").pack,
+    "real": struct.Struct("!f").pack,
+    "double precision": struct.Struct("!d").pack,
+    "boolean": lambda v: b"\x01" if v else b"\x00",
+    "date": lambda v: struct.pack("!i", _pg_date_days(v)),
+    "timestamp with time zone": lambda v: struct.pack("!q", _pg_timestamp_micros(v)),
+    "time": lambda v: struct.pack("!q", _pg_time_micros(v)),
+    "character varying": lambda v: str(v).encode("utf-8"),
+    "text": lambda v: str(v).encode("utf-8"),
+    # jsonb binário = versão 1 + texto JSON.
+    "jsonb": lambda v: b"\x01" + (v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)).encode("utf-8"),
+    # geometry_recv aceita EWKB (com SRID).
+    "geometry": bytes,
+}
+
+
+def pgcopy_encode_rows(rows: Iterable[tuple], pg_types: List[str]) -> bytes:
+    """Codifica tuplas no formato binário do COPY (sem header/trailer)."""
+    encoders = [_PGCOPY_ENCODERS[t] for t in pg_types]
+    field_count = struct.pack("!h", len(encoders))
+    pack_len = struct.Struct("!i").pack
+    out = bytearray()
+    for row in rows:
+        out += field_count
+        for encode, value in zip(encoders, row):
+            if value is None:
+                out += _PGCOPY_NULL
+                continue
+            data = encode(value)
+            out += pack_len(len(data))
+            out += data
+    return bytes(out)
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like sobre um iterador de bytes, para alimentar cur.copy_expert em streaming."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buf = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            try:
+                self._buf = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def copy_binary(conn, table: str, columns: List[str], chunks: Iterable[bytes]) -> None:
+    """COPY FROM STDIN (FORMAT binary); `chunks` já vem codificado por pgcopy_encode_rows."""
+
+    def _framed():
+        yield _PGCOPY_HEADER
+        yield from chunks
+        yield _PGCOPY_TRAILER
+
+    cols = ", ".join(sql.Identifier(c).as_string(conn) for c in columns)
+    with conn.cursor() as cur:
+        # Campos texto em COPY binário são convertidos a partir do client_encoding.
+        cur.execute("SET client_encoding TO 'UTF8'")
+        cur.copy_expert(
+            f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT binary)",
+            _ChunkReader(_framed()),
+            size=1 << 20,
+        )
+
+
+def launder_pg_column_name(name: str) -> str:
+    """Mesmo LAUNDER do driver PostgreSQL do GDAL: minúsculas, ' - # viram _, até 63 bytes."""
+    laundered = "".join(
+        "_" if ch in "'-#" else (ch.lower() if ord(ch) < 128 else ch)
+        for ch in name
+    )
+    return laundered.encode("utf-8")[:63].decode("utf-8", errors="ignore")
+
+
+def _parse_epsg(crs: Optional[str]) -> Optional[int]:
+    if not crs:
+        return None
+    m = re.fullmatch(r"\s*EPSG:(\d+)\s*", str(crs), flags=re.IGNORECASE)
+    return int(m.group(1)) if m else None
+
+
+def _load_open_arrow():
+    try:
+        from pyogrio.raw import open_arrow
+    except ImportError as e:
+        raise RuntimeError(
+            "LANDWATCH_STAGING_ENGINE=pyogrio requer os pacotes pyogrio e pyarrow."
+        ) from e
+    return open_arrow
+
+
+@contextmanager
+def _open_shp_native(
+    shp_path: Path,
+    shp_encoding: Optional[str],
+    srid: Optional[int] = None,
+    batch_size: int = PYOGRIO_BATCH_SIZE,
+):
+    """Abre o SHP via pyogrio e expõe o layout que o ogr2ogr criaria.
+
+    Produz (layer_srid, columns, pg_types, batches, stats); cada item de
+    `batches` é (linhas de atributos, geometrias shapely) já com as flags do
+    ogr2ogr aplicadas: make_valid quando LANDWATCH_OGR2OGR_MAKEVALID e
+    descarte de inválidas quando LANDWATCH_OGR2OGR_SKIP_INVALID.
+    """
+    import shapely
+
+    open_arrow = _load_open_arrow()
+    if OGR2OGR_NLT.upper() != "GEOMETRY":
+        log_warn(f"LANDWATCH_OGR2OGR_NLT={OGR2OGR_NLT} ignorado no engine pyogrio (geometrias como lidas).")
+
+    kwargs = {"batch_size": max(1, int(batch_size)), "use_pyarrow": True}
+    if shp_encoding:
+        kwargs["encoding"] = shp_encoding
+    with open_arrow(str(shp_path), **kwargs) as (meta, reader):
+        layer_srid = _parse_epsg(meta.get("crs"))
+        if layer_srid is None:
+            if srid is None:
+                raise RuntimeError(f"CRS do SHP não reconhecido ({meta.get('crs')!r}) e SRID do dataset ausente.")
+            log_warn(f"CRS do SHP não reconhecido ({meta.get('crs')!r}); usando SRID do dataset {srid}.")
+            layer_srid = int(srid)
+        schema = reader.schema
+        columns: List[str] = []
+        pg_types: List[str] = []
+        seen = {"row_id", "geom"}
+        for field in meta["fields"]:
+            name = launder_pg_column_name(str(field))
+            base = name
+            i = 2
+            while name in seen:
+                name = f"{base}_{i}"
+                i += 1
+            seen.add(name)
+            columns.append(name)
+            pg_types.append(_arrow_pg_type(schema.field(str(field)).type))
+        geom_field = meta.get("geometry_name") or "wkb_geometry"
+        stats = {"skipped": 0}
+
+        def _batches():
+            for batch in reader:
+                wkb = batch.column(batch.schema.get_field_index(geom_field)).to_numpy(zero_copy_only=False)
+                geoms = shapely.from_wkb(wkb)
+                missing = shapely.is_missing(geoms)
+                if OGR2OGR_MAKEVALID:
+                    invalid = ~missing & ~shapely.is_valid(geoms)
+                    if invalid.any():
+                        geoms[invalid] = shapely.make_valid(geoms[invalid])
+                attrs = [batch.column(batch.schema.get_field_index(str(f))).to_pylist() for f in meta["fields"]]
+                rows = list(zip(*attrs)) if attrs else [()] * len(geoms)
+                if OGR2OGR_SKIP_INVALID:
+                    keep = missing | shapely.is_valid(geoms)
+                    if not keep.all():
+                        stats["skipped"] += int((~keep).sum())
+                        rows = [row for row, k in zip(rows, keep.tolist()) if k]
+                        geoms = geoms[keep]
+                yield rows, shapely.set_srid(geoms, int(layer_srid))
+
+        yield int(layer_srid), columns, pg_types, _batches(), stats
+
+
+def create_stg_raw_shp_native(
+    conn,
+    shp_path: Path,
+    shp_encoding: Optional[str],
+    table: str = STG_RAW_TABLE,
+    srid: Optional[int] = None,
+    batch_size: int = PYOGRIO_BATCH_SIZE,
+) -> int:
+    """Carrega o SHP em `table` com o mesmo layout do ogr2ogr (row_id, geom, atributos).
+
+    row_id é sequencial a partir de 1, como o serial criado pelo ogr2ogr.
+    """
+    load_start = time.time()
+    total_rows = 0
+    with _open_shp_native(shp_path, shp_encoding, srid=srid, batch_size=batch_size) as (
+        layer_srid,
+        columns,
+        pg_types,
+        batches,
+        stats,
+    ):
+        col_defs = [
+            "row_id integer NOT NULL",
+            f"geom geometry(Geometry, {layer_srid})",
+        ] + [f"{sql.Identifier(c).as_string(conn)} {t}" for c, t in zip(columns, pg_types)]
+        exec_sql(conn, f"CREATE UNLOGGED TABLE {table} ({', '.join(col_defs)})")
+        copy_types = ["integer"] + pg_types + ["geometry"]
+
+        def _chunks():
+            nonlocal total_rows
+            for rows, geoms in batches:
+                ewkb = _geoms_to_ewkb(geoms)
+                numbered = []
+                for row, g in zip(rows, ewkb):
+                    total_rows += 1
+                    numbered.append((total_rows, *row, g))
+                yield pgcopy_encode_rows(numbered, copy_types)
+                elapsed = max(time.time() - load_start, 1e-6)
+                log_info(
+                    f"pyogrio staging: {total_rows} linhas ({int(total_rows / elapsed)}/s, "
+                    f"{int(elapsed)}s)"
+                )
+
+        copy_binary(conn, table, ["row_id"] + columns + ["geom"], _chunks())
+    exec_sql(conn, f"ALTER TABLE {table} ADD PRIMARY KEY (row_id)")
+    if stats["skipped"]:
+        log_warn(f"pyogrio staging: {stats['skipped']} feição(ões) com geometria inválida descartada(s).")
+    log_info(f"pyogrio staging finalizado: {total_rows} linhas em {int(time.time() - load_start)}s.")
+    return total_rows
+
+_PG_PY_ENCODINGS = {
+    "UTF8": "utf-8",
+    "LATIN1": "latin-1",
+    "SQL_ASCII": "ascii",
+}
+_EWKT_SRID_PREFIX = re.compile(r"^\s*SRID=\d+;", flags=re.IGNORECASE)
+
+
+def _python_csv_encoding(encoding: str) -> str:
+    """Nome de encoding do Postgres (csv_encoding) -> codec Python."""
+    key = encoding.strip().upper().replace("-", "").replace("_", "")
+    if key in _PG_PY_ENCODINGS:
+        return _PG_PY_ENCODINGS[key]
+    if key.startswith("WIN") and key[3:].isdigit():
+        return f"cp{key[3:]}"
+    codecs.lookup(encoding)
+    return encoding
+
+
+def _csv_quoted_fields(record: str, delimiter: str, quotechar: str = '"') -> List[bool]:
+    """Para cada campo do registro CSV bruto, se ele começou entre aspas."""
+    quoted = [False]
+    at_start = True
+    in_quotes = False
+    i, n = 0, len(record)
+    while i < n:
+        ch = record[i]
+        if in_quotes:
+            if ch == quotechar:
+                if i + 1 < n and record[i + 1] == quotechar:
+                    i += 1
+                else:
+                    in_quotes = False
+        elif ch == delimiter:
+            quoted.append(False)
+            at_start = True
+            i += 1
+            continue
+        elif ch == quotechar and at_start:
+            quoted[-1] = True
+            in_quotes = True
+        at_start = False
+        i += 1
+    return quoted
+
+
+def _csv_stream_rows(handle, delimiter: str):
+    # Mesma semântica do COPY (FORMAT csv): campo vazio sem aspas vira NULL e
+    # "" (entre aspas) continua texto vazio. QUOTE_NOTNULL (Python 3.12+) faz
+    # isso no leitor C; antes disso o registro bruto é reexaminado só quando
+    # contém "" para saber quais campos vazios vieram entre aspas.
+    _raise_csv_field_size_limit()
+    quote_notnull = getattr(csv, "QUOTE_NOTNULL", None)
+    if quote_notnull is not None:
+        yield from csv.reader(handle, delimiter=delimiter, quoting=quote_notnull)
+        return
+    lines: List[str] = []
+
+    def _tracked():
+        for line in handle:
+            lines.append(line)
+            yield line
+
+    for row in csv.reader(_tracked(), delimiter=delimiter):
+        record = "".join(lines)
+        lines.clear()
+        if '""' not in record or "" not in row:
+            yield [v if v != "" else None for v in row]
+            continue
+        quoted = _csv_quoted_fields(record, delimiter)
+        yield [v if v != "" or (i < len(quoted) and quoted[i]) else None for i, v in enumerate(row)]
+
+
+def _csv_wkt_to_geoms(values: List[Optional[str]], srid: int):
+    """Equivalente vetorizado de pg_temp.safe_geom_from_wkt (NULL em vazio/erro)."""
+    import numpy as np
+    import shapely
+
+    wkts = np.array(
+        [_EWKT_SRID_PREFIX.sub("", v) if v else None for v in values],
+        dtype=object,
+    )
+    geoms = shapely.from_wkt(wkts, on_invalid="ignore")
+    return shapely.set_srid(geoms, int(srid))
+
+
+def _geoms_to_ewkb(geoms) -> List[Optional[bytes]]:
+    import shapely
+
+    return shapely.to_wkb(geoms, include_srid=True, flavor="extended").tolist()
+
+
+def _create_stg_payload_table(conn, payload_table: str) -> None:
+    drop_table(conn, payload_table)
+    hash_cols = "".join(f",\n          {c} text" for c in STG_PAYLOAD_HASH_COLUMNS)
+    exec_sql(
+        conn,
+        f"""
+        CREATE UNLOGGED TABLE {payload_table} (
+          row_id bigint,
+          payload jsonb,
+          geom geometry,
+          feature_key_override text{hash_cols}
+        )
+        """,
+    )
+
+
+def create_stg_payload_from_csv_stream(
+    conn,
+    csv_path: Path,
+    delimiter: str,
+    encoding: str,
+    geom_col: Optional[str],
+    srid: int,
+    payload_table: str = STG_PAYLOAD_TABLE,
+    batch_rows: int = CSV_STREAM_BATCH_ROWS,
+    client_hashing: bool = False,
+) -> int:
+    """Lê o CSV uma vez e grava stg_payload (row_id, payload, geom) via COPY binário.
+
+    Substitui stg_raw + to_jsonb + safe_geom_from_wkt: o payload continua com
+    todos os valores como texto (mesmo jsonb, mesmos hashes), e o WKT é
+    parseado em lote com shapely. Com `client_hashing`, grava também os
+    hashes e remove duplicatas de feature_key (ver hashing no cliente).
+    """
+    _create_stg_payload_table(conn, payload_table)
+    load_start = time.time()
+    total_rows = 0
+    py_encoding = _python_csv_encoding(encoding)
+    copy_cols = ["row_id", "payload", "geom"]
+    if client_hashing:
+        copy_cols += STG_PAYLOAD_HASH_COLUMNS
+    copy_types = ["bigint", "jsonb", "geometry"] + ["text"] * (len(copy_cols) - 3)
+    dedup = ClientDedup()
+
+    with csv_path.open("r", encoding=py_encoding, newline="") as handle:
+        rows = _csv_stream_rows(handle, delimiter)
+        header = next(rows, None)
+        if header is None:
+            raise RuntimeError(f"CSV vazio: {csv_path}")
+        cols = _csv_column_names([h or "" for h in header])
+        geom_idx = None
+        if geom_col:
+            if geom_col not in cols:
+                raise RuntimeError(f"Coluna de geometria '{geom_col}' não encontrada em {csv_path.name}.")
+            geom_idx = cols.index(geom_col)
+
+        def _encode(items, first_id):
+            geoms = None
+            if geom_idx is not None:
+                geoms = _csv_wkt_to_geoms([r[geom_idx] for r in items], srid)
+                ewkb = _geoms_to_ewkb(geoms)
+            else:
+                ewkb = [None] * len(items)
+            if not client_hashing:
+                return pgcopy_encode_rows(
+                    (
+                        (first_id + i, json.dumps(dict(zip(cols, r)), ensure_ascii=False), g)
+                        for i, (r, g) in enumerate(zip(items, ewkb))
+                    ),
+                    copy_types,
+                )
+            geom_hashes = client_geom_hashes(geoms) if geoms is not None else [None] * len(items)
+            hashes = client_payload_hashes_batch(cols, items, None, CLIENT_HASH_ALGO)
+            out = []
+            for i, (g, gh, h) in enumerate(zip(ewkb, geom_hashes, hashes)):
+                row_id = first_id + i
+                dedup.add(h.feature_key, row_id)
+                out.append(
+                    (row_id, h.payload_text, g, h.feature_key, h.attr_hash, h.attr_compare_hash, h.tooltip_hash, gh)
+                )
+            return pgcopy_encode_rows(out, copy_types)
+
+        def _batches():
+            nonlocal total_rows
+            batch: List[List[Optional[str]]] = []
+            for line_no, row in enumerate(rows, start=2):
+                if len(row) != len(cols):
+                    raise RuntimeError(
+                        f"CSV {csv_path.name} linha {line_no}: esperado {len(cols)} campos, "
+                        f"encontrado {len(row)}."
+                    )
+                batch.append(row)
+                total_rows += 1
+                if len(batch) >= batch_rows:
+                    yield _encode(batch, total_rows - len(batch) + 1)
+                    batch = []
+                    log_info(
+                        f"CSV stream: {total_rows} linhas "
+                        f"({int(total_rows / max(time.time() - load_start, 1e-6))}/s)"
+                    )
+            if batch:
+                yield _encode(batch, total_rows - len(batch) + 1)
+
+        copy_binary(conn, payload_table, copy_cols, _batches())
+    if client_hashing:
+        dedup.delete_losers(conn, payload_table)
+    log_info(f"CSV stream finalizado: {total_rows} linhas em {int(time.time() - load_start)}s.")
+    return total_rows
+
+
+# ============================================================
+# Hashing no cliente (mesmos hashes do ingest.sql)
+# ============================================================
+# Reproduz byte a byte o texto de `jsonb::text` (chaves ordenadas por tamanho e
+# depois bytes, separadores ": " e ", ", números no formato numeric) para que
+# md5(payload::text) calculado aqui seja idêntico ao calculado no Postgres.
+_CLIENT_HASH_PG_TYPES = {
+    "smallint",
+    "integer",
+    "bigint",
+    "real",
+    "double precision",
+    "boolean",
+    "date",
+    "character varying",
+}
+
+
+@dataclass
+class ClientHashes:
+    payload_text: str
+    feature_key: str
+    attr_hash: str
+    attr_compare_hash: str
+    tooltip_hash: str
+
+
+class ClientDedup:
+    """Mantém a linha de maior row_id por feature_key (mesma regra do ROW_NUMBER do ingest.sql).
+
+    Espera row_id crescente, como os loaders gravam.
+    """
+
+    def __init__(self):
+        self._latest: Dict[str, int] = {}
+        self.losers: List[int] = []
+
+    def add(self, feature_key: str, row_id: int) -> None:
+        previous = self._latest.get(feature_key)
+        if previous is not None:
+            self.losers.append(previous)
+        self._latest[feature_key] = row_id
+
+    def delete_losers(self, conn, payload_table: str) -> int:
+        if not self.losers:
+            return 0
+        # stg_payload chega sem índice; sem a PK o DELETE varre a tabela inteira.
+        # A PK também serve ao join por row_id do ingest.sql.
+        exec_sql(conn, f"ALTER TABLE {payload_table} ADD PRIMARY KEY (row_id)")
+        exec_sql(conn, f"DELETE FROM {payload_table} WHERE row_id = ANY(%s)", (self.losers,))
+        log_info(f"Dedup no cliente: {len(self.losers)} linha(s) duplicada(s) por feature_key removida(s).")
+        return len(self.losers)
+
+
+def ensure_sql_hashing_allowed(source: str, reason: str) -> None:
+    """Falha se o dataset cair nos hashes do ingest.sql (md5) com LANDWATCH_CLIENT_HASH_ALGO != md5.
+
+    O SQL só sabe md5: trocar o algoritmo de attr_compare_hash/tooltip_hash
+    silenciosamente marcaria todas as feições do dataset como CHANGED.
+    """
+    if CLIENT_HASH_ALGO == "md5":
+        return
+    raise RuntimeError(
+        f"{source}: hashes seriam calculados no SQL (md5) porque {reason}, mas "
+        f"LANDWATCH_CLIENT_HASH_ALGO={CLIENT_HASH_ALGO}; attr_compare_hash/tooltip_hash trocariam de algoritmo. "
+        "Ajuste o dataset/engine ou use LANDWATCH_CLIENT_HASH_ALGO=md5."
+    )
+
+
+def _hash_hex(text: str, algo: str = "md5") -> str:
+    data = text.encode("utf-8")
+    if algo == "md5":
+        return hashlib.md5(data).hexdigest()
+    if algo == "blake2b":
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    raise ValueError(f"LANDWATCH_CLIENT_HASH_ALGO inválido: {algo}")
+
+
+def _jsonb_number_text(value) -> str:
+    # float8/float4 -> jsonb passa por numeric: dígitos mínimos, sem expoente.
+    d = value if isinstance(value, Decimal) else Decimal(repr(value))
+    if d == 0:
+        return "0"
+    return format(d.normalize(), "f")
+
+
+def _jsonb_scalar_text(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return json.dumps("NaN" if math.isnan(value) else ("Infinity" if value > 0 else "-Infinity"))
+    if isinstance(value, (float, Decimal)):
+        return _jsonb_number_text(value)
+    if isinstance(value, (dt.date, dt.datetime)):
+        return json.dumps(value.isoformat())
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def _jsonb_key_order(key: str):
+    raw = key.encode("utf-8")
+    return len(raw), raw
+
+
+def jsonb_text(obj: dict) -> str:
+    """Texto idêntico ao `jsonb::text` do Postgres para objetos de escalares."""
+    return "{" + ", ".join(
+        f"{json.dumps(k, ensure_ascii=False)}: {_jsonb_scalar_text(obj[k])}"
+        for k in sorted(obj, key=_jsonb_key_order)
+    ) + "}"
+
+
+def _jsonb_get_text(value) -> Optional[str]:
+    # Semântica de `payload->>'campo'` para escalares.
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    text = _jsonb_scalar_text(value)
+    return json.loads(text) if text.startswith('"') else text
+
+
+def _first_text(payload: dict, fields: List[str]) -> Optional[str]:
+    for field in fields:
+        text = _jsonb_get_text(payload.get(field))
+        if text is not None:
+            return text or None
+    return None
+
+
+def client_payload_hashes(
+    payload: dict,
+    feature_key_override: Optional[str],
+    algo: str = "md5",
+) -> ClientHashes:
+    """Hashes de uma linha com as mesmas regras de __stg_norm_raw no ingest.sql."""
+    payload_text = jsonb_text(payload)
+    excluded = [k for k in ATTR_HASH_EXCLUDE_KEYS if k in payload]
+    if excluded:
+        compare_text = jsonb_text({k: v for k, v in payload.items() if k not in excluded})
+    else:
+        compare_text = payload_text
+    compare_md5 = _hash_hex(compare_text)
+    tooltip_text = jsonb_text(
+        {
+            "display_name": _first_text(payload, TOOLTIP_DISPLAY_FIELDS),
+            "natural_id": _first_text(payload, TOOLTIP_NATURAL_ID_FIELDS),
+        }
+    )
+    return ClientHashes(
+        payload_text=payload_text,
+        # feature_key é identidade (lw_feature): sempre md5, como o fallback do SQL.
+        feature_key=feature_key_override if feature_key_override is not None else compare_md5,
+        # attr_hash endereça lw_attr_pack.pack_hash (compartilhado): sempre md5.
+        attr_hash=_hash_hex(payload_text),
+        attr_compare_hash=compare_md5 if algo == "md5" else _hash_hex(compare_text, algo),
+        tooltip_hash=_hash_hex(tooltip_text, algo),
+    )
+
+
+# json.dumps(str, ensure_ascii=False) sem montar um JSONEncoder por valor.
+_json_str_text = json.encoder.encode_basestring
+
+
+def _jsonb_column_texts(values) -> List[str]:
+    return [
+        "null" if v is None else _json_str_text(v) if type(v) is str else _jsonb_scalar_text(v)
+        for v in values
+    ]
+
+
+def _jsonb_object_texts(keys: List[str], column_texts: List[List[str]], n_rows: int) -> List[str]:
+    """`jsonb_text` de cada linha a partir dos textos por coluna (ordem das chaves calculada uma vez)."""
+    order = sorted(range(len(keys)), key=lambda i: _jsonb_key_order(keys[i]))
+    if not order:
+        return ["{}"] * n_rows
+    prefixes = [json.dumps(keys[i], ensure_ascii=False) + ": " for i in order]
+    columns = [column_texts[i] for i in order]
+    return ["{" + ", ".join(map(str.__add__, prefixes, values)) + "}" for values in zip(*columns)]
+
+
+def _first_text_column(index: Dict[str, int], columns: List[Sequence], fields: List[str], n_rows: int):
+    out: List[Optional[str]] = [None] * n_rows
+    pending = set(range(n_rows))
+    for field in fields:
+        if field not in index or not pending:
+            continue
+        values = columns[index[field]]
+        for r in list(pending):
+            text = _jsonb_get_text(values[r])
+            if text is not None:
+                out[r] = text or None
+                pending.discard(r)
+    return out
+
+
+def client_payload_hashes_batch(
+    columns: List[str],
+    rows: List[Sequence],
+    overrides: Optional[List[Optional[str]]] = None,
+    algo: str = "md5",
+) -> List[ClientHashes]:
+    """`client_payload_hashes` para um lote de linhas (payload = dict(zip(columns, row))).
+
+    Trabalha por coluna: ordem das chaves e texto das chaves uma vez por lote,
+    valores serializados coluna a coluna; por linha sobra só o join e o hash.
+    """
+    n_rows = len(rows)
+    if not n_rows:
+        return []
+    # dict(zip(...)): com nome repetido vale a última coluna.
+    index = {name: i for i, name in enumerate(columns)}
+    keys = list(index)
+    transposed = list(zip(*rows))
+    values = [transposed[index[k]] for k in keys]
+    texts = [_jsonb_column_texts(col) for col in values]
+    payload_texts = _jsonb_object_texts(keys, texts, n_rows)
+    compare_pos = [i for i, k in enumerate(keys) if k not in ATTR_HASH_EXCLUDE_KEYS]
+    if len(compare_pos) == len(keys):
+        compare_texts = payload_texts
+    else:
+        compare_texts = _jsonb_object_texts(
+            [keys[i] for i in compare_pos], [texts[i] for i in compare_pos], n_rows
+        )
+    key_index = {k: i for i, k in enumerate(keys)}
+    tooltip_texts = _jsonb_object_texts(
+        ["display_name", "natural_id"],
+        [
+            _jsonb_column_texts(_first_text_column(key_index, values, TOOLTIP_DISPLAY_FIELDS, n_rows)),
+            _jsonb_column_texts(_first_text_column(key_index, values, TOOLTIP_NATURAL_ID_FIELDS, n_rows)),
+        ],
+        n_rows,
+    )
+    compare_md5 = [_hash_hex(t) for t in compare_texts]
+    compare_hashes = compare_md5 if algo == "md5" else [_hash_hex(t, algo) for t in compare_texts]
+    overrides = overrides or [None] * n_rows
+    return [
+        ClientHashes(
+            payload_text=payload_texts[r],
+            feature_key=overrides[r] if overrides[r] is not None else compare_md5[r],
+            attr_hash=_hash_hex(payload_texts[r]),
+            attr_compare_hash=compare_hashes[r],
+            tooltip_hash=_hash_hex(tooltip_texts[r], algo),
+        )
+        for r in range(n_rows)
+    ]
+
+
+def client_geom_hashes(geoms) -> List[Optional[str]]:
+    """md5(encode(ST_AsBinary(geom), 'hex')) para geometrias válidas; NULL nas demais.
+
+    Inválidas ficam sem hash para o ingest.sql aplicar ST_MakeValid e hashear.
+    geom_hash identifica lw_geom_store, então é sempre md5.
+    """
+    import shapely
+
+    hashable = ~shapely.is_missing(geoms) & shapely.is_valid(geoms)
+    if hasattr(shapely, "has_m"):
+        hashable &= ~shapely.has_m(geoms)
+    hashes: List[Optional[str]] = [None] * len(geoms)
+    if not hashable.any():
+        return hashes
+    idx = hashable.nonzero()[0]
+    wkbs = shapely.to_wkb(geoms[idx], flavor="iso", byte_order=1, include_srid=False)
+    for i, wkb in zip(idx.tolist(), wkbs.tolist()):
+        hashes[i] = hashlib.md5(wkb.hex().encode("ascii")).hexdigest()
+    return hashes
+
+
+def _pg_override_text(value) -> Optional[str]:
+    # `t.col::text` para os tipos aceitos como natural_id (sem float).
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, dt.date):
+        return value.isoformat()
+    return str(value)
+
+
+def create_stg_payload_from_shp_native(
+    conn,
+    shp_path: Path,
+    shp_encoding: Optional[str],
+    natural_id_col: Optional[str],
+    payload_table: str = STG_PAYLOAD_TABLE,
+    srid: Optional[int] = None,
+    batch_size: int = PYOGRIO_BATCH_SIZE,
+) -> Optional[int]:
+    """SHP -> stg_payload direto (sem stg_raw), com hashes e dedup no cliente.
+
+    O payload é o mesmo de `to_jsonb(stg_raw) - 'geom'` (inclui row_id).
+    Retorna None, sem criar nada, se algum tipo de coluna não tiver emulação
+    exata no cliente; o chamador volta para o caminho stg_raw.
+    """
+    import numpy as np
+
+    load_start = time.time()
+    total_rows = 0
+    dedup = ClientDedup()
+    with _open_shp_native(shp_path, shp_encoding, srid=srid, batch_size=batch_size) as (
+        _layer_srid,
+        columns,
+        pg_types,
+        batches,
+        stats,
+    ):
+        unsupported = [c for c, t in zip(columns, pg_types) if t not in _CLIENT_HASH_PG_TYPES]
+        if unsupported:
+            log_warn(f"Hashing no cliente indisponível (tipos sem emulação: {', '.join(unsupported)}).")
+            return None
+        nid_idx = None
+        if natural_id_col:
+            col = _match_column_name(natural_id_col, set(columns))
+            if col:
+                nid_idx = columns.index(col)
+                if pg_types[nid_idx] in ("real", "double precision"):
+                    log_warn(f"Hashing no cliente indisponível (natural_id_col '{col}' é float).")
+                    return None
+            else:
+                log_warn(f"natural_id_col '{natural_id_col}' não encontrado em stg_raw; usando hash completo.")
+
+        real_idx = [i for i, t in enumerate(pg_types) if t == "real"]
+        _create_stg_payload_table(conn, payload_table)
+        copy_cols = ["row_id", "payload", "geom", "feature_key_override"] + STG_PAYLOAD_HASH_COLUMNS
+        copy_types = ["bigint", "jsonb", "geometry"] + ["text"] * (len(copy_cols) - 3)
+
+        # payload["row_id"] depois das colunas, como no dict de antes.
+        payload_columns = list(columns) + ["row_id"]
+
+        def _chunks():
+            nonlocal total_rows
+            for rows, geoms in batches:
+                ewkb = _geoms_to_ewkb(geoms)
+                geom_hashes = client_geom_hashes(geoms)
+                first_id = total_rows + 1
+                payload_rows = []
+                for row_id, row in enumerate(rows, start=first_id):
+                    values = list(row)
+                    for i in real_idx:
+                        if values[i] is not None and math.isfinite(values[i]):
+                            values[i] = Decimal(str(np.float32(values[i])))
+                    values.append(row_id)
+                    payload_rows.append(values)
+                overrides = [_pg_override_text(row[nid_idx]) for row in rows] if nid_idx is not None else None
+                hashes = client_payload_hashes_batch(payload_columns, payload_rows, overrides, CLIENT_HASH_ALGO)
+                out = []
+                for g, gh, h in zip(ewkb, geom_hashes, hashes):
+                    total_rows += 1
+                    dedup.add(h.feature_key, total_rows)
+                    out.append(
+                        (
+                            total_rows,
+                            h.payload_text,
+                            g,
+                            overrides[total_rows - first_id] if overrides is not None else None,
+                            h.feature_key,
+                            h.attr_hash,
+                            h.attr_compare_hash,
+                            h.tooltip_hash,
+                            gh,
+                        )
+                    )
+                yield pgcopy_encode_rows(out, copy_types)
+                elapsed = max(time.time() - load_start, 1e-6)
+                log_info(
+                    f"pyogrio staging (hash no cliente): {total_rows} linhas "
+                    f"({int(total_rows / elapsed)}/s, {int(elapsed)}s)"
+                )
+
+        copy_binary(conn, payload_table, copy_cols, _chunks())
+    dedup.delete_losers(conn, payload_table)
+    if stats["skipped"]:
+        log_warn(f"pyogrio staging: {stats['skipped']} feição(ões) com geometria inválida descartada(s).")
+    log_info(f"pyogrio staging finalizado: {total_rows} linhas em {int(time.time() - load_start)}s.")
+    return total_rows
+
+
 # ============================================================
 # Ingest SQL runner
 # ============================================================
@@ -970,38 +2237,40 @@ def build_feature_key_fallback_sql(payload_expr: str = "s.payload") -> str:
     return f"md5({build_attr_compare_json_sql(payload_expr)}::text)"
 
 
+TOOLTIP_DISPLAY_FIELDS = [
+    "nome_uc",
+    "nome",
+    "NOME",
+    "nm",
+    "NM",
+    "denominacao",
+    "descricao",
+    "terrai_nom",
+    "TERRAI_NOM",
+    "etnia_nome",
+    "ETNIA_NOME",
+    "undadm_nom",
+    "UNDADM_NOM",
+]
+TOOLTIP_NATURAL_ID_FIELDS = [
+    "cnuc_code",
+    "cd_cnuc",
+    "Cnuc",
+    "terrai_cod",
+    "TERRAI_COD",
+    "id",
+    "ID",
+    "objectid",
+    "OBJECTID",
+]
+
+
 def build_tooltip_json_sql(payload_expr: str = "s.payload") -> str:
-    display_fields = [
-        "nome_uc",
-        "nome",
-        "NOME",
-        "nm",
-        "NM",
-        "denominacao",
-        "descricao",
-        "terrai_nom",
-        "TERRAI_NOM",
-        "etnia_nome",
-        "ETNIA_NOME",
-        "undadm_nom",
-        "UNDADM_NOM",
-    ]
-    natural_id_fields = [
-        "cnuc_code",
-        "cd_cnuc",
-        "Cnuc",
-        "terrai_cod",
-        "TERRAI_COD",
-        "id",
-        "ID",
-        "objectid",
-        "OBJECTID",
-    ]
     display_expr = "NULLIF(COALESCE(" + ", ".join(
-        f"{payload_expr}->>{_sql_literal(field)}" for field in display_fields
+        f"{payload_expr}->>{_sql_literal(field)}" for field in TOOLTIP_DISPLAY_FIELDS
     ) + "), '')"
     natural_id_expr = "NULLIF(COALESCE(" + ", ".join(
-        f"{payload_expr}->>{_sql_literal(field)}" for field in natural_id_fields
+        f"{payload_expr}->>{_sql_literal(field)}" for field in TOOLTIP_NATURAL_ID_FIELDS
     ) + "), '')"
     return (
         "jsonb_build_object("
@@ -1056,7 +2325,14 @@ def _safe_geom_from_wkt_fn_sql() -> str:
     """
 
 
-def build_geom_sql(srid: int, is_spatial: bool) -> str:
+def build_dedup_rank_sql(client_dedup: bool = False) -> str:
+    if client_dedup:
+        # staging já deduplicado no cliente (maior row_id por feature_key).
+        return "1"
+    return "ROW_NUMBER() OVER (PARTITION BY r.feature_key ORDER BY r.row_id DESC)"
+
+
+def build_geom_sql(srid: int, is_spatial: bool, fast_path: Optional[bool] = None) -> str:
     # geom já chega como `geometry` em __stg_norm (vinda do stg_payload via join
     # por row_id), sem round-trip WKT. Só falta validar e hashear. O geom_hash
     # (md5 do WKB) é idêntico ao do pipeline antigo — round-trip WKT verificado
@@ -1065,29 +2341,160 @@ def build_geom_sql(srid: int, is_spatial: bool) -> str:
     _ = srid
     if not is_spatial:
         return "UPDATE __stg_norm SET geom = NULL, geom_hash = NULL;"
+    if fast_path is None:
+        fast_path = GEOM_FAST_PATH
+    # geom_hash preenchido = hasheado no cliente (só geometrias válidas).
+    if fast_path:
+        # WKB cru com hash já no lw_geom_store = bytes idênticos a uma geometria
+        # já validada na carga anterior: ST_MakeValid seria no-op. O state do
+        # dataset (lw_feature_state.geom_hash) é subconjunto do store, então a
+        # busca no índice único de geom_hash cobre os dois. ST_IsValid só roda
+        # para hashes desconhecidos (CASE garante a ordem da avaliação).
+        return """
+        DROP TABLE IF EXISTS __geom_raw_hash;
+        CREATE TEMP TABLE __geom_raw_hash AS
+        SELECT
+            r.row_id,
+            r.geom_hash,
+            EXISTS (
+                SELECT 1 FROM landwatch.lw_geom_store g WHERE g.geom_hash = r.geom_hash
+            ) AS is_known
+        FROM (
+            SELECT row_id, md5(encode(ST_AsBinary(geom), 'hex')) AS geom_hash
+            FROM __stg_norm
+            WHERE geom IS NOT NULL AND geom_hash IS NULL
+        ) r;
+
+        UPDATE __stg_norm n
+        SET geom_hash = h.geom_hash
+        FROM __geom_raw_hash h
+        WHERE n.row_id = h.row_id
+          AND CASE WHEN h.is_known THEN true ELSE ST_IsValid(n.geom) END;
+
+        UPDATE __stg_norm
+        SET geom = ST_MakeValid(geom)
+        WHERE geom IS NOT NULL AND geom_hash IS NULL;
+
+        UPDATE __stg_norm
+        SET geom_hash = md5(encode(ST_AsBinary(geom), 'hex'))
+        WHERE geom IS NOT NULL AND geom_hash IS NULL;
+    """
     return """
         UPDATE __stg_norm
         SET geom = ST_MakeValid(geom)
-        WHERE geom IS NOT NULL AND NOT ST_IsValid(geom);
+        WHERE geom IS NOT NULL AND geom_hash IS NULL AND NOT ST_IsValid(geom);
 
         UPDATE __stg_norm
         SET geom_hash = md5(encode(ST_AsBinary(geom), 'hex'))
-        WHERE geom IS NOT NULL;
+        WHERE geom IS NOT NULL AND geom_hash IS NULL;
     """
 
 
+@dataclass
+class IngestStepMetric:
+    step_order: int
+    step_name: str
+    duration_ms: float
+    row_count: Optional[int]
+    explain_plan: Optional[str] = None
+
+
+_INGEST_STEP_MARKER = re.compile(r"^\s*--\s*@step\s+([A-Za-z0-9_]+)\s*$")
+_SQL_STATEMENT_END = re.compile(r";[ \t]*(?:\r?\n|$)")
+_EXPLAINABLE_SQL = re.compile(
+    r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|CREATE\s+TEMP\s+TABLE\s+\S+\s+AS)\b",
+    flags=re.IGNORECASE,
+)
+
+
+def split_ingest_steps(template: str) -> List[Tuple[str, str]]:
+    """Quebra o ingest.sql renderizado nos blocos `-- @step <nome>`, sem comentários.
+    SQL antes do primeiro marcador (ou um template sem marcadores) vira o step `ingest`."""
+    steps: List[Tuple[str, str]] = []
+    name = "ingest"
+    lines: List[str] = []
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if body:
+            steps.append((name, body))
+
+    for line in template.splitlines():
+        marker = _INGEST_STEP_MARKER.match(line)
+        if marker:
+            flush()
+            name = marker.group(1)
+            lines = []
+            continue
+        if line.strip().startswith("--"):
+            continue
+        lines.append(line)
+    flush()
+    return steps
+
+
+def split_sql_statements(step_sql: str) -> List[str]:
+    # ingest.sql não usa dollar-quoting: `;` no fim da linha fecha o statement.
+    return [stmt.strip() for stmt in _SQL_STATEMENT_END.split(step_sql) if stmt.strip()]
+
+
+def _execute_ingest_step(cur, step_sql: str, params: dict, explain: bool) -> Tuple[Optional[int], Optional[str]]:
+    """Executa um step statement a statement. Retorna (linhas afetadas, plano).
+    Linhas = soma dos rowcounts de DML/CTAS (DDL/ANALYZE não contam); com EXPLAIN
+    ANALYZE o statement roda de verdade, mas o rowcount não fica disponível."""
+    row_count: Optional[int] = None
+    plans: List[str] = []
+    for stmt in split_sql_statements(step_sql):
+        if explain and _EXPLAINABLE_SQL.match(stmt):
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + stmt, params)
+            plans.append("\n".join(str(r[0]) for r in cur.fetchall()))
+            continue
+        cur.execute(stmt, params)
+        if isinstance(cur.rowcount, int) and cur.rowcount >= 0:
+            row_count = (row_count or 0) + cur.rowcount
+    return row_count, ("\n\n".join(plans) or None)
+
+
+def record_ingest_step_metrics(cur, dataset_id: int, version_id: int, metrics: List[IngestStepMetric]) -> bool:
+    """Grava as métricas na mesma transação do ingest (somem junto em rollback).
+    Silencioso enquanto a migração sql/ingest_step_metric_apply.sql não foi aplicada."""
+    cur.execute("SELECT to_regclass('landwatch.lw_ingest_step_metric') IS NOT NULL")
+    row = cur.fetchone()
+    if not row or row[0] is not True:
+        return False
+    cur.execute(
+        "DELETE FROM landwatch.lw_ingest_step_metric WHERE version_id = %s",
+        (version_id,),
+    )
+    cur.executemany(
+        """
+        INSERT INTO landwatch.lw_ingest_step_metric
+          (version_id, dataset_id, step_order, step_name, duration_ms, row_count, explain_plan)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """,
+        [
+            (version_id, dataset_id, m.step_order, m.step_name, m.duration_ms, m.row_count, m.explain_plan)
+            for m in metrics
+        ],
+    )
+    return True
+
+
 def run_ingest_sql(conn, dataset_id: int, version_id: int, snapshot_date: str, doc_col: Optional[str],
-                   date_col: Optional[str], is_spatial: bool, srid: int):
+                   date_col: Optional[str], is_spatial: bool, srid: int,
+                   payload_table: str = STG_PAYLOAD_TABLE,
+                   client_dedup: bool = False) -> List[IngestStepMetric]:
     with open(INGEST_SQL_PATH, "r", encoding="utf-8") as f:
         template = f.read()
 
     replacements = {
-        "{{STG_TABLE}}": "landwatch.stg_payload",
+        "{{STG_TABLE}}": payload_table,
         "{{ATTR_COMPARE_JSON_SQL}}": build_attr_compare_json_sql("s.payload"),
         "{{FEATURE_KEY_FALLBACK_SQL}}": build_feature_key_fallback_sql("s.payload"),
         "{{TOOLTIP_JSON_SQL}}": build_tooltip_json_sql("s.payload"),
         "{{DOC_DATE_SQL}}": build_doc_date_sql(doc_col, date_col),
         "{{GEOM_SQL}}": build_geom_sql(srid, is_spatial),
+        "{{DEDUP_RANK_SQL}}": build_dedup_rank_sql(client_dedup),
     }
     for k, v in replacements.items():
         template = template.replace(k, v)
@@ -1104,16 +2511,42 @@ def run_ingest_sql(conn, dataset_id: int, version_id: int, snapshot_date: str, d
         "snapshot_date": snapshot_date,
     }
 
-    # remove comentarios simples e executar em bloco
-    lines = []
-    for line in template.splitlines():
-        if line.strip().startswith("--"):
-            continue
-        lines.append(line)
-    sql_clean = "\n".join(lines)
-
+    # executa step a step (mesma transação) para medir tempo/linhas de cada um
+    metrics: List[IngestStepMetric] = []
     with conn.cursor() as cur:
-        cur.execute(sql_clean, params)
+        for order, (name, step_sql) in enumerate(split_ingest_steps(template), start=1):
+            explain = "all" in INGEST_SQL_EXPLAIN or name.lower() in INGEST_SQL_EXPLAIN
+            started = time.perf_counter()
+            try:
+                row_count, plan = _execute_ingest_step(cur, step_sql, params, explain)
+            except Exception:
+                log_error(
+                    f"Ingestao SQL falhou no step {name} apos "
+                    f"{time.perf_counter() - started:.1f}s."
+                )
+                raise
+            metric = IngestStepMetric(
+                step_order=order,
+                step_name=name,
+                duration_ms=round((time.perf_counter() - started) * 1000.0, 3),
+                row_count=row_count,
+                explain_plan=plan,
+            )
+            metrics.append(metric)
+            log_debug(f"Step {name}: {metric.duration_ms:.0f} ms, linhas={row_count}.")
+            if plan:
+                log_info(f"EXPLAIN step {name}:\n{plan}")
+
+        if INGEST_STEP_METRICS:
+            record_ingest_step_metrics(cur, dataset_id, version_id, metrics)
+
+    slowest = sorted(metrics, key=lambda m: m.duration_ms, reverse=True)[:3]
+    if slowest:
+        log_info(
+            "Steps mais lentos: "
+            + ", ".join(f"{m.step_name}={m.duration_ms / 1000.0:.1f}s" for m in slowest)
+        )
+    return metrics
 
 
 # ============================================================
@@ -1139,7 +2572,16 @@ def infer_csv_rules(dataset_code: str) -> Tuple[Optional[str], Optional[str], Op
 # ============================================================
 # Execução por arquivo
 # ============================================================
-def process_csv(conn, dataset_id: int, dataset_code: str, csv_path: Path, snapshot_date: str, version_id: int):
+def process_csv(
+    conn,
+    dataset_id: int,
+    dataset_code: str,
+    csv_path: Path,
+    snapshot_date: str,
+    version_id: int,
+    staging: Optional[Tuple[str, str]] = None,
+):
+    raw_table, payload_table = staging or version_staging_tables(version_id)
     cfg = load_dataset_config(conn, dataset_id)
     delimiter = cfg.get("csv_delimiter") or ";"
     encoding = cfg.get("csv_encoding") or "latin1"
@@ -1165,8 +2607,33 @@ def process_csv(conn, dataset_id: int, dataset_code: str, csv_path: Path, snapsh
     log_debug(f"CSV delimiter='{delimiter}' encoding='{encoding}'")
     log_debug(f"CSV doc_col='{doc_col}' date_col='{date_col}' geom_col='{geom_col}'")
 
-    create_stg_raw_csv(conn, csv_path, delimiter, encoding)
-    create_stg_payload_from_raw_csv(conn, geom_col, int(cfg["srid"]))
+    client_hashed = False
+    if CSV_STAGING_ENGINE == "stream":
+        client_hashed = CLIENT_HASHING
+        if not client_hashed:
+            ensure_sql_hashing_allowed(csv_path.name, "LANDWATCH_CLIENT_HASHING está desligado")
+        create_stg_payload_from_csv_stream(
+            conn,
+            csv_path,
+            delimiter,
+            encoding,
+            geom_col,
+            int(cfg["srid"]),
+            payload_table=payload_table,
+            client_hashing=client_hashed,
+        )
+    else:
+        if CLIENT_HASHING:
+            log_debug("Hashing no cliente requer LANDWATCH_CSV_STAGING_ENGINE=stream; usando hashes no SQL.")
+        ensure_sql_hashing_allowed(csv_path.name, "LANDWATCH_CSV_STAGING_ENGINE não é stream")
+        create_stg_raw_csv(conn, csv_path, delimiter, encoding, table=raw_table)
+        create_stg_payload_from_raw_csv(
+            conn,
+            geom_col,
+            int(cfg["srid"]),
+            raw_table=raw_table,
+            payload_table=payload_table,
+        )
 
     sql_start = time.time()
     run_ingest_sql(
@@ -1178,11 +2645,22 @@ def process_csv(conn, dataset_id: int, dataset_code: str, csv_path: Path, snapsh
         date_col=date_col,
         is_spatial=bool(geom_col),
         srid=int(cfg["srid"]),
+        payload_table=payload_table,
+        client_dedup=client_hashed,
     )
     log_info(f"Ingestao SQL (CSV) finalizada em {int(time.time() - sql_start)}s.")
 
 
-def process_shp(conn, dataset_id: int, dataset_code: str, shp_path: Path, snapshot_date: str, version_id: int):
+def process_shp(
+    conn,
+    dataset_id: int,
+    dataset_code: str,
+    shp_path: Path,
+    snapshot_date: str,
+    version_id: int,
+    staging: Optional[Tuple[str, str]] = None,
+):
+    raw_table, payload_table = staging or version_staging_tables(version_id)
     cfg = load_dataset_config(conn, dataset_id)
     srid = int(cfg["srid"])
     natural_id_col = cfg.get("natural_id_col")
@@ -1193,15 +2671,47 @@ def process_shp(conn, dataset_id: int, dataset_code: str, shp_path: Path, snapsh
     log_info(f"natural_id_col='{natural_id_col}'")
 
     preferred_encoding = "UTF-8" if dataset_code.upper().startswith("CAR_") else None
-    create_stg_raw_shp(
-        conn,
-        shp_path,
-        total_size,
-        preferred_encoding=preferred_encoding,
-    )
     if not natural_id_col:
         log_warn("natural_id_col não definido para dataset; feature_key será hash completo.")
-    create_stg_payload_from_raw_shp(conn, natural_id_col)
+    client_hashed = False
+    if CLIENT_HASHING and STAGING_ENGINE == "pyogrio":
+        shp_encoding, encoding_source = detect_shp_encoding(shp_path, preferred_encoding=preferred_encoding)
+        log_info(
+            f"Staging SHP via pyogrio com hash no cliente "
+            f"(encoding={shp_encoding or 'auto'}, source={encoding_source}, algo={CLIENT_HASH_ALGO})"
+        )
+        client_hashed = create_stg_payload_from_shp_native(
+            conn,
+            shp_path,
+            shp_encoding,
+            natural_id_col,
+            payload_table=payload_table,
+            srid=srid,
+        ) is not None
+    elif CLIENT_HASHING:
+        log_debug("Hashing no cliente requer LANDWATCH_STAGING_ENGINE=pyogrio; usando hashes no SQL.")
+    if not client_hashed:
+        if not CLIENT_HASHING:
+            reason = "LANDWATCH_CLIENT_HASHING está desligado"
+        elif STAGING_ENGINE != "pyogrio":
+            reason = "LANDWATCH_STAGING_ENGINE não é pyogrio"
+        else:
+            reason = "o SHP tem tipos de coluna/natural_id sem emulação no cliente"
+        ensure_sql_hashing_allowed(shp_path.name, reason)
+        create_stg_raw_shp(
+            conn,
+            shp_path,
+            total_size,
+            preferred_encoding=preferred_encoding,
+            table=raw_table,
+            srid=srid,
+        )
+        create_stg_payload_from_raw_shp(
+            conn,
+            natural_id_col,
+            raw_table=raw_table,
+            payload_table=payload_table,
+        )
 
     sql_start = time.time()
     run_ingest_sql(
@@ -1213,6 +2723,8 @@ def process_shp(conn, dataset_id: int, dataset_code: str, shp_path: Path, snapsh
         date_col=None,
         is_spatial=True,
         srid=srid,
+        payload_table=payload_table,
+        client_dedup=client_hashed,
     )
     log_info(f"Ingestao SQL (SHP) finalizada em {int(time.time() - sql_start)}s.")
 
@@ -1260,6 +2772,15 @@ def _parse_args():
         "--result-json",
         help="Caminho para gravar metadados de ingestao concluida em JSON.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=(
+            "Datasets ingeridos em paralelo (processos, uma conexão cada). "
+            "Default: LANDWATCH_INGEST_WORKERS ou 1."
+        ),
+    )
     return parser.parse_args()
 
 
@@ -1650,8 +3171,17 @@ def _refresh_sicar_meta_cache(dataset_codes: Optional[List[str]]) -> None:
             raise
 
 
-def _refresh_tile_cache(dataset_codes: Optional[List[str]]) -> None:
+def _tile_cache_delta_available(conn) -> bool:
+    row = fetch_one(
+        conn,
+        "SELECT to_regprocedure('landwatch.refresh_feature_geom_tile_cache_delta(bigint[],text[])') IS NOT NULL",
+    )
+    return bool(row) and row[0] is True
+
+
+def _refresh_tile_cache(dataset_codes: Optional[List[str]], version_ids: Optional[List[int]] = None) -> None:
     dataset_codes = _normalize_codes(dataset_codes)
+    version_ids = _normalize_ints(version_ids)
     start = time.monotonic()
     attempt = 0
     while True:
@@ -1693,6 +3223,26 @@ def _refresh_tile_cache(dataset_codes: Optional[List[str]]) -> None:
                         f"mas relkind={relkind!r}."
                     )
 
+                if version_ids and _tile_cache_delta_available(conn):
+                    row = fetch_one(
+                        conn,
+                        """
+                        SELECT deleted_count, inserted_count, reused_count
+                        FROM landwatch.refresh_feature_geom_tile_cache_delta(%s::bigint[], %s::text[])
+                        """,
+                        (version_ids, dataset_codes or None),
+                    )
+                    deleted_count, inserted_count, reused_count = row or (0, 0, 0)
+                    log_info(
+                        "Refresh concluido: landwatch.mv_feature_geom_tile_active "
+                        f"kind=delta-reuse elapsed={_elapsed_seconds(start)}s "
+                        f"deleted={deleted_count or 0} inserted={inserted_count or 0} "
+                        f"reused={reused_count or 0}"
+                        f"{_dataset_log_suffix(dataset_codes)}"
+                        f"{_version_log_suffix(version_ids)}"
+                    )
+                    return
+
                 params = (dataset_codes or None,)
                 exec_sql(
                     conn,
@@ -1784,6 +3334,156 @@ def _refresh_feature_caches_delta(dataset_codes: Optional[List[str]], version_id
             raise
 
 
+@dataclass
+class _RefreshTask:
+    name: str
+    label: str
+    run: Callable[[], None]
+    deps: Tuple[str, ...] = ()
+
+
+def _run_refresh_task(task: _RefreshTask) -> bool:
+    try:
+        task.run()
+        return True
+    except Exception as e:
+        log_warn(f"Falha ao atualizar {task.label}: {e}")
+        return False
+
+
+def _run_refresh_tasks(tasks: List[_RefreshTask], workers: int) -> bool:
+    """Executa as tasks respeitando deps; com workers<=1 roda na ordem da lista.
+
+    Dependência só ordena: a falha de uma task não cancela as dependentes
+    (mesmo comportamento do refresh sequencial).
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        results = [_run_refresh_task(task) for task in tasks]
+        return all(results)
+
+    ok = True
+    names = {task.name for task in tasks}
+    pending = {task.name: task for task in tasks}
+    done: set = set()
+    running: Dict[object, str] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for task in list(pending.values()):
+                if len(running) >= workers:
+                    break
+                if all(dep in done or dep not in names for dep in task.deps):
+                    del pending[task.name]
+                    running[pool.submit(_run_refresh_task, task)] = task.name
+            if not running:
+                raise RuntimeError(
+                    "Dependencias de refresh nao resolvidas: " + ", ".join(sorted(pending))
+                )
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                done.add(running.pop(future))
+                ok = future.result() and ok
+    return ok
+
+
+def _refresh_split_per_dataset(dataset_codes: List[str], workers: int) -> bool:
+    """Divide o refresh por dataset só quando todos os caches são tabelas.
+
+    Em MV cada chamada refaz a view inteira, então dividir só multiplicaria o custo.
+    """
+    if workers <= 1 or len(dataset_codes) <= 1:
+        return False
+    try:
+        with get_conn() as conn:
+            conn.autocommit = True
+            return _cache_relations_support_delta(conn)
+    except Exception as e:
+        log_warn(f"Falha ao verificar caches para refresh paralelo por dataset: {e}")
+        return False
+
+
+def _base_mv_refresh_tasks(views: List[str]) -> List[_RefreshTask]:
+    return [
+        _RefreshTask(f"mv:{view}", f"MV {view}", lambda view=view: _refresh_materialized_view(view))
+        for view in views
+    ]
+
+
+def _build_refresh_tasks(
+    dataset_codes: Optional[List[str]],
+    version_ids: Optional[List[int]],
+    split_per_dataset: bool,
+    base_mv_views: List[str],
+) -> List[_RefreshTask]:
+    """Monta o grafo de refresh.
+
+    geom_active alimenta attrs_light e tile; attrs_light alimenta tooltip.
+    sicar_meta e as MVs base são independentes.
+    """
+    codes = _normalize_codes(dataset_codes)
+    if split_per_dataset:
+        chunks: List[Optional[List[str]]] = [[code] for code in codes]
+    else:
+        chunks = [dataset_codes]
+    version_ids = _normalize_ints(version_ids)
+
+    tasks: List[_RefreshTask] = []
+    geom_names: List[str] = []
+    tile_tasks: List[_RefreshTask] = []
+    for chunk in chunks:
+        suffix = f":{chunk[0]}" if split_per_dataset and chunk else ""
+        geom_name = f"geom_active{suffix}"
+        attrs_name = f"attrs_light{suffix}"
+        geom_names.append(geom_name)
+        tasks.extend(
+            [
+                _RefreshTask(
+                    geom_name,
+                    f"cache landwatch.mv_feature_geom_active{suffix}",
+                    lambda chunk=chunk: _refresh_geom_active_cache(chunk),
+                ),
+                _RefreshTask(
+                    attrs_name,
+                    f"cache landwatch.mv_feature_active_attrs_light{suffix}",
+                    lambda chunk=chunk: _refresh_active_attrs_cache(chunk),
+                    (geom_name,),
+                ),
+                _RefreshTask(
+                    f"tooltip{suffix}",
+                    f"cache landwatch.mv_feature_tooltip_active{suffix}",
+                    lambda chunk=chunk: _refresh_tooltip_cache(chunk),
+                    (attrs_name,),
+                ),
+                _RefreshTask(
+                    f"sicar_meta{suffix}",
+                    f"cache landwatch.mv_sicar_meta_active{suffix}",
+                    lambda chunk=chunk: _refresh_sicar_meta_cache(chunk),
+                ),
+            ]
+        )
+        if not version_ids:
+            tile_tasks.append(
+                _RefreshTask(
+                    f"tile{suffix}",
+                    f"cache landwatch.mv_feature_geom_tile_active{suffix}",
+                    lambda chunk=chunk: _refresh_tile_cache(chunk),
+                    (geom_name,),
+                )
+            )
+    tasks.extend(_base_mv_refresh_tasks(base_mv_views))
+    if version_ids:
+        # Com version_ids (delta fino indisponível) o tile ainda pode ir por
+        # delta com reaproveitamento, numa chamada só, depois de todo o geom_active.
+        tile_tasks.append(
+            _RefreshTask(
+                "tile",
+                "cache landwatch.mv_feature_geom_tile_active",
+                lambda: _refresh_tile_cache(dataset_codes, version_ids),
+                tuple(geom_names),
+            )
+        )
+    return tasks + tile_tasks
+
+
 def _refresh_mvs(
     tile_cache_dataset_codes: Optional[List[str]] = None,
     cache_version_ids: Optional[List[int]] = None,
@@ -1792,17 +3492,11 @@ def _refresh_mvs(
         "landwatch.mv_indigena_phase_active",
         "landwatch.mv_ucs_sigla_active",
     ]
-    ok = True
+    workers = max(1, REFRESH_WORKERS)
     if _normalize_ints(cache_version_ids):
         try:
             if _refresh_feature_caches_delta(tile_cache_dataset_codes, cache_version_ids):
-                for view in base_mv_views:
-                    try:
-                        _refresh_materialized_view(view)
-                    except Exception as e:
-                        ok = False
-                        log_warn(f"Falha ao atualizar MV {view}: {e}")
-                return ok
+                return _run_refresh_tasks(_base_mv_refresh_tasks(base_mv_views), workers)
         except Exception as e:
             if _is_missing_delta_function_error(e):
                 log_warn(
@@ -1810,42 +3504,273 @@ def _refresh_mvs(
                     "usando fallback de rebuild por dataset."
                 )
             else:
-                ok = False
                 log_warn(f"Falha ao atualizar caches por delta fino: {e}")
-                return ok
+                return False
+
+    split_per_dataset = _refresh_split_per_dataset(_normalize_codes(tile_cache_dataset_codes), workers)
+    tasks = _build_refresh_tasks(
+        tile_cache_dataset_codes,
+        cache_version_ids,
+        split_per_dataset,
+        base_mv_views,
+    )
+    return _run_refresh_tasks(tasks, workers)
+
+
+def _ingest_file(
+    file_path: Path,
+    root: Path,
+    category_arg: Optional[str],
+    snapshot_date_override: Optional[str],
+) -> dict:
+    """Ingere um arquivo em versão/transação próprias; nunca propaga a falha do dataset."""
+    dataset_start = time.time()
+    if category_arg:
+        category_code = _split_csv(category_arg)[0].upper()
+    else:
+        try:
+            category_code = derive_category_code(root, file_path)
+        except Exception:
+            category_code = file_path.parent.name.upper()
+    dataset_code = derive_dataset_code(file_path)
+    snapshot_date = snapshot_date_override or DEFAULT_SNAPSHOT_DATE
+    outcome = {
+        "file": str(file_path),
+        "dataset_code": dataset_code,
+        "dataset_id": None,
+        "version_id": None,
+        "status": "FAILED",
+    }
 
+    log_info("-" * 80)
+    log_info(f"Arquivo: {file_path}")
+    log_info(f"Categoria: {category_code} | Dataset: {dataset_code} | Snapshot: {snapshot_date}")
+
+    version_id = None
     try:
-        _refresh_geom_active_cache(tile_cache_dataset_codes)
-    except Exception as e:
-        ok = False
-        log_warn(f"Falha ao atualizar cache landwatch.mv_feature_geom_active: {e}")
-    try:
-        _refresh_active_attrs_cache(tile_cache_dataset_codes)
-    except Exception as e:
-        ok = False
-        log_warn(f"Falha ao atualizar cache landwatch.mv_feature_active_attrs_light: {e}")
-    try:
-        _refresh_tooltip_cache(tile_cache_dataset_codes)
-    except Exception as e:
-        ok = False
-        log_warn(f"Falha ao atualizar cache landwatch.mv_feature_tooltip_active: {e}")
-    try:
-        _refresh_sicar_meta_cache(tile_cache_dataset_codes)
+        attempt = 0
+        while True:
+            try:
+                attempt += 1
+                with get_conn() as conn:
+                    conn.autocommit = False
+                    dataset_id = get_or_create_dataset(
+                        conn,
+                        dataset_code=dataset_code,
+                        category_code=category_code,
+                        is_spatial=(file_path.suffix.lower() in SPATIAL_SUFFIXES),
+                    )
+                    outcome["dataset_id"] = dataset_id
+
+                    src_fp = None
+                    if ENABLE_FINGERPRINT_SKIP:
+                        try:
+                            src_fp = compute_source_fingerprint(file_path)
+                            last_fp = get_last_good_fingerprint(conn, dataset_id)
+                            log_info(f"Fingerprint: {src_fp} | last: {last_fp}")
+                            if last_fp and src_fp == last_fp:
+                                version_id = start_dataset_version(
+                                    conn,
+                                    dataset_id,
+                                    dataset_code,
+                                    snapshot_date,
+                                    str(file_path),
+                                    src_fp,
+                                )
+                                finish_dataset_version(conn, version_id, "SKIPPED_NO_CHANGES", None)
+                                conn.commit()
+                                outcome["version_id"] = version_id
+                                outcome["status"] = "SKIPPED_NO_CHANGES"
+                                log_info("SKIP: Sem mudanças detectadas.")
+                                break
+                        except Exception as e:
+                            log_warn(f"Fingerprint falhou (seguindo sem skip): {e}")
+
+                    version_id = start_dataset_version(
+                        conn,
+                        dataset_id,
+                        dataset_code,
+                        snapshot_date,
+                        str(file_path),
+                        src_fp,
+                    )
+                    # Versão RUNNING visível antes do staging: o cleanup de órfãs
+                    # de outros processos não toca nas tabelas desta versão, e o
+                    # lock da versão indica que este ingest segue vivo.
+                    conn.commit()
+                    with running_version_lock(conn, version_id):
+                        if ENSURE_PARTITIONS:
+                            ensure_dataset_partitions(conn, dataset_id)
+                        staging = version_staging_tables(version_id)
+
+                        if file_path.suffix.lower() == ".csv":
+                            process_csv(conn, dataset_id, dataset_code, file_path, snapshot_date, version_id, staging)
+                        else:
+                            process_shp(conn, dataset_id, dataset_code, file_path, snapshot_date, version_id, staging)
+
+                        finish_dataset_version(conn, version_id, "COMPLETED", None)
+                        conn.commit()
+                    outcome["version_id"] = version_id
+                    outcome["status"] = "COMPLETED"
+                    log_info("OK: Ingestão concluída.")
+                    log_info(f"Tempo total do dataset: {int(time.time() - dataset_start)}s.")
+                break
+            except Exception as e:
+                if _is_transient_db_error(e) and attempt <= DB_MAX_RETRIES:
+                    delay = _retry_delay(attempt)
+                    log_warn(
+                        f"Falha de conexão no DB ({e}). Tentando novamente em {delay:.1f}s "
+                        f"(tentativa {attempt}/{DB_MAX_RETRIES})."
+                    )
+                    time.sleep(delay)
+                    continue
+                raise
+
     except Exception as e:
-        ok = False
-        log_warn(f"Falha ao atualizar cache landwatch.mv_sicar_meta_active: {e}")
-    for view in base_mv_views:
+        log_error(f"Falha na ingestão de {file_path}: {e}")
+        outcome["version_id"] = version_id
+        outcome["status"] = "FAILED"
         try:
-            _refresh_materialized_view(view)
-        except Exception as e:
-            ok = False
-            log_warn(f"Falha ao atualizar MV {view}: {e}")
+            with get_conn() as conn_err:
+                conn_err.autocommit = True
+                if version_id:
+                    finish_dataset_version(conn_err, version_id, "FAILED", str(e))
+        except Exception as e2:
+            log_error(f"Falha ao registrar FAILED: {e2}")
+    finally:
+        if version_id:
+            _drop_staging_tables(version_staging_tables(version_id))
+    return outcome
+
+
+def _source_size_bytes(file_path: Path) -> int:
     try:
-        _refresh_tile_cache(tile_cache_dataset_codes)
-    except Exception as e:
-        ok = False
-        log_warn(f"Falha ao atualizar cache landwatch.mv_feature_geom_tile_active: {e}")
-    return ok
+        if file_path.suffix.lower() in SPATIAL_SUFFIXES:
+            return sum(p.stat().st_size for p in _shapefile_component_paths(file_path) if p.exists())
+        return file_path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _plan_ingest_jobs(file_paths: List[Path]) -> List[List[Tuple[int, Path]]]:
+    """Agrupa arquivos por dataset_code e ordena os grupos do maior para o menor.
+
+    Arquivos do mesmo dataset ficam no mesmo job (em ordem) porque compartilham
+    lw_feature_state/lw_dataset_version; grupos distintos são independentes.
+    """
+    groups: Dict[str, List[Tuple[int, Path]]] = {}
+    for idx, file_path in enumerate(file_paths):
+        groups.setdefault(derive_dataset_code(file_path), []).append((idx, file_path))
+    sized = [
+        (sum(_source_size_bytes(p) for _, p in items), items[0][0], items)
+        for items in groups.values()
+    ]
+    sized.sort(key=lambda item: (-item[0], item[1]))
+    return [items for _, _, items in sized]
+
+
+def _ingest_job_worker(
+    job: List[Tuple[int, Path]],
+    root: Path,
+    category_arg: Optional[str],
+    snapshot_date_override: Optional[str],
+) -> List[Tuple[int, dict]]:
+    _set_log_context(derive_dataset_code(job[0][1]))
+    return [
+        (idx, _ingest_file(file_path, root, category_arg, snapshot_date_override))
+        for idx, file_path in job
+    ]
+
+
+def _run_ingest_jobs(
+    file_paths: List[Path],
+    root: Path,
+    category_arg: Optional[str],
+    snapshot_date_override: Optional[str],
+    workers: int = 1,
+    pooled: bool = False,
+) -> List[dict]:
+    jobs = _plan_ingest_jobs(file_paths)
+    workers = max(1, min(int(workers or 1), len(jobs)))
+    if workers <= 1:
+        return [
+            _ingest_file(file_path, root, category_arg, snapshot_date_override)
+            for file_path in file_paths
+        ]
+
+    log_info(f"Ingestão paralela: workers={workers} jobs={len(jobs)} (maiores primeiro)")
+    indexed: Dict[int, dict] = {}
+    initializer = _enable_connection_pool if pooled else None
+    if _CONN_POOL is not None:
+        # Nenhuma conexão ociosa do pai deve ser herdada pelos workers no fork.
+        _CONN_POOL.drain()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as pool:
+        futures = {
+            pool.submit(_ingest_job_worker, job, root, category_arg, snapshot_date_override): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                for idx, outcome in future.result():
+                    indexed[idx] = outcome
+            except Exception as e:
+                # Worker morto (OOM/sinal): a sessão cai com o lock da versão e o
+                # cleanup do próximo run marca a versão RUNNING como FAILED.
+                log_error(f"Worker de ingestão falhou para {derive_dataset_code(job[0][1])}: {e}")
+                for idx, file_path in job:
+                    indexed[idx] = {
+                        "file": str(file_path),
+                        "dataset_code": derive_dataset_code(file_path),
+                        "dataset_id": None,
+                        "version_id": None,
+                        "status": "FAILED",
+                    }
+    return [indexed[idx] for idx in sorted(indexed)]
+
+
+def ingest_files(
+    files: Iterable,
+    snapshot_date: Optional[str] = None,
+    category: Optional[str] = None,
+    root: Optional[Path] = None,
+    workers: Optional[int] = None,
+    refresh_mvs: bool = False,
+    cleanup_orphans: bool = True,
+) -> List[dict]:
+    """API in-process equivalente a `bulk_ingest.py --files ... --skip-mv-refresh`.
+
+    Reaproveita conexões (pool) e o ogr2ogr resolvido entre arquivos e chamadas.
+    Retorna um dict por arquivo (file, dataset_code, dataset_id, version_id,
+    status), na ordem de entrada; falhas de dataset não propagam exceção.
+    """
+    file_paths = [Path(str(f).strip()) for f in files if str(f).strip()]
+    if not file_paths:
+        return []
+    root = Path(root or ROOT_DIR)
+    workers = INGEST_WORKERS if workers is None else workers
+    with connection_pool():
+        if cleanup_orphans:
+            try:
+                with get_conn() as conn:
+                    cleanup_orphan_staging_tables(conn)
+            except Exception as e:
+                log_warn(f"Limpeza de staging órfã falhou (seguindo): {e}")
+        outcomes = _run_ingest_jobs(
+            file_paths,
+            root,
+            category_arg=category,
+            snapshot_date_override=snapshot_date or None,
+            workers=workers,
+            pooled=True,
+        )
+        if refresh_mvs:
+            completed = [o for o in outcomes if o.get("status") == "COMPLETED"]
+            _refresh_mvs(
+                [o["dataset_code"] for o in completed],
+                [int(o["version_id"]) for o in completed],
+            )
+    return outcomes
 
 
 def main():
@@ -1870,11 +3795,12 @@ def main():
         file_paths = [Path(p.strip()) for p in _split_csv(args.files)]
     else:
         shp_paths = sorted(root.rglob("*.shp"))
+        fgb_paths = sorted(root.rglob("*.fgb"))
         csv_paths = sorted(root.rglob("*.csv"))
-        file_paths = shp_paths + csv_paths
+        file_paths = shp_paths + fgb_paths + csv_paths
 
     if not file_paths:
-        log_warn(f"Nenhum .shp ou .csv encontrado abaixo de {root}")
+        log_warn(f"Nenhum .shp, .fgb ou .csv encontrado abaixo de {root}")
         return
 
     if category_filter:
@@ -1885,108 +3811,33 @@ def main():
     log_info(f"ROOT_DIR={root}")
     log_info(f"FILES={len(file_paths)}")
 
+    try:
+        with get_conn() as conn:
+            cleanup_orphan_staging_tables(conn)
+    except Exception as e:
+        log_warn(f"Limpeza de staging órfã falhou (seguindo): {e}")
+
+    workers = INGEST_WORKERS if args.workers is None else args.workers
+    outcomes = _run_ingest_jobs(
+        file_paths,
+        root,
+        category_arg=args.category,
+        snapshot_date_override=snapshot_date_override,
+        workers=workers,
+    )
     successful_dataset_codes: List[str] = []
     result_datasets: List[dict] = []
-    for file_path in file_paths:
-        dataset_start = time.time()
-        if args.category:
-            category_code = _split_csv(args.category)[0].upper()
-        else:
-            try:
-                category_code = derive_category_code(root, file_path)
-            except Exception:
-                category_code = file_path.parent.name.upper()
-        dataset_code = derive_dataset_code(file_path)
-        snapshot_date = snapshot_date_override or DEFAULT_SNAPSHOT_DATE
-
-        log_info("-" * 80)
-        log_info(f"Arquivo: {file_path}")
-        log_info(f"Categoria: {category_code} | Dataset: {dataset_code} | Snapshot: {snapshot_date}")
-
-        version_id = None
-        try:
-            attempt = 0
-            while True:
-                try:
-                    attempt += 1
-                    with get_conn() as conn:
-                        conn.autocommit = False
-                        dataset_id = get_or_create_dataset(
-                            conn,
-                            dataset_code=dataset_code,
-                            category_code=category_code,
-                            is_spatial=(file_path.suffix.lower() == ".shp"),
-                        )
-
-                        src_fp = None
-                        if ENABLE_FINGERPRINT_SKIP:
-                            try:
-                                src_fp = compute_source_fingerprint(file_path)
-                                last_fp = get_last_good_fingerprint(conn, dataset_id)
-                                log_info(f"Fingerprint: {src_fp} | last: {last_fp}")
-                                if last_fp and src_fp == last_fp:
-                                    version_id = start_dataset_version(
-                                        conn,
-                                        dataset_id,
-                                        dataset_code,
-                                        snapshot_date,
-                                        str(file_path),
-                                        src_fp,
-                                    )
-                                    finish_dataset_version(conn, version_id, "SKIPPED_NO_CHANGES", None)
-                                    conn.commit()
-                                    log_info("SKIP: Sem mudanças detectadas.")
-                                    break
-                            except Exception as e:
-                                log_warn(f"Fingerprint falhou (seguindo sem skip): {e}")
-
-                        version_id = start_dataset_version(
-                            conn,
-                            dataset_id,
-                            dataset_code,
-                            snapshot_date,
-                            str(file_path),
-                            src_fp,
-                        )
-
-                        if file_path.suffix.lower() == ".csv":
-                            process_csv(conn, dataset_id, dataset_code, file_path, snapshot_date, version_id)
-                        else:
-                            process_shp(conn, dataset_id, dataset_code, file_path, snapshot_date, version_id)
-
-                        finish_dataset_version(conn, version_id, "COMPLETED", None)
-                        conn.commit()
-                        successful_dataset_codes.append(dataset_code)
-                        result_datasets.append(
-                            {
-                                "dataset_code": dataset_code,
-                                "dataset_id": int(dataset_id),
-                                "version_id": int(version_id),
-                            }
-                        )
-                        log_info("OK: Ingestão concluída.")
-                        log_info(f"Tempo total do dataset: {int(time.time() - dataset_start)}s.")
-                    break
-                except Exception as e:
-                    if _is_transient_db_error(e) and attempt <= DB_MAX_RETRIES:
-                        delay = _retry_delay(attempt)
-                        log_warn(
-                            f"Falha de conexão no DB ({e}). Tentando novamente em {delay:.1f}s "
-                            f"(tentativa {attempt}/{DB_MAX_RETRIES})."
-                        )
-                        time.sleep(delay)
-                        continue
-                    raise
-
-        except Exception as e:
-            log_error(f"Falha na ingestão de {file_path}: {e}")
-            try:
-                with get_conn() as conn_err:
-                    conn_err.autocommit = True
-                    if version_id:
-                        finish_dataset_version(conn_err, version_id, "FAILED", str(e))
-            except Exception as e2:
-                log_error(f"Falha ao registrar FAILED: {e2}")
+    for outcome in outcomes:
+        if outcome.get("status") != "COMPLETED":
+            continue
+        successful_dataset_codes.append(outcome["dataset_code"])
+        result_datasets.append(
+            {
+                "dataset_code": outcome["dataset_code"],
+                "dataset_id": int(outcome["dataset_id"]),
+                "version_id": int(outcome["version_id"]),
+            }
+        )
 
     if args.skip_mv_refresh:
         log_info("MV refresh ignorado (flag --skip-mv-refresh).")
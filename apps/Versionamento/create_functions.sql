@@ -58,6 +58,25 @@ CREATE INDEX IF NOT EXISTS idx_lw_feature_delta_run_dataset_version
 -- Funções de delta fino dos caches ficam em sql/feature_cache_delta_apply.sql.
 -- Elas são separadas porque também servem como migration idempotente em bancos existentes.
 
+-- Lock dos refresh_* de cache. Rebuild total (p_codes vazio): exclusivo no cache.
+-- Por dataset: compartilhado no cache + exclusivo por dataset (ordem fixa),
+-- permitindo refresh paralelo de datasets distintos.
+CREATE OR REPLACE FUNCTION landwatch.lock_cache_scope(p_cache text, p_codes text[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF COALESCE(array_length(p_codes, 1), 0) = 0 THEN
+    PERFORM pg_advisory_xact_lock(hashtext('landwatch.' || p_cache));
+  ELSE
+    PERFORM pg_advisory_xact_lock_shared(hashtext('landwatch.' || p_cache));
+    PERFORM pg_advisory_xact_lock(hashtext('landwatch.' || p_cache || ':' || c.code))
+    FROM (SELECT DISTINCT code FROM unnest(p_codes) AS raw(code)) c
+    ORDER BY c.code;
+  END IF;
+END;
+$$;
+
 CREATE OR REPLACE FUNCTION landwatch.refresh_feature_geom_active_cache(
   p_dataset_codes text[] DEFAULT NULL
 )
@@ -69,8 +88,6 @@ DECLARE
   v_dataset_ids bigint[];
   v_full_rebuild boolean;
 BEGIN
-  PERFORM pg_advisory_xact_lock(hashtext('landwatch.mv_feature_geom_active'));
-
   SELECT array_agg(code ORDER BY code)
   INTO v_dataset_codes
   FROM (
@@ -81,6 +98,8 @@ BEGIN
 
   v_full_rebuild := COALESCE(array_length(v_dataset_codes, 1), 0) = 0;
 
+  PERFORM landwatch.lock_cache_scope('mv_feature_geom_active', v_dataset_codes);
+
   IF NOT v_full_rebuild THEN
     SELECT array_agg(d.dataset_id ORDER BY d.dataset_id)
     INTO v_dataset_ids
@@ -276,8 +295,6 @@ DECLARE
   v_dataset_ids bigint[];
   v_full_rebuild boolean;
 BEGIN
-  PERFORM pg_advisory_xact_lock(hashtext('landwatch.mv_feature_geom_tile_active'));
-
   SELECT array_agg(code ORDER BY code)
   INTO v_dataset_codes
   FROM (
@@ -288,6 +305,8 @@ BEGIN
 
   v_full_rebuild := COALESCE(array_length(v_dataset_codes, 1), 0) = 0;
 
+  PERFORM landwatch.lock_cache_scope('mv_feature_geom_tile_active', v_dataset_codes);
+
   IF NOT v_full_rebuild THEN
     SELECT array_agg(d.dataset_id ORDER BY d.dataset_id)
     INTO v_dataset_ids
@@ -394,8 +413,6 @@ DECLARE
   v_dataset_ids bigint[];
   v_full_rebuild boolean;
 BEGIN
-  PERFORM pg_advisory_xact_lock(hashtext('landwatch.mv_feature_active_attrs_light'));
-
   SELECT array_agg(code ORDER BY code)
   INTO v_dataset_codes
   FROM (
@@ -406,6 +423,8 @@ BEGIN
 
   v_full_rebuild := COALESCE(array_length(v_dataset_codes, 1), 0) = 0;
 
+  PERFORM landwatch.lock_cache_scope('mv_feature_active_attrs_light', v_dataset_codes);
+
   IF NOT v_full_rebuild THEN
     SELECT array_agg(d.dataset_id ORDER BY d.dataset_id)
     INTO v_dataset_ids
@@ -483,8 +502,6 @@ DECLARE
   v_dataset_ids bigint[];
   v_full_rebuild boolean;
 BEGIN
-  PERFORM pg_advisory_xact_lock(hashtext('landwatch.mv_feature_tooltip_active'));
-
   SELECT array_agg(code ORDER BY code)
   INTO v_dataset_codes
   FROM (
@@ -495,6 +512,8 @@ BEGIN
 
   v_full_rebuild := COALESCE(array_length(v_dataset_codes, 1), 0) = 0;
 
+  PERFORM landwatch.lock_cache_scope('mv_feature_tooltip_active', v_dataset_codes);
+
   IF NOT v_full_rebuild THEN
     SELECT array_agg(d.dataset_id ORDER BY d.dataset_id)
     INTO v_dataset_ids
@@ -587,8 +606,6 @@ DECLARE
   v_dataset_ids bigint[];
   v_full_rebuild boolean;
 BEGIN
-  PERFORM pg_advisory_xact_lock(hashtext('landwatch.mv_sicar_meta_active'));
-
   SELECT array_agg(code ORDER BY code)
   INTO v_dataset_codes
   FROM (
@@ -599,6 +616,8 @@ BEGIN
 
   v_full_rebuild := COALESCE(array_length(v_dataset_codes, 1), 0) = 0;
 
+  PERFORM landwatch.lock_cache_scope('mv_sicar_meta_active', v_dataset_codes);
+
   IF NOT v_full_rebuild THEN
     SELECT array_agg(d.dataset_id ORDER BY d.dataset_id)
     INTO v_dataset_ids
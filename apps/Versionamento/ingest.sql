@@ -5,6 +5,8 @@
 -- Convenções:
 --   :dataset_id, :version_id, :snapshot_date são parâmetros.
 --   staging tables são UNLOGGED e recriadas por dataset.
+--   `-- @step <nome>` delimita os blocos executados (e cronometrados) um a um
+--   pelo run_ingest_sql; tudo continua na mesma transação.
 
 -- =========================================================
 -- 1) Staging
@@ -12,6 +14,9 @@
 -- O staging (landwatch.stg_payload) é montado pelo bulk_ingest.py
 -- (create_stg_payload_from_raw_shp / _csv) e expõe:
 --   row_id BIGINT, payload JSONB, geom geometry, feature_key_override TEXT
+--   feature_key, attr_hash, attr_compare_hash, tooltip_hash, geom_hash TEXT
+-- As colunas de hash só vêm preenchidas no hashing no cliente
+-- (LANDWATCH_CLIENT_HASHING); NULL = calcular aqui, como sempre.
 -- A geom já vem como `geometry` (SHP: direto do ogr2ogr; CSV: WKT parseado uma
 -- vez no estágio de payload) — sem round-trip WKT dentro deste arquivo.
 
@@ -24,18 +29,20 @@
 --
 -- Este bloco assume que payload contém todas as colunas já normalizadas.
 
+-- @step stg_norm_raw
 DROP TABLE IF EXISTS __stg_norm_raw;
 CREATE TEMP TABLE __stg_norm_raw AS
 SELECT
     s.row_id,
     -- hash da linha inteira como feature_key
     COALESCE(
+        s.feature_key,
         s.feature_key_override,
         {{FEATURE_KEY_FALLBACK_SQL}}
     ) AS feature_key,
-    md5(s.payload::text) AS attr_hash,
-    md5({{ATTR_COMPARE_JSON_SQL}}::text) AS attr_compare_hash,
-    md5({{TOOLTIP_JSON_SQL}}::text) AS tooltip_hash,
+    COALESCE(s.attr_hash, md5(s.payload::text)) AS attr_hash,
+    COALESCE(s.attr_compare_hash, md5({{ATTR_COMPARE_JSON_SQL}}::text)) AS attr_compare_hash,
+    COALESCE(s.tooltip_hash, md5({{TOOLTIP_JSON_SQL}}::text)) AS tooltip_hash,
     s.payload AS attr_json
 FROM {{STG_TABLE}} s;
 -- P3: a geom NÃO entra aqui — fica fora do sort de dedup e é trazida só nas
@@ -44,6 +51,9 @@ FROM {{STG_TABLE}} s;
 
 -- Deduplica por feature_key para evitar colisões no mapeamento de feature_id.
 -- Mantém a linha mais recente (maior row_id) quando houver duplicatas.
+-- Com hashing no cliente o staging já chega deduplicado e o rank vira
+-- constante (sem sort).
+-- @step stg_norm_dedup
 DROP TABLE IF EXISTS __stg_norm;
 CREATE TEMP TABLE __stg_norm AS
 SELECT
@@ -53,16 +63,18 @@ SELECT
     r.attr_compare_hash,
     r.tooltip_hash,
     r.attr_json,
-    p.geom
+    p.geom,
+    p.geom_hash
 FROM (
     SELECT
         r.*,
-        ROW_NUMBER() OVER (PARTITION BY r.feature_key ORDER BY r.row_id DESC) AS __rn
+        {{DEDUP_RANK_SQL}} AS __rn
     FROM __stg_norm_raw r
 ) r
 JOIN {{STG_TABLE}} p ON p.row_id = r.row_id
 WHERE r.__rn = 1;
 
+-- @step doc_date
 -- doc_normalized + date_closed (para CSVs de CPF/CNPJ)
 -- ajuste os nomes conforme dataset (config em lw_dataset)
 ALTER TABLE __stg_norm ADD COLUMN doc_normalized TEXT;
@@ -70,20 +82,24 @@ ALTER TABLE __stg_norm ADD COLUMN date_closed DATE;
 
 {{DOC_DATE_SQL}}
 
--- Geometria: a coluna geom ja vem do join com stg_payload (P1/P3, sem
--- round-trip WKT). So falta validar e hashear (bloco GEOM_SQL abaixo).
-ALTER TABLE __stg_norm ADD COLUMN geom_hash TEXT;
+-- @step geom
+-- Geometria: geom e geom_hash (se hasheado no cliente) ja vem do join com
+-- stg_payload (P1/P3, sem round-trip WKT). So falta validar e hashear o que
+-- ainda nao tem hash (bloco GEOM_SQL abaixo). Com o fast path, geometrias cujo
+-- WKB cru ja esta no lw_geom_store nao passam por ST_IsValid/ST_MakeValid.
 
 {{GEOM_SQL}}
 
 -- =========================================================
 -- 3) Feature upsert
 -- =========================================================
+-- @step feature_upsert
 INSERT INTO landwatch.lw_feature(dataset_id, feature_key)
 SELECT :dataset_id, n.feature_key
 FROM __stg_norm n
 ON CONFLICT (dataset_id, feature_key) DO NOTHING;
 
+-- @step feature_map
 -- map feature_id
 DROP TABLE IF EXISTS __stg_map;
 CREATE TEMP TABLE __stg_map AS
@@ -109,6 +125,7 @@ ANALYZE __stg_map;
 -- =========================================================
 -- 4) Diff vs estado atual
 -- =========================================================
+-- @step prev_state
 DROP TABLE IF EXISTS __prev_state;
 CREATE TEMP TABLE __prev_state AS
 SELECT
@@ -124,6 +141,7 @@ WHERE dataset_id = :dataset_id;
 CREATE UNIQUE INDEX ON __prev_state(feature_id);
 ANALYZE __prev_state;
 
+-- @step new_features
 -- novos
 DROP TABLE IF EXISTS __new_features;
 CREATE TEMP TABLE __new_features AS
@@ -142,6 +160,7 @@ WHERE p.feature_id IS NULL;
 CREATE INDEX ON __new_features(feature_id);
 ANALYZE __new_features;
 
+-- @step changed_features
 -- alterados
 DROP TABLE IF EXISTS __changed_features;
 CREATE TEMP TABLE __changed_features AS
@@ -165,6 +184,7 @@ WHERE p.geom_hash IS DISTINCT FROM m.geom_hash
 CREATE INDEX ON __changed_features(feature_id);
 ANALYZE __changed_features;
 
+-- @step changed_subsets
 DROP TABLE IF EXISTS __geom_changed_features;
 CREATE TEMP TABLE __geom_changed_features AS
 SELECT feature_id
@@ -186,6 +206,7 @@ FROM __changed_features
 WHERE tooltip_changed OR became_present;
 CREATE INDEX ON __tooltip_changed_features(feature_id);
 
+-- @step disappeared
 -- desaparecidos (estavam presentes e não vieram no snapshot)
 DROP TABLE IF EXISTS __disappeared;
 CREATE TEMP TABLE __disappeared AS
@@ -195,14 +216,17 @@ LEFT JOIN __stg_map m ON m.feature_id = p.feature_id
 WHERE p.is_present = TRUE AND m.feature_id IS NULL;
 CREATE INDEX ON __disappeared(feature_id);
 
+-- @step delta_reset
 -- Persistir delta fino por versão para atualização incremental das caches.
 -- Mantém o delta na mesma transação da ingestão: se a ingestão falhar, o delta também some.
 DELETE FROM landwatch.lw_feature_delta
-WHERE version_id = :version_id;
+WHERE dataset_id = :dataset_id
+  AND version_id = :version_id;
 
 DELETE FROM landwatch.lw_feature_delta_run
 WHERE version_id = :version_id;
 
+-- @step delta_new
 INSERT INTO landwatch.lw_feature_delta
   (dataset_id, version_id, feature_id, action, geom_changed, attr_changed, tooltip_changed, became_present, became_absent, snapshot_date)
 SELECT
@@ -218,6 +242,7 @@ SELECT
   :snapshot_date
 FROM __new_features n;
 
+-- @step delta_changed
 INSERT INTO landwatch.lw_feature_delta
   (dataset_id, version_id, feature_id, action, geom_changed, attr_changed, tooltip_changed, became_present, became_absent, snapshot_date)
 SELECT
@@ -233,6 +258,7 @@ SELECT
   :snapshot_date
 FROM __changed_features c;
 
+-- @step delta_disappeared
 INSERT INTO landwatch.lw_feature_delta
   (dataset_id, version_id, feature_id, action, geom_changed, attr_changed, tooltip_changed, became_present, became_absent, snapshot_date)
 SELECT
@@ -248,6 +274,7 @@ SELECT
   :snapshot_date
 FROM __disappeared d;
 
+-- @step delta_run
 INSERT INTO landwatch.lw_feature_delta_run (
   dataset_id,
   version_id,
@@ -287,6 +314,7 @@ WHERE version_id = :version_id
 -- =========================================================
 -- 5) Atributos - packs deduplicados
 -- =========================================================
+-- @step attr_pack_insert
 -- inserir packs novos
 INSERT INTO landwatch.lw_attr_pack(pack_hash, pack_json)
 SELECT DISTINCT m.attr_hash, m.attr_json
@@ -298,6 +326,7 @@ WHERE p.pack_id IS NULL
     OR EXISTS (SELECT 1 FROM __attr_changed_features c WHERE c.feature_id = m.feature_id)
   );
 
+-- @step attr_hist_close
 -- fechar packs antigos se mudou ou sumiu
 UPDATE landwatch.lw_feature_attr_pack_hist h
 SET valid_to = :snapshot_date
@@ -313,6 +342,7 @@ WHERE h.dataset_id = :dataset_id
   AND h.feature_id = d.feature_id
   AND h.valid_to IS NULL;
 
+-- @step attr_hist_insert
 -- inserir novos packs (novos + alterados)
 INSERT INTO landwatch.lw_feature_attr_pack_hist
   (dataset_id, feature_id, pack_id, version_id, valid_from, valid_to)
@@ -339,6 +369,7 @@ WHERE h.feature_id IS NULL
 -- =========================================================
 -- 6) Geometria - dedupe + histórico
 -- =========================================================
+-- @step geom_store_insert
 -- inserir geoms novos
 INSERT INTO landwatch.lw_geom_store(geom_hash, geom, srid)
 SELECT DISTINCT m.geom_hash, m.geom, 4326
@@ -351,6 +382,7 @@ WHERE m.geom IS NOT NULL
     OR EXISTS (SELECT 1 FROM __geom_changed_features c WHERE c.feature_id = m.feature_id)
   );
 
+-- @step geom_hist_close
 -- fechar geoms antigos se mudou ou sumiu
 UPDATE landwatch.lw_feature_geom_hist h
 SET valid_to = :snapshot_date
@@ -366,6 +398,7 @@ WHERE h.dataset_id = :dataset_id
   AND h.feature_id = d.feature_id
   AND h.valid_to IS NULL;
 
+-- @step geom_hist_insert
 -- inserir geoms novos (novos + alterados)
 INSERT INTO landwatch.lw_feature_geom_hist
   (dataset_id, feature_id, geom_id, version_id, valid_from, valid_to)
@@ -400,6 +433,7 @@ WHERE m.geom_hash IS NOT NULL
 -- - somente se date_closed IS NULL
 -- - se desaparecer ou date_closed virar preenchido, fecha
 
+-- @step doc_index_close
 -- fechar registros quando sumiu
 UPDATE landwatch.lw_doc_index d
 SET valid_to = :snapshot_date
@@ -417,6 +451,7 @@ WHERE d.dataset_id = :dataset_id
   AND d.valid_to IS NULL
   AND m.date_closed IS NOT NULL;
 
+-- @step doc_index_insert
 -- inserir ativos
 INSERT INTO landwatch.lw_doc_index
   (dataset_id, feature_id, doc_normalized, date_closed, version_id, valid_from, valid_to)
@@ -441,6 +476,7 @@ WHERE m.doc_normalized IS NOT NULL
 -- =========================================================
 -- 8) Feature state
 -- =========================================================
+-- @step state_insert
 -- novos
 INSERT INTO landwatch.lw_feature_state
   (dataset_id, feature_id, is_present, geom_hash, attr_hash, attr_compare_hash, tooltip_hash, snapshot_date, current_version_id, updated_at)
@@ -460,6 +496,7 @@ LEFT JOIN landwatch.lw_feature_state s
   ON s.dataset_id = :dataset_id AND s.feature_id = m.feature_id
 WHERE s.feature_id IS NULL;
 
+-- @step state_update
 -- atualiza quando mudou
 UPDATE landwatch.lw_feature_state s
 SET
@@ -481,6 +518,7 @@ WHERE s.dataset_id = :dataset_id
     OR s.tooltip_hash IS DISTINCT FROM m.tooltip_hash
   );
 
+-- @step state_absent
 -- marca ausentes
 UPDATE landwatch.lw_feature_state s
 SET
@@ -1,9 +1,11 @@
 import os
+import shutil
 import sys
 import argparse
 from pathlib import Path
 from typing import Dict
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
     from dotenv import load_dotenv
@@ -19,19 +21,42 @@ if load_dotenv:
     if env_path.exists():
         load_dotenv(env_path)
 
-from steps.common import JobConfig, StorageClient, DatasetArtifact, now_run_id, log_info, log_warn, compute_fingerprint, cleanup_files
+from steps.common import (
+    JobConfig,
+    StorageClient,
+    DatasetArtifact,
+    now_run_id,
+    log_info,
+    log_warn,
+    compute_fingerprint,
+    compute_file_digests,
+    cleanup_files,
+)
 from steps.download_prodes import run as download_prodes
 from steps.download_deter import run as download_deter
 from steps.download_sicar import run as download_sicar
 from steps.download_url import run as download_url
-from steps.manifest import build_manifest, get_prev_fingerprint, load_latest_manifest, save_manifest
-from steps.ingest import refresh_mvs_once, run_ingest, run_ingest_only, run_pmtiles_build
+from steps.manifest import (
+    SKIP_KEYS,
+    build_manifest,
+    get_prev_extra,
+    get_prev_fingerprint,
+    is_unchanged_artifact,
+    load_latest_manifest,
+    raw_object_key,
+    save_manifest,
+)
+from steps.ingest import IngestResult, refresh_mvs_once, run_ingest, run_ingest_only, run_pmtiles_build
+from steps.archive import ARCHIVE_SUFFIXES, RESTORE_ENABLED, pack_files, resolve_archive_format, restore_raw_artifacts
 from steps.cleanup import cleanup_category
 from steps.prepare_ucs import run as prepare_ucs_run, OUTPUT_DATASET_CODE as UCS_OUTPUT_DATASET_CODE
 
 
 EXCLUDE_FROM_MANIFEST_KEY = "exclude_from_manifest"
 EXCLUDE_FROM_INGEST_KEY = "exclude_from_ingest"
+JOB_CATEGORIES = ("PRODES", "DETER", "SICAR", "URL")
+# Pipeline: downloads das categorias em paralelo, ingestao de cada categoria assim que ela chega.
+JOB_PIPELINE = os.environ.get("LANDWATCH_JOB_PIPELINE", "0").strip().lower() in ("1", "true", "yes")
 
 
 def build_config() -> JobConfig:
@@ -53,15 +78,57 @@ def build_config() -> JobConfig:
     )
 
 
-def upload_artifacts(storage: StorageClient, run_id: str, artifacts, work_dir: Path):
+def upload_artifacts(storage: StorageClient, artifacts, work_dir: Path) -> Dict[str, Dict[str, str]]:
+    """Raw enderecado por conteudo: cada arquivo vira `raw/<categoria>/objects/<sha1>`, enviado so se ainda nao existe.
+
+    Com `LANDWATCH_RAW_ARCHIVE=zstd|xz` o artefato inteiro vira um tar comprimido com chave = fingerprint.
+    Retorna {dataset_code: {caminho relativo ao work_dir: objeto}} para o manifest do run.
+    """
+    archive_format = resolve_archive_format()
+    archive_dir = work_dir / ".raw_archive"
+    refs: Dict[str, Dict[str, str]] = {}
+    pending: Dict[str, list] = {}
+    reused = 0
     for art in artifacts:
+        if archive_format:
+            present = [p for p in art.files if p.exists()]
+            keys = {}
+            if present:
+                key = raw_object_key(art.category, compute_fingerprint(present)) + ARCHIVE_SUFFIXES[archive_format]
+                keys = {p: key for p in present}
+        else:
+            keys = {p: raw_object_key(art.category, digest) for p, digest in compute_file_digests(art.files).items()}
         for file_path in art.files:
+            key = keys.get(file_path)
+            if not key:
+                continue
             try:
                 rel = file_path.relative_to(work_dir)
             except ValueError:
                 rel = Path(art.category) / file_path.name
-            storage_path = f"raw/{run_id}/{rel.as_posix()}"
-            storage.upload_file(file_path, storage_path)
+            refs.setdefault(art.dataset_code, {})[rel.as_posix()] = key
+            if key in pending:
+                continue
+            if storage.exists(key):
+                reused += 1
+                continue
+            pending[key] = [p for p in art.files if keys.get(p) == key]
+    log_info(f"Raw: {len(pending)} objeto(s) novo(s), {reused} ja no storage")
+    try:
+        items = []
+        for key, files in pending.items():
+            if archive_format:
+                archive = pack_files(files, archive_dir / Path(key).name, archive_format)
+                size = sum(p.stat().st_size for p in files)
+                log_info(f"Raw: {Path(key).name} {size / 1e6:.1f} MB -> {archive.stat().st_size / 1e6:.1f} MB")
+                items.append((archive, key))
+            else:
+                items.append((files[0], key))
+        storage.upload_files(items)
+    finally:
+        if archive_format:
+            shutil.rmtree(archive_dir, ignore_errors=True)
+    return refs
 
 
 def _artifact_has_flag(artifact: DatasetArtifact, key: str) -> bool:
@@ -191,13 +258,14 @@ def process_category(storage: StorageClient, run_id: str, category: str, artifac
     prev_manifest = load_latest_manifest(storage, category)
     changed = []
     for art in manifest_artifacts:
+        if is_unchanged_artifact(art):
+            continue
         current_fp = compute_fingerprint(art.files)
         prev_fp = get_prev_fingerprint(prev_manifest, art.dataset_code)
         if not prev_fp or current_fp != prev_fp:
             changed.append(art)
 
-    if config.save_raw:
-        upload_artifacts(storage, run_id, artifacts, config.work_dir)
+    raw_objects = upload_artifacts(storage, artifacts, config.work_dir) if config.save_raw else None
 
     status = "skipped"
     changed_for_ingest = _filter_ingest_artifacts(changed)
@@ -207,7 +275,7 @@ def process_category(storage: StorageClient, run_id: str, category: str, artifac
     else:
         status = "skipped"
 
-    manifest = build_manifest(run_id, category, manifest_artifacts)
+    manifest = build_manifest(run_id, category, manifest_artifacts, prev_manifest, raw_objects=raw_objects)
     manifest["status"] = status
     save_manifest(storage, category, run_id, manifest)
 
@@ -237,6 +305,7 @@ def _prepare_category_state(
         "changed_for_ingest": [],
         "collect_error": None,
         "skip_reason": None,
+        "raw_objects": None,
     }
     if not artifacts:
         state["skip_reason"] = "no_artifacts"
@@ -252,13 +321,15 @@ def _prepare_category_state(
     state["prev_manifest"] = prev_manifest
     changed = []
     for art in manifest_artifacts:
+        if is_unchanged_artifact(art):
+            continue
         current_fp = compute_fingerprint(art.files)
         prev_fp = get_prev_fingerprint(prev_manifest, art.dataset_code)
         if not prev_fp or current_fp != prev_fp:
             changed.append(art)
 
     if config.save_raw:
-        upload_artifacts(storage, run_id, artifacts, config.work_dir)
+        state["raw_objects"] = upload_artifacts(storage, artifacts, config.work_dir)
 
     state["changed"] = changed
     state["changed_for_ingest"] = _filter_ingest_artifacts(changed)
@@ -271,8 +342,9 @@ def _build_manifest_with_failed_fingerprints(
     manifest_artifacts,
     prev_manifest: dict,
     failed_codes,
+    raw_objects=None,
 ) -> dict:
-    manifest = build_manifest(run_id, category, manifest_artifacts)
+    manifest = build_manifest(run_id, category, manifest_artifacts, prev_manifest, raw_objects=raw_objects)
     failed_codes = set(failed_codes or [])
     if not failed_codes:
         return manifest
@@ -281,6 +353,15 @@ def _build_manifest_with_failed_fingerprints(
         code = dataset.get("dataset_code")
         if code not in failed_codes:
             continue
+        # Watermark/data de publicacao acompanham o fingerprint: o proximo run nao pode pular o dataset que falhou.
+        extra = dict(dataset.get("extra") or {})
+        for key in SKIP_KEYS:
+            prev_value = get_prev_extra(prev_manifest, code, key)
+            if prev_value:
+                extra[key] = prev_value
+            else:
+                extra.pop(key, None)
+        dataset["extra"] = extra
         prev_fp = get_prev_fingerprint(prev_manifest, code)
         if prev_fp:
             dataset["fingerprint"] = prev_fp
@@ -337,6 +418,7 @@ def _finalize_category_state(
         manifest_artifacts,
         state.get("prev_manifest"),
         failed.keys(),
+        raw_objects=state.get("raw_objects"),
     )
     manifest["status"] = status
     manifest["changed_count"] = len(changed)
@@ -366,7 +448,8 @@ def load_existing_artifacts(work_dir: Path, category: str, snapshot_date: str):
     if not category_dir.exists():
         return []
     artifacts = []
-    for shp in category_dir.rglob("*.shp"):
+    primaries = sorted(category_dir.rglob("*.shp")) + sorted(category_dir.rglob("*.fgb"))
+    for shp in primaries:
         base = shp.with_suffix("")
         files = [p for p in base.parent.glob(base.name + ".*")]
         if not files:
@@ -419,6 +502,115 @@ def _filter_prodes_artifacts(artifacts, workspaces, years):
     return [a for a in filtered if any(a.dataset_code.endswith(suf) for suf in year_suffixes)]
 
 
+def _download_category(
+    config: JobConfig,
+    category: str,
+    snapshot_date: str,
+    prodes_workspaces=None,
+    prodes_years=None,
+    prev_manifest=None,
+):
+    if category == "PRODES":
+        return download_prodes(
+            config.work_dir,
+            snapshot_date,
+            workspaces=prodes_workspaces,
+            years=prodes_years,
+            prev_manifest=prev_manifest,
+        )
+    if category == "DETER":
+        return download_deter(config.work_dir, snapshot_date, prev_manifest=prev_manifest)
+    if category == "SICAR":
+        return download_sicar(config.work_dir, snapshot_date, prev_manifest=prev_manifest)
+    if category == "URL":
+        return download_url(config.work_dir, snapshot_date)
+    raise ValueError(f"Categoria desconhecida: {category}")
+
+
+def _collect_category(
+    storage: StorageClient,
+    run_id: str,
+    category: str,
+    config: JobConfig,
+    snapshot_date: str,
+    prodes_workspaces=None,
+    prodes_years=None,
+) -> dict:
+    """Baixa (ou reaproveita) os artefatos da categoria e calcula o que mudou; nunca propaga a falha."""
+    try:
+        log_info(f"Download {category}...")
+        prev_manifest = load_latest_manifest(storage, category)
+        reuse = prev_manifest and prev_manifest.get("status") == "failed"
+        artifacts = []
+        if reuse:
+            artifacts = load_existing_artifacts(config.work_dir, category, snapshot_date)
+            source = "arquivos baixados"
+            if not artifacts and RESTORE_ENABLED:
+                # No novo (work_dir vazio): reidrata do raw salvo pelo run que falhou.
+                artifacts = restore_raw_artifacts(storage, prev_manifest, config.work_dir, category, snapshot_date)
+                source = "raw do storage"
+            if category == "PRODES":
+                artifacts = _filter_prodes_artifacts(artifacts, prodes_workspaces, prodes_years)
+            if artifacts:
+                log_info(f"{category}: reutilizando {source} (manifest failed).")
+        if not artifacts:
+            artifacts = _download_category(
+                config,
+                category,
+                snapshot_date,
+                prodes_workspaces=prodes_workspaces,
+                prodes_years=prodes_years,
+                prev_manifest=prev_manifest,
+            )
+        if category == "URL":
+            artifacts = _transform_url_ucs_artifacts(artifacts, config, snapshot_date)
+        return _prepare_category_state(storage, run_id, category, artifacts, config)
+    except Exception as exc:
+        log_warn(f"{category} falhou ({type(exc).__name__}): {exc}")
+        log_warn(traceback.format_exc())
+        return {
+            "category": category,
+            "artifacts": [],
+            "manifest_artifacts": [],
+            "changed": [],
+            "changed_for_ingest": [],
+            "collect_error": str(exc),
+        }
+
+
+def _merge_ingest_result(target: IngestResult, other: IngestResult) -> None:
+    target.successes.extend(other.successes)
+    target.success_versions.extend(other.success_versions)
+    target.failures.update(other.failures)
+    target.skipped.extend(other.skipped)
+
+
+def _collect_and_ingest_pipelined(storage: StorageClient, run_id: str, categories, config: JobConfig, collect_kwargs: dict):
+    """Downloads das categorias em paralelo; cada categoria entra na ingestao assim que termina.
+
+    A ingestao continua serial (uma categoria por vez, nesta thread), entao o banco
+    trabalha enquanto as categorias mais lentas (SICAR) ainda estao baixando.
+    """
+    states = {}
+    ingest_result = IngestResult()
+    snapshot_date = collect_kwargs["snapshot_date"]
+    with ThreadPoolExecutor(max_workers=len(categories), thread_name_prefix="landwatch-collect") as pool:
+        futures = {
+            pool.submit(_collect_category, storage, run_id, category, config, **collect_kwargs): category
+            for category in categories
+        }
+        for future in as_completed(futures):
+            category = futures[future]
+            state = future.result()
+            states[category] = state
+            changed_for_ingest = state.get("changed_for_ingest", [])
+            if not changed_for_ingest:
+                continue
+            log_info(f"{category}: {len(changed_for_ingest)} dataset(s) na fila de ingestao.")
+            _merge_ingest_result(ingest_result, run_ingest_only(changed_for_ingest, snapshot_date))
+    return states, ingest_result
+
+
 def run_all(config: JobConfig, snapshot_date: str, categories=None, prodes_workspaces=None, prodes_years=None):
     config.work_dir.mkdir(parents=True, exist_ok=True)
     storage = StorageClient(
@@ -431,95 +623,26 @@ def run_all(config: JobConfig, snapshot_date: str, categories=None, prodes_works
     run_id = now_run_id()
 
     results = {}
-    states = {}
-    def should_run(category: str) -> bool:
-        return not categories or category in categories
-    if should_run("PRODES"):
-        try:
-            log_info("Download PRODES...")
-            prev_manifest = load_latest_manifest(storage, "PRODES")
-            reuse = prev_manifest and prev_manifest.get("status") == "failed"
-            artifacts = []
-            if reuse:
-                artifacts = load_existing_artifacts(config.work_dir, "PRODES", snapshot_date)
-                artifacts = _filter_prodes_artifacts(artifacts, prodes_workspaces, prodes_years)
-                if artifacts:
-                    log_info("PRODES: reutilizando arquivos baixados (manifest failed).")
-            if not artifacts:
-                artifacts = download_prodes(
-                    config.work_dir,
-                    snapshot_date,
-                    workspaces=prodes_workspaces,
-                    years=prodes_years,
-                )
-            states["PRODES"] = _prepare_category_state(storage, run_id, "PRODES", artifacts, config)
-        except Exception as exc:
-            log_warn(f"PRODES falhou ({type(exc).__name__}): {exc}")
-            log_warn(traceback.format_exc())
-            states["PRODES"] = {"category": "PRODES", "artifacts": [], "manifest_artifacts": [], "changed": [], "changed_for_ingest": [], "collect_error": str(exc)}
-
-    if should_run("DETER"):
-        try:
-            log_info("Download DETER...")
-            prev_manifest = load_latest_manifest(storage, "DETER")
-            reuse = prev_manifest and prev_manifest.get("status") == "failed"
-            artifacts = []
-            if reuse:
-                artifacts = load_existing_artifacts(config.work_dir, "DETER", snapshot_date)
-                if artifacts:
-                    log_info("DETER: reutilizando arquivos baixados (manifest failed).")
-            if not artifacts:
-                artifacts = download_deter(config.work_dir, snapshot_date)
-            states["DETER"] = _prepare_category_state(storage, run_id, "DETER", artifacts, config)
-        except Exception as exc:
-            log_warn(f"DETER falhou ({type(exc).__name__}): {exc}")
-            log_warn(traceback.format_exc())
-            states["DETER"] = {"category": "DETER", "artifacts": [], "manifest_artifacts": [], "changed": [], "changed_for_ingest": [], "collect_error": str(exc)}
-
-    if should_run("SICAR"):
-        try:
-            log_info("Download SICAR...")
-            prev_manifest = load_latest_manifest(storage, "SICAR")
-            reuse = prev_manifest and prev_manifest.get("status") == "failed"
-            artifacts = []
-            if reuse:
-                artifacts = load_existing_artifacts(config.work_dir, "SICAR", snapshot_date)
-                if artifacts:
-                    log_info("SICAR: reutilizando arquivos baixados (manifest failed).")
-            if not artifacts:
-                artifacts = download_sicar(config.work_dir, snapshot_date)
-            states["SICAR"] = _prepare_category_state(storage, run_id, "SICAR", artifacts, config)
-        except Exception as exc:
-            log_warn(f"SICAR falhou ({type(exc).__name__}): {exc}")
-            log_warn(traceback.format_exc())
-            states["SICAR"] = {"category": "SICAR", "artifacts": [], "manifest_artifacts": [], "changed": [], "changed_for_ingest": [], "collect_error": str(exc)}
-
-    if should_run("URL"):
-        try:
-            log_info("Download URLs...")
-            prev_manifest = load_latest_manifest(storage, "URL")
-            reuse = prev_manifest and prev_manifest.get("status") == "failed"
-            artifacts = []
-            if reuse:
-                artifacts = load_existing_artifacts(config.work_dir, "URL", snapshot_date)
-                if artifacts:
-                    log_info("URL: reutilizando arquivos baixados (manifest failed).")
-            if not artifacts:
-                artifacts = download_url(config.work_dir, snapshot_date)
-            artifacts = _transform_url_ucs_artifacts(artifacts, config, snapshot_date)
-            states["URL"] = _prepare_category_state(storage, run_id, "URL", artifacts, config)
-        except Exception as exc:
-            log_warn(f"URL falhou ({type(exc).__name__}): {exc}")
-            log_warn(traceback.format_exc())
-            states["URL"] = {"category": "URL", "artifacts": [], "manifest_artifacts": [], "changed": [], "changed_for_ingest": [], "collect_error": str(exc)}
-
-    ingest_artifacts = []
-    for category in ("PRODES", "DETER", "SICAR", "URL"):
-        state = states.get(category)
-        if state:
-            ingest_artifacts.extend(state.get("changed_for_ingest", []))
+    selected = [category for category in JOB_CATEGORIES if not categories or category in categories]
+    collect_kwargs = {
+        "snapshot_date": snapshot_date,
+        "prodes_workspaces": prodes_workspaces,
+        "prodes_years": prodes_years,
+    }
+
+    if JOB_PIPELINE and len(selected) > 1:
+        states, ingest_result = _collect_and_ingest_pipelined(storage, run_id, selected, config, collect_kwargs)
+    else:
+        states = {}
+        for category in selected:
+            states[category] = _collect_category(storage, run_id, category, config, **collect_kwargs)
+        ingest_artifacts = []
+        for category in JOB_CATEGORIES:
+            state = states.get(category)
+            if state:
+                ingest_artifacts.extend(state.get("changed_for_ingest", []))
+        ingest_result = run_ingest_only(ingest_artifacts, snapshot_date)
 
-    ingest_result = run_ingest_only(ingest_artifacts, snapshot_date)
     mv_ok = True
     pmtiles_ok = True
     if ingest_result.successes:
@@ -529,7 +652,7 @@ def run_all(config: JobConfig, snapshot_date: str, categories=None, prodes_works
         else:
             log_warn("PMTiles ignorado porque refresh de MVs falhou.")
 
-    for category in ("PRODES", "DETER", "SICAR", "URL"):
+    for category in JOB_CATEGORIES:
         state = states.get(category)
         if not state:
             continue
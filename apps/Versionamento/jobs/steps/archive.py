@@ -0,0 +1,144 @@
+import os
+import shutil
+import tarfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .common import DatasetArtifact, StorageClient, ensure_dir, log_info, log_warn
+from .manifest import RAW_OBJECTS_KEY, UNCHANGED_KEY
+
+
+# Raw comprimido: cada artefato (familia .shp/.dbf/...) vira um tar zstd (ou xz sem o pacote zstandard).
+ARCHIVE_MODE = os.environ.get("LANDWATCH_RAW_ARCHIVE", "off").strip().lower()
+ZSTD_LEVEL = int(os.environ.get("LANDWATCH_RAW_ZSTD_LEVEL", "10").strip() or "10")
+XZ_PRESET = int(os.environ.get("LANDWATCH_RAW_XZ_PRESET", "6").strip() or "6")
+RESTORE_ENABLED = os.environ.get("LANDWATCH_RAW_RESTORE", "1").strip().lower() not in ("0", "false", "no")
+ARCHIVE_SUFFIXES = {"zstd": ".tar.zst", "xz": ".tar.xz"}
+RESTORE_DIRNAME = ".raw_restore"
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def resolve_archive_format(mode: Optional[str] = None) -> Optional[str]:
+    """'zstd', 'xz' ou None (arquivos soltos, um objeto por arquivo)."""
+    mode = (ARCHIVE_MODE if mode is None else mode).strip().lower()
+    if mode in ("", "0", "off", "none", "false", "no"):
+        return None
+    if mode in ("zstd", "zst", "1", "on", "true", "yes"):
+        if _zstandard() is None:
+            log_warn("Pacote zstandard nao instalado; raw sera arquivado com xz.")
+            return "xz"
+        return "zstd"
+    if mode in ("xz", "lzma"):
+        return "xz"
+    raise ValueError(f"LANDWATCH_RAW_ARCHIVE invalido: {mode} (use off, zstd ou xz)")
+
+
+def is_archive_key(key: str) -> bool:
+    return key.endswith(tuple(ARCHIVE_SUFFIXES.values()))
+
+
+def pack_files(files: Iterable[Path], dest: Path, fmt: str) -> Path:
+    """Empacota os arquivos (so o nome, sem pastas) num tar comprimido, em streaming."""
+    ensure_dir(dest.parent)
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    if fmt == "zstd":
+        compressor = _zstandard().ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+        with tmp.open("wb") as raw, compressor.stream_writer(raw) as writer:
+            with tarfile.open(fileobj=writer, mode="w|") as tar:
+                for path in files:
+                    tar.add(str(path), arcname=path.name)
+    else:
+        with tarfile.open(tmp, mode="w:xz", preset=XZ_PRESET) as tar:
+            for path in files:
+                tar.add(str(path), arcname=path.name)
+    os.replace(tmp, dest)
+    return dest
+
+
+def unpack_archive(archive: Path, dest_dir: Path) -> List[Path]:
+    """Extrai os arquivos regulares do tar para `dest_dir` (nomes sem pastas); retorna os caminhos."""
+    ensure_dir(dest_dir)
+    extracted = []
+
+    def _extract(tar):
+        for member in tar:
+            if not member.isfile():
+                continue
+            target = dest_dir / Path(member.name).name
+            with tar.extractfile(member) as src, target.open("wb") as out:
+                shutil.copyfileobj(src, out)
+            extracted.append(target)
+
+    if archive.name.endswith(ARCHIVE_SUFFIXES["zstd"]):
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError(f"zstandard e necessario para restaurar {archive.name}")
+        with archive.open("rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                _extract(tar)
+    else:
+        with tarfile.open(archive, mode="r|xz") as tar:
+            _extract(tar)
+    return extracted
+
+
+def restore_raw_artifacts(
+    storage: StorageClient,
+    manifest: Optional[dict],
+    work_dir: Path,
+    category: str,
+    snapshot_date: str,
+) -> List[DatasetArtifact]:
+    """Reconstroi os artefatos do manifest a partir do raw no storage (ex.: run falho retomado em outro no).
+
+    Tudo ou nada: se algum dataset do manifest nao tem raw ou falha ao baixar, retorna [] e a categoria e baixada de novo.
+    """
+    refs: Dict[str, Dict[str, str]] = (manifest or {}).get(RAW_OBJECTS_KEY) or {}
+    datasets = {ds.get("dataset_code"): ds for ds in (manifest or {}).get("datasets", [])}
+    missing = sorted(code for code in datasets if not refs.get(code))
+    if not refs or missing:
+        if refs:
+            log_info(f"{category}: raw incompleto no storage (sem {', '.join(missing)}); seguindo com download.")
+        return []
+
+    staging = work_dir / RESTORE_DIRNAME
+    artifacts = []
+    try:
+        for code, files in sorted(refs.items()):
+            by_key: Dict[str, List[str]] = {}
+            for rel, key in files.items():
+                by_key.setdefault(key, []).append(rel)
+            restored: List[Path] = []
+            for key, rels in by_key.items():
+                if is_archive_key(key):
+                    archive = storage.download_file(key, staging / Path(key).name)
+                    names = {Path(rel).name for rel in rels}
+                    extracted = unpack_archive(archive, work_dir / Path(rels[0]).parent)
+                    archive.unlink()
+                    restored.extend(p for p in extracted if p.name in names)
+                else:
+                    restored.extend(storage.download_file(key, work_dir / rel) for rel in rels)
+            dataset = datasets.get(code) or {}
+            extra = {k: v for k, v in (dataset.get("extra") or {}).items() if k != UNCHANGED_KEY}
+            artifacts.append(
+                DatasetArtifact(
+                    category=category,
+                    dataset_code=code,
+                    files=sorted(restored),
+                    snapshot_date=dataset.get("snapshot_date") or snapshot_date,
+                    extra=extra or None,
+                )
+            )
+    except Exception as exc:
+        log_warn(f"{category}: falha ao restaurar raw do storage ({exc}); seguindo com download.")
+        return []
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return artifacts
@@ -1,21 +1,50 @@
+import json
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Set
 
 from .common import StorageClient, log_info
+from .manifest import RAW_OBJECTS_KEY, list_manifest_run_ids, raw_object_keys, rewrite_manifest_index
+
+
+def _read_manifest(storage: StorageClient, rel_path: str) -> Optional[dict]:
+    payload = storage.read_text(rel_path)
+    if not payload:
+        return None
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return None
 
 
 def cleanup_category(storage: StorageClient, category: str, retention_runs: int) -> None:
     manifest_prefix = f"manifests/{category}"
-    manifest_paths = storage.list_paths(manifest_prefix)
-    names = sorted([Path(p).name for p in manifest_paths if p.endswith('.json')])
+    names = [f"{run_id}.json" for run_id in list_manifest_run_ids(storage, category)]
     if len(names) <= retention_runs:
         return
     to_remove = names[:-retention_runs]
+    # Objetos raw sao compartilhados entre runs: so saem quando nenhum run retido aponta para eles.
+    referenced: Optional[Set[str]] = set()
+    for name in names[-retention_runs:]:
+        manifest = _read_manifest(storage, f"{manifest_prefix}/{name}")
+        if manifest is None:
+            # Sem ler um manifest retido nao da para saber o que ele referencia; nao apaga objetos.
+            referenced = None
+            break
+        referenced |= raw_object_keys(manifest)
     for name in to_remove:
         run_id = Path(name).stem
-        raw_prefix = f"raw/{category}/{run_id}"
-        for path in storage.list_paths(raw_prefix):
-            rel = path.replace(storage.blob_prefix + '/', '') if storage.mode == 'blob' else str(Path(path).relative_to(storage.local_root))
-            storage.delete_path(rel)
+        removed_objects = 0
+        manifest = _read_manifest(storage, f"{manifest_prefix}/{name}")
+        if referenced is not None:
+            for key in sorted(raw_object_keys(manifest) - referenced):
+                storage.delete_path(key)
+                removed_objects += 1
+        # Layout antigo (copia completa por run; o upload gravava em raw/<run_id>/<categoria>).
+        legacy_prefixes = () if RAW_OBJECTS_KEY in (manifest or {}) else (f"raw/{category}/{run_id}", f"raw/{run_id}/{category}")
+        for raw_prefix in legacy_prefixes:
+            for path in storage.list_paths(raw_prefix):
+                rel = path.replace(storage.blob_prefix + '/', '') if storage.mode == 'blob' else str(Path(path).relative_to(storage.local_root))
+                storage.delete_path(rel)
         storage.delete_path(f"{manifest_prefix}/{name}")
-        log_info(f"Limpeza: removido run {run_id} de {category}")
+        log_info(f"Limpeza: removido run {run_id} de {category} ({removed_objects} objeto(s) raw sem referencia)")
+    rewrite_manifest_index(storage, category, [Path(name).stem for name in names[-retention_runs:]])
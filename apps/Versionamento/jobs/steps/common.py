@@ -1,10 +1,20 @@
-import hashlib
+import importlib.util
 import json
 import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Upload do raw: arquivos em paralelo e, no blob, blocos em paralelo por arquivo.
+UPLOAD_WORKERS = int(os.environ.get("LANDWATCH_UPLOAD_WORKERS", "4").strip() or "4")
+BLOB_MAX_CONCURRENCY = int(os.environ.get("LANDWATCH_BLOB_MAX_CONCURRENCY", "4").strip() or "4")
+BLOB_BLOCK_SIZE_MB = int(os.environ.get("LANDWATCH_BLOB_BLOCK_SIZE_MB", "8").strip() or "8")
+# Modo local: hardlink em vez de copia (mesmo filesystem). So e seguro se ninguem reescrever o arquivo no lugar.
+LOCAL_HARDLINK = os.environ.get("LANDWATCH_STORAGE_LOCAL_HARDLINK", "0").strip().lower() in ("1", "true", "yes")
 
 
 def now_run_id() -> str:
@@ -58,7 +68,12 @@ class StorageClient:
                 raise RuntimeError('azure-storage-blob is required for blob mode') from exc
             if not blob_conn or not blob_container:
                 raise RuntimeError('Blob connection string and container are required')
-            self._client = BlobServiceClient.from_connection_string(blob_conn)
+            block_size = max(1, BLOB_BLOCK_SIZE_MB) * 1024 * 1024
+            self._client = BlobServiceClient.from_connection_string(
+                blob_conn,
+                max_block_size=block_size,
+                max_single_put_size=block_size,
+            )
             self._container = self._client.get_container_client(blob_container)
             try:
                 self._container.get_container_properties()
@@ -78,23 +93,97 @@ class StorageClient:
         if self.mode == 'local':
             target = self.local_root / rel_path
             target.parent.mkdir(parents=True, exist_ok=True)
-            target.write_bytes(local_path.read_bytes())
+            tmp = target.with_name(f".{target.name}.tmp")
+            if tmp.exists():
+                tmp.unlink()
+            linked = False
+            if LOCAL_HARDLINK:
+                try:
+                    os.link(local_path, tmp)
+                    linked = True
+                except OSError:
+                    pass
+            if not linked:
+                # copyfile faz streaming (sendfile/copy_file_range no Linux), sem carregar o arquivo em memoria.
+                shutil.copyfile(local_path, tmp)
+            os.replace(tmp, target)
             return str(target)
         blob_name = self._blob_path(rel_path)
         with local_path.open('rb') as f:
-            self._container.upload_blob(blob_name, f, overwrite=True)
+            self._container.upload_blob(
+                blob_name,
+                f,
+                length=local_path.stat().st_size,
+                overwrite=True,
+                max_concurrency=max(1, BLOB_MAX_CONCURRENCY),
+            )
         return blob_name
 
+    def upload_files(self, items: Iterable[Tuple[Path, str]], workers: Optional[int] = None) -> List[str]:
+        """Sobe (arquivo local, caminho no storage) em paralelo; a primeira falha e propagada no fim."""
+        items = list(items)
+        workers = max(1, min(UPLOAD_WORKERS if workers is None else int(workers), len(items) or 1))
+        if workers == 1:
+            return [self.upload_file(local_path, rel_path) for local_path, rel_path in items]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self.upload_file, local_path, rel_path) for local_path, rel_path in items]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+        return [f.result() for f in futures]
+
+    def download_file(self, rel_path: str, local_path: Path) -> Path:
+        """Baixa em streaming para `local_path` (via temporario ao lado; so aparece completo)."""
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = local_path.with_name(f".{local_path.name}.tmp")
+        if self.mode == 'local':
+            shutil.copyfile(self.local_root / rel_path, tmp)
+        else:
+            blob = self._container.get_blob_client(self._blob_path(rel_path))
+            with tmp.open('wb') as f:
+                blob.download_blob(max_concurrency=max(1, BLOB_MAX_CONCURRENCY)).readinto(f)
+        os.replace(tmp, local_path)
+        return local_path
+
+    def exists(self, rel_path: str) -> bool:
+        if self.mode == 'local':
+            return (self.local_root / rel_path).exists()
+        try:
+            return bool(self._container.get_blob_client(self._blob_path(rel_path)).exists())
+        except Exception:
+            return False
+
     def write_text(self, rel_path: str, text: str) -> str:
         if self.mode == 'local':
             target = self.local_root / rel_path
             target.parent.mkdir(parents=True, exist_ok=True)
-            target.write_text(text, encoding='utf-8')
+            tmp = target.with_name(f".{target.name}.tmp")
+            tmp.write_text(text, encoding='utf-8')
+            os.replace(tmp, target)
             return str(target)
         blob_name = self._blob_path(rel_path)
         self._container.upload_blob(blob_name, text.encode('utf-8'), overwrite=True)
         return blob_name
 
+    def append_text(self, rel_path: str, text: str, truncate: bool = False) -> str:
+        """Acrescenta `text` ao fim (append blob no modo blob; cada bloco entra inteiro). `truncate` recria vazio antes."""
+        if self.mode == 'local':
+            target = self.local_root / rel_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if truncate:
+                self.write_text(rel_path, text)
+                return str(target)
+            with target.open('a', encoding='utf-8') as f:
+                f.write(text)
+            return str(target)
+        blob_name = self._blob_path(rel_path)
+        blob = self._container.get_blob_client(blob_name)
+        if truncate or not blob.exists():
+            blob.create_append_blob()
+        if text:
+            blob.append_block(text.encode('utf-8'))
+        return blob_name
+
     def list_paths(self, prefix: str) -> List[str]:
         if self.mode == 'local':
             base = (self.local_root / prefix).resolve()
@@ -130,25 +219,48 @@ class StorageClient:
             pass
 
 
+def _source_fingerprint_script() -> Path:
+    script = Path(__file__).resolve().parents[2] / "source_fingerprint.py"
+    if not script.exists():
+        raise FileNotFoundError(f"source_fingerprint.py nao encontrado: {script}")
+    return script
+
+
+def _load_source_fingerprint():
+    """source_fingerprint mora na raiz de apps/Versionamento (compartilhado com bulk_ingest).
+
+    Carregado pelo caminho, sem mexer no sys.path; fica em sys.modules para o
+    bulk_ingest in-process reaproveitar o mesmo modulo (e o cache em memoria).
+    """
+    module = sys.modules.get("source_fingerprint")
+    if module is not None:
+        return module
+    spec = importlib.util.spec_from_file_location("source_fingerprint", _source_fingerprint_script())
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["source_fingerprint"] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop("source_fingerprint", None)
+        raise
+    return module
+
+
+source_fingerprint = _load_source_fingerprint()
+
+
 def sha1_file(path: Path, chunk_bytes: int = 8 * 1024 * 1024) -> str:
-    h = hashlib.sha1()
-    with path.open('rb') as f:
-        while True:
-            b = f.read(chunk_bytes)
-            if not b:
-                break
-            h.update(b)
-    return h.hexdigest()
+    return source_fingerprint.sha1_file(path, chunk_bytes)
 
 
 def compute_fingerprint(paths: Iterable[Path]) -> str:
-    manifest = {}
-    for p in sorted(paths, key=lambda x: x.name.lower()):
-        if not p.exists():
-            continue
-        manifest[p.name] = {'sha1': sha1_file(p), 'size': int(p.stat().st_size)}
-    payload = json.dumps(manifest, sort_keys=True, ensure_ascii=False)
-    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    """Mesmo formato de sempre; digests por arquivo reaproveitados do cache (ver source_fingerprint)."""
+    return source_fingerprint.fingerprint_files(paths)
+
+
+def compute_file_digests(paths: Iterable[Path]) -> Dict[Path, str]:
+    """sha1 de cada arquivo existente (mesmo cache do compute_fingerprint)."""
+    return {path: digest for path, (digest, _size) in source_fingerprint.file_digests(paths).items()}
 
 
 def ensure_dir(path: Path) -> None:
@@ -175,6 +287,9 @@ def cleanup_files(artifacts: Iterable[DatasetArtifact]) -> None:
         try:
             if art.files:
                 parent = art.files[0].parent
+                cache_file = parent / source_fingerprint.CACHE_FILENAME
+                if cache_file.exists() and all(p.name == cache_file.name for p in parent.iterdir()):
+                    cache_file.unlink()
                 if parent.exists() and not any(parent.iterdir()):
                     parent.rmdir()
         except Exception:
@@ -1,20 +1,27 @@
 import os
-import time
 import datetime
 import tempfile
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 from urllib.parse import quote
 
 import requests
 import geopandas as gpd
 
 from .common import DatasetArtifact, ensure_dir, log_info, log_warn
+from .manifest import WATERMARK_KEY, get_prev_fingerprint, get_prev_watermark
+from .wfs import (
+    WATERMARKS_ENABLED,
+    PageStats,
+    WfsClient,
+    base_dir,
+    find_base,
+    keep_base,
+    unchanged_artifact,
+    write_pages,
+)
 
 DEFAULT_PAGE_SIZE = 50000
-TIMEOUT = 60
-MAX_RETRIES = 3
-RETRY_BACKOFF = 5.0
 
 LAYERS = {
     "deter-amz:deter_amz": "https://terrabrasilis.dpi.inpe.br/geoserver/deter-amz/ows",
@@ -26,21 +33,6 @@ EXTENSIONS = ("shp", "shx", "dbf", "prj", "cpg", "qpj")
 session = requests.Session()
 
 
-def get_with_retry(url_base: str, params: dict, layer_name: str, idx: int):
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            r = session.get(url_base, params=params, timeout=TIMEOUT)
-            r.raise_for_status()
-            return r
-        except requests.exceptions.RequestException as e:
-            log_warn(f"{layer_name} (idx={idx}) tentativa {attempt}/{MAX_RETRIES} falhou: {e}")
-            if attempt < MAX_RETRIES:
-                sleep_sec = RETRY_BACKOFF * attempt
-                time.sleep(sleep_sec)
-            else:
-                return None
-
-
 def export_shp(gdf: gpd.GeoDataFrame, prefix: str, target_dir: Path) -> List[Path]:
     if gdf is None or gdf.empty:
         raise ValueError("GeoDataFrame vazio")
@@ -62,7 +54,43 @@ def export_shp(gdf: gpd.GeoDataFrame, prefix: str, target_dir: Path) -> List[Pat
         return out_files
 
 
-def run(work_dir: Path, snapshot_date: str) -> List[DatasetArtifact]:
+def _cql_date(value) -> str:
+    # GeoServer devolve datas como "2024-05-01Z" no GeoJSON; o CQL quer so a data.
+    return str(value).rstrip("Z")
+
+
+def _plan_incremental(
+    client: WfsClient,
+    prefix: str,
+    watermark: dict,
+    prev_watermark: Optional[dict],
+    prev_fingerprint: Optional[str],
+    base_root: Path,
+) -> Tuple[List[Path], Optional[dict], Optional[int]]:
+    """Base + filtro das feicoes novas, se o delta reconstroi exatamente a camada atual.
+
+    So vale quando count_atual == count_anterior + count(view_date > max_anterior),
+    ou seja, nada foi removido/corrigido no historico; senao, download completo.
+    """
+    if not prev_watermark or not prev_watermark.get("max_view_date") or prev_watermark.get("count") is None:
+        return [], None, None
+    base_files = find_base(base_root, prefix, prev_fingerprint)
+    if not base_files:
+        return [], None, None
+    newer = {"CQL_FILTER": f"view_date > '{_cql_date(prev_watermark['max_view_date'])}'"}
+    count_newer = client.count_matched(newer)
+    if count_newer is None or int(prev_watermark["count"]) + count_newer != watermark["count"]:
+        log_info(f"{client.label}: historico mudou desde o ultimo run; download completo.")
+        return [], None, None
+    log_info(
+        f"{client.label}: incremental a partir de view_date > {_cql_date(prev_watermark['max_view_date'])} "
+        f"({count_newer} registros novos)"
+    )
+    newer["sortBy"] = "view_date A"
+    return base_files, newer, count_newer
+
+
+def run(work_dir: Path, snapshot_date: str, prev_manifest: Optional[dict] = None) -> List[DatasetArtifact]:
     page_size = int(os.environ.get("DETER_PAGE_SIZE", DEFAULT_PAGE_SIZE))
     all_years = os.environ.get("DETER_ALL_YEARS", "1").strip().lower() not in ("0", "false", "no")
     dias = int(os.environ.get("DETER_DIAS", "7"))
@@ -72,44 +100,68 @@ def run(work_dir: Path, snapshot_date: str) -> List[DatasetArtifact]:
 
     if all_years:
         for layer_name, url_base in LAYERS.items():
-            all_feats = []
-            idx = 0
-            while True:
-                params = {
-                    "service": "WFS",
-                    "version": "2.0.0",
-                    "request": "GetFeature",
-                    "typeNames": layer_name,
-                    "outputFormat": "application/json",
-                    "count": page_size,
-                    "startIndex": idx,
-                    "sortBy": "view_date A",
-                }
-                r = get_with_retry(url_base, params, layer_name, idx)
-                if r is None:
-                    break
-                feats = r.json().get("features", [])
-                if not feats:
-                    break
-                all_feats.extend(feats)
-                idx += len(feats)
-                log_info(f"{layer_name}: {idx} registros carregados...")
-
-            if not all_feats:
+            client = WfsClient(url_base, layer_name, page_size, session=session)
+            prefix = f"{layer_name.split(':', 1)[0]}_ALLYEARS"
+            code = prefix.upper()
+            extra = {"layer": layer_name}
+            base_root = base_dir(work_dir, "DETER")
+            try:
+                filters, total, base_files = {"sortBy": "view_date A"}, None, []
+                prev_watermark = None
+                if WATERMARKS_ENABLED:
+                    count = client.count_matched()
+                    prev_watermark = get_prev_watermark(prev_manifest, code)
+                    if count is not None:
+                        watermark = {"count": count, "max_view_date": client.max_value("view_date")}
+                        if prev_watermark == watermark:
+                            log_info(f"{layer_name}: sem mudancas desde o ultimo run ({count} registros); download ignorado.")
+                            artifacts.append(unchanged_artifact("DETER", code, snapshot_date, prev_watermark, extra))
+                            continue
+                        base_files, newer, count_newer = _plan_incremental(
+                            client,
+                            prefix,
+                            watermark,
+                            prev_watermark,
+                            get_prev_fingerprint(prev_manifest, code),
+                            base_root,
+                        )
+                        if base_files:
+                            filters, total = newer, count_newer
+                stats = PageStats("view_date")
+                files = write_pages(
+                    stats.track(client.iter_pages(filters, total=total)),
+                    out_root,
+                    prefix,
+                    base_files=base_files,
+                    schema=client.describe_schema(),
+                )
+            except Exception as exc:
+                log_warn(f"{layer_name}: download falhou ({exc})")
+                continue
+
+            if not files:
                 log_warn(f"{layer_name}: sem feicoes")
                 continue
 
-            gdf = gpd.GeoDataFrame.from_features(all_feats)
-            prefix = f"{layer_name.split(':', 1)[0]}_ALLYEARS"
-            target_dir = out_root
-            files = export_shp(gdf, prefix, target_dir)
+            if WATERMARKS_ENABLED:
+                if base_files:
+                    extra["incremental_from"] = prev_watermark["max_view_date"]
+                    extra[WATERMARK_KEY] = {
+                        "count": int(prev_watermark["count"]) + stats.count,
+                        "max_view_date": max(
+                            v for v in (prev_watermark["max_view_date"], stats.max_value) if v is not None
+                        ),
+                    }
+                else:
+                    extra[WATERMARK_KEY] = {"count": stats.count, "max_view_date": stats.max_value}
+                keep_base(files, base_root, prefix)
             artifacts.append(
                 DatasetArtifact(
                     category="DETER",
-                    dataset_code=prefix.upper(),
+                    dataset_code=code,
                     files=files,
                     snapshot_date=snapshot_date,
-                    extra={"layer": layer_name},
+                    extra=extra,
                 )
             )
     else:
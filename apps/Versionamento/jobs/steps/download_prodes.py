@@ -1,6 +1,7 @@
 import os
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Optional
 
@@ -8,6 +9,17 @@ import requests
 import geopandas as gpd
 
 from .common import DatasetArtifact, ensure_dir, log_info, log_warn
+from .manifest import WATERMARK_KEY, get_prev_watermark
+from .wfs import (
+    WATERMARK_DATE_KEY,
+    WATERMARKS_ENABLED,
+    PageStats,
+    WfsClient,
+    content_signal,
+    unchanged_artifact,
+    watermark_unchanged,
+    write_pages,
+)
 
 DEFAULT_PAGE_SIZE = 50000
 TIMEOUT = 60
@@ -24,6 +36,13 @@ LAYERS = [
     ("prodes-legal-amz", "yearly_deforestation"),
 ]
 
+# Campos cujo maximo por ano entra no watermark (alem do numberMatched).
+WATERMARK_FIELDS = [
+    f.strip()
+    for f in os.environ.get("PRODES_WATERMARK_FIELDS", "image_date,area_km").split(",")
+    if f.strip()
+]
+
 MIN_YEAR_BY_WS = {
     "prodes-amazon-nb": 2008,
     "prodes-legal-amz": 2008,
@@ -84,37 +103,48 @@ def get_year_range(workspace: str, layer: str) -> tuple[int, int]:
 
 def fetch_layer(workspace: str, layer: str, year: int, page_size: int) -> gpd.GeoDataFrame:
     url = f"https://terrabrasilis.dpi.inpe.br/geoserver/{workspace}/wfs"
-    all_feats = []
-    index = 0
-
-    while True:
-        params = {
-            "service": "WFS",
-            "version": "2.0.0",
-            "request": "GetFeature",
-            "typeNames": f"{workspace}:{layer}",
-            "outputFormat": "application/json",
-            "count": page_size,
-            "startIndex": index,
-            "CQL_FILTER": f"year={year}",
-            "sortBy": "year A",
-        }
-
-        resp = request_with_retry(url, params, workspace, layer, year, index)
-        if resp is None:
-            break
-        feats = resp.json().get("features", [])
-        if not feats:
-            break
-        all_feats.extend(feats)
-        index += len(feats)
-        log_info(f"{workspace}:{layer} — {index} registros carregados para ano {year}")
-
+    client = WfsClient(
+        url,
+        f"{workspace}:{layer}",
+        page_size,
+        session=session,
+        label=f"{workspace}:{layer} ano={year}",
+    )
+    all_feats = client.fetch_all({"CQL_FILTER": f"year={year}", "sortBy": "year A"})
     if not all_feats:
         return gpd.GeoDataFrame()
     return gpd.GeoDataFrame.from_features(all_feats)
 
 
+def _year_client(workspace: str, layer: str, year: int, page_size: int) -> WfsClient:
+    url = f"https://terrabrasilis.dpi.inpe.br/geoserver/{workspace}/wfs"
+    return WfsClient(
+        url,
+        f"{workspace}:{layer}",
+        page_size,
+        session=session,
+        label=f"{workspace}:{layer} ano={year}",
+    )
+
+
+def stream_layer(
+    workspace: str,
+    layer: str,
+    year: int,
+    page_size: int,
+    out_dir: Path,
+    name: str,
+    total: Optional[int] = None,
+    stats: Optional[PageStats] = None,
+) -> List[Path]:
+    """Baixa um ano gravando pagina a pagina em disco (sem acumular as feicoes)."""
+    client = _year_client(workspace, layer, year, page_size)
+    pages = client.iter_pages({"CQL_FILTER": f"year={year}", "sortBy": "year A"}, total=total)
+    if stats is not None:
+        pages = stats.track(pages)
+    return write_pages(pages, out_dir, name, schema=client.describe_schema())
+
+
 def save_shapefile(gdf: gpd.GeoDataFrame, out_dir: Path, name: str) -> Path:
     if gdf.empty:
         raise ValueError("GeoDataFrame vazio")
@@ -131,6 +161,7 @@ def run(
     snapshot_date: str,
     workspaces: Optional[List[str]] = None,
     years: Optional[List[int]] = None,
+    prev_manifest: Optional[dict] = None,
 ) -> List[DatasetArtifact]:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
     page_size = int(os.environ.get("PRODES_PAGE_SIZE", DEFAULT_PAGE_SIZE))
@@ -147,6 +178,7 @@ def run(
         if missing:
             log_warn(f"Workspaces PRODES desconhecidos ignorados: {sorted(missing)}")
 
+    jobs = []
     for ws, layer in layers:
         try:
             if years:
@@ -157,28 +189,52 @@ def run(
                 years_to_fetch = list(range(start, y_max + 1))
             else:
                 years_to_fetch = [get_year_range(ws, layer)[1]]
-
-            for year in years_to_fetch:
-                log_info(f"Processando {ws}:{layer} ano={year}")
-                gdf = fetch_layer(ws, layer, year, page_size)
-                if gdf.empty:
-                    log_warn(f"GeoDataFrame vazio para {ws}:{layer} ano={year}")
-                    continue
-
-                ws_folder = ws.replace("-", "_")
-                out_dir = out_root / ws_folder
-                name = f"{ws_folder}_{year}"
-                shp_path = save_shapefile(gdf, out_dir, name)
-                files = sorted(shp_path.parent.glob(f"{name}.*"))
-                artifacts.append(
-                    DatasetArtifact(
-                        category="PRODES",
-                        dataset_code=name.upper(),
-                        files=files,
-                        snapshot_date=snapshot_date,
-                        extra={"workspace": ws, "layer": layer, "year": year},
-                    )
-                )
         except Exception as exc:
             log_warn(f"Erro em {ws}:{layer}: {exc}")
+            continue
+        jobs.extend((ws, layer, year) for year in years_to_fetch)
+
+    def fetch_year(job) -> Optional[DatasetArtifact]:
+        ws, layer, year = job
+        try:
+            log_info(f"Processando {ws}:{layer} ano={year}")
+            ws_folder = ws.replace("-", "_")
+            out_dir = out_root / ws_folder
+            name = f"{ws_folder}_{year}"
+            extra = {"workspace": ws, "layer": layer, "year": year}
+            total = None
+            signal = {}
+            if WATERMARKS_ENABLED:
+                client = _year_client(ws, layer, year, page_size)
+                filters = {"CQL_FILTER": f"year={year}"}
+                total = client.count_matched(filters)
+                signal = content_signal(client, WATERMARK_FIELDS, filters)
+                prev_watermark = get_prev_watermark(prev_manifest, name.upper())
+                if total is not None and watermark_unchanged(prev_watermark, {"count": total, **signal}, snapshot_date):
+                    log_info(f"{ws}:{layer} ano={year}: sem mudancas desde o ultimo run ({total} registros); download ignorado.")
+                    return unchanged_artifact("PRODES", name.upper(), snapshot_date, prev_watermark, extra)
+            stats = PageStats()
+            files = stream_layer(ws, layer, year, page_size, out_dir, name, total=total, stats=stats)
+            if not files:
+                log_warn(f"Sem feicoes para {ws}:{layer} ano={year}")
+                return None
+            if WATERMARKS_ENABLED:
+                extra[WATERMARK_KEY] = {"count": stats.count, **signal, WATERMARK_DATE_KEY: snapshot_date}
+            return DatasetArtifact(
+                category="PRODES",
+                dataset_code=name.upper(),
+                files=files,
+                snapshot_date=snapshot_date,
+                extra=extra,
+            )
+        except Exception as exc:
+            log_warn(f"Erro em {ws}:{layer} ano={year}: {exc}")
+            return None
+
+    # Anos em paralelo; o limite por host do WfsClient segura a carga no servidor.
+    year_workers = max(1, int(os.environ.get("PRODES_YEAR_WORKERS", "2").strip() or "2"))
+    with ThreadPoolExecutor(max_workers=year_workers, thread_name_prefix="landwatch-prodes") as pool:
+        for artifact in pool.map(fetch_year, jobs):
+            if artifact is not None:
+                artifacts.append(artifact)
     return artifacts
@@ -3,17 +3,31 @@ import os
 import shutil
 import subprocess
 import sys
+import threading
 import time
 import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 
 import pandas as pd
 
 from .common import DatasetArtifact, ensure_dir, log_info, log_warn
+from .manifest import RELEASE_DATE_KEY, get_prev_extra, unchanged_artifact
 
 SHAPE_EXTS = [".shp", ".shx", ".dbf", ".prj", ".cpg", ".qpj"]
+ALL_STATES = [
+    "AC", "AL", "AM", "AP", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "MS",
+    "MT", "PA", "PB", "PE", "PI", "PR", "RJ", "RN", "RO", "RR", "RS", "SC",
+    "SE", "SP", "TO",
+]
+# Pula UFs cuja data de disponibilizacao no SICAR e a mesma do ultimo run ingerido.
+SKIP_UNCHANGED = os.environ.get("SICAR_SKIP_UNCHANGED", "1").strip().lower() not in ("0", "false", "no")
+# UFs baixadas em paralelo (modo Python), cada uma com sessao httpx propria; 1 = sequencial.
+STATE_WORKERS = int(os.environ.get("SICAR_STATE_WORKERS", "3").strip() or "3")
+# Sessoes com captcha ja resolvido esperando uma UF livre (alem das que estao baixando).
+CAPTCHA_PREFETCH = int(os.environ.get("SICAR_CAPTCHA_PREFETCH", "2").strip() or "2")
 
 DOCKER_INNER_SCRIPT = r'''
 import os, time
@@ -197,6 +211,7 @@ def download_state_with_retries(
     outer_retries: int,
     debug: bool,
     err_types,
+    captcha: Optional[str] = None,
 ):
     uf = uf.upper()
     uf_dir = base_folder / f"_tmp_{uf}"
@@ -204,6 +219,8 @@ def download_state_with_retries(
     last_error = None
 
     for attempt in range(1, outer_retries + 1):
+        kwargs = {"captcha": captcha} if captcha else {}
+        captcha = None
         try:
             res = car.download_state(
                 state=uf,
@@ -211,6 +228,7 @@ def download_state_with_retries(
                 folder=str(uf_dir),
                 tries=inner_tries,
                 debug=debug,
+                **kwargs,
             )
             if res:
                 return res
@@ -222,7 +240,152 @@ def download_state_with_retries(
     return False
 
 
-def run(work_dir: Path, snapshot_date: str) -> List[DatasetArtifact]:
+def _extract_state(output_root: Path, uf: str) -> None:
+    tmp_dir = output_root / f"_tmp_{uf}"
+    if not tmp_dir.exists():
+        return
+    for zpath in tmp_dir.glob("*.zip"):
+        with zipfile.ZipFile(zpath, "r") as zf:
+            zf.extractall(tmp_dir)
+        zpath.unlink()
+    for ext in SHAPE_EXTS:
+        candidates = sorted(tmp_dir.glob(f"*{ext}"))
+        if not candidates:
+            continue
+        src = candidates[0]
+        dst = output_root / f"CAR_{uf}{ext}"
+        if dst.exists():
+            dst.unlink()
+        shutil.move(str(src), str(dst))
+    try:
+        shutil.rmtree(tmp_dir)
+    except Exception:
+        pass
+
+
+def _prepare_session(car, uf: str, slots: threading.Semaphore) -> Tuple[object, str]:
+    """Sessao nova (cookies proprios) com captcha ja resolvido, pronta para a UF."""
+    slots.acquire()
+    try:
+        session = car.clone()
+        try:
+            captcha = session.solve_captcha()
+        except Exception as exc:
+            log_warn(f"[{uf}] captcha antecipado falhou ({exc}); sera resolvido no download.")
+            captcha = ""
+        return session, captcha
+    except Exception:
+        slots.release()
+        raise
+
+
+def _download_states(
+    car,
+    states: List[str],
+    download_one: Callable[[object, str, Optional[str]], bool],
+    workers: int,
+    prefetch: int,
+) -> List[dict]:
+    """Baixa as UFs; com workers > 1 roda em paralelo e resolve captchas em segundo plano.
+
+    Cada UF usa a propria sessao (`car.clone()`): o captcha vale para a sessao que o pediu.
+    As sessoes sao preparadas (cookies + captcha via OCR) num pool separado enquanto as
+    outras UFs baixam, limitadas a `workers + prefetch` para o captcha nao expirar na fila.
+    """
+    results = {}
+    started = time.time()
+    total = len(states)
+    lock = threading.Lock()
+
+    def finish(uf: str, ok: bool, state_started: float, size: int) -> None:
+        elapsed = max(time.time() - state_started, 1e-6)
+        with lock:
+            results[uf] = ok
+            done = len(results)
+        mb = size / (1024 * 1024)
+        status = "ok" if ok else "falhou"
+        log_info(f"[{uf}] {status}: {mb:.1f} MB em {elapsed:.0f}s ({mb / elapsed:.2f} MB/s) - {done}/{total} UFs")
+
+    if workers > 1 and not hasattr(car, "clone"):
+        # SICAR do pip (upstream) nao tem clone/solve_captcha; use LANDWATCH_SICAR_MODULE_PATH para o pacote local.
+        log_warn("Pacote SICAR sem suporte a sessoes paralelas; baixando UFs em sequencia.")
+        workers = 1
+
+    if workers <= 1 or total <= 1:
+        for uf in states:
+            t0 = time.time()
+            log_info(f"Iniciando download SICAR para UF={uf}")
+            ok, size = download_one(car, uf, None)
+            finish(uf, ok, t0, size)
+    else:
+        slots = threading.Semaphore(workers + max(prefetch, 0))
+        shared_lock = threading.Lock()
+
+        def run_state(uf: str, prepared: Future) -> None:
+            try:
+                session, captcha = prepared.result()
+            except Exception as exc:
+                log_warn(f"[{uf}] falha ao abrir sessao SICAR ({exc}); usando sessao compartilhada.")
+                session, captcha = None, None
+            t0 = time.time()
+            log_info(f"Iniciando download SICAR para UF={uf}")
+            try:
+                if session is None:
+                    with shared_lock:
+                        ok, size = download_one(car, uf, None)
+                else:
+                    ok, size = download_one(session, uf, captcha or None)
+            finally:
+                if session is not None:
+                    slots.release()
+            finish(uf, ok, t0, size)
+
+        with (
+            ThreadPoolExecutor(max_workers=max(prefetch, 1), thread_name_prefix="sicar-captcha") as captcha_pool,
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sicar-uf") as download_pool,
+        ):
+            prepared = {uf: captcha_pool.submit(_prepare_session, car, uf, slots) for uf in states}
+            futures = [download_pool.submit(run_state, uf, prepared[uf]) for uf in states]
+            for future in futures:
+                future.result()
+
+    elapsed = max(time.time() - started, 1e-6)
+    log_info(f"SICAR: {sum(1 for ok in results.values() if ok)}/{total} UFs em {elapsed:.0f}s")
+    return [{"uf": uf, "ok": results.get(uf, False)} for uf in states]
+
+
+def _normalize_release_dates(release_dates) -> Dict[str, str]:
+    return {str(getattr(uf, "value", uf)).upper(): date for uf, date in (release_dates or {}).items() if date}
+
+
+def _fetch_release_dates(car=None, err_types=()) -> Dict[str, str]:
+    """Data de disponibilizacao por UF (pagina de downloads do SICAR); {} se indisponivel."""
+    try:
+        if car is None:
+            Sicar, _State, _Polygon, _Paddle, Tesseract, _err_types = _load_sicar_module()
+            car = Sicar(driver=Tesseract)
+        return _normalize_release_dates(car.get_release_dates())
+    except Exception as exc:
+        log_warn(f"SICAR: datas de disponibilizacao indisponiveis ({exc}); baixando todas as UFs.")
+        return {}
+
+
+def _split_unchanged(states: List[str], release_dates: Dict[str, str], prev_manifest: Optional[dict]):
+    """(UFs a baixar, UFs sem nova publicacao desde o ultimo run ingerido)."""
+    if not SKIP_UNCHANGED or not release_dates:
+        return list(states), []
+    to_download, unchanged = [], []
+    for uf in states:
+        current = release_dates.get(uf)
+        prev = get_prev_extra(prev_manifest, f"CAR_{uf}", RELEASE_DATE_KEY)
+        if current and prev == current:
+            unchanged.append(uf)
+        else:
+            to_download.append(uf)
+    return to_download, unchanged
+
+
+def run(work_dir: Path, snapshot_date: str, prev_manifest: Optional[dict] = None) -> List[DatasetArtifact]:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
     output_root = work_dir / "SICAR"
     ensure_dir(output_root)
@@ -244,13 +407,26 @@ def run(work_dir: Path, snapshot_date: str) -> List[DatasetArtifact]:
         log_warn("ACA detectado: desabilitando modo Docker interno do SICAR.")
         use_docker = False
 
+    run_utc = datetime.utcnow().isoformat()
     if use_docker:
         if not states_to_download:
-            states_to_download = [
-                "AC", "AL", "AM", "AP", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "MS",
-                "MT", "PA", "PB", "PE", "PI", "PR", "RJ", "RN", "RO", "RR", "RS", "SC",
-                "SE", "SP", "TO",
-            ]
+            states_to_download = list(ALL_STATES)
+        release_dates = _fetch_release_dates() if SKIP_UNCHANGED else {}
+    else:
+        Sicar, State, Polygon, Paddle, Tesseract, err_types = _load_sicar_module()
+        if not states_to_download:
+            states_to_download = [s.value for s in State]
+        polygon = Polygon.AREA_PROPERTY
+        car = Sicar(driver=Tesseract)
+        release_dates = _fetch_release_dates(car)
+
+    states_to_download, unchanged_states = _split_unchanged(states_to_download, release_dates, prev_manifest)
+    if unchanged_states:
+        log_info(f"SICAR UFs sem nova publicacao (puladas): {', '.join(unchanged_states)}")
+
+    if not states_to_download:
+        results = []
+    elif use_docker:
         log_info(f"SICAR (Docker) UFs: {', '.join(states_to_download)}")
         _docker_pull(image)
         docker_attempts = int(os.environ.get("SICAR_DOCKER_RETRIES", "2"))
@@ -273,32 +449,14 @@ def run(work_dir: Path, snapshot_date: str) -> List[DatasetArtifact]:
             else:
                 raise last_error
         _extract_and_flatten(output_root)
-        release_dates = {}
-        run_utc = datetime.utcnow().isoformat()
+        results = [{"uf": uf, "ok": bool(list(output_root.glob(f"CAR_{uf}.*")))} for uf in states_to_download]
     else:
-        Sicar, State, Polygon, Paddle, Tesseract, err_types = _load_sicar_module()
-        if not states_to_download:
-            states_to_download = [s.value for s in State]
         log_info(f"SICAR (Python) UFs: {', '.join(states_to_download)}")
-        polygon = Polygon.AREA_PROPERTY
         _ensure_tesseract()
-        driver = Tesseract
-        car = Sicar(driver=driver)
-        try:
-            release_dates = car.get_release_dates()
-        except err_types[-1]:
-            release_dates = {}
-        run_utc = datetime.utcnow().isoformat()
 
-    results = []
-
-    for uf in states_to_download:
-        if use_docker:
-            ok = bool(list(output_root.glob(f"CAR_{uf}.*")))
-        else:
-            log_info(f"Iniciando download SICAR para UF={uf}")
+        def download_one(session, uf: str, captcha: Optional[str]):
             zip_path = download_state_with_retries(
-                car=car,
+                car=session,
                 uf=uf,
                 polygon=polygon,
                 base_folder=output_root,
@@ -306,32 +464,30 @@ def run(work_dir: Path, snapshot_date: str) -> List[DatasetArtifact]:
                 outer_retries=outer_retries,
                 debug=True,
                 err_types=err_types[:-1],
+                captcha=captcha,
             )
-            ok = bool(zip_path)
-
-            if ok:
-                tmp_dir = output_root / f"_tmp_{uf}"
-                if tmp_dir.exists():
-                    for zpath in tmp_dir.glob("*.zip"):
-                        with zipfile.ZipFile(zpath, "r") as zf:
-                            zf.extractall(tmp_dir)
-                        zpath.unlink()
-                    for ext in SHAPE_EXTS:
-                        candidates = sorted(tmp_dir.glob(f"*{ext}"))
-                        if not candidates:
-                            continue
-                        src = candidates[0]
-                        dst = output_root / f"CAR_{uf}{ext}"
-                        if dst.exists():
-                            dst.unlink()
-                        shutil.move(str(src), str(dst))
-                    try:
-                        shutil.rmtree(tmp_dir)
-                    except Exception:
-                        pass
-        results.append({"uf": uf, "ok": ok})
-
-    artifacts: List[DatasetArtifact] = []
+            size = Path(zip_path).stat().st_size if zip_path and Path(zip_path).exists() else 0
+            if zip_path:
+                _extract_state(output_root, uf)
+            return bool(zip_path), size
+
+        results = _download_states(car, states_to_download, download_one, STATE_WORKERS, CAPTCHA_PREFETCH)
+
+    polygon_label = polygon_name if use_docker else polygon.name
+    artifacts: List[DatasetArtifact] = [
+        unchanged_artifact(
+            "SICAR",
+            f"CAR_{uf}",
+            snapshot_date,
+            {
+                "uf": uf,
+                "polygon": polygon_label,
+                RELEASE_DATE_KEY: release_dates.get(uf),
+                "run_datetime_utc": run_utc,
+            },
+        )
+        for uf in unchanged_states
+    ]
     for item in results:
         uf = item["uf"]
         if not item["ok"]:
@@ -347,25 +503,26 @@ def run(work_dir: Path, snapshot_date: str) -> List[DatasetArtifact]:
                 snapshot_date=snapshot_date,
                 extra={
                     "uf": uf,
-                    "polygon": polygon_name if use_docker else polygon.name,
-                    "release_date_sicar": release_dates.get(State(uf), None) if (not use_docker and release_dates) else None,
+                    "polygon": polygon_label,
+                    RELEASE_DATE_KEY: release_dates.get(uf),
                     "run_datetime_utc": run_utc,
                 },
             )
         )
 
-    if artifacts:
+    downloaded = [a for a in artifacts if a.files]
+    if downloaded:
         rows = [
             {
                 "uf": a.extra.get("uf"),
                 "polygon": a.extra.get("polygon"),
                 "ok": True,
                 "file_root": a.dataset_code,
-                "release_date_sicar": a.extra.get("release_date_sicar"),
+                "release_date_sicar": a.extra.get(RELEASE_DATE_KEY),
                 "run_datetime_utc": run_utc,
                 "output_dir": str(output_root),
             }
-            for a in artifacts
+            for a in downloaded
         ]
         df_manifest = pd.DataFrame(rows)
         df_manifest.to_parquet(output_root / "SICAR_manifest.parquet", index=False)
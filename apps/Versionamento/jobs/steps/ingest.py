@@ -69,18 +69,75 @@ def _ingest_script() -> Path:
     return ingest_script
 
 
+def _ingest_mode() -> str:
+    mode = os.environ.get("LANDWATCH_INGEST_MODE", "subprocess").strip().lower()
+    return mode if mode in ("subprocess", "inprocess") else "subprocess"
+
+
+def _load_bulk_ingest():
+    script_dir = str(_ingest_script().parent)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    import bulk_ingest
+
+    return bulk_ingest
+
+
+def _primary_files(art: DatasetArtifact) -> List[Path]:
+    # Only pass primary inputs to bulk_ingest (.shp/.fgb/.csv). Other sidecar files break ogr2ogr.
+    return [p for p in art.files if p.suffix.lower() in (".shp", ".fgb", ".csv")]
+
+
+def _run_ingest_inprocess(artifacts: List[DatasetArtifact], snapshot_date: str) -> IngestResult:
+    """Ingestao via bulk_ingest.ingest_files: um import, pool de conexoes e ogr2ogr resolvido uma vez."""
+    result = IngestResult()
+    bulk_ingest = _load_bulk_ingest()
+    by_date: Dict[str, List[tuple]] = {}
+    for art in artifacts:
+        primary = _primary_files(art)
+        if not primary:
+            result.skipped.append(art.dataset_code)
+            continue
+        by_date.setdefault(art.snapshot_date or snapshot_date, []).append((art, primary))
+
+    for date, items in by_date.items():
+        files = [p for _, primary in items for p in primary]
+        log_info(f"Executando ingestao in-process: {len(files)} arquivo(s) snapshot={date} ...")
+        try:
+            outcomes = bulk_ingest.ingest_files(files, snapshot_date=date)
+        except Exception as exc:
+            for art, _ in items:
+                log_warn(f"Ingestao falhou (dataset={art.dataset_code}, erro={exc})")
+                result.failures[art.dataset_code] = str(exc)
+            continue
+        by_file = {outcome.get("file"): outcome for outcome in outcomes}
+        for art, primary in items:
+            art_outcomes = [by_file.get(str(p)) or {"status": "FAILED"} for p in primary]
+            failed = [outcome for outcome in art_outcomes if outcome.get("status") == "FAILED"]
+            if failed:
+                log_warn(f"Ingestao falhou (dataset={art.dataset_code}, status=FAILED)")
+                result.failures[art.dataset_code] = "status=FAILED"
+                continue
+            for outcome in art_outcomes:
+                if outcome.get("status") == "COMPLETED" and outcome.get("version_id") is not None:
+                    result.success_versions.append(int(outcome["version_id"]))
+            result.successes.append(art.dataset_code)
+    return result
+
+
 def run_ingest_only(artifacts: Iterable[DatasetArtifact], snapshot_date: str) -> IngestResult:
     artifacts = list(artifacts)
     result = IngestResult()
     if not artifacts:
         log_info("Nenhum artefato para ingestao.")
         return result
+    if _ingest_mode() == "inprocess":
+        return _run_ingest_inprocess(artifacts, snapshot_date)
 
     ingest_script = _ingest_script()
     python_exec = os.environ.get("LANDWATCH_PYTHON_EXECUTABLE") or sys.executable
     for art in artifacts:
-        # Only pass primary inputs to bulk_ingest (.shp/.csv). Other sidecar files break ogr2ogr.
-        primary = [p for p in art.files if p.suffix.lower() in (".shp", ".csv")]
+        primary = _primary_files(art)
         if not primary:
             result.skipped.append(art.dataset_code)
             continue
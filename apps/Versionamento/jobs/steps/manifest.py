@@ -1,47 +1,140 @@
 import json
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Set
 
 from .common import DatasetArtifact, StorageClient, compute_fingerprint, log_info
 
 
-def build_manifest(run_id: str, category: str, artifacts: Iterable[DatasetArtifact]) -> dict:
+# Artefato sem arquivos: o downloader viu o mesmo watermark do manifest anterior e nao baixou.
+UNCHANGED_KEY = "unchanged_since_previous"
+WATERMARK_KEY = "wfs_watermark"
+RELEASE_DATE_KEY = "release_date_sicar"
+# Chaves de `extra` usadas para pular downloads; so valem enquanto a ingestao do dataset deu certo.
+SKIP_KEYS = (WATERMARK_KEY, RELEASE_DATE_KEY)
+MANIFESTS_PREFIX = "manifests"
+# `latest.json` aponta para o ultimo run; `index.jsonl` lista os runs (append a cada save, compactado na limpeza).
+LATEST_NAME = "latest.json"
+INDEX_NAME = "index.jsonl"
+# Raw enderecado por conteudo: {dataset_code: {caminho relativo: objeto}} no manifest do run.
+RAW_OBJECTS_KEY = "raw_objects"
+
+
+def raw_object_key(category: str, sha1: str) -> str:
+    return f"raw/{category}/objects/{sha1[:2]}/{sha1}"
+
+
+def raw_object_keys(manifest: Optional[dict]) -> Set[str]:
+    """Objetos raw referenciados por um manifest."""
+    refs = (manifest or {}).get(RAW_OBJECTS_KEY) or {}
+    return {key for files in refs.values() for key in (files or {}).values()}
+
+
+def is_unchanged_artifact(art: DatasetArtifact) -> bool:
+    return bool((art.extra or {}).get(UNCHANGED_KEY)) and not art.files
+
+
+def unchanged_artifact(category: str, dataset_code: str, snapshot_date: str, extra: Optional[dict] = None) -> DatasetArtifact:
+    merged = dict(extra or {})
+    merged[UNCHANGED_KEY] = True
+    return DatasetArtifact(
+        category=category,
+        dataset_code=dataset_code,
+        files=[],
+        snapshot_date=snapshot_date,
+        extra=merged,
+    )
+
+
+def build_manifest(
+    run_id: str,
+    category: str,
+    artifacts: Iterable[DatasetArtifact],
+    prev_manifest: Optional[dict] = None,
+    raw_objects: Optional[Dict[str, Dict[str, str]]] = None,
+) -> dict:
     datasets = []
+    raw_refs = dict(raw_objects) if raw_objects is not None else None
     for art in artifacts:
+        files = [p.name for p in art.files]
         fp = compute_fingerprint(art.files)
+        if is_unchanged_artifact(art):
+            # Mantem arquivos/fingerprint do run anterior para o proximo run comparar.
+            prev = get_prev_dataset(prev_manifest, art.dataset_code) or {}
+            files = list(prev.get("files") or [])
+            fp = prev.get("fingerprint")
+            prev_raw = ((prev_manifest or {}).get(RAW_OBJECTS_KEY) or {}).get(art.dataset_code)
+            if raw_refs is not None and prev_raw:
+                # Dataset nao baixado de novo: o run continua apontando para os mesmos objetos.
+                raw_refs[art.dataset_code] = dict(prev_raw)
         datasets.append(
             {
                 "dataset_code": art.dataset_code,
                 "snapshot_date": art.snapshot_date,
-                "files": [p.name for p in art.files],
+                "files": files,
                 "fingerprint": fp,
                 "extra": art.extra or {},
             }
         )
-    return {
+    manifest = {
         "run_id": run_id,
         "category": category,
         "datasets": datasets,
     }
+    if raw_refs is not None:
+        manifest[RAW_OBJECTS_KEY] = raw_refs
+    return manifest
+
+
+def _listed_run_ids(storage: StorageClient, category: str) -> List[str]:
+    """run_ids pelo LIST do prefixo (manifests anteriores ao indice)."""
+    names = [Path(p).name for p in storage.list_paths(f"{MANIFESTS_PREFIX}/{category}")]
+    return sorted(Path(name).stem for name in names if name.endswith('.json') and name != LATEST_NAME)
+
+
+def list_manifest_run_ids(storage: StorageClient, category: str) -> List[str]:
+    """run_ids com manifest, do mais antigo ao mais recente; le o indice e so lista o prefixo se nao houver indice."""
+    index = storage.read_text(f"{MANIFESTS_PREFIX}/{category}/{INDEX_NAME}")
+    if index is None:
+        return _listed_run_ids(storage, category)
+    run_ids = set()
+    for line in index.splitlines():
+        try:
+            run_id = json.loads(line).get("run_id")
+        except (ValueError, AttributeError):
+            continue
+        if run_id:
+            run_ids.add(run_id)
+    return sorted(run_ids)
+
+
+def rewrite_manifest_index(storage: StorageClient, category: str, run_ids: Iterable[str]) -> None:
+    lines = "".join(json.dumps({"run_id": run_id}) + "\n" for run_id in sorted(run_ids))
+    storage.append_text(f"{MANIFESTS_PREFIX}/{category}/{INDEX_NAME}", lines, truncate=True)
 
 
 def load_latest_manifest(storage: StorageClient, category: str) -> Optional[dict]:
-    prefix = f"manifests/{category}"
-    paths = storage.list_paths(prefix)
-    if not paths:
-        return None
-    # pick latest by filename sort
-    names = sorted([Path(p).name for p in paths if p.endswith('.json')])
-    if not names:
+    prefix = f"{MANIFESTS_PREFIX}/{category}"
+    pointer = storage.read_text(f"{prefix}/{LATEST_NAME}")
+    if pointer:
+        try:
+            run_id = json.loads(pointer).get("run_id")
+        except (ValueError, AttributeError):
+            run_id = None
+        payload = storage.read_text(f"{prefix}/{run_id}.json") if run_id else None
+        if payload:
+            return json.loads(payload)
+    # Sem ponteiro valido (categoria de antes do indice): pega o ultimo pelo nome.
+    run_ids = _listed_run_ids(storage, category)
+    if not run_ids:
         return None
-    latest = names[-1]
-    payload = storage.read_text(f"{prefix}/{latest}")
+    payload = storage.read_text(f"{prefix}/{run_ids[-1]}.json")
     if not payload:
         return None
     return json.loads(payload)
 
 
-def get_prev_fingerprint(prev_manifest: Optional[dict], dataset_code: str) -> Optional[str]:
+def get_prev_dataset(prev_manifest: Optional[dict], dataset_code: str) -> Optional[dict]:
+    """Entrada do dataset no manifest anterior, se ela for confiavel (ver get_prev_fingerprint)."""
     if not prev_manifest:
         return None
     for ds in prev_manifest.get("datasets", []):
@@ -51,11 +144,38 @@ def get_prev_fingerprint(prev_manifest: Optional[dict], dataset_code: str) -> Op
                 and ds.get("fingerprint_status") != "previous_retained_after_failure"
             ):
                 return None
-            return ds.get("fingerprint")
+            return ds
     return None
 
 
+def get_prev_fingerprint(prev_manifest: Optional[dict], dataset_code: str) -> Optional[str]:
+    ds = get_prev_dataset(prev_manifest, dataset_code)
+    return ds.get("fingerprint") if ds else None
+
+
+def get_prev_extra(prev_manifest: Optional[dict], dataset_code: str, key: str):
+    ds = get_prev_dataset(prev_manifest, dataset_code)
+    if not ds or not ds.get("fingerprint"):
+        return None
+    return (ds.get("extra") or {}).get(key)
+
+
+def get_prev_watermark(prev_manifest: Optional[dict], dataset_code: str) -> Optional[dict]:
+    return get_prev_extra(prev_manifest, dataset_code, WATERMARK_KEY)
+
+
 def save_manifest(storage: StorageClient, category: str, run_id: str, manifest: dict) -> None:
+    prefix = f"{MANIFESTS_PREFIX}/{category}"
     payload = json.dumps(manifest, ensure_ascii=False, indent=2)
-    storage.write_text(f"manifests/{category}/{run_id}.json", payload)
-    log_info(f"Manifest salvo: manifests/{category}/{run_id}.json")
+    storage.write_text(f"{prefix}/{run_id}.json", payload)
+    entry = json.dumps({"run_id": run_id, "status": manifest.get("status")}) + "\n"
+    index = f"{prefix}/{INDEX_NAME}"
+    if storage.exists(index):
+        storage.append_text(index, entry)
+    else:
+        # Primeiro run com indice: semeia com os manifests que ja existem (um LIST, uma vez so).
+        previous = [r for r in _listed_run_ids(storage, category) if r != run_id]
+        storage.append_text(index, "".join(json.dumps({"run_id": r}) + "\n" for r in previous) + entry, truncate=True)
+    # Ponteiro por ultimo: so aponta para um manifest ja gravado e indexado.
+    storage.write_text(f"{prefix}/{LATEST_NAME}", json.dumps({"run_id": run_id}))
+    log_info(f"Manifest salvo: {prefix}/{run_id}.json")
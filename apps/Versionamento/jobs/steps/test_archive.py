@@ -0,0 +1,93 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from steps import archive
+from steps.common import StorageClient
+from steps.manifest import RAW_OBJECTS_KEY, RELEASE_DATE_KEY, UNCHANGED_KEY
+
+
+class RawArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="raw_archive_test_"))
+        self.addCleanup(lambda: shutil.rmtree(self.tmp_dir, ignore_errors=True))
+        self.src_dir = self.tmp_dir / "src"
+        self.src_dir.mkdir()
+        self.files = []
+        for ext, body in ((".shp", b"\x00\x01" * 5000), (".dbf", b"NOME      " * 20000), (".prj", b"GEOGCS")):
+            path = self.src_dir / f"CAR_SP{ext}"
+            path.write_bytes(body)
+            self.files.append(path)
+
+    def _roundtrip(self, fmt: str):
+        packed = archive.pack_files(self.files, self.tmp_dir / f"car{archive.ARCHIVE_SUFFIXES[fmt]}", fmt)
+        out = archive.unpack_archive(packed, self.tmp_dir / "out")
+
+        self.assertLess(packed.stat().st_size, sum(p.stat().st_size for p in self.files) / 10)
+        self.assertEqual(sorted(p.name for p in out), sorted(p.name for p in self.files))
+        for path in self.files:
+            self.assertEqual((self.tmp_dir / "out" / path.name).read_bytes(), path.read_bytes())
+
+    @unittest.skipIf(archive._zstandard() is None, "zstandard nao instalado")
+    def test_zstd_roundtrip(self):
+        self._roundtrip("zstd")
+
+    def test_xz_roundtrip(self):
+        self._roundtrip("xz")
+
+    def test_zstd_falls_back_to_xz_without_package(self):
+        with patch.object(archive, "_zstandard", return_value=None):
+            self.assertEqual(archive.resolve_archive_format("zstd"), "xz")
+        self.assertIsNone(archive.resolve_archive_format("off"))
+        with self.assertRaises(ValueError):
+            archive.resolve_archive_format("gzip")
+
+    def test_restore_rebuilds_artifacts_from_archive_and_loose_objects(self):
+        storage = StorageClient(mode="local", local_root=self.tmp_dir / "storage")
+        archive.pack_files(self.files, self.tmp_dir / "car.tar.xz", "xz")
+        storage.upload_file(self.tmp_dir / "car.tar.xz", "raw/SICAR/objects/aa/aaa.tar.xz")
+        storage.upload_file(self.files[2], "raw/SICAR/objects/bb/bbb")
+        manifest = {
+            "status": "failed",
+            "datasets": [
+                {"dataset_code": "CAR_SP", "snapshot_date": "2026-05-20", "extra": {RELEASE_DATE_KEY: "01/05/2026"}},
+                {"dataset_code": "CAR_AC", "snapshot_date": "2026-05-20", "extra": {UNCHANGED_KEY: True}},
+            ],
+            RAW_OBJECTS_KEY: {
+                "CAR_SP": {f"SICAR/{p.name}": "raw/SICAR/objects/aa/aaa.tar.xz" for p in self.files},
+                "CAR_AC": {"SICAR/CAR_AC.prj": "raw/SICAR/objects/bb/bbb"},
+            },
+        }
+        work_dir = self.tmp_dir / "work"
+
+        artifacts = archive.restore_raw_artifacts(storage, manifest, work_dir, "SICAR", "2026-05-21")
+
+        by_code = {art.dataset_code: art for art in artifacts}
+        self.assertEqual([p.name for p in by_code["CAR_SP"].files], ["CAR_SP.dbf", "CAR_SP.prj", "CAR_SP.shp"])
+        self.assertEqual((work_dir / "SICAR" / "CAR_SP.dbf").read_bytes(), self.files[1].read_bytes())
+        self.assertEqual(by_code["CAR_SP"].extra, {RELEASE_DATE_KEY: "01/05/2026"})
+        self.assertEqual(by_code["CAR_SP"].snapshot_date, "2026-05-20")
+        self.assertIsNone(by_code["CAR_AC"].extra)
+        self.assertFalse((work_dir / archive.RESTORE_DIRNAME).exists())
+
+    def test_restore_is_all_or_nothing(self):
+        storage = StorageClient(mode="local", local_root=self.tmp_dir / "storage")
+        manifest = {
+            "datasets": [{"dataset_code": "CAR_SP"}, {"dataset_code": "CAR_AC"}],
+            RAW_OBJECTS_KEY: {"CAR_SP": {"SICAR/CAR_SP.shp": "raw/SICAR/objects/aa/missing"}},
+        }
+
+        self.assertEqual(archive.restore_raw_artifacts(storage, manifest, self.tmp_dir / "work", "SICAR", "d"), [])
+        manifest["datasets"].pop()
+        self.assertEqual(archive.restore_raw_artifacts(storage, manifest, self.tmp_dir / "work", "SICAR", "d"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from steps import common
+from steps.common import StorageClient
+
+
+class _FakeAppendBlob:
+    def __init__(self, blobs, name):
+        self.blobs = blobs
+        self.name = name
+
+    def exists(self):
+        return self.name in self.blobs
+
+    def create_append_blob(self):
+        self.blobs[self.name] = b""
+
+    def append_block(self, data):
+        self.blobs[self.name] += data
+
+
+class _FakeContainer:
+    def __init__(self):
+        self.uploads = {}
+        self.append_blobs = {}
+
+    def upload_blob(self, name, data, **kwargs):
+        self.uploads[name] = (data.read(), kwargs)
+
+    def get_blob_client(self, name):
+        return _FakeAppendBlob(self.append_blobs, name)
+
+
+class StorageClientUploadTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="storage_test_"))
+        self.addCleanup(lambda: shutil.rmtree(self.tmp_dir, ignore_errors=True))
+        self.src = self.tmp_dir / "work" / "CAR_SP.shp"
+        self.src.parent.mkdir()
+        self.src.write_bytes(b"shp" * 4096)
+        self.storage = StorageClient(mode="local", local_root=self.tmp_dir / "storage")
+
+    def test_local_upload_streams_instead_of_reading_whole_file(self):
+        with patch.object(Path, "read_bytes", side_effect=AssertionError("arquivo lido inteiro")):
+            target = Path(self.storage.upload_file(self.src, "raw/run/SICAR/CAR_SP.shp"))
+
+        self.assertEqual(target.read_bytes(), self.src.read_bytes())
+        self.assertNotEqual(target.stat().st_ino, self.src.stat().st_ino)
+        self.assertEqual([p.name for p in target.parent.iterdir()], ["CAR_SP.shp"])
+
+    def test_local_upload_can_hardlink(self):
+        with patch.object(common, "LOCAL_HARDLINK", True):
+            target = Path(self.storage.upload_file(self.src, "raw/run/SICAR/CAR_SP.shp"))
+
+        self.assertEqual(target.stat().st_ino, self.src.stat().st_ino)
+
+    def test_upload_files_runs_all_and_raises_first_failure(self):
+        other = self.src.with_suffix(".dbf")
+        other.write_bytes(b"dbf")
+        missing = self.src.with_suffix(".prj")
+        items = [(self.src, "raw/a.shp"), (missing, "raw/a.prj"), (other, "raw/a.dbf")]
+
+        with self.assertRaises(FileNotFoundError):
+            self.storage.upload_files(items, workers=3)
+
+        self.assertEqual((self.tmp_dir / "storage" / "raw" / "a.dbf").read_bytes(), b"dbf")
+        self.assertTrue((self.tmp_dir / "storage" / "raw" / "a.shp").exists())
+
+    def test_blob_upload_uses_block_concurrency(self):
+        storage = StorageClient.__new__(StorageClient)
+        storage.mode = "blob"
+        storage.blob_prefix = "landwatch"
+        storage._container = _FakeContainer()
+
+        with patch.object(common, "BLOB_MAX_CONCURRENCY", 6):
+            name = storage.upload_file(self.src, "raw/run/CAR_SP.shp")
+
+        data, kwargs = storage._container.uploads[name]
+        self.assertEqual(name, "landwatch/raw/run/CAR_SP.shp")
+        self.assertEqual(data, self.src.read_bytes())
+        self.assertEqual(kwargs["max_concurrency"], 6)
+        self.assertEqual(kwargs["length"], self.src.stat().st_size)
+
+    def test_append_text_uses_append_blob(self):
+        storage = StorageClient.__new__(StorageClient)
+        storage.mode = "blob"
+        storage.blob_prefix = "landwatch"
+        storage._container = _FakeContainer()
+
+        storage.append_text("manifests/SICAR/index.jsonl", "a\n")
+        storage.append_text("manifests/SICAR/index.jsonl", "b\n")
+        self.assertEqual(storage._container.append_blobs["landwatch/manifests/SICAR/index.jsonl"], b"a\nb\n")
+        storage.append_text("manifests/SICAR/index.jsonl", "c\n", truncate=True)
+        self.assertEqual(storage._container.append_blobs["landwatch/manifests/SICAR/index.jsonl"], b"c\n")
+
+
+class SourceFingerprintLoadTest(unittest.TestCase):
+    def test_module_is_loaded_by_path_and_shared_via_sys_modules(self):
+        self.assertIs(common.source_fingerprint, sys.modules["source_fingerprint"])
+        self.assertEqual(Path(common.source_fingerprint.__file__), common._source_fingerprint_script())
+        self.assertIs(common._load_source_fingerprint(), common.source_fingerprint)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from jobs.steps import download_prodes, wfs
+from jobs.steps.manifest import UNCHANGED_KEY, WATERMARK_KEY
+
+_DESCRIBE_XSD = """<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+  <xsd:element name="year" type="xsd:int"/>
+  <xsd:element name="image_date" type="xsd:date"/>
+  <xsd:element name="area_km" type="xsd:double"/>
+  <xsd:element name="geom" type="gml:MultiSurfacePropertyType"/>
+</xsd:schema>"""
+
+
+class _FakeResponse:
+    def __init__(self, payload=None, text=""):
+        self._payload = payload
+        self.text = text
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+class _FakeProdesSession:
+    """GeoServer do PRODES: numberMatched, DescribeFeatureType e maximo por sortBy."""
+
+    def __init__(self, count, maxima):
+        self.count = count
+        self.maxima = maxima
+
+    def get(self, url, params=None, timeout=None):
+        if params.get("request") == "DescribeFeatureType":
+            return _FakeResponse(text=_DESCRIBE_XSD)
+        if params.get("resultType") == "hits":
+            return _FakeResponse(text=f'<wfs:FeatureCollection numberMatched="{self.count}"/>')
+        field = params["sortBy"].split()[0]
+        return _FakeResponse({"features": [{"properties": {field: self.maxima[field]}}]})
+
+
+class ProdesWatermarkTest(unittest.TestCase):
+    SNAPSHOT = "2026-05-20"
+
+    def _run(self, prev_watermark, count=3, maxima=None):
+        maxima = maxima or {"image_date": "2020-08-01Z", "area_km": 12.5}
+        prev_manifest = {
+            "status": "completed",
+            "datasets": [
+                {
+                    "dataset_code": "PRODES_CERRADO_NB_2020",
+                    "fingerprint": "fp",
+                    "extra": {WATERMARK_KEY: prev_watermark},
+                }
+            ],
+        }
+        downloads = []
+
+        def fake_stream(ws, layer, year, page_size, out_dir, name, total=None, stats=None):
+            downloads.append(name)
+            list(stats.track(iter([[{"properties": {}}] * count])))
+            return [Path(f"/tmp/{name}.shp")]
+
+        with (
+            patch.object(download_prodes, "session", _FakeProdesSession(count, maxima)),
+            patch.object(download_prodes, "stream_layer", side_effect=fake_stream),
+            patch.object(download_prodes, "log_info"),
+        ):
+            artifacts = download_prodes.run(
+                Path("/tmp"),
+                self.SNAPSHOT,
+                workspaces=["prodes-cerrado-nb"],
+                years=[2020],
+                prev_manifest=prev_manifest,
+            )
+        return downloads, artifacts[0]
+
+    def test_same_count_and_content_signal_skips_download(self):
+        prev = {"count": 3, "max_image_date": "2020-08-01Z", "max_area_km": 12.5, "downloaded_on": "2026-05-01"}
+
+        downloads, artifact = self._run(prev)
+
+        self.assertEqual(downloads, [])
+        self.assertTrue(artifact.extra[UNCHANGED_KEY])
+        self.assertEqual(artifact.extra[WATERMARK_KEY], prev)
+
+    def test_correction_with_same_count_is_downloaded(self):
+        prev = {"count": 3, "max_image_date": "2020-08-01Z", "max_area_km": 11.0, "downloaded_on": "2026-05-01"}
+
+        downloads, artifact = self._run(prev)
+
+        self.assertEqual(downloads, ["prodes_cerrado_nb_2020"])
+        self.assertEqual(
+            artifact.extra[WATERMARK_KEY],
+            {"count": 3, "max_image_date": "2020-08-01Z", "max_area_km": 12.5, "downloaded_on": self.SNAPSHOT},
+        )
+
+    def test_old_or_legacy_watermark_forces_full_download(self):
+        stale = {"count": 3, "max_image_date": "2020-08-01Z", "max_area_km": 12.5, "downloaded_on": "2026-01-01"}
+        for prev in (stale, {"count": 3}):
+            with self.subTest(prev=prev), patch.object(wfs, "WATERMARK_MAX_AGE_DAYS", 30):
+                downloads, artifact = self._run(prev)
+
+                self.assertEqual(downloads, ["prodes_cerrado_nb_2020"])
+                self.assertNotIn(UNCHANGED_KEY, artifact.extra)
+
+    def test_max_age_zero_disables_forced_download(self):
+        prev = {"count": 3, "max_image_date": "2020-08-01Z", "max_area_km": 12.5, "downloaded_on": "2020-01-01"}
+
+        with patch.object(wfs, "WATERMARK_MAX_AGE_DAYS", 0):
+            self.assertTrue(wfs.watermark_unchanged(prev, {k: v for k, v in prev.items() if k != "downloaded_on"}, "2026-05-20"))
+        self.assertFalse(wfs.watermark_unchanged(None, {"count": 3}, "2026-05-20"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from steps import download_sicar
+from steps.manifest import RELEASE_DATE_KEY, is_unchanged_artifact
+
+
+class _FakeSicar:
+    """Sessao SICAR falsa: conta clones, captchas resolvidos e downloads simultaneos."""
+
+    def __init__(self, shared=None):
+        self.shared = shared or {
+            "lock": threading.Lock(),
+            "clones": 0,
+            "captchas": 0,
+            "active": 0,
+            "max_active": 0,
+            "used_captchas": {},
+        }
+
+    def clone(self):
+        with self.shared["lock"]:
+            self.shared["clones"] += 1
+        return _FakeSicar(self.shared)
+
+    def solve_captcha(self):
+        with self.shared["lock"]:
+            self.shared["captchas"] += 1
+        return "AbC12"
+
+
+class DownloadStatesTest(unittest.TestCase):
+    def _download_one(self, fail=()):
+        def download_one(session, uf, captcha):
+            shared = session.shared
+            with shared["lock"]:
+                shared["active"] += 1
+                shared["max_active"] = max(shared["max_active"], shared["active"])
+                shared["used_captchas"][uf] = captcha
+            time.sleep(0.02)
+            with shared["lock"]:
+                shared["active"] -= 1
+            return uf not in fail, 1024 * 1024
+
+        return download_one
+
+    def test_parallel_states_use_own_session_and_presolved_captcha(self):
+        car = _FakeSicar()
+        states = ["AC", "AL", "AM", "AP", "BA", "CE"]
+
+        with patch.object(download_sicar, "log_info"), patch.object(download_sicar, "log_warn"):
+            results = download_sicar._download_states(car, states, self._download_one(fail=("AM",)), 3, 2)
+
+        self.assertEqual([r["uf"] for r in results], states)
+        self.assertEqual([r["ok"] for r in results], [True, True, False, True, True, True])
+        self.assertEqual(car.shared["clones"], len(states))
+        self.assertEqual(car.shared["captchas"], len(states))
+        self.assertEqual(set(car.shared["used_captchas"].values()), {"AbC12"})
+        self.assertGreater(car.shared["max_active"], 1)
+        self.assertLessEqual(car.shared["max_active"], 3)
+
+    def test_single_worker_keeps_shared_session_sequential(self):
+        car = _FakeSicar()
+
+        with patch.object(download_sicar, "log_info"):
+            results = download_sicar._download_states(car, ["SP", "MG"], self._download_one(), 1, 2)
+
+        self.assertEqual(results, [{"uf": "SP", "ok": True}, {"uf": "MG", "ok": True}])
+        self.assertEqual(car.shared["clones"], 0)
+        self.assertEqual(car.shared["max_active"], 1)
+        self.assertEqual(car.shared["used_captchas"], {"SP": None, "MG": None})
+
+    def test_failed_captcha_prefetch_still_downloads_state(self):
+        car = _FakeSicar()
+
+        def broken_captcha():
+            raise RuntimeError("captcha fora do ar")
+
+        car.solve_captcha = broken_captcha
+        original_clone = car.clone
+
+        def clone():
+            session = original_clone()
+            session.solve_captcha = broken_captcha
+            return session
+
+        car.clone = clone
+
+        with patch.object(download_sicar, "log_info"), patch.object(download_sicar, "log_warn"):
+            results = download_sicar._download_states(car, ["PA", "PB"], self._download_one(), 2, 1)
+
+        self.assertEqual([r["ok"] for r in results], [True, True])
+        self.assertEqual(car.shared["used_captchas"], {"PA": None, "PB": None})
+
+    def test_upstream_package_without_clone_falls_back_to_sequential(self):
+        car = _FakeSicar()
+
+        class _UpstreamSicar:
+            shared = car.shared
+
+        with patch.object(download_sicar, "log_info"), patch.object(download_sicar, "log_warn") as warn_mock:
+            results = download_sicar._download_states(_UpstreamSicar(), ["RO", "RR"], self._download_one(), 3, 2)
+
+        self.assertEqual([r["ok"] for r in results], [True, True])
+        self.assertEqual(car.shared["max_active"], 1)
+        warn_mock.assert_called_once()
+
+
+
+class ReleaseDateSkipTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="download_sicar_test_"))
+        self.addCleanup(lambda: shutil.rmtree(self.tmp_dir, ignore_errors=True))
+
+    def _prev_manifest(self, **datasets):
+        return {
+            "status": "ingested",
+            "datasets": [
+                {"dataset_code": code, "fingerprint": f"fp-{code}", "extra": {RELEASE_DATE_KEY: date}}
+                for code, date in datasets.items()
+            ],
+        }
+
+    def _sicar_module(self, release_dates):
+        class FakeSicar(_FakeSicar):
+            def __init__(self, driver=None):
+                super().__init__()
+
+            def get_release_dates(self):
+                return release_dates
+
+        polygon = types.SimpleNamespace(AREA_PROPERTY=types.SimpleNamespace(name="AREA_PROPERTY"))
+        return FakeSicar, [], polygon, None, object, (RuntimeError,)
+
+    def test_split_unchanged_compares_with_previous_ingested_release(self):
+        prev = self._prev_manifest(CAR_SP="01/02/2026", CAR_MG="01/01/2026")
+
+        to_download, unchanged = download_sicar._split_unchanged(
+            ["SP", "MG", "BA"],
+            {"SP": "01/02/2026", "MG": "10/02/2026", "BA": "05/02/2026"},
+            prev,
+        )
+
+        self.assertEqual((to_download, unchanged), (["MG", "BA"], ["SP"]))
+        self.assertEqual(download_sicar._split_unchanged(["SP"], {}, prev), (["SP"], []))
+
+    def test_run_downloads_only_states_with_new_release(self):
+        downloaded = []
+
+        def fake_download_states(_car, states, _download_one, _workers, _prefetch):
+            downloaded.extend(states)
+            for uf in states:
+                (self.tmp_dir / "SICAR" / f"CAR_{uf}.shp").write_bytes(b"shp")
+            return [{"uf": uf, "ok": True} for uf in states]
+
+        with (
+            patch.dict(os.environ, {"SICAR_TEST_STATES": "SP,MG", "LANDWATCH_SICAR_USE_DOCKER": "0"}),
+            patch.object(
+                download_sicar,
+                "_load_sicar_module",
+                return_value=self._sicar_module({"SP": "01/02/2026", "MG": "10/02/2026"}),
+            ),
+            patch.object(download_sicar, "_ensure_tesseract"),
+            patch.object(download_sicar, "_download_states", side_effect=fake_download_states),
+            patch.object(download_sicar, "log_info"),
+        ):
+            artifacts = download_sicar.run(
+                self.tmp_dir,
+                "2026-02-11",
+                prev_manifest=self._prev_manifest(CAR_SP="01/02/2026", CAR_MG="01/01/2026"),
+            )
+
+        self.assertEqual(downloaded, ["MG"])
+        by_code = {a.dataset_code: a for a in artifacts}
+        self.assertTrue(is_unchanged_artifact(by_code["CAR_SP"]))
+        self.assertEqual(by_code["CAR_SP"].extra[RELEASE_DATE_KEY], "01/02/2026")
+        self.assertEqual([p.name for p in by_code["CAR_MG"].files], ["CAR_MG.shp"])
+        self.assertEqual(by_code["CAR_MG"].extra[RELEASE_DATE_KEY], "10/02/2026")
+
+
+if __name__ == "__main__":
+    unittest.main()
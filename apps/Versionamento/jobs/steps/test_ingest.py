@@ -2,6 +2,7 @@ import subprocess
 import sys
 import json
 import tempfile
+import types
 import unittest
 from pathlib import Path
 from unittest.mock import patch
@@ -74,6 +75,36 @@ class IngestStepTest(unittest.TestCase):
         self.assertEqual(result.success_versions, [123])
         self.assertIn("--result-json", calls[0])
 
+    def test_run_ingest_only_inprocess_uses_ingest_files_api(self):
+        calls = []
+
+        def fake_ingest_files(files, snapshot_date=None):
+            calls.append(([str(p) for p in files], snapshot_date))
+            return [
+                {"file": str(files[0]), "dataset_code": "A", "version_id": 123, "status": "COMPLETED"},
+                {"file": str(files[1]), "dataset_code": "B", "version_id": None, "status": "FAILED"},
+                {"file": str(files[2]), "dataset_code": "C", "version_id": 7, "status": "SKIPPED_NO_CHANGES"},
+            ]
+
+        fake_module = types.SimpleNamespace(ingest_files=fake_ingest_files)
+        with (
+            patch.dict(ingest.os.environ, {"LANDWATCH_INGEST_MODE": "inprocess"}),
+            patch.object(ingest, "_load_bulk_ingest", return_value=fake_module),
+            patch.object(ingest.subprocess, "run") as run_mock,
+        ):
+            result = ingest.run_ingest_only(
+                [self._artifact("A"), self._artifact("B"), self._artifact("C", ".csv"), self._artifact("D", ".dbf")],
+                "2026-05-21",
+            )
+
+        run_mock.assert_not_called()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][1], "2026-05-21")
+        self.assertEqual(result.successes, ["A", "C"])
+        self.assertEqual(result.success_versions, [123])
+        self.assertEqual(result.failures, {"B": "status=FAILED"})
+        self.assertEqual(result.skipped, ["D"])
+
     def test_refresh_mvs_once_runs_refresh_only_command(self):
         calls = []
 
@@ -1,12 +1,30 @@
+import json
+import shutil
 import sys
+import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from steps.manifest import get_prev_fingerprint
+from steps.cleanup import cleanup_category
+from steps.common import DatasetArtifact, StorageClient
+from steps.manifest import (
+    INDEX_NAME,
+    RAW_OBJECTS_KEY,
+    UNCHANGED_KEY,
+    WATERMARK_KEY,
+    build_manifest,
+    get_prev_fingerprint,
+    get_prev_watermark,
+    list_manifest_run_ids,
+    load_latest_manifest,
+    raw_object_keys,
+    save_manifest,
+)
 
 
 class ManifestTest(unittest.TestCase):
@@ -29,6 +47,103 @@ class ManifestTest(unittest.TestCase):
         self.assertEqual(get_prev_fingerprint(manifest, "FAILED_DATASET"), "old-fp")
         self.assertIsNone(get_prev_fingerprint(manifest, "UNSAFE_DATASET"))
 
+    def test_unchanged_artifact_carries_previous_files_and_fingerprint(self):
+        prev = {
+            "status": "completed",
+            "datasets": [
+                {
+                    "dataset_code": "PRODES_CERRADO_2020",
+                    "files": ["prodes_cerrado_2020.shp", "prodes_cerrado_2020.dbf"],
+                    "fingerprint": "old-fp",
+                    "extra": {WATERMARK_KEY: {"count": 10}},
+                }
+            ],
+        }
+        art = DatasetArtifact(
+            category="PRODES",
+            dataset_code="PRODES_CERRADO_2020",
+            files=[],
+            snapshot_date="2024-01-01",
+            extra={WATERMARK_KEY: {"count": 10}, UNCHANGED_KEY: True},
+        )
+
+        manifest = build_manifest("run-2", "PRODES", [art], prev_manifest=prev)
+
+        ds = manifest["datasets"][0]
+        self.assertEqual(ds["fingerprint"], "old-fp")
+        self.assertEqual(ds["files"], ["prodes_cerrado_2020.shp", "prodes_cerrado_2020.dbf"])
+        self.assertEqual(get_prev_watermark(manifest, "PRODES_CERRADO_2020"), {"count": 10})
+
+    def test_watermark_requires_trusted_previous_fingerprint(self):
+        manifest = {
+            "status": "failed",
+            "datasets": [
+                {"dataset_code": "A", "fingerprint": "fp", "extra": {WATERMARK_KEY: {"count": 1}}},
+                {
+                    "dataset_code": "B",
+                    "fingerprint": None,
+                    "fingerprint_status": "previous_retained_after_failure",
+                    "extra": {WATERMARK_KEY: {"count": 2}},
+                },
+            ],
+        }
+
+        self.assertIsNone(get_prev_watermark(manifest, "A"))
+        self.assertIsNone(get_prev_watermark(manifest, "B"))
+        self.assertIsNone(get_prev_watermark(None, "A"))
+
+    def test_unchanged_artifact_keeps_referencing_previous_raw_objects(self):
+        prev = {
+            "status": "ingested",
+            "datasets": [{"dataset_code": "PRODES_2020", "files": ["prodes_2020.shp"], "fingerprint": "fp"}],
+            RAW_OBJECTS_KEY: {"PRODES_2020": {"PRODES/prodes_2020.shp": "raw/PRODES/objects/ab/abc"}},
+        }
+        unchanged = DatasetArtifact("PRODES", "PRODES_2020", [], "2026-05-21", {UNCHANGED_KEY: True})
+        new_refs = {"PRODES_2024": {"PRODES/prodes_2024.shp": "raw/PRODES/objects/cd/cde"}}
+
+        manifest = build_manifest("run", "PRODES", [unchanged], prev, raw_objects=new_refs)
+
+        self.assertEqual(raw_object_keys(manifest), {"raw/PRODES/objects/ab/abc", "raw/PRODES/objects/cd/cde"})
+        self.assertNotIn(RAW_OBJECTS_KEY, build_manifest("run", "PRODES", [unchanged], prev))
+
+
+
+class ManifestIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="manifest_index_test_"))
+        self.addCleanup(lambda: shutil.rmtree(self.tmp_dir, ignore_errors=True))
+        self.storage = StorageClient(mode="local", local_root=self.tmp_dir / "storage")
+
+    def test_index_is_seeded_from_legacy_manifests_then_read_without_listing(self):
+        legacy = self.tmp_dir / "storage" / "manifests" / "PRODES" / "20260518T000000Z.json"
+        legacy.parent.mkdir(parents=True)
+        legacy.write_text(json.dumps({"run_id": "20260518T000000Z"}), encoding="utf-8")
+        self.assertEqual(load_latest_manifest(self.storage, "PRODES")["run_id"], "20260518T000000Z")
+
+        for run_id in ("20260519T000000Z", "20260520T000000Z"):
+            save_manifest(self.storage, "PRODES", run_id, {"run_id": run_id, "status": "ingested"})
+
+        def list_paths(prefix):
+            self.assertFalse(prefix.startswith("manifests/"), "LIST do prefixo de manifests")
+            return []
+
+        with patch.object(self.storage, "list_paths", side_effect=list_paths):
+            self.assertEqual(load_latest_manifest(self.storage, "PRODES")["run_id"], "20260520T000000Z")
+            self.assertEqual(
+                list_manifest_run_ids(self.storage, "PRODES"),
+                ["20260518T000000Z", "20260519T000000Z", "20260520T000000Z"],
+            )
+            save_manifest(self.storage, "PRODES", "20260521T000000Z", {"run_id": "20260521T000000Z"})
+            cleanup_category(self.storage, "PRODES", retention_runs=2)
+
+        manifests = self.tmp_dir / "storage" / "manifests" / "PRODES"
+        self.assertEqual(
+            sorted(p.name for p in manifests.iterdir()),
+            ["20260520T000000Z.json", "20260521T000000Z.json", INDEX_NAME, "latest.json"],
+        )
+        self.assertEqual(list_manifest_run_ids(self.storage, "PRODES"), ["20260520T000000Z", "20260521T000000Z"])
+        self.assertEqual(load_latest_manifest(self.storage, "PRODES")["run_id"], "20260521T000000Z")
+
 
 if __name__ == "__main__":
     unittest.main()
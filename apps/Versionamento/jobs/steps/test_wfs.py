@@ -0,0 +1,301 @@
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import pyogrio
+
+from jobs.steps import wfs
+
+
+class _FakeResponse:
+    def __init__(self, payload=None, text=""):
+        self._payload = payload
+        self.text = text
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        if self._payload is None:
+            raise ValueError("sem json")
+        return self._payload
+
+
+_DESCRIBE_XSD = """<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+  <xsd:complexType name="yearly_deforestationType"><xsd:sequence>
+    <xsd:element maxOccurs="1" minOccurs="0" name="year" nillable="true" type="xsd:int"/>
+    <xsd:element maxOccurs="1" minOccurs="0" name="area_km" nillable="true" type="xsd:double"/>
+    <xsd:element maxOccurs="1" minOccurs="0" name="image_date" nillable="true" type="xsd:date"/>
+    <xsd:element maxOccurs="1" minOccurs="0" name="geom" nillable="true" type="gml:MultiSurfacePropertyType"/>
+  </xsd:sequence></xsd:complexType>
+  <xsd:element name="yearly_deforestation" substitutionGroup="gml:AbstractFeature" type="prodes:yearly_deforestationType"/>
+</xsd:schema>"""
+
+
+class _FakeWfsSession:
+    """Servidor WFS em memoria; paginas mais antigas respondem mais devagar."""
+
+    def __init__(self, total, hits=True, cap=None):
+        self.total = total
+        self.hits = hits
+        # Teto de feicoes por resposta (maxFeatures do GeoServer), ignorando o `count` pedido.
+        self.cap = cap
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.page_starts = []
+
+    def get(self, url, params=None, timeout=None):
+        if params.get("request") == "DescribeFeatureType":
+            return _FakeResponse(text=_DESCRIBE_XSD)
+        if params.get("resultType") == "hits":
+            if not self.hits:
+                return _FakeResponse(text='<wfs:FeatureCollection numberMatched="unknown"/>')
+            return _FakeResponse(text=f'<wfs:FeatureCollection numberMatched="{self.total}" numberReturned="0"/>')
+        start, count = params["startIndex"], params["count"]
+        with self.lock:
+            self.page_starts.append(start)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.03 if start == 0 else 0.01)
+        with self.lock:
+            self.active -= 1
+        if self.cap:
+            count = min(count, self.cap)
+        feats = [{"id": i} for i in range(start, min(start + count, self.total))]
+        return _FakeResponse({"features": feats})
+
+
+class WfsClientTest(unittest.TestCase):
+    def test_pages_are_fetched_concurrently_and_yielded_in_order(self):
+        session = _FakeWfsSession(total=10)
+        client = wfs.WfsClient("https://wfs.example/ows", "ws:layer", page_size=3, page_workers=3, session=session)
+
+        with patch.object(wfs, "log_info"):
+            feats = client.fetch_all({"sortBy": "year A"})
+
+        self.assertEqual([f["id"] for f in feats], list(range(10)))
+        self.assertGreater(session.max_active, 1)
+        # 4 paginas do numberMatched + 1 pagina vazia de confirmacao no fim
+        self.assertEqual(sorted(session.page_starts), [0, 3, 6, 9, 10])
+
+    def test_falls_back_to_sequential_paging_without_number_matched(self):
+        session = _FakeWfsSession(total=5, hits=False)
+        client = wfs.WfsClient("https://wfs.example/ows", "ws:layer", page_size=2, page_workers=4, session=session)
+
+        with patch.object(wfs, "log_info"), patch.object(wfs, "log_warn"):
+            feats = client.fetch_all()
+
+        self.assertEqual([f["id"] for f in feats], list(range(5)))
+        self.assertEqual(session.page_starts, [0, 2, 4, 5])
+        self.assertEqual(session.max_active, 1)
+
+    def test_short_pages_from_capped_server_are_completed(self):
+        session = _FakeWfsSession(total=10, cap=2)
+        client = wfs.WfsClient("https://wfs.example/ows", "ws:layer", page_size=3, page_workers=3, session=session)
+
+        with patch.object(wfs, "log_info"):
+            feats = client.fetch_all()
+
+        self.assertEqual([f["id"] for f in feats], list(range(10)))
+
+    def test_missing_records_raise_instead_of_truncating(self):
+        session = _FakeWfsSession(total=10)
+        session.total = 7  # numberMatched dizia 10, mas o servidor so entrega 7
+        client = wfs.WfsClient("https://wfs.example/ows", "ws:layer", page_size=3, page_workers=2, session=session)
+        client.count_matched = lambda filters=None: 10
+
+        with patch.object(wfs, "log_info"), self.assertRaises(RuntimeError):
+            client.fetch_all()
+
+    def test_failed_page_raises_instead_of_truncating(self):
+        session = _FakeWfsSession(total=4)
+        client = wfs.WfsClient("https://wfs.example/ows", "ws:layer", page_size=2, page_workers=2, session=session)
+        original_get = session.get
+
+        def flaky_get(url, params=None, timeout=None):
+            if params.get("startIndex") == 2:
+                raise wfs.requests.exceptions.ConnectionError("reset")
+            return original_get(url, params=params, timeout=timeout)
+
+        session.get = flaky_get
+        with (
+            patch.object(wfs, "log_info"),
+            patch.object(wfs, "log_warn"),
+            patch.object(wfs.time, "sleep"),
+            self.assertRaises(RuntimeError),
+        ):
+            client.fetch_all()
+
+    def test_host_limiter_caps_concurrency_per_host(self):
+        limiter = wfs._HostLimiter(max_concurrent=2, min_interval=0)
+        lock = threading.Lock()
+        state = {"active": 0, "max": 0}
+
+        def work():
+            with limiter:
+                with lock:
+                    state["active"] += 1
+                    state["max"] = max(state["max"], state["active"])
+                time.sleep(0.02)
+                with lock:
+                    state["active"] -= 1
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(state["max"], 2)
+
+
+def _polygon_feature(i, multi=False):
+    ring = [[i, 0], [i + 1, 0], [i + 1, 1], [i, 0]]
+    geometry = (
+        {"type": "MultiPolygon", "coordinates": [[ring]]}
+        if multi
+        else {"type": "Polygon", "coordinates": [ring]}
+    )
+    return {"type": "Feature", "properties": {"year": 2020 + i, "nome": f"área {i}"}, "geometry": geometry}
+
+
+class WritePagesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="wfs_write_test_"))
+        self.addCleanup(lambda: shutil.rmtree(self.tmp_dir, ignore_errors=True))
+
+    def _pages(self, consumed):
+        for page_no in range(3):
+            consumed.append(page_no)
+            yield [_polygon_feature(page_no * 2 + i, multi=page_no == 1) for i in range(2)]
+
+    def test_appends_pages_to_shapefile_and_replaces_previous_artifact(self):
+        out_dir = self.tmp_dir / "DETER"
+        out_dir.mkdir()
+        (out_dir / "deter_ALLYEARS.qpj").write_text("antigo", encoding="utf-8")
+        consumed = []
+
+        with patch.object(wfs, "log_info"):
+            files = wfs.write_pages(self._pages(consumed), out_dir, "deter_ALLYEARS", fmt="shp")
+
+        self.assertEqual(consumed, [0, 1, 2])
+        self.assertIn(out_dir / "deter_ALLYEARS.shp", files)
+        self.assertFalse((out_dir / "deter_ALLYEARS.qpj").exists())
+        self.assertEqual(sorted(p.name for p in out_dir.iterdir()), sorted(p.name for p in files))
+        gdf = pyogrio.read_dataframe(out_dir / "deter_ALLYEARS.shp")
+        self.assertEqual(gdf["year"].tolist(), [2020, 2021, 2022, 2023, 2024, 2025])
+        self.assertEqual(gdf["nome"].iloc[0], "área 0")
+
+    def test_writes_flatgeobuf_in_page_order(self):
+        with patch.object(wfs, "log_info"):
+            files = wfs.write_pages(self._pages([]), self.tmp_dir, "prodes_2020", fmt="fgb")
+
+        self.assertEqual(files, [self.tmp_dir / "prodes_2020.fgb"])
+        gdf = pyogrio.read_dataframe(files[0])
+        self.assertEqual(gdf["year"].tolist(), [2020, 2021, 2022, 2023, 2024, 2025])
+        self.assertEqual(set(gdf.geometry.geom_type), {"Polygon", "MultiPolygon"})
+
+    def test_failed_download_keeps_previous_artifact(self):
+        previous = self.tmp_dir / "prodes_2020.shp"
+        previous.write_bytes(b"anterior")
+
+        def broken_pages():
+            yield [_polygon_feature(0)]
+            raise RuntimeError("pagina falhou")
+
+        with self.assertRaises(RuntimeError):
+            wfs.write_pages(broken_pages(), self.tmp_dir, "prodes_2020", fmt="shp")
+
+        self.assertEqual(previous.read_bytes(), b"anterior")
+        self.assertEqual([p.name for p in self.tmp_dir.iterdir()], ["prodes_2020.shp"])
+
+    def test_returns_empty_without_features(self):
+        self.assertEqual(wfs.write_pages(iter([]), self.tmp_dir, "vazio", fmt="shp"), [])
+        self.assertEqual(list(self.tmp_dir.iterdir()), [])
+
+    def test_appends_new_pages_to_base_artifact(self):
+        out_dir = self.tmp_dir / "DETER"
+        base_root = wfs.base_dir(self.tmp_dir, "DETER")
+        with patch.object(wfs, "log_info"):
+            first = wfs.write_pages(iter([[_polygon_feature(0), _polygon_feature(1)]]), out_dir, "deter", fmt="shp")
+        wfs.keep_base(first, base_root, "deter")
+        base_files = wfs.find_base(base_root, "deter", wfs.compute_fingerprint(first), fmt="shp")
+        self.assertEqual(sorted(p.name for p in base_files), sorted(p.name for p in first))
+
+        stats = wfs.PageStats("year")
+        with patch.object(wfs, "log_info"):
+            files = wfs.write_pages(
+                stats.track(iter([[_polygon_feature(2)], []])),
+                out_dir,
+                "deter",
+                fmt="shp",
+                base_files=base_files,
+            )
+
+        self.assertEqual((stats.count, stats.max_value), (1, 2022))
+        gdf = pyogrio.read_dataframe(out_dir / "deter.shp")
+        self.assertEqual(gdf["year"].tolist(), [2020, 2021, 2022])
+        # a base continua sendo o artefato anterior ate o proximo keep_base
+        self.assertEqual(len(pyogrio.read_dataframe(base_root / "deter.shp")), 2)
+        self.assertIn(out_dir / "deter.shp", files)
+
+    def _typed_pages(self):
+        ring = [[0, 0], [1, 0], [1, 1], [0, 0]]
+        geometry = {"type": "Polygon", "coordinates": [ring]}
+        # primeira pagina: area inteira e image_date sempre nula; a segunda traz decimal e data
+        yield [{"type": "Feature", "properties": {"year": 2020, "area_km": 3, "image_date": None}, "geometry": geometry}]
+        yield [
+            {"type": "Feature", "properties": {"year": 2021, "area_km": 3.5, "image_date": "2021-08-01"}, "geometry": geometry},
+            {"type": "Feature", "properties": {"year": None, "area_km": None}, "geometry": geometry},
+        ]
+
+    def test_describe_schema_maps_xsd_types(self):
+        client = wfs.WfsClient("https://wfs.example/ows", "prodes:yearly_deforestation", 10, session=_FakeWfsSession(0))
+
+        self.assertEqual(
+            client.describe_schema(),
+            {"year": "Int64", "area_km": "float64", "image_date": "string"},
+        )
+
+    def test_page_types_follow_schema_when_values_change_between_pages(self):
+        client = wfs.WfsClient("https://wfs.example/ows", "prodes:yearly_deforestation", 10, session=_FakeWfsSession(0))
+        schema = client.describe_schema()
+        for fmt in ("shp", "fgb"):
+            with self.subTest(fmt=fmt), patch.object(wfs, "log_info"):
+                files = wfs.write_pages(self._typed_pages(), self.tmp_dir / fmt, "prodes", fmt=fmt, schema=schema)
+                gdf = pyogrio.read_dataframe(files[0] if fmt == "fgb" else self.tmp_dir / fmt / "prodes.shp")
+
+                self.assertEqual(gdf["area_km"].tolist()[:2], [3.0, 3.5])
+                self.assertEqual(gdf["image_date"].tolist()[:2], [None, "2021-08-01"])
+                self.assertEqual(gdf["year"].tolist()[:2], [2020, 2021])
+
+    def test_inferred_schema_keeps_decimals_and_text_after_first_page(self):
+        with patch.object(wfs, "log_info"):
+            files = wfs.write_pages(self._typed_pages(), self.tmp_dir, "prodes", fmt="fgb")
+
+        gdf = pyogrio.read_dataframe(files[0])
+        self.assertEqual(gdf["area_km"].tolist()[:2], [3.0, 3.5])
+        self.assertEqual(gdf["image_date"].tolist()[:2], [None, "2021-08-01"])
+
+    def test_base_with_other_fingerprint_is_ignored(self):
+        base_root = wfs.base_dir(self.tmp_dir, "DETER")
+        base_root.mkdir(parents=True)
+        (base_root / "deter.shp").write_bytes(b"base")
+
+        self.assertEqual(wfs.find_base(base_root, "deter", "outro-fp", fmt="shp"), [])
+        self.assertEqual(wfs.find_base(base_root, "deter", None, fmt="shp"), [])
+        self.assertEqual(wfs.find_base(base_root, "deter", wfs.compute_fingerprint([base_root / "deter.shp"]), fmt="fgb"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,449 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import geopandas as gpd
+import pandas as pd
+import pyogrio
+import requests
+
+from .common import DatasetArtifact, compute_fingerprint, ensure_dir, log_info, log_warn
+from .manifest import WATERMARK_KEY
+from .manifest import unchanged_artifact as manifest_unchanged_artifact
+
+TIMEOUT = 60
+MAX_RETRIES = 3
+RETRY_BACKOFF = 5.0
+
+PAGE_WORKERS = int(os.environ.get("LANDWATCH_WFS_PAGE_WORKERS", "4").strip() or "4")
+MAX_PER_HOST = int(os.environ.get("LANDWATCH_WFS_MAX_PER_HOST", "4").strip() or "4")
+MIN_INTERVAL_SECONDS = float(os.environ.get("LANDWATCH_WFS_MIN_INTERVAL_SECONDS", "0").strip() or "0")
+OUTPUT_FORMAT = os.environ.get("LANDWATCH_WFS_OUTPUT_FORMAT", "shp").strip().lower() or "shp"
+WATERMARKS_ENABLED = os.environ.get("LANDWATCH_WFS_WATERMARKS", "1").strip().lower() not in ("0", "false", "no")
+# Watermark mais velho que isso (dias desde o ultimo download completo) forca novo download; 0 = sem limite.
+WATERMARK_MAX_AGE_DAYS = int(os.environ.get("LANDWATCH_WFS_WATERMARK_MAX_AGE_DAYS", "30").strip() or "30")
+WATERMARK_DATE_KEY = "downloaded_on"
+# Copia (hardlink) do ultimo artefato baixado, fora da pasta da categoria; base do download incremental.
+BASE_DIRNAME = ".wfs_base"
+
+# formato -> (driver OGR, extensao principal, opcoes de escrita)
+OUTPUT_FORMATS = {
+    "shp": ("ESRI Shapefile", ".shp", {}),
+    # Sem indice espacial: mantem a ordem das paginas e nao reordena o arquivo no fim.
+    "fgb": ("FlatGeobuf", ".fgb", {"geometry_type": "Unknown", "layer_options": {"SPATIAL_INDEX": "NO"}}),
+}
+
+_NUMBER_MATCHED_RE = re.compile(r'numberMatched="(\d+)"')
+_XSD_ELEMENT_RE = re.compile(r"<(?:\w+:)?element\b([^>]*)>")
+_XSD_ATTR_RE = re.compile(r'(\w+)="([^"]*)"')
+# tipo XSD (sem prefixo) -> dtype pandas de cada atributo; o resto vira texto.
+_XSD_DTYPES = {
+    "int": "Int64",
+    "integer": "Int64",
+    "long": "Int64",
+    "short": "Int64",
+    "byte": "Int64",
+    "double": "float64",
+    "float": "float64",
+    "decimal": "float64",
+    "boolean": "boolean",
+}
+
+
+class _HostLimiter:
+    """Limita requisicoes simultaneas e o intervalo minimo entre inicios por host."""
+
+    def __init__(self, max_concurrent: int, min_interval: float):
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._lock = threading.Lock()
+        self._min_interval = max(0.0, min_interval)
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        if self._min_interval:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + self._min_interval
+            if start > now:
+                time.sleep(start - now)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._slots.release()
+        return False
+
+
+_LIMITERS: Dict[str, _HostLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def host_limiter(url: str) -> _HostLimiter:
+    host = urlparse(url).netloc.lower()
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(host)
+        if limiter is None:
+            limiter = _HostLimiter(MAX_PER_HOST, MIN_INTERVAL_SECONDS)
+            _LIMITERS[host] = limiter
+        return limiter
+
+
+class WfsClient:
+    """Cliente WFS 2.0 paginado: numberMatched via resultType=hits e paginas em paralelo.
+
+    As paginas sao entregues em ordem de startIndex; no maximo `page_workers`
+    paginas ficam em voo/memoria ao mesmo tempo.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        type_name: str,
+        page_size: int,
+        page_workers: Optional[int] = None,
+        session: Optional[requests.Session] = None,
+        label: Optional[str] = None,
+    ):
+        self.url = url
+        self.type_name = type_name
+        self.page_size = max(1, int(page_size))
+        self.page_workers = max(1, PAGE_WORKERS if page_workers is None else int(page_workers))
+        self.session = session or requests.Session()
+        self.label = label or type_name
+
+    def _base_params(self, extra: Optional[dict]) -> dict:
+        params = {
+            "service": "WFS",
+            "version": "2.0.0",
+            "request": "GetFeature",
+            "typeNames": self.type_name,
+        }
+        params.update(extra or {})
+        return params
+
+    def _get(self, params: dict, index: int):
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                with host_limiter(self.url):
+                    resp = self.session.get(self.url, params=params, timeout=TIMEOUT)
+                resp.raise_for_status()
+                return resp
+            except requests.exceptions.RequestException as e:
+                log_warn(f"{self.label} (idx={index}) tentativa {attempt}/{MAX_RETRIES} falhou: {e}")
+                if attempt < MAX_RETRIES:
+                    time.sleep(RETRY_BACKOFF * attempt)
+        return None
+
+    def count_matched(self, filters: Optional[dict] = None) -> Optional[int]:
+        """numberMatched do servidor (resultType=hits); None se o servidor nao informar."""
+        params = self._base_params(filters)
+        params["resultType"] = "hits"
+        resp = self._get(params, index=-1)
+        if resp is None:
+            return None
+        match = _NUMBER_MATCHED_RE.search(resp.text or "")
+        if match:
+            return int(match.group(1))
+        try:
+            payload = resp.json()
+        except ValueError:
+            return None
+        value = payload.get("numberMatched", payload.get("totalFeatures"))
+        return int(value) if isinstance(value, int) or (isinstance(value, str) and value.isdigit()) else None
+
+    def describe_schema(self) -> Optional[Dict[str, str]]:
+        """{atributo: dtype} pelo DescribeFeatureType (sem a geometria); None se indisponivel."""
+        params = {
+            "service": "WFS",
+            "version": "2.0.0",
+            "request": "DescribeFeatureType",
+            "typeNames": self.type_name,
+        }
+        resp = self._get(params, index=-1)
+        text = (resp.text or "") if resp is not None else ""
+        schema: Dict[str, str] = {}
+        for match in _XSD_ELEMENT_RE.finditer(text):
+            attrs = dict(_XSD_ATTR_RE.findall(match.group(1)))
+            name, xsd_type = attrs.get("name"), attrs.get("type", "")
+            # substitutionGroup marca o elemento da propria feicao, nao um atributo.
+            if not name or xsd_type.startswith("gml:") or "substitutionGroup" in attrs:
+                continue
+            schema[name] = _XSD_DTYPES.get(xsd_type.split(":")[-1], "string")
+        if not schema:
+            log_warn(f"{self.label}: DescribeFeatureType indisponivel; esquema inferido da primeira pagina.")
+            return None
+        return schema
+
+    def _fetch_page(self, filters: Optional[dict], start_index: int, count: int) -> List[dict]:
+        params = self._base_params(filters)
+        params.update({"outputFormat": "application/json", "count": count, "startIndex": start_index})
+        resp = self._get(params, start_index)
+        if resp is None:
+            raise RuntimeError(f"{self.label}: pagina startIndex={start_index} excedeu tentativas.")
+        return resp.json().get("features", [])
+
+    def _fetch_range(self, filters: Optional[dict], start_index: int, count: int) -> List[dict]:
+        """Feicoes [start_index, start_index + count); pagina curta (teto do servidor, ex. maxFeatures) e completada."""
+        feats = list(self._fetch_page(filters, start_index, count))
+        while 0 < len(feats) < count:
+            more = self._fetch_page(filters, start_index + len(feats), count - len(feats))
+            if not more:
+                break
+            feats.extend(more)
+        return feats
+
+    def iter_pages(self, filters: Optional[dict] = None, total: Optional[int] = None) -> Iterator[List[dict]]:
+        if total is None:
+            total = self.count_matched(filters)
+        if total is None:
+            log_warn(f"{self.label}: numberMatched indisponivel; paginando sequencialmente.")
+            yield from self._iter_pages_sequential(filters)
+            return
+        if total == 0:
+            return
+        starts = list(range(0, total, self.page_size))
+        log_info(f"{self.label}: {total} registros em {len(starts)} pagina(s) (workers={self.page_workers})")
+        loaded = 0
+        with ThreadPoolExecutor(max_workers=self.page_workers, thread_name_prefix="landwatch-wfs") as pool:
+            pending = []
+            next_start = 0
+            while next_start < len(starts) or pending:
+                while next_start < len(starts) and len(pending) < self.page_workers:
+                    start = starts[next_start]
+                    count = min(self.page_size, total - start)
+                    pending.append(pool.submit(self._fetch_range, filters, start, count))
+                    next_start += 1
+                feats = pending.pop(0).result()
+                loaded += len(feats)
+                log_info(f"{self.label}: {loaded} registros carregados...")
+                if feats:
+                    yield feats
+        if loaded < total:
+            # Camada truncada viraria feicoes "desaparecidas" na ingestao: falha em vez de gravar.
+            raise RuntimeError(f"{self.label}: servidor entregou {loaded} de {total} registros.")
+        # Registros publicados durante o download ficam para a proxima pagina.
+        yield from self._iter_pages_sequential(filters, start_index=loaded)
+
+    def _iter_pages_sequential(self, filters: Optional[dict], start_index: int = 0) -> Iterator[List[dict]]:
+        index = start_index
+        while True:
+            feats = self._fetch_page(filters, index, self.page_size)
+            if not feats:
+                return
+            index += len(feats)
+            log_info(f"{self.label}: {index} registros carregados...")
+            yield feats
+
+    def max_value(self, field: str, filters: Optional[dict] = None) -> Optional[Any]:
+        """Maior valor de `field` (uma feicao com sortBy DESC); None se a camada estiver vazia."""
+        extra = dict(filters or {})
+        extra["sortBy"] = f"{field} D"
+        feats = self._fetch_page(extra, 0, 1)
+        if not feats:
+            return None
+        return (feats[0].get("properties") or {}).get(field)
+
+    def fetch_all(self, filters: Optional[dict] = None) -> List[dict]:
+        feats: List[dict] = []
+        for page in self.iter_pages(filters):
+            feats.extend(page)
+        return feats
+
+
+class PageStats:
+    """Conta as feicoes (e o maior `field`) que passam pelo iterador de paginas.
+
+    O watermark gravado no manifest vem do que foi escrito no arquivo, nao do
+    numberMatched pedido antes do download (que pode mudar durante ele).
+    """
+
+    def __init__(self, field: Optional[str] = None):
+        self.field = field
+        self.count = 0
+        self.max_value: Optional[Any] = None
+
+    def track(self, pages: Iterable[List[dict]]) -> Iterator[List[dict]]:
+        for page in pages:
+            self.count += len(page)
+            if self.field:
+                for feat in page:
+                    value = (feat.get("properties") or {}).get(self.field)
+                    if value is not None and (self.max_value is None or value > self.max_value):
+                        self.max_value = value
+            yield page
+
+
+def content_signal(client: WfsClient, fields: Iterable[str], filters: Optional[dict] = None) -> Dict[str, Any]:
+    """Maior valor de cada campo existente na camada (um GetFeature de 1 feicao por campo).
+
+    Complementa o numberMatched no watermark: correcoes que mantem a contagem
+    costumam mudar a data da imagem ou a area. Campos fora do DescribeFeatureType
+    sao ignorados (pedir sortBy por campo inexistente e erro no GeoServer).
+    """
+    schema = client.describe_schema() or {}
+    return {f"max_{field}": client.max_value(field, filters) for field in fields if field in schema}
+
+
+def watermark_unchanged(prev_watermark: Optional[dict], watermark: dict, snapshot_date: str) -> bool:
+    """True se o watermark bate com o anterior e o ultimo download completo nao passou de WATERMARK_MAX_AGE_DAYS."""
+    if not prev_watermark:
+        return False
+    if {k: v for k, v in prev_watermark.items() if k != WATERMARK_DATE_KEY} != watermark:
+        return False
+    if WATERMARK_MAX_AGE_DAYS <= 0:
+        return True
+    try:
+        downloaded_on = date.fromisoformat(str(prev_watermark.get(WATERMARK_DATE_KEY))[:10])
+        age = (date.fromisoformat(str(snapshot_date)[:10]) - downloaded_on).days
+    except ValueError:
+        return False
+    return age < WATERMARK_MAX_AGE_DAYS
+
+
+def resolve_output_format(fmt: Optional[str] = None) -> str:
+    fmt = (fmt or OUTPUT_FORMAT).strip().lower()
+    if fmt not in OUTPUT_FORMATS:
+        log_warn(f"LANDWATCH_WFS_OUTPUT_FORMAT={fmt!r} invalido; usando shp.")
+        return "shp"
+    return fmt
+
+
+def infer_schema(gdf: gpd.GeoDataFrame) -> Dict[str, str]:
+    """Esquema a partir de uma pagina (sem DescribeFeatureType).
+
+    Inteiros viram float64 e colunas so com nulos viram texto: numa pagina
+    seguinte o mesmo atributo pode trazer decimais.
+    """
+    schema = {}
+    for col in gdf.columns:
+        if col == gdf.geometry.name:
+            continue
+        series = gdf[col]
+        if series.isna().all():
+            schema[col] = "string"
+        elif pd.api.types.is_bool_dtype(series):
+            schema[col] = "boolean"
+        elif pd.api.types.is_numeric_dtype(series):
+            schema[col] = "float64"
+        else:
+            schema[col] = "string"
+    return schema
+
+
+def apply_schema(gdf: gpd.GeoDataFrame, schema: Dict[str, str]) -> gpd.GeoDataFrame:
+    """Mesmas colunas, ordem e tipos em toda pagina (o append nao muda o tipo do campo criado na primeira)."""
+    geometry = gdf.geometry.name
+    for col, dtype in schema.items():
+        if col in gdf.columns:
+            gdf[col] = gdf[col].astype(dtype)
+        else:
+            gdf[col] = pd.Series(None, index=gdf.index, dtype=dtype)
+    extra = [c for c in gdf.columns if c not in schema and c != geometry]
+    if extra:
+        log_warn(f"Atributos fora do esquema descartados: {', '.join(map(str, extra))}")
+    return gdf[[*schema, geometry]]
+
+
+def write_pages(
+    pages: Iterable[List[dict]],
+    out_dir: Path,
+    name: str,
+    fmt: Optional[str] = None,
+    crs: str = "EPSG:4674",
+    base_files: Optional[List[Path]] = None,
+    schema: Optional[Dict[str, str]] = None,
+) -> List[Path]:
+    """Grava as paginas GeoJSON direto em disco (append por pagina).
+
+    O pico de memoria fica em uma pagina (mais as que o WfsClient tem em voo).
+    O arquivo e montado num diretorio temporario ao lado de `out_dir` e so
+    substitui o artefato anterior quando o download termina; retorna [] sem feicoes.
+    Com `base_files` (artefato anterior) as paginas sao anexadas a uma copia dele.
+    Toda pagina e convertida para `schema` (`WfsClient.describe_schema`); sem ele,
+    o esquema vem de `infer_schema` na primeira pagina.
+    """
+    driver, suffix, write_kwargs = OUTPUT_FORMATS[resolve_output_format(fmt)]
+    ensure_dir(out_dir)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{name}-", dir=out_dir))
+    try:
+        tmp_path = tmp_dir / f"{name}{suffix}"
+        for base in base_files or []:
+            shutil.copy2(base, tmp_dir / base.name)
+        has_base = tmp_path.exists()
+        written = 0
+        for page in pages:
+            if not page:
+                continue
+            gdf = gpd.GeoDataFrame.from_features(page, crs=crs)
+            if gdf.empty:
+                continue
+            if schema is None:
+                schema = infer_schema(gdf)
+            gdf = apply_schema(gdf, schema)
+            pyogrio.write_dataframe(gdf, tmp_path, driver=driver, append=has_base or written > 0, **write_kwargs)
+            written += len(gdf)
+        if not written and not has_base:
+            return []
+        # Remove o artefato anterior (inclusive sidecars/outro formato) so depois do download completo.
+        for old in out_dir.glob(f"{name}.*"):
+            if old.is_file():
+                old.unlink()
+        out_files = []
+        for src in sorted(tmp_dir.iterdir()):
+            dest = out_dir / src.name
+            os.replace(src, dest)
+            out_files.append(dest)
+        log_info(f"{name}: {written} feicoes gravadas em {out_dir / (name + suffix)}")
+        return out_files
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def base_dir(work_dir: Path, category: str) -> Path:
+    return work_dir / BASE_DIRNAME / category
+
+
+def keep_base(files: List[Path], target_dir: Path, name: str) -> None:
+    """Guarda o artefato como base do proximo download incremental (hardlink, senao copia)."""
+    try:
+        ensure_dir(target_dir)
+        for old in target_dir.glob(f"{name}.*"):
+            old.unlink()
+        for src in files:
+            dest = target_dir / src.name
+            try:
+                os.link(src, dest)
+            except OSError:
+                shutil.copy2(src, dest)
+    except Exception as exc:
+        log_warn(f"{name}: nao foi possivel guardar base incremental ({exc})")
+
+
+def find_base(target_dir: Path, name: str, fingerprint: Optional[str], fmt: Optional[str] = None) -> List[Path]:
+    """Base guardada, so se for exatamente o artefato do manifest anterior (mesmo fingerprint)."""
+    suffix = OUTPUT_FORMATS[resolve_output_format(fmt)][1]
+    files = sorted(target_dir.glob(f"{name}.*"))
+    if not fingerprint or not any(p.suffix.lower() == suffix for p in files):
+        return []
+    return files if compute_fingerprint(files) == fingerprint else []
+
+
+def unchanged_artifact(
+    category: str,
+    dataset_code: str,
+    snapshot_date: str,
+    watermark: dict,
+    extra: Optional[dict] = None,
+) -> DatasetArtifact:
+    merged = dict(extra or {})
+    merged[WATERMARK_KEY] = watermark
+    return manifest_unchanged_artifact(category, dataset_code, snapshot_date, merged)
@@ -3,6 +3,7 @@ import os
 import shutil
 import sys
 import tempfile
+import threading
 import unittest
 from pathlib import Path
 from unittest.mock import patch
@@ -14,6 +15,8 @@ if str(ROOT) not in sys.path:
 import run_job
 from steps.common import DatasetArtifact, JobConfig
 from steps.ingest import IngestResult
+from steps.manifest import RELEASE_DATE_KEY, WATERMARK_KEY
+from steps.wfs import unchanged_artifact
 
 
 class RunJobFlowTest(unittest.TestCase):
@@ -74,6 +77,53 @@ class RunJobFlowTest(unittest.TestCase):
         self.assertEqual(results["PRODES"]["status"], "ingested")
         self.assertEqual(results["DETER"]["status"], "ingested")
 
+    def test_pipeline_ingests_categories_while_slower_downloads_run(self):
+        order = []
+        config = self._config()
+        prodes_ingested = threading.Event()
+        sicar_artifacts = [self._artifact("SICAR", "CAR_SP", b"c")]
+
+        def slow_download_sicar(_work_dir, _snapshot_date, prev_manifest=None):
+            # So termina depois que outra categoria ja foi ingerida.
+            self.assertTrue(prodes_ingested.wait(timeout=5))
+            order.append(("download", "SICAR"))
+            return sicar_artifacts
+
+        def fake_run_ingest_only(artifacts, snapshot_date):
+            codes = [a.dataset_code for a in artifacts]
+            order.append(("ingest", codes))
+            if "PRODES_A" in codes:
+                prodes_ingested.set()
+            return IngestResult(successes=codes, success_versions=[len(order)], failures={})
+
+        with (
+            patch.dict(os.environ, {"LANDWATCH_LOCAL_ROOT": str(self.tmp_dir / "storage")}),
+            patch.object(run_job, "JOB_PIPELINE", True),
+            patch.object(run_job, "now_run_id", return_value="20260521T000000Z"),
+            patch.object(run_job, "download_prodes", return_value=[self._artifact("PRODES", "PRODES_A", b"a")]),
+            patch.object(run_job, "download_sicar", side_effect=slow_download_sicar),
+            patch.object(run_job, "run_ingest_only", side_effect=fake_run_ingest_only),
+            patch.object(
+                run_job,
+                "refresh_mvs_once",
+                side_effect=lambda codes=None, versions=None: order.append(("mv", sorted(codes or []), sorted(versions or []))) or True,
+            ),
+            patch.object(run_job, "run_pmtiles_build", return_value=True),
+        ):
+            results = run_job.run_all(config, "2026-05-21", categories=["PRODES", "SICAR"])
+
+        self.assertEqual(
+            order,
+            [
+                ("ingest", ["PRODES_A"]),
+                ("download", "SICAR"),
+                ("ingest", ["CAR_SP"]),
+                ("mv", ["CAR_SP", "PRODES_A"], [1, 3]),
+            ],
+        )
+        self.assertEqual(results["PRODES"]["status"], "ingested")
+        self.assertEqual(results["SICAR"]["status"], "ingested")
+
     def test_failed_dataset_does_not_advance_manifest_fingerprint(self):
         config = self._config()
         storage_root = self.tmp_dir / "storage"
@@ -115,5 +165,177 @@ class RunJobFlowTest(unittest.TestCase):
         pmtiles_mock.assert_not_called()
 
 
+    def test_unchanged_wfs_dataset_is_not_ingested_and_keeps_previous_manifest_entry(self):
+        config = self._config()
+        storage_root = self.tmp_dir / "storage"
+        prev_dir = storage_root / "manifests" / "DETER"
+        prev_dir.mkdir(parents=True)
+        watermark = {"count": 5, "max_view_date": "2026-05-19Z"}
+        prev_manifest = {
+            "run_id": "old",
+            "category": "DETER",
+            "status": "ingested",
+            "datasets": [
+                {
+                    "dataset_code": "DETER_A",
+                    "snapshot_date": "2026-05-20",
+                    "files": ["DETER_A.shp"],
+                    "fingerprint": "previous-fingerprint",
+                    "extra": {WATERMARK_KEY: watermark},
+                }
+            ],
+        }
+        (prev_dir / "20260520T000000Z.json").write_text(json.dumps(prev_manifest), encoding="utf-8")
+        seen_prev = []
+
+        def fake_download_deter(_work_dir, snapshot_date, prev_manifest=None):
+            seen_prev.append(prev_manifest["run_id"])
+            return [unchanged_artifact("DETER", "DETER_A", snapshot_date, watermark)]
+
+        with (
+            patch.dict(os.environ, {"LANDWATCH_LOCAL_ROOT": str(storage_root)}),
+            patch.object(run_job, "now_run_id", return_value="20260521T000000Z"),
+            patch.object(run_job, "download_deter", side_effect=fake_download_deter),
+            patch.object(
+                run_job,
+                "run_ingest_only",
+                return_value=IngestResult(successes=[], failures={}),
+            ) as ingest_mock,
+            patch.object(run_job, "refresh_mvs_once") as refresh_mock,
+            patch.object(run_job, "run_pmtiles_build", return_value=True),
+        ):
+            results = run_job.run_all(config, "2026-05-21", categories=["DETER"])
+
+        manifest_path = storage_root / "manifests" / "DETER" / "20260521T000000Z.json"
+        dataset = json.loads(manifest_path.read_text(encoding="utf-8"))["datasets"][0]
+        self.assertEqual(seen_prev, ["old"])
+        self.assertEqual(results["DETER"]["status"], "skipped")
+        self.assertEqual(dataset["fingerprint"], "previous-fingerprint")
+        self.assertEqual(dataset["files"], ["DETER_A.shp"])
+        self.assertEqual(dataset["extra"][WATERMARK_KEY], watermark)
+        self.assertTrue(all(not call.args[0] for call in ingest_mock.call_args_list))
+        refresh_mock.assert_not_called()
+
+
+    def test_failed_sicar_ingest_keeps_previous_release_date(self):
+        config = self._config()
+        storage_root = self.tmp_dir / "storage"
+        prev_dir = storage_root / "manifests" / "SICAR"
+        prev_dir.mkdir(parents=True)
+        prev_manifest = {
+            "run_id": "old",
+            "category": "SICAR",
+            "status": "ingested",
+            "datasets": [
+                {
+                    "dataset_code": "CAR_SP",
+                    "snapshot_date": "2026-05-20",
+                    "files": ["CAR_SP.shp"],
+                    "fingerprint": "previous-fingerprint",
+                    "extra": {RELEASE_DATE_KEY: "01/05/2026"},
+                }
+            ],
+        }
+        (prev_dir / "20260520T000000Z.json").write_text(json.dumps(prev_manifest), encoding="utf-8")
+        artifact = self._artifact("SICAR", "CAR_SP", b"new")
+        artifact.extra = {RELEASE_DATE_KEY: "20/05/2026"}
+
+        with (
+            patch.dict(os.environ, {"LANDWATCH_LOCAL_ROOT": str(storage_root)}),
+            patch.object(run_job, "now_run_id", return_value="20260521T000000Z"),
+            patch.object(run_job, "download_sicar", return_value=[artifact]),
+            patch.object(run_job, "run_ingest_only", return_value=IngestResult(successes=[], failures={"CAR_SP": "exit=1"})),
+            patch.object(run_job, "refresh_mvs_once"),
+            patch.object(run_job, "run_pmtiles_build"),
+        ):
+            run_job.run_all(config, "2026-05-21", categories=["SICAR"])
+
+        manifest_path = storage_root / "manifests" / "SICAR" / "20260521T000000Z.json"
+        dataset = json.loads(manifest_path.read_text(encoding="utf-8"))["datasets"][0]
+        self.assertEqual(dataset["fingerprint"], "previous-fingerprint")
+        self.assertEqual(dataset["extra"][RELEASE_DATE_KEY], "01/05/2026")
+
+    def test_raw_objects_are_deduplicated_and_refcounted_on_cleanup(self):
+        config = self._config()
+        config.save_raw = True
+        storage_root = self.tmp_dir / "storage"
+
+        def run(run_id, contents):
+            artifacts = [self._artifact("PRODES", code, body) for code, body in contents.items()]
+            with (
+                patch.dict(os.environ, {"LANDWATCH_LOCAL_ROOT": str(storage_root)}),
+                patch.object(run_job, "now_run_id", return_value=run_id),
+                patch.object(run_job, "download_prodes", return_value=artifacts),
+                patch.object(
+                    run_job,
+                    "run_ingest_only",
+                    side_effect=lambda arts, _date: IngestResult(successes=[a.dataset_code for a in arts], failures={}),
+                ),
+                patch.object(run_job, "refresh_mvs_once", return_value=True),
+                patch.object(run_job, "run_pmtiles_build", return_value=True),
+            ):
+                run_job.run_all(config, "2026-05-21", categories=["PRODES"])
+            manifest_path = storage_root / "manifests" / "PRODES" / f"{run_id}.json"
+            return json.loads(manifest_path.read_text(encoding="utf-8"))["raw_objects"]
+
+        def objects():
+            return sorted(p.name for p in (storage_root / "raw" / "PRODES" / "objects").rglob("*") if p.is_file())
+
+        first = run("20260519T000000Z", {"PRODES_2020": b"2020", "PRODES_2024": b"v1"})
+        second = run("20260520T000000Z", {"PRODES_2020": b"2020", "PRODES_2024": b"v22"})
+        self.assertEqual(second["PRODES_2020"], first["PRODES_2020"])
+        self.assertEqual(len(objects()), 3)
+
+        third = run("20260521T000000Z", {"PRODES_2020": b"2020", "PRODES_2024": b"v333"})
+
+        # Run 1 saiu pela retencao (2): so o objeto que apenas ele referenciava foi apagado.
+        self.assertFalse((storage_root / "manifests" / "PRODES" / "20260519T000000Z.json").exists())
+        retained = {Path(key).name for refs in (second, third) for files in refs.values() for key in files.values()}
+        self.assertEqual(len(retained), 3)
+        self.assertEqual(objects(), sorted(retained))
+
+    def test_failed_run_on_fresh_node_restores_archived_raw_instead_of_downloading(self):
+        config = self._config()
+        config.save_raw = True
+        storage_root = self.tmp_dir / "storage"
+        ingested = []
+
+        def ingest(fail):
+            def fake(arts, _date):
+                ingested.append([(a.dataset_code, sorted(p.name for p in a.files)) for a in arts])
+                codes = [a.dataset_code for a in arts]
+                return IngestResult(successes=[] if fail else codes, failures={c: "exit=1" for c in codes} if fail else {})
+
+            return fake
+
+        def run(run_id, download, fail):
+            with (
+                patch.dict(os.environ, {"LANDWATCH_LOCAL_ROOT": str(storage_root)}),
+                patch.object(run_job, "now_run_id", return_value=run_id),
+                patch.object(run_job, "resolve_archive_format", return_value="xz"),
+                patch.object(run_job, "download_sicar", side_effect=download),
+                patch.object(run_job, "run_ingest_only", side_effect=ingest(fail)),
+                patch.object(run_job, "refresh_mvs_once", return_value=True),
+                patch.object(run_job, "run_pmtiles_build", return_value=True),
+            ):
+                return run_job.run_all(config, "2026-05-21", categories=["SICAR"])
+
+        def first_download(*_args, **_kwargs):
+            art = self._artifact("SICAR", "CAR_SP", b"shp" * 1000)
+            dbf = art.files[0].with_suffix(".dbf")
+            dbf.write_bytes(b"dbf" * 1000)
+            art.files.append(dbf)
+            return [art]
+
+        self.assertEqual(run("20260520T000000Z", first_download, fail=True)["SICAR"]["status"], "failed")
+        self.assertEqual([p.suffixes for p in (storage_root / "raw" / "SICAR").rglob("*") if p.is_file()], [[".tar", ".xz"]])
+        shutil.rmtree(config.work_dir)
+
+        results = run("20260521T000000Z", AssertionError("nao deveria baixar"), fail=False)
+
+        self.assertEqual(results["SICAR"]["status"], "ingested")
+        self.assertEqual(ingested[-1], [("CAR_SP", ["CAR_SP.dbf", "CAR_SP.shp"])])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,132 @@
+"""Fingerprint de arquivos-fonte compartilhado por run_job e bulk_ingest.
+
+O formato continua o mesmo de antes (sha1 do JSON {nome: {sha1, size}}), entao os
+fingerprints ja gravados em manifests e em lw_dataset_version seguem comparaveis.
+O ganho vem de:
+  - cache por arquivo num sidecar por diretorio (`.landwatch_fingerprints.json`),
+    valido enquanto tamanho + mtime + inode nao mudarem (ctime fica de fora porque o
+    hardlink da base incremental o altera sem mudar o conteudo);
+  - hash dos componentes (.shp/.dbf/...) em paralelo (hashlib libera o GIL).
+Assim o job calcula o fingerprint uma vez e o bulk_ingest reaproveita os digests.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CACHE_FILENAME = ".landwatch_fingerprints.json"
+CACHE_ENABLED = os.environ.get("LANDWATCH_FINGERPRINT_CACHE", "1").strip().lower() not in ("0", "false", "no")
+WORKERS = int(os.environ.get("LANDWATCH_FINGERPRINT_WORKERS", "4").strip() or "4")
+CHUNK_BYTES = 8 * 1024 * 1024
+
+_LOCK = threading.Lock()
+# (caminho resolvido, size, mtime_ns, inode) -> sha1
+_MEMORY: Dict[Tuple[str, int, int, int], str] = {}
+
+
+def _stat_entry(st: os.stat_result) -> dict:
+    return {
+        "size": int(st.st_size),
+        "mtime_ns": int(st.st_mtime_ns),
+        "inode": int(st.st_ino),
+    }
+
+
+def sha1_file(path: Path, chunk_bytes: int = CHUNK_BYTES) -> str:
+    h = hashlib.sha1()
+    with Path(path).open("rb") as f:
+        while True:
+            b = f.read(chunk_bytes)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def _load_dir_cache(directory: Path) -> dict:
+    try:
+        payload = json.loads((directory / CACHE_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def _store_dir_cache(directory: Path, updates: Dict[str, dict]) -> None:
+    """Mescla `updates` no sidecar (escrita atomica); descarta entradas de arquivos que sumiram."""
+    with _LOCK:
+        cache = _load_dir_cache(directory)
+        cache.update(updates)
+        cache = {name: entry for name, entry in cache.items() if (directory / name).exists()}
+        tmp = directory / f"{CACHE_FILENAME}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            tmp.write_text(json.dumps(cache, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, directory / CACHE_FILENAME)
+        except OSError:
+            # Diretorio somente leitura: segue sem cache em disco.
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+
+def _digest(path: Path, use_cache: bool) -> Tuple[str, int, Optional[dict]]:
+    """(sha1, size, entrada nova para o sidecar ou None se veio do cache)."""
+    st = path.stat()
+    entry = _stat_entry(st)
+    key = (str(path.resolve()), entry["size"], entry["mtime_ns"], entry["inode"])
+    if use_cache:
+        with _LOCK:
+            cached = _MEMORY.get(key)
+        if cached:
+            return cached, entry["size"], None
+        stored = _load_dir_cache(path.parent).get(path.name) or {}
+        if stored.get("sha1") and all(stored.get(k) == v for k, v in entry.items()):
+            with _LOCK:
+                _MEMORY[key] = stored["sha1"]
+            return stored["sha1"], entry["size"], None
+    digest = sha1_file(path)
+    if not use_cache:
+        return digest, entry["size"], None
+    with _LOCK:
+        _MEMORY[key] = digest
+    return digest, entry["size"], dict(entry, sha1=digest)
+
+
+def file_digests(
+    paths: Iterable[Path],
+    workers: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+) -> Dict[Path, Tuple[str, int]]:
+    """{arquivo: (sha1, size)} dos arquivos existentes, hasheados em paralelo e com cache."""
+    files: List[Path] = [p for p in sorted({Path(p) for p in paths}, key=lambda x: x.name.lower()) if p.exists()]
+    use_cache = CACHE_ENABLED if use_cache is None else use_cache
+    workers = max(1, min(WORKERS if workers is None else int(workers), len(files) or 1))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = list(pool.map(lambda p: _digest(p, use_cache), files))
+    else:
+        digests = [_digest(p, use_cache) for p in files]
+
+    updates: Dict[Path, Dict[str, dict]] = {}
+    out: Dict[Path, Tuple[str, int]] = {}
+    for path, (digest, size, entry) in zip(files, digests):
+        out[path] = (digest, size)
+        if entry:
+            updates.setdefault(path.parent, {})[path.name] = entry
+    for directory, entries in updates.items():
+        _store_dir_cache(directory, entries)
+    return out
+
+
+def fingerprint_files(paths: Iterable[Path], workers: Optional[int] = None, use_cache: Optional[bool] = None) -> str:
+    """Fingerprint de um conjunto de arquivos (inexistentes sao ignorados)."""
+    manifest = {
+        path.name: {"sha1": digest, "size": size}
+        for path, (digest, size) in file_digests(paths, workers=workers, use_cache=use_cache).items()
+    }
+    payload = json.dumps(manifest, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
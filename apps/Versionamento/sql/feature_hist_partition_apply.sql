@@ -0,0 +1,301 @@
+SET search_path TO landwatch, app, public, pg_catalog;
+
+-- Particiona lw_feature_state, lw_feature_delta, lw_feature_geom_hist e
+-- lw_feature_attr_pack_hist por LIST (dataset_id):
+--   * uma partição quente por dataset grande (CAR_<UF>, ver is_hot_feature_dataset);
+--   * uma partição DEFAULT para o resto.
+-- Os UPDATE/DELETE do ingest.sql e os refresh_* (que já filtram por
+-- dataset_id) passam a tocar só a partição do dataset: vacuum, bloat e
+-- profundidade de índice ficam por dataset.
+--
+-- Execução:
+-- 1) Nenhum ingest rodando (o script aborta se houver versão RUNNING).
+-- 2) A tabela antiga fica como <tabela>_unpartitioned (índices com sufixo _unpart)
+--    para rollback. Depois de validar, remova manualmente:
+--    DROP TABLE landwatch.lw_feature_geom_hist_unpartitioned; (etc.)
+-- 3) Views/MVs que dependem dessas tabelas são recriadas com a mesma definição
+--    e índices (MVs são repopuladas). Reaplique GRANTs específicos, se houver.
+-- 4) Partições quentes de datasets novos são criadas pelo bulk_ingest.py
+--    (landwatch.ensure_feature_partitions) antes do staging.
+
+CREATE OR REPLACE FUNCTION landwatch.is_hot_feature_dataset(p_code text)
+RETURNS boolean
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT COALESCE(upper(p_code) ~ '^CAR_[A-Z]{2}$', false);
+$$;
+
+BEGIN;
+
+SET LOCAL lock_timeout = '30s';
+SET LOCAL statement_timeout = 0;
+
+CREATE TEMP TABLE __lw_part_views (
+  view_oid oid PRIMARY KEY,
+  depth integer NOT NULL,
+  relkind "char" NOT NULL,
+  view_name text NOT NULL,
+  view_def text NOT NULL,
+  index_defs text[] NOT NULL
+) ON COMMIT DROP;
+
+DO $$
+DECLARE
+  v_tables text[] := ARRAY['lw_feature_state', 'lw_feature_delta', 'lw_feature_geom_hist', 'lw_feature_attr_pack_hist'];
+  v_todo text[] := ARRAY[]::text[];
+  v_oids oid[] := ARRAY[]::oid[];
+  v_table text;
+  v_oid oid;
+  v_running integer;
+  v_view record;
+  v_idx record;
+  v_con record;
+  v_ds record;
+  v_index_defs text[];
+  v_pk_cols text[];
+  v_def text;
+  v_rows bigint;
+BEGIN
+  FOREACH v_table IN ARRAY v_tables LOOP
+    SELECT c.oid INTO v_oid
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'landwatch' AND c.relname = v_table AND c.relkind = 'r';
+    IF v_oid IS NOT NULL THEN
+      v_todo := v_todo || v_table;
+      v_oids := v_oids || v_oid;
+    END IF;
+  END LOOP;
+
+  IF COALESCE(array_length(v_todo, 1), 0) = 0 THEN
+    RAISE NOTICE 'Tabelas de historico ja particionadas; nada a fazer.';
+    RETURN;
+  END IF;
+
+  SELECT count(*) INTO v_running
+  FROM landwatch.lw_dataset_version v
+  WHERE v.status = 'RUNNING';
+  IF v_running > 0 THEN
+    RAISE EXCEPTION 'Ha % versao(oes) RUNNING, abortando particionamento.', v_running;
+  END IF;
+
+  -- Views/MVs dependentes (recursivo): guardadas antes do rename para que a
+  -- definição aponte para o nome original (que passa a ser a tabela particionada).
+  INSERT INTO __lw_part_views (view_oid, depth, relkind, view_name, view_def, index_defs)
+  WITH RECURSIVE deps AS (
+    SELECT DISTINCT r.ev_class AS view_oid, 1 AS depth
+    FROM pg_depend d
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE d.classid = 'pg_rewrite'::regclass
+      AND d.refclassid = 'pg_class'::regclass
+      AND d.refobjid = ANY(v_oids)
+      AND r.ev_class <> d.refobjid
+    UNION
+    SELECT r.ev_class, deps.depth + 1
+    FROM deps
+    JOIN pg_depend d
+      ON d.refobjid = deps.view_oid
+     AND d.refclassid = 'pg_class'::regclass
+     AND d.classid = 'pg_rewrite'::regclass
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE r.ev_class <> deps.view_oid
+  )
+  SELECT
+    c.oid,
+    max(deps.depth),
+    c.relkind,
+    format('%I.%I', n.nspname, c.relname),
+    pg_get_viewdef(c.oid),
+    ARRAY(SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i WHERE i.indrelid = c.oid)
+  FROM deps
+  JOIN pg_class c ON c.oid = deps.view_oid
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  GROUP BY c.oid, c.relkind, n.nspname, c.relname;
+
+  FOR v_view IN SELECT * FROM __lw_part_views ORDER BY depth DESC LOOP
+    EXECUTE format(
+      'DROP %s %s',
+      CASE WHEN v_view.relkind = 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+      v_view.view_name
+    );
+  END LOOP;
+
+  FOREACH v_table IN ARRAY v_todo LOOP
+    v_oid := format('landwatch.%I', v_table)::regclass::oid;
+
+    -- índices secundários recriados na tabela nova com o mesmo nome; UNIQUE sem
+    -- dataset_id não é suportado em tabela particionada e fica só na antiga.
+    v_index_defs := ARRAY[]::text[];
+    FOR v_idx IN
+      SELECT
+        ic.relname,
+        i.indisprimary,
+        i.indisunique,
+        pg_get_indexdef(i.indexrelid) AS def,
+        EXISTS (
+          SELECT 1
+          FROM unnest(i.indkey) AS k(attnum)
+          JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+          WHERE a.attname = 'dataset_id'
+        ) AS has_dataset_id
+      FROM pg_index i
+      JOIN pg_class ic ON ic.oid = i.indexrelid
+      WHERE i.indrelid = v_oid
+    LOOP
+      IF NOT v_idx.indisprimary THEN
+        IF v_idx.indisunique AND NOT v_idx.has_dataset_id THEN
+          RAISE NOTICE 'Indice unico % sem dataset_id nao sera recriado em %.', v_idx.relname, v_table;
+        ELSE
+          v_index_defs := v_index_defs || v_idx.def;
+        END IF;
+      END IF;
+      EXECUTE format('ALTER INDEX landwatch.%I RENAME TO %I', v_idx.relname, left(v_idx.relname, 56) || '_unpart');
+    END LOOP;
+
+    -- PK precisa conter a chave de partição (lw_feature_delta: version_id, feature_id).
+    SELECT array_agg(a.attname::text ORDER BY k.ord)
+      INTO v_pk_cols
+    FROM pg_index i
+    CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+    WHERE i.indrelid = v_oid AND i.indisprimary;
+    IF v_pk_cols IS NOT NULL AND NOT ('dataset_id' = ANY(v_pk_cols)) THEN
+      v_pk_cols := ARRAY['dataset_id'] || v_pk_cols;
+    END IF;
+
+    EXECUTE format('ALTER TABLE landwatch.%I RENAME TO %I', v_table, v_table || '_unpartitioned');
+    EXECUTE format(
+      'CREATE TABLE landwatch.%I (LIKE landwatch.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY LIST (dataset_id)',
+      v_table,
+      v_table || '_unpartitioned'
+    );
+    EXECUTE format('CREATE TABLE landwatch.%I PARTITION OF landwatch.%I DEFAULT', v_table || '_default', v_table);
+    FOR v_ds IN
+      SELECT d.dataset_id
+      FROM landwatch.lw_dataset d
+      WHERE landwatch.is_hot_feature_dataset(d.code)
+      ORDER BY d.dataset_id
+    LOOP
+      EXECUTE format(
+        'CREATE TABLE landwatch.%I PARTITION OF landwatch.%I FOR VALUES IN (%s)',
+        v_table || '_d' || v_ds.dataset_id,
+        v_table,
+        v_ds.dataset_id
+      );
+    END LOOP;
+
+    EXECUTE format('INSERT INTO landwatch.%I SELECT * FROM landwatch.%I', v_table, v_table || '_unpartitioned');
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    IF v_pk_cols IS NOT NULL THEN
+      EXECUTE format(
+        'ALTER TABLE landwatch.%I ADD CONSTRAINT %I PRIMARY KEY (%s)',
+        v_table,
+        v_table || '_pkey',
+        (SELECT string_agg(quote_ident(c), ', ') FROM unnest(v_pk_cols) AS c)
+      );
+    END IF;
+    FOREACH v_def IN ARRAY v_index_defs LOOP
+      EXECUTE v_def;
+    END LOOP;
+    FOR v_con IN
+      SELECT conname, pg_get_constraintdef(oid) AS def
+      FROM pg_constraint
+      WHERE conrelid = v_oid AND contype = 'f'
+      ORDER BY conname
+    LOOP
+      EXECUTE format('ALTER TABLE landwatch.%I ADD CONSTRAINT %I %s', v_table, v_con.conname, v_con.def);
+    END LOOP;
+
+    EXECUTE format('ANALYZE landwatch.%I', v_table);
+    RAISE NOTICE '% particionada (% linhas copiadas).', v_table, v_rows;
+  END LOOP;
+
+  FOR v_view IN SELECT * FROM __lw_part_views ORDER BY depth ASC LOOP
+    EXECUTE format(
+      'CREATE %s %s AS %s',
+      CASE WHEN v_view.relkind = 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+      v_view.view_name,
+      rtrim(v_view.view_def, E'; \n')
+    );
+    FOREACH v_def IN ARRAY v_view.index_defs LOOP
+      EXECUTE v_def;
+    END LOOP;
+  END LOOP;
+END $$;
+
+COMMIT;
+
+-- Cria (se faltar) a partição dedicada do dataset nas quatro tabelas. Linhas do
+-- dataset que já estavam na DEFAULT são movidas antes do ATTACH. Sem p_force,
+-- só datasets quentes (is_hot_feature_dataset) ganham partição própria.
+CREATE OR REPLACE FUNCTION landwatch.ensure_feature_partitions(
+  p_dataset_id bigint,
+  p_force boolean DEFAULT false
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_tables text[] := ARRAY['lw_feature_state', 'lw_feature_delta', 'lw_feature_geom_hist', 'lw_feature_attr_pack_hist'];
+  v_table text;
+  v_part text;
+  v_code text;
+  v_created integer := 0;
+BEGIN
+  SELECT d.code INTO v_code
+  FROM landwatch.lw_dataset d
+  WHERE d.dataset_id = p_dataset_id;
+
+  IF v_code IS NULL THEN
+    RAISE EXCEPTION 'Dataset % nao encontrado em landwatch.lw_dataset.', p_dataset_id;
+  END IF;
+  IF NOT p_force AND NOT landwatch.is_hot_feature_dataset(v_code) THEN
+    RETURN 0;
+  END IF;
+
+  FOREACH v_table IN ARRAY v_tables LOOP
+    CONTINUE WHEN NOT EXISTS (
+      SELECT 1
+      FROM pg_partitioned_table pt
+      JOIN pg_class c ON c.oid = pt.partrelid
+      JOIN pg_namespace n ON n.oid = c.relnamespace
+      WHERE n.nspname = 'landwatch' AND c.relname = v_table
+    );
+    v_part := v_table || '_d' || p_dataset_id;
+    CONTINUE WHEN to_regclass(format('landwatch.%I', v_part)) IS NOT NULL;
+
+    EXECUTE format(
+      'CREATE TABLE landwatch.%I (LIKE landwatch.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+      v_part,
+      v_table
+    );
+    IF to_regclass(format('landwatch.%I', v_table || '_default')) IS NOT NULL THEN
+      EXECUTE format(
+        'WITH moved AS (DELETE FROM landwatch.%I WHERE dataset_id = $1 RETURNING *) '
+        'INSERT INTO landwatch.%I SELECT * FROM moved',
+        v_table || '_default',
+        v_part
+      ) USING p_dataset_id;
+    END IF;
+    -- CHECK casando com o bound evita o scan de validação no ATTACH.
+    EXECUTE format(
+      'ALTER TABLE landwatch.%I ADD CONSTRAINT %I CHECK (dataset_id IS NOT NULL AND dataset_id = %s)',
+      v_part,
+      v_part || '_bound',
+      p_dataset_id
+    );
+    EXECUTE format(
+      'ALTER TABLE landwatch.%I ATTACH PARTITION landwatch.%I FOR VALUES IN (%s)',
+      v_table,
+      v_part,
+      p_dataset_id
+    );
+    EXECUTE format('ALTER TABLE landwatch.%I DROP CONSTRAINT %I', v_part, v_part || '_bound');
+    v_created := v_created + 1;
+  END LOOP;
+
+  RETURN v_created;
+END;
+$$;
@@ -0,0 +1,134 @@
+SET search_path TO landwatch, app, public, pg_catalog;
+
+-- Volta lw_feature_state, lw_feature_delta, lw_feature_geom_hist e
+-- lw_feature_attr_pack_hist para heap único. Os dados atuais (inclusive ingests
+-- feitos depois do apply) são copiados de volta para <tabela>_unpartitioned, que
+-- retoma o nome original; a tabela particionada é removida.
+-- Pré-requisito: nenhum ingest rodando e <tabela>_unpartitioned ainda existente.
+
+BEGIN;
+
+SET LOCAL lock_timeout = '30s';
+SET LOCAL statement_timeout = 0;
+
+CREATE TEMP TABLE __lw_part_views (
+  view_oid oid PRIMARY KEY,
+  depth integer NOT NULL,
+  relkind "char" NOT NULL,
+  view_name text NOT NULL,
+  view_def text NOT NULL,
+  index_defs text[] NOT NULL
+) ON COMMIT DROP;
+
+DO $$
+DECLARE
+  v_tables text[] := ARRAY['lw_feature_state', 'lw_feature_delta', 'lw_feature_geom_hist', 'lw_feature_attr_pack_hist'];
+  v_todo text[] := ARRAY[]::text[];
+  v_oids oid[] := ARRAY[]::oid[];
+  v_table text;
+  v_oid oid;
+  v_view record;
+  v_idx record;
+  v_def text;
+  v_rows bigint;
+BEGIN
+  FOREACH v_table IN ARRAY v_tables LOOP
+    SELECT c.oid INTO v_oid
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'landwatch' AND c.relname = v_table AND c.relkind = 'p';
+    IF v_oid IS NOT NULL THEN
+      IF to_regclass(format('landwatch.%I', v_table || '_unpartitioned')) IS NULL THEN
+        RAISE EXCEPTION 'landwatch.% nao existe; rollback manual necessario para %.', v_table || '_unpartitioned', v_table;
+      END IF;
+      v_todo := v_todo || v_table;
+      v_oids := v_oids || v_oid;
+    END IF;
+  END LOOP;
+
+  IF COALESCE(array_length(v_todo, 1), 0) = 0 THEN
+    RAISE NOTICE 'Nenhuma tabela de historico particionada; nada a fazer.';
+    RETURN;
+  END IF;
+
+  INSERT INTO __lw_part_views (view_oid, depth, relkind, view_name, view_def, index_defs)
+  WITH RECURSIVE deps AS (
+    SELECT DISTINCT r.ev_class AS view_oid, 1 AS depth
+    FROM pg_depend d
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE d.classid = 'pg_rewrite'::regclass
+      AND d.refclassid = 'pg_class'::regclass
+      AND d.refobjid = ANY(v_oids)
+      AND r.ev_class <> d.refobjid
+    UNION
+    SELECT r.ev_class, deps.depth + 1
+    FROM deps
+    JOIN pg_depend d
+      ON d.refobjid = deps.view_oid
+     AND d.refclassid = 'pg_class'::regclass
+     AND d.classid = 'pg_rewrite'::regclass
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE r.ev_class <> deps.view_oid
+  )
+  SELECT
+    c.oid,
+    max(deps.depth),
+    c.relkind,
+    format('%I.%I', n.nspname, c.relname),
+    pg_get_viewdef(c.oid),
+    ARRAY(SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i WHERE i.indrelid = c.oid)
+  FROM deps
+  JOIN pg_class c ON c.oid = deps.view_oid
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  GROUP BY c.oid, c.relkind, n.nspname, c.relname;
+
+  FOR v_view IN SELECT * FROM __lw_part_views ORDER BY depth DESC LOOP
+    EXECUTE format(
+      'DROP %s %s',
+      CASE WHEN v_view.relkind = 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+      v_view.view_name
+    );
+  END LOOP;
+
+  FOREACH v_table IN ARRAY v_todo LOOP
+    EXECUTE format('TRUNCATE landwatch.%I', v_table || '_unpartitioned');
+    EXECUTE format('INSERT INTO landwatch.%I SELECT * FROM landwatch.%I', v_table || '_unpartitioned', v_table);
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    EXECUTE format('DROP TABLE landwatch.%I', v_table);
+    EXECUTE format('ALTER TABLE landwatch.%I RENAME TO %I', v_table || '_unpartitioned', v_table);
+
+    FOR v_idx IN
+      SELECT ic.relname
+      FROM pg_index i
+      JOIN pg_class ic ON ic.oid = i.indexrelid
+      WHERE i.indrelid = format('landwatch.%I', v_table)::regclass
+        AND ic.relname LIKE '%\_unpart'
+    LOOP
+      EXECUTE format(
+        'ALTER INDEX landwatch.%I RENAME TO %I',
+        v_idx.relname,
+        left(v_idx.relname, length(v_idx.relname) - length('_unpart'))
+      );
+    END LOOP;
+
+    EXECUTE format('ANALYZE landwatch.%I', v_table);
+    RAISE NOTICE '% restaurada sem particoes (% linhas).', v_table, v_rows;
+  END LOOP;
+
+  FOR v_view IN SELECT * FROM __lw_part_views ORDER BY depth ASC LOOP
+    EXECUTE format(
+      'CREATE %s %s AS %s',
+      CASE WHEN v_view.relkind = 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+      v_view.view_name,
+      rtrim(v_view.view_def, E'; \n')
+    );
+    FOREACH v_def IN ARRAY v_view.index_defs LOOP
+      EXECUTE v_def;
+    END LOOP;
+  END LOOP;
+END $$;
+
+COMMIT;
+
+DROP FUNCTION IF EXISTS landwatch.ensure_feature_partitions(bigint, boolean);
+DROP FUNCTION IF EXISTS landwatch.is_hot_feature_dataset(text);
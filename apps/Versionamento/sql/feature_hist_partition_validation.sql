@@ -0,0 +1,70 @@
+SET search_path TO landwatch, app, public, pg_catalog;
+
+-- Tipo de cada tabela (p = particionada) e cópia de rollback ainda presente.
+SELECT
+  c.relname,
+  c.relkind,
+  to_regclass(format('landwatch.%I', c.relname || '_unpartitioned')) IS NOT NULL AS has_unpartitioned_copy,
+  pg_size_pretty(pg_total_relation_size(c.oid)) AS total_size
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'landwatch'
+  AND c.relname IN ('lw_feature_state', 'lw_feature_delta', 'lw_feature_geom_hist', 'lw_feature_attr_pack_hist')
+ORDER BY c.relname;
+
+-- Partições, bound e tamanho.
+SELECT
+  parent.relname AS parent_table,
+  child.relname AS partition_name,
+  pg_get_expr(child.relpartbound, child.oid) AS partition_bound,
+  child.reltuples::bigint AS approx_rows,
+  pg_size_pretty(pg_total_relation_size(child.oid)) AS total_size
+FROM pg_inherits i
+JOIN pg_class parent ON parent.oid = i.inhparent
+JOIN pg_class child ON child.oid = i.inhrelid
+JOIN pg_namespace n ON n.oid = parent.relnamespace
+WHERE n.nspname = 'landwatch'
+  AND parent.relname IN ('lw_feature_state', 'lw_feature_delta', 'lw_feature_geom_hist', 'lw_feature_attr_pack_hist')
+ORDER BY parent.relname, pg_total_relation_size(child.oid) DESC;
+
+-- Datasets quentes ainda na DEFAULT (rodar landwatch.ensure_feature_partitions(dataset_id)).
+SELECT
+  d.dataset_id,
+  d.code,
+  count(*)::bigint AS rows_in_default
+FROM landwatch.lw_feature_geom_hist_default h
+JOIN landwatch.lw_dataset d ON d.dataset_id = h.dataset_id
+WHERE landwatch.is_hot_feature_dataset(d.code)
+GROUP BY d.dataset_id, d.code
+ORDER BY rows_in_default DESC;
+
+-- Contagem igual à cópia antiga (só faz sentido antes de novos ingests).
+SELECT
+  t.table_name,
+  t.partitioned_rows,
+  t.unpartitioned_rows,
+  t.partitioned_rows = t.unpartitioned_rows AS counts_match
+FROM (
+  SELECT 'lw_feature_state' AS table_name,
+         (SELECT count(*) FROM landwatch.lw_feature_state)::bigint AS partitioned_rows,
+         (SELECT count(*) FROM landwatch.lw_feature_state_unpartitioned)::bigint AS unpartitioned_rows
+  UNION ALL
+  SELECT 'lw_feature_delta',
+         (SELECT count(*) FROM landwatch.lw_feature_delta)::bigint,
+         (SELECT count(*) FROM landwatch.lw_feature_delta_unpartitioned)::bigint
+  UNION ALL
+  SELECT 'lw_feature_geom_hist',
+         (SELECT count(*) FROM landwatch.lw_feature_geom_hist)::bigint,
+         (SELECT count(*) FROM landwatch.lw_feature_geom_hist_unpartitioned)::bigint
+  UNION ALL
+  SELECT 'lw_feature_attr_pack_hist',
+         (SELECT count(*) FROM landwatch.lw_feature_attr_pack_hist)::bigint,
+         (SELECT count(*) FROM landwatch.lw_feature_attr_pack_hist_unpartitioned)::bigint
+) t;
+
+-- Pruning: o plano deve citar só a partição do dataset (troque o dataset_id).
+EXPLAIN (COSTS OFF)
+SELECT count(*)
+FROM landwatch.lw_feature_geom_hist h
+WHERE h.dataset_id = 1
+  AND h.valid_to IS NULL;
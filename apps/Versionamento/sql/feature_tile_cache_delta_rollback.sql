@@ -0,0 +1,5 @@
+SET search_path TO landwatch, app, public, pg_catalog;
+
+-- Sem a função, refresh_feature_caches_delta e o bulk_ingest.py voltam ao
+-- caminho anterior (delta fino sem reaproveitamento / rebuild por dataset).
+DROP FUNCTION IF EXISTS landwatch.refresh_feature_geom_tile_cache_delta(bigint[], text[]);
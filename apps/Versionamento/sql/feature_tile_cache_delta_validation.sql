@@ -0,0 +1,52 @@
+SET search_path TO landwatch, app, public, pg_catalog;
+
+SELECT
+  p.proname,
+  pg_get_function_arguments(p.oid) AS args,
+  pg_get_function_result(p.oid) AS result
+FROM pg_proc p
+JOIN pg_namespace n ON n.oid = p.pronamespace
+WHERE n.nspname = 'landwatch'
+  AND p.proname IN ('refresh_feature_geom_tile_cache', 'refresh_feature_geom_tile_cache_delta')
+ORDER BY p.proname;
+
+-- Cache de tiles x geometria ativa (mesmo critério do apply do cache).
+WITH expected AS (
+  SELECT a.dataset_id, a.feature_id, a.geom_id, a.version_id
+  FROM landwatch.mv_feature_geom_active a
+  WHERE landwatch.safe_transform_to_3857(a.geom) IS NOT NULL
+),
+missing AS (
+  SELECT dataset_id, feature_id FROM expected
+  EXCEPT
+  SELECT dataset_id, feature_id FROM landwatch.mv_feature_geom_tile_active
+),
+extra AS (
+  SELECT dataset_id, feature_id FROM landwatch.mv_feature_geom_tile_active
+  EXCEPT
+  SELECT dataset_id, feature_id FROM expected
+),
+mismatch AS (
+  SELECT c.dataset_id, c.feature_id
+  FROM landwatch.mv_feature_geom_tile_active c
+  JOIN expected e ON e.dataset_id = c.dataset_id AND e.feature_id = c.feature_id
+  WHERE c.geom_id IS DISTINCT FROM e.geom_id
+     OR c.version_id IS DISTINCT FROM e.version_id
+)
+SELECT
+  'mv_feature_geom_tile_active' AS cache_name,
+  (SELECT count(*) FROM expected)::bigint AS expected_rows,
+  (SELECT count(*) FROM landwatch.mv_feature_geom_tile_active)::bigint AS cache_rows,
+  (SELECT count(*) FROM missing)::bigint AS missing_rows,
+  (SELECT count(*) FROM extra)::bigint AS extra_rows,
+  (SELECT count(*) FROM mismatch)::bigint AS mismatch_rows;
+
+-- Simplificações reaproveitadas devem ser idênticas entre feições do mesmo geom_id.
+SELECT
+  count(*)::bigint AS geom_ids_with_divergent_simplification
+FROM (
+  SELECT c.geom_id
+  FROM landwatch.mv_feature_geom_tile_active c
+  GROUP BY c.geom_id
+  HAVING count(DISTINCT md5(ST_AsEWKB(c.geom_3857_s600)::text)) > 1
+) d;
@@ -0,0 +1,18 @@
+SET search_path TO landwatch, app, public, pg_catalog;
+
+-- Perfil do ingest.sql por versão: um registro por `-- @step` executado pelo
+-- run_ingest_sql (gravado na mesma transação do ingest).
+CREATE TABLE IF NOT EXISTS landwatch.lw_ingest_step_metric (
+  version_id BIGINT NOT NULL REFERENCES landwatch.lw_dataset_version(version_id),
+  dataset_id BIGINT NOT NULL REFERENCES landwatch.lw_dataset(dataset_id),
+  step_order INTEGER NOT NULL,
+  step_name TEXT NOT NULL,
+  duration_ms NUMERIC(14, 3) NOT NULL,
+  row_count BIGINT,
+  explain_plan TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (version_id, step_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_lw_ingest_step_metric_dataset_step
+  ON landwatch.lw_ingest_step_metric(dataset_id, step_name, created_at DESC);
@@ -0,0 +1,4 @@
+SET search_path TO landwatch, app, public, pg_catalog;
+
+-- Sem a tabela o bulk_ingest.py apenas deixa de gravar as métricas (to_regclass).
+DROP TABLE IF EXISTS landwatch.lw_ingest_step_metric;
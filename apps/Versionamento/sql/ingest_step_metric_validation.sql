@@ -0,0 +1,65 @@
+SET search_path TO landwatch, app, public, pg_catalog;
+
+SELECT
+  table_name,
+  column_name,
+  data_type,
+  is_nullable
+FROM information_schema.columns
+WHERE table_schema = 'landwatch'
+  AND table_name = 'lw_ingest_step_metric'
+ORDER BY ordinal_position;
+
+-- Perfil das últimas versões (steps mais lentos primeiro).
+SELECT
+  m.version_id,
+  d.code AS dataset_code,
+  v.status,
+  m.step_order,
+  m.step_name,
+  m.duration_ms,
+  m.row_count,
+  m.explain_plan IS NOT NULL AS has_explain
+FROM landwatch.lw_ingest_step_metric m
+JOIN landwatch.lw_dataset d ON d.dataset_id = m.dataset_id
+JOIN landwatch.lw_dataset_version v ON v.version_id = m.version_id
+WHERE m.version_id IN (
+  SELECT version_id
+  FROM landwatch.lw_ingest_step_metric
+  GROUP BY version_id
+  ORDER BY max(created_at) DESC
+  LIMIT 5
+)
+ORDER BY m.version_id DESC, m.duration_ms DESC;
+
+-- Regressão: última execução de cada step vs mediana das 10 anteriores do mesmo dataset.
+WITH ranked AS (
+  SELECT
+    m.*,
+    row_number() OVER (PARTITION BY m.dataset_id, m.step_name ORDER BY m.created_at DESC) AS rn
+  FROM landwatch.lw_ingest_step_metric m
+),
+baseline AS (
+  SELECT
+    dataset_id,
+    step_name,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms) AS median_ms,
+    count(*)::bigint AS samples
+  FROM ranked
+  WHERE rn BETWEEN 2 AND 11
+  GROUP BY dataset_id, step_name
+)
+SELECT
+  d.code AS dataset_code,
+  r.step_name,
+  r.version_id,
+  r.duration_ms,
+  round(b.median_ms::numeric, 3) AS median_ms,
+  b.samples,
+  round((r.duration_ms / NULLIF(b.median_ms, 0))::numeric, 2) AS ratio
+FROM ranked r
+JOIN baseline b ON b.dataset_id = r.dataset_id AND b.step_name = r.step_name
+JOIN landwatch.lw_dataset d ON d.dataset_id = r.dataset_id
+WHERE r.rn = 1
+ORDER BY ratio DESC NULLS LAST
+LIMIT 30;
@@ -199,6 +199,25 @@ END $$;
 
 COMMIT;
 
+-- Lock dos refresh_* de cache. Rebuild total (p_codes vazio): exclusivo no cache.
+-- Por dataset: compartilhado no cache + exclusivo por dataset (ordem fixa),
+-- permitindo refresh paralelo de datasets distintos.
+CREATE OR REPLACE FUNCTION landwatch.lock_cache_scope(p_cache text, p_codes text[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF COALESCE(array_length(p_codes, 1), 0) = 0 THEN
+    PERFORM pg_advisory_xact_lock(hashtext('landwatch.' || p_cache));
+  ELSE
+    PERFORM pg_advisory_xact_lock_shared(hashtext('landwatch.' || p_cache));
+    PERFORM pg_advisory_xact_lock(hashtext('landwatch.' || p_cache || ':' || c.code))
+    FROM (SELECT DISTINCT code FROM unnest(p_codes) AS raw(code)) c
+    ORDER BY c.code;
+  END IF;
+END;
+$$;
+
 CREATE OR REPLACE FUNCTION landwatch.refresh_sicar_meta_cache(
   p_dataset_codes text[] DEFAULT NULL
 )
@@ -210,8 +229,6 @@ DECLARE
   v_dataset_ids bigint[];
   v_full_rebuild boolean;
 BEGIN
-  PERFORM pg_advisory_xact_lock(hashtext('landwatch.mv_sicar_meta_active'));
-
   SELECT array_agg(code ORDER BY code)
   INTO v_dataset_codes
   FROM (
@@ -222,6 +239,8 @@ BEGIN
 
   v_full_rebuild := COALESCE(array_length(v_dataset_codes, 1), 0) = 0;
 
+  PERFORM landwatch.lock_cache_scope('mv_sicar_meta_active', v_dataset_codes);
+
   IF NOT v_full_rebuild THEN
     SELECT array_agg(d.dataset_id ORDER BY d.dataset_id)
     INTO v_dataset_ids
@@ -0,0 +1,149 @@
+import datetime as dt
+import hashlib
+import unittest
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+
+import bulk_ingest
+
+try:
+    import shapely
+except ImportError:  # pragma: no cover - dependência do geopandas
+    shapely = None
+
+ROOT = Path(__file__).resolve().parent
+
+
+def _md5(text: str) -> str:
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+class BulkIngestClientHashingTest(unittest.TestCase):
+    def test_jsonb_text_matches_postgres_rendering(self):
+        text = bulk_ingest.jsonb_text(
+            {"aa": "x\n\"", "b": 1, "c": None, "f": 2.0, "g": 1e-07, "h": True, "é": "ç"}
+        )
+        # jsonb ordena por tamanho (bytes) e depois bytes; numeric sem expoente.
+        self.assertEqual(
+            text,
+            '{"b": 1, "c": null, "f": 2, "g": 0.0000001, "h": true, "aa": "x\\n\\"", "é": "ç"}',
+        )
+
+    def test_payload_hashes_follow_ingest_sql_rules(self):
+        payload = {"row_id": 3, "nome": "Parque", "id": 7}
+        hashes = bulk_ingest.client_payload_hashes(payload, None, "md5")
+
+        self.assertEqual(hashes.payload_text, '{"id": 7, "nome": "Parque", "row_id": 3}')
+        self.assertEqual(hashes.attr_hash, _md5(hashes.payload_text))
+        # row_id fora do compare (LANDWATCH_ATTR_HASH_EXCLUDE_KEYS) e feature_key = fallback md5.
+        self.assertEqual(hashes.attr_compare_hash, _md5('{"id": 7, "nome": "Parque"}'))
+        self.assertEqual(hashes.feature_key, hashes.attr_compare_hash)
+        self.assertEqual(
+            hashes.tooltip_hash,
+            _md5('{"natural_id": "7", "display_name": "Parque"}'),
+        )
+
+    def test_payload_hashes_keep_override_and_nullif_empty_tooltip(self):
+        hashes = bulk_ingest.client_payload_hashes({"nome": "", "NOME": "x"}, "K1", "blake2b")
+
+        self.assertEqual(hashes.feature_key, "K1")
+        self.assertEqual(hashes.tooltip_hash, hashlib.blake2b(
+            b'{"natural_id": null, "display_name": null}', digest_size=16
+        ).hexdigest())
+        self.assertEqual(hashes.attr_hash, _md5('{"NOME": "x", "nome": ""}'))
+
+    @unittest.skipIf(shapely is None, "shapely indisponível")
+    def test_geom_hashes_only_for_valid_geometries(self):
+        import numpy as np
+
+        box = shapely.box(0, 0, 1, 1)
+        bowtie = shapely.Polygon([(0, 0), (1, 1), (1, 0), (0, 1)])
+        hashes = bulk_ingest.client_geom_hashes(np.array([box, bowtie, None], dtype=object))
+
+        self.assertEqual(hashes[0], _md5(shapely.to_wkb(box, byte_order=1).hex()))
+        self.assertIsNone(hashes[1])
+        self.assertIsNone(hashes[2])
+
+    def test_client_dedup_keeps_highest_row_id(self):
+        dedup = bulk_ingest.ClientDedup()
+        for key, row_id in (("a", 1), ("b", 2), ("a", 3), ("a", 4)):
+            dedup.add(key, row_id)
+        self.assertEqual(dedup.losers, [1, 3])
+
+        with (
+            patch.object(bulk_ingest, "exec_sql") as exec_sql_mock,
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            dedup.delete_losers(object(), "landwatch.stg_payload_v1")
+        self.assertEqual(exec_sql_mock.call_args.args[2], ([1, 3],))
+
+    def test_batch_hashes_match_per_row_hashes(self):
+        columns = ["nome", "row_id", "Cnuc", "area", "ativo", "data", "nome_uc", "obs", "é"]
+        rows = [
+            ["Parque", 1, "0001", 1.5, True, dt.date(2020, 1, 2), None, 'a"b\n', "ç"],
+            ["", 2, None, Decimal("0.10"), False, None, "UC X", None, None],
+            [None, 3, 7, 0.0, None, None, "", "", ""],
+        ]
+        for algo in ("md5", "blake2b"):
+            for overrides in (None, ["K1", None, "K3"]):
+                with self.subTest(algo=algo, overrides=overrides):
+                    expected = [
+                        bulk_ingest.client_payload_hashes(
+                            dict(zip(columns, row)), overrides[i] if overrides else None, algo
+                        )
+                        for i, row in enumerate(rows)
+                    ]
+                    self.assertEqual(bulk_ingest.client_payload_hashes_batch(columns, rows, overrides, algo), expected)
+        # Nome repetido: vale a última coluna, como em dict(zip(...)).
+        self.assertEqual(
+            bulk_ingest.client_payload_hashes_batch(["a", "a"], [[1, 2]], None, "md5"),
+            [bulk_ingest.client_payload_hashes({"a": 2}, None, "md5")],
+        )
+        self.assertEqual(bulk_ingest.client_payload_hashes_batch(["a"], [], None, "md5"), [])
+
+    def test_delete_losers_adds_primary_key_before_delete(self):
+        dedup = bulk_ingest.ClientDedup()
+        for key, row_id in (("a", 1), ("a", 2)):
+            dedup.add(key, row_id)
+
+        with (
+            patch.object(bulk_ingest, "exec_sql") as exec_sql_mock,
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            dedup.delete_losers(object(), "landwatch.stg_payload_v1")
+
+        queries = [c.args[1] for c in exec_sql_mock.call_args_list]
+        self.assertEqual(queries[0], "ALTER TABLE landwatch.stg_payload_v1 ADD PRIMARY KEY (row_id)")
+        self.assertTrue(queries[1].startswith("DELETE FROM landwatch.stg_payload_v1"))
+
+    def test_sql_fallback_fails_loudly_with_non_md5_algo(self):
+        with (
+            patch.object(bulk_ingest, "CLIENT_HASHING", True),
+            patch.object(bulk_ingest, "STAGING_ENGINE", "pyogrio"),
+            patch.object(bulk_ingest, "CLIENT_HASH_ALGO", "blake2b"),
+            patch.object(bulk_ingest, "load_dataset_config", return_value={"srid": 4674, "natural_id_col": "id"}),
+            patch.object(bulk_ingest, "_shapefile_component_paths", return_value=[]),
+            patch.object(bulk_ingest, "detect_shp_encoding", return_value=("UTF-8", "cpg")),
+            patch.object(bulk_ingest, "create_stg_payload_from_shp_native", return_value=None),
+            patch.object(bulk_ingest, "create_stg_raw_shp") as raw_mock,
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            with self.assertRaisesRegex(RuntimeError, "LANDWATCH_CLIENT_HASH_ALGO=blake2b"):
+                bulk_ingest.process_shp(object(), 1, "UC_X", Path("uc.shp"), "2026-01-01", 9)
+
+        raw_mock.assert_not_called()
+        with patch.object(bulk_ingest, "CLIENT_HASH_ALGO", "md5"):
+            bulk_ingest.ensure_sql_hashing_allowed("uc.shp", "teste")
+
+    def test_ingest_sql_prefers_staged_hashes_and_skips_rank_sort(self):
+        sql = (ROOT / "ingest.sql").read_text(encoding="utf-8")
+        self.assertIn("COALESCE(s.attr_hash, md5(s.payload::text)) AS attr_hash", sql)
+        self.assertIn("{{DEDUP_RANK_SQL}} AS __rn", sql)
+        self.assertEqual(bulk_ingest.build_dedup_rank_sql(True), "1")
+        self.assertIn("ROW_NUMBER() OVER", bulk_ingest.build_dedup_rank_sql(False))
+        self.assertIn("geom_hash IS NULL", bulk_ingest.build_geom_sql(4674, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
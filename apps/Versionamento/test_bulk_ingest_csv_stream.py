@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import bulk_ingest
+
+try:
+    import shapely
+except ImportError:  # pragma: no cover - dependência do geopandas
+    shapely = None
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(query)
+
+    def copy_expert(self, query, stream, size=8192):
+        self.conn.copy_sql = query
+        self.conn.copy_data = stream.read()
+
+
+class _FakeConn:
+    def __init__(self):
+        self.executed = []
+        self.copy_sql = None
+        self.copy_data = b""
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+
+class _FakeIdentifier:
+    def __init__(self, name: str):
+        self.name = name
+
+    def as_string(self, _conn):
+        return f'"{self.name}"'
+
+
+def _decode_pgcopy(data: bytes):
+    assert data.startswith(b"PGCOPY\n\xff\r\n\x00")
+    pos = 19
+    rows = []
+    while True:
+        (count,) = struct.unpack_from("!h", data, pos)
+        pos += 2
+        if count == -1:
+            return rows
+        fields = []
+        for _ in range(count):
+            (size,) = struct.unpack_from("!i", data, pos)
+            pos += 4
+            if size == -1:
+                fields.append(None)
+                continue
+            fields.append(data[pos:pos + size])
+            pos += size
+        rows.append(fields)
+
+
+@unittest.skipIf(shapely is None, "shapely indisponível")
+class BulkIngestCsvStreamTest(unittest.TestCase):
+    def _load(self, content: bytes, geom_col="geom", batch_rows=2, client_hashing=False):
+        with tempfile.TemporaryDirectory(prefix="bulk_ingest_csv_") as tmp:
+            csv_path = Path(tmp) / "Lista.csv"
+            csv_path.write_bytes(content)
+            conn = _FakeConn()
+            with (
+                patch.object(bulk_ingest.sql, "Identifier", side_effect=lambda name: _FakeIdentifier(name)),
+                patch.object(bulk_ingest, "log_info"),
+            ):
+                total = bulk_ingest.create_stg_payload_from_csv_stream(
+                    conn,
+                    csv_path,
+                    ";",
+                    "latin1",
+                    geom_col,
+                    4674,
+                    payload_table="landwatch.stg_payload_v3",
+                    batch_rows=batch_rows,
+                    client_hashing=client_hashing,
+                )
+        return total, conn, _decode_pgcopy(conn.copy_data)
+
+    def test_stream_writes_payload_rows_with_text_values_and_ewkb(self):
+        content = (
+            "cpf;nome;nome;geom\n"
+            "1;Jos\xe9;x;POINT(1 2)\n"
+            "2;;y;not wkt\n"
+            "3;\"a;b\";z;\"SRID=4326;POINT(3 4)\"\n"
+        ).encode("latin1")
+
+        total, conn, rows = self._load(content)
+
+        self.assertEqual(total, 3)
+        self.assertIn("DROP TABLE IF EXISTS landwatch.stg_payload_v3", conn.executed[0])
+        self.assertIn('("row_id", "payload", "geom") FROM STDIN WITH (FORMAT binary)', conn.copy_sql)
+        self.assertEqual([struct.unpack("!q", r[0])[0] for r in rows], [1, 2, 3])
+        payloads = [json.loads(r[1][1:].decode("utf-8")) for r in rows]
+        self.assertEqual(payloads[0], {"cpf": "1", "nome": "José", "nome_2": "x", "geom": "POINT(1 2)"})
+        self.assertIsNone(payloads[1]["nome"])
+        self.assertEqual(payloads[2]["nome"], "a;b")
+        point = shapely.from_wkb(rows[0][2])
+        self.assertEqual((point.x, point.y), (1.0, 2.0))
+        self.assertEqual(shapely.get_srid(point), 4674)
+        self.assertIsNone(rows[1][2])
+        self.assertEqual(shapely.get_srid(shapely.from_wkb(rows[2][2])), 4674)
+
+    def test_stream_with_client_hashing_writes_hashes_and_drops_duplicates(self):
+        content = b"cpf;geom\n1;POINT(1 2)\n1;POINT(1 2)\n2;\n"
+
+        total, conn, rows = self._load(content, client_hashing=True)
+
+        self.assertEqual(total, 3)
+        self.assertIn('"feature_key", "attr_hash", "attr_compare_hash", "tooltip_hash", "geom_hash"', conn.copy_sql)
+        self.assertEqual(len(rows[0]), 8)
+        payload_text = rows[0][1][1:].decode("utf-8")
+        self.assertEqual(payload_text, '{"cpf": "1", "geom": "POINT(1 2)"}')
+        self.assertEqual(rows[0][3], rows[1][3])  # mesma feature_key
+        self.assertIsNotNone(rows[0][7])
+        self.assertIsNone(rows[2][7])
+        self.assertIn("DELETE FROM landwatch.stg_payload_v3 WHERE row_id = ANY(%s)", conn.executed)
+
+    def test_stream_reads_wkt_larger_than_default_field_limit(self):
+        ring = ", ".join(f"{i % 1000}.123456 {i // 1000}.654321" for i in range(10000))
+        first = ring.split(", ")[0]
+        wkt = f"POLYGON(({ring}, {first}))"
+        self.assertGreater(len(wkt), 200 * 1024)
+        content = f'cpf;geom\n1;"{wkt}"\n'.encode("latin1")
+        # Volta ao padrão do Python (131072) para o teste não depender de outro ter subido o limite.
+        previous = bulk_ingest.csv.field_size_limit(131072)
+        self.addCleanup(bulk_ingest.csv.field_size_limit, previous)
+
+        total, _conn, rows = self._load(content)
+
+        self.assertEqual(total, 1)
+        self.assertEqual(json.loads(rows[0][1][1:].decode("utf-8"))["geom"], wkt)
+        self.assertIsNotNone(rows[0][2])
+
+    def test_stream_rejects_rows_with_wrong_field_count(self):
+        with self.assertRaises(RuntimeError):
+            self._load(b"a;b\n1;2;3\n", geom_col=None)
+
+    def test_quoted_empty_stays_text_and_unquoted_empty_is_null(self):
+        content = '"";;x\n"a""b";"";\n"multi\nline";"";""\n'
+        expected = [["", None, "x"], ['a"b', "", None], ["multi\nline", "", ""]]
+        # Sem QUOTE_NOTNULL (Python < 3.12, imagem python:3.11-slim).
+        csv_311 = SimpleNamespace(reader=csv.reader, field_size_limit=csv.field_size_limit)
+
+        with patch.object(bulk_ingest, "csv", csv_311):
+            self.assertEqual(list(bulk_ingest._csv_stream_rows(io.StringIO(content), ";")), expected)
+        self.assertEqual(list(bulk_ingest._csv_stream_rows(io.StringIO(content), ";")), expected)
+
+    def test_stream_payload_keeps_quoted_empty_as_text(self):
+        _total, _conn, rows = self._load(b'cpf;nome;obs\n1;"";\n', geom_col=None)
+
+        self.assertEqual(json.loads(rows[0][1][1:].decode("utf-8")), {"cpf": "1", "nome": "", "obs": None})
+
+    def test_python_csv_encoding_maps_postgres_names(self):
+        self.assertEqual(bulk_ingest._python_csv_encoding("latin1"), "latin-1")
+        self.assertEqual(bulk_ingest._python_csv_encoding("UTF8"), "utf-8")
+        self.assertEqual(bulk_ingest._python_csv_encoding("WIN1252"), "cp1252")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -64,6 +64,24 @@ class StgPayloadGeomPassthroughTest(unittest.TestCase):
         self.assertIn("md5(encode(ST_AsBinary(geom), 'hex'))", g)
         self.assertIn("ST_MakeValid(geom)", g)
 
+    def test_build_geom_sql_fast_path_validates_only_unknown_hashes(self):
+        g = bulk_ingest.build_geom_sql(4674, True, fast_path=True)
+        raw_hash = g.index("CREATE TEMP TABLE __geom_raw_hash")
+        make_valid = g.index("ST_MakeValid(geom)")
+        self.assertLess(raw_hash, make_valid)
+        self.assertIn("landwatch.lw_geom_store g WHERE g.geom_hash = r.geom_hash", g)
+        self.assertIn("CASE WHEN h.is_known THEN true ELSE ST_IsValid(n.geom) END", g)
+        # MakeValid só nas linhas que ficaram sem hash (desconhecidas e inválidas).
+        self.assertIn(
+            "SET geom = ST_MakeValid(geom)\n        WHERE geom IS NOT NULL AND geom_hash IS NULL;", g
+        )
+
+    def test_build_geom_sql_without_fast_path_keeps_full_validation(self):
+        g = bulk_ingest.build_geom_sql(4674, True, fast_path=False)
+        self.assertNotIn("lw_geom_store", g)
+        self.assertIn("NOT ST_IsValid(geom)", g)
+        self.assertIn("md5(encode(ST_AsBinary(geom), 'hex'))", g)
+
     def test_build_geom_sql_non_spatial_nulls_geom(self):
         g = bulk_ingest.build_geom_sql(4674, False)
         self.assertIn("geom = NULL", g)
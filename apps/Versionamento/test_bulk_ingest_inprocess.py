@@ -0,0 +1,167 @@
+import multiprocessing
+import sys
+import types
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+if "psycopg2" not in sys.modules:
+    psycopg2_stub = types.ModuleType("psycopg2")
+    psycopg2_stub.OperationalError = RuntimeError
+    psycopg2_stub.InterfaceError = RuntimeError
+    psycopg2_stub.connect = lambda **_kwargs: None
+    psycopg2_stub.sql = types.SimpleNamespace(Identifier=lambda name: name)
+    sys.modules["psycopg2"] = psycopg2_stub
+    sys.modules["psycopg2.sql"] = psycopg2_stub.sql
+
+import bulk_ingest
+
+
+class _FakeConn:
+    autocommit = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+def _fake_extensions():
+    return types.SimpleNamespace(connection=type("connection", (), {"__exit__": lambda self, *args: False}))
+
+
+class IngestFilesApiTest(unittest.TestCase):
+    def test_ingest_files_runs_jobs_with_pool_and_returns_outcomes(self):
+        outcomes = [{"file": "a.shp", "dataset_code": "A", "dataset_id": 1, "version_id": 9, "status": "COMPLETED"}]
+
+        with (
+            patch.object(bulk_ingest.psycopg2, "extensions", _fake_extensions(), create=True),
+            patch.object(bulk_ingest, "get_conn", return_value=_FakeConn()),
+            patch.object(bulk_ingest, "cleanup_orphan_staging_tables") as cleanup_mock,
+            patch.object(bulk_ingest, "_run_ingest_jobs", return_value=outcomes) as jobs_mock,
+            patch.object(bulk_ingest, "_refresh_mvs") as refresh_mock,
+        ):
+            result = bulk_ingest.ingest_files(["a.shp"], snapshot_date="2026-05-21", workers=1)
+            self.assertIsNone(bulk_ingest._CONN_POOL)
+
+        self.assertEqual(result, outcomes)
+        cleanup_mock.assert_called_once()
+        args, kwargs = jobs_mock.call_args
+        self.assertEqual(args[0], [Path("a.shp")])
+        self.assertEqual(kwargs["snapshot_date_override"], "2026-05-21")
+        self.assertTrue(kwargs["pooled"])
+        refresh_mock.assert_not_called()
+
+    def test_ingest_files_refreshes_completed_datasets_when_requested(self):
+        outcomes = [
+            {"file": "a.shp", "dataset_code": "A", "dataset_id": 1, "version_id": 9, "status": "COMPLETED"},
+            {"file": "b.shp", "dataset_code": "B", "dataset_id": 2, "version_id": 10, "status": "FAILED"},
+        ]
+
+        with (
+            patch.object(bulk_ingest.psycopg2, "extensions", _fake_extensions(), create=True),
+            patch.object(bulk_ingest, "_run_ingest_jobs", return_value=outcomes),
+            patch.object(bulk_ingest, "_refresh_mvs") as refresh_mock,
+        ):
+            bulk_ingest.ingest_files(["a.shp", "b.shp"], refresh_mvs=True, cleanup_orphans=False)
+
+        refresh_mock.assert_called_once_with(["A"], [9])
+
+
+def _worker_pool_state():
+    pool = bulk_ingest._CONN_POOL
+    inherited = bulk_ingest._INHERITED_POOLS
+    return len(pool._idle), len(inherited), any(c.close.called for p in inherited for c in p._idle)
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def _pool(self, max_idle=2):
+        with patch.object(bulk_ingest.psycopg2, "extensions", _fake_extensions(), create=True):
+            return bulk_ingest._ConnectionPool(max_idle)
+
+    def test_release_resets_session_and_reuses_connection(self):
+        pool = self._pool()
+        conn = MagicMock()
+        conn.closed = 0
+        cursor = conn.cursor.return_value.__enter__.return_value
+
+        pool.release(conn)
+
+        executed = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(executed, ["DISCARD TEMP", "RESET ALL", "SET search_path TO landwatch, public"])
+        conn.rollback.assert_called_once()
+        self.assertFalse(conn.autocommit)
+        self.assertIs(pool.acquire(), conn)
+        self.assertIsNone(pool.acquire())
+
+    def test_release_drops_broken_and_excess_connections(self):
+        pool = self._pool(max_idle=1)
+        broken = MagicMock()
+        broken.closed = 0
+        broken.rollback.side_effect = RuntimeError("server closed the connection")
+        first = MagicMock()
+        first.closed = 0
+        extra = MagicMock()
+        extra.closed = 0
+
+        pool.release(broken)
+        pool.release(first)
+        pool.release(extra)
+
+        broken.close.assert_called_once()
+        extra.close.assert_called_once()
+        self.assertIs(pool.acquire(), first)
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "sem fork")
+    def test_forked_worker_gets_fresh_pool_without_parent_connections(self):
+        pool = self._pool()
+        parent_conn = MagicMock()
+        parent_conn.closed = 0
+        pool.release(parent_conn)
+        self.assertEqual(len(pool._idle), 1)
+
+        with (
+            patch.object(bulk_ingest.psycopg2, "extensions", _fake_extensions(), create=True),
+            patch.object(bulk_ingest, "_CONN_POOL", pool),
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=bulk_ingest._enable_connection_pool,
+            ) as executor,
+        ):
+            idle, inherited, closed_in_child = executor.submit(_worker_pool_state).result()
+
+        self.assertEqual((idle, inherited, closed_in_child), (0, 1, False))
+
+    def test_drain_closes_idle_connections_and_keeps_pool_active(self):
+        pool = self._pool()
+        conn = MagicMock()
+        conn.closed = 0
+        pool.release(conn)
+
+        pool.drain()
+
+        conn.close.assert_called_once()
+        self.assertIsNone(pool.acquire())
+        other = MagicMock()
+        other.closed = 0
+        pool.release(other)
+        self.assertIs(pool.acquire(), other)
+
+    def test_resolve_ogr2ogr_is_cached_per_process(self):
+        with (
+            patch.object(bulk_ingest, "_RESOLVED_OGR2OGR", None),
+            patch.object(bulk_ingest, "OGR2OGR_PATH", "/opt/gdal/ogr2ogr"),
+            patch.object(bulk_ingest, "_ogr_has_postgres_driver", return_value=True) as probe_mock,
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            self.assertEqual(bulk_ingest.resolve_ogr2ogr(), "/opt/gdal/ogr2ogr")
+            self.assertEqual(bulk_ingest.resolve_ogr2ogr(), "/opt/gdal/ogr2ogr")
+
+        probe_mock.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
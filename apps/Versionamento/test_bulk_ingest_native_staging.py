@@ -0,0 +1,167 @@
+import datetime as dt
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import bulk_ingest
+
+try:
+    import geopandas as gpd
+    import pyogrio  # noqa: F401
+    import shapely
+except ImportError:  # pragma: no cover - engine opcional
+    gpd = None
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(query)
+
+    def copy_expert(self, query, stream, size=8192):
+        self.conn.copy_sql = query
+        chunks = []
+        while True:
+            chunk = stream.read(size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.conn.copy_data = b"".join(chunks)
+
+
+class _FakeConn:
+    def __init__(self):
+        self.executed = []
+        self.copy_sql = None
+        self.copy_data = b""
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+
+class _FakeIdentifier:
+    def __init__(self, name: str):
+        self.name = name
+
+    def as_string(self, _conn):
+        return f'"{self.name}"'
+
+
+class BulkIngestNativeStagingTest(unittest.TestCase):
+    def test_pgcopy_encode_rows_writes_lengths_and_nulls(self):
+        data = bulk_ingest.pgcopy_encode_rows(
+            [(1, "á", None, dt.date(2000, 1, 2))],
+            ["integer", "character varying", "double precision", "date"],
+        )
+        self.assertEqual(
+            data,
+            b"\x00\x04"
+            + b"\x00\x00\x00\x04\x00\x00\x00\x01"
+            + b"\x00\x00\x00\x02\xc3\xa1"
+            + b"\xff\xff\xff\xff"
+            + b"\x00\x00\x00\x04\x00\x00\x00\x01",
+        )
+
+    def test_launder_matches_ogr_pg_driver(self):
+        self.assertEqual(bulk_ingest.launder_pg_column_name("Cod-Imovel#"), "cod_imovel_")
+        # Como no GDAL, só caracteres ASCII vão para minúsculas.
+        self.assertEqual(bulk_ingest.launder_pg_column_name("ÁREA"), "Área")
+        self.assertEqual(len(bulk_ingest.launder_pg_column_name("x" * 80)), 63)
+
+    def test_chunk_reader_streams_across_chunk_boundaries(self):
+        reader = bulk_ingest._ChunkReader([b"abc", b"", b"defg"])
+        self.assertEqual(reader.read(2), b"ab")
+        self.assertEqual(reader.read(5), b"c")
+        self.assertEqual(reader.read(), b"defg")
+
+    @unittest.skipIf(gpd is None, "pyogrio/geopandas indisponíveis")
+    def test_flatgeobuf_is_spatial_single_file_utf8_source(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fgb = Path(tmp) / "deter_amz_ALLYEARS.fgb"
+            fgb.write_bytes(b"fgb")
+            (Path(tmp) / "deter_amz_ALLYEARS.cpg").write_text("LATIN1", encoding="utf-8")
+
+            self.assertEqual(bulk_ingest._shapefile_component_paths(fgb), [fgb])
+            self.assertEqual(bulk_ingest.detect_shp_encoding(fgb, "UTF-8"), (None, "format:fgb"))
+            self.assertEqual(bulk_ingest._source_size_bytes(fgb), 3)
+            self.assertIn(".fgb", bulk_ingest.SPATIAL_SUFFIXES)
+
+    def test_native_loader_mirrors_ogr2ogr_layout(self):
+        with tempfile.TemporaryDirectory(prefix="bulk_ingest_native_") as tmp:
+            shp = Path(tmp) / "CAR_XX.shp"
+            gdf = gpd.GeoDataFrame(
+                {"COD_IMOVEL": ["A", "B", "C"], "AREA": [1.5, 2.0, 3.0]},
+                geometry=[
+                    shapely.box(0, 0, 1, 1),
+                    shapely.Polygon([(0, 0), (1, 1), (1, 0), (0, 1)]),
+                    None,
+                ],
+                crs="EPSG:4674",
+            )
+            gdf.to_file(shp, engine="pyogrio")
+            conn = _FakeConn()
+            with (
+                patch.object(bulk_ingest.sql, "Identifier", side_effect=lambda name: _FakeIdentifier(name)),
+                patch.object(bulk_ingest, "OGR2OGR_MAKEVALID", True),
+                patch.object(bulk_ingest, "OGR2OGR_SKIP_INVALID", True),
+                patch.object(bulk_ingest, "log_info"),
+            ):
+                rows = bulk_ingest.create_stg_raw_shp_native(
+                    conn,
+                    shp,
+                    "UTF-8",
+                    table="landwatch.stg_raw_v5",
+                    batch_size=2,
+                )
+
+        self.assertEqual(rows, 3)
+        create_sql = conn.executed[0]
+        self.assertIn("CREATE UNLOGGED TABLE landwatch.stg_raw_v5", create_sql)
+        self.assertIn("geom geometry(Geometry, 4674)", create_sql)
+        self.assertIn('"cod_imovel" character varying', create_sql)
+        self.assertIn('"area" double precision', create_sql)
+        self.assertIn("FORMAT binary", conn.copy_sql)
+        self.assertTrue(conn.copy_data.startswith(b"PGCOPY\n\xff\r\n\x00"))
+        self.assertTrue(conn.copy_data.endswith(b"\xff\xff"))
+        self.assertIn("ALTER TABLE landwatch.stg_raw_v5 ADD PRIMARY KEY (row_id)", conn.executed)
+
+    @unittest.skipIf(gpd is None, "pyogrio/geopandas indisponíveis")
+    def test_native_payload_loader_hashes_rows_with_override(self):
+        with tempfile.TemporaryDirectory(prefix="bulk_ingest_native_") as tmp:
+            shp = Path(tmp) / "UCS.shp"
+            gdf = gpd.GeoDataFrame(
+                {"CNUC_CODE": ["0001", "0002", "0001"], "NOME": ["Parque", "Reserva", "Parque"]},
+                geometry=[shapely.box(0, 0, 1, 1), shapely.box(1, 1, 2, 2), shapely.box(0, 0, 1, 1)],
+                crs="EPSG:4674",
+            )
+            gdf.to_file(shp, engine="pyogrio")
+            conn = _FakeConn()
+            with (
+                patch.object(bulk_ingest.sql, "Identifier", side_effect=lambda name: _FakeIdentifier(name)),
+                patch.object(bulk_ingest, "log_info"),
+            ):
+                rows = bulk_ingest.create_stg_payload_from_shp_native(
+                    conn,
+                    shp,
+                    "UTF-8",
+                    "CNUC_CODE",
+                    payload_table="landwatch.stg_payload_v5",
+                )
+
+        self.assertEqual(rows, 3)
+        self.assertIn('"feature_key_override", "feature_key"', conn.copy_sql)
+        self.assertIn("DELETE FROM landwatch.stg_payload_v5 WHERE row_id = ANY(%s)", conn.executed)
+        self.assertIn(b'{"nome": "Parque", "row_id": 1, "cnuc_code": "0001"}', conn.copy_data)
+
+
+if __name__ == "__main__":
+    unittest.main()
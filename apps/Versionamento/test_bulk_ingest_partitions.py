@@ -0,0 +1,63 @@
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import bulk_ingest
+
+
+SQL_DIR = Path(__file__).resolve().parent / "sql"
+
+
+class EnsureDatasetPartitionsTest(unittest.TestCase):
+    def test_noop_without_partition_migration(self):
+        conn = MagicMock()
+        with patch.object(bulk_ingest, "fetch_one", return_value=(False,)):
+            self.assertEqual(bulk_ingest.ensure_dataset_partitions(conn, 7), 0)
+        conn.cursor.assert_not_called()
+
+    def test_calls_ensure_function_in_own_transaction(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        cur.fetchone.return_value = (4,)
+        with (
+            patch.object(bulk_ingest, "fetch_one", return_value=(True,)),
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            created = bulk_ingest.ensure_dataset_partitions(conn, 7)
+
+        self.assertEqual(created, 4)
+        queries = [c.args[0] for c in cur.execute.call_args_list]
+        self.assertIn("SET LOCAL lock_timeout = '10s'", queries)
+        self.assertIn("SELECT landwatch.ensure_feature_partitions(%s)", queries)
+        self.assertEqual(conn.commit.call_count, 2)
+
+
+def test_partition_migration_covers_history_tables_and_hot_datasets():
+    sql = (SQL_DIR / "feature_hist_partition_apply.sql").read_text(encoding="utf-8")
+
+    for table in ("lw_feature_state", "lw_feature_delta", "lw_feature_geom_hist", "lw_feature_attr_pack_hist"):
+        assert f"'{table}'" in sql
+    assert "PARTITION BY LIST (dataset_id)" in sql
+    assert "PARTITION OF landwatch.%I DEFAULT" in sql
+    assert "'^CAR_[A-Z]{2}$'" in sql
+    assert "ARRAY['dataset_id'] || v_pk_cols" in sql
+    assert "CREATE OR REPLACE FUNCTION landwatch.ensure_feature_partitions(" in sql
+    assert "ATTACH PARTITION" in sql
+
+
+def test_partition_rollback_restores_unpartitioned_tables():
+    sql = (SQL_DIR / "feature_hist_partition_rollback.sql").read_text(encoding="utf-8")
+
+    assert "_unpartitioned" in sql
+    assert "TRUNCATE landwatch.%I" in sql
+    assert "DROP FUNCTION IF EXISTS landwatch.ensure_feature_partitions(bigint, boolean);" in sql
+
+
+def test_ingest_sql_delta_delete_prunes_by_dataset():
+    sql = (Path(__file__).resolve().parent / "ingest.sql").read_text(encoding="utf-8")
+
+    assert "DELETE FROM landwatch.lw_feature_delta\nWHERE dataset_id = :dataset_id\n  AND version_id = :version_id;" in sql
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import sys
+import threading
+import time
+import types
+import unittest
+from unittest.mock import patch
+
+if "psycopg2" not in sys.modules:
+    psycopg2_stub = types.ModuleType("psycopg2")
+    psycopg2_stub.OperationalError = RuntimeError
+    psycopg2_stub.InterfaceError = RuntimeError
+    psycopg2_stub.connect = lambda **_kwargs: None
+    psycopg2_stub.sql = types.SimpleNamespace(Identifier=lambda name: name)
+    sys.modules["psycopg2"] = psycopg2_stub
+    sys.modules["psycopg2.sql"] = psycopg2_stub.sql
+
+import bulk_ingest
+
+
+class _Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.active = 0
+        self.max_active = 0
+
+    def task(self, name, delay=0.02):
+        def run(*_args):
+            with self.lock:
+                self.events.append(("start", name))
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(delay)
+            with self.lock:
+                self.active -= 1
+                self.events.append(("end", name))
+
+        return run
+
+    def index(self, kind, name):
+        return self.events.index((kind, name))
+
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def test_sequential_mode_keeps_list_order(self):
+        calls = []
+        tasks = [
+            bulk_ingest._RefreshTask("a", "A", lambda: calls.append("a")),
+            bulk_ingest._RefreshTask("b", "B", lambda: calls.append("b"), ("a",)),
+            bulk_ingest._RefreshTask("c", "C", lambda: calls.append("c")),
+        ]
+
+        self.assertTrue(bulk_ingest._run_refresh_tasks(tasks, 1))
+        self.assertEqual(calls, ["a", "b", "c"])
+
+    def test_parallel_mode_runs_independent_tasks_concurrently_and_respects_deps(self):
+        recorder = _Recorder()
+        tasks = [
+            bulk_ingest._RefreshTask("geom", "geom", recorder.task("geom")),
+            bulk_ingest._RefreshTask("attrs", "attrs", recorder.task("attrs"), ("geom",)),
+            bulk_ingest._RefreshTask("tooltip", "tooltip", recorder.task("tooltip"), ("attrs",)),
+            bulk_ingest._RefreshTask("sicar", "sicar", recorder.task("sicar")),
+            bulk_ingest._RefreshTask("tile", "tile", recorder.task("tile"), ("geom",)),
+        ]
+
+        self.assertTrue(bulk_ingest._run_refresh_tasks(tasks, 4))
+
+        self.assertGreater(recorder.max_active, 1)
+        self.assertLess(recorder.index("end", "geom"), recorder.index("start", "attrs"))
+        self.assertLess(recorder.index("end", "geom"), recorder.index("start", "tile"))
+        self.assertLess(recorder.index("end", "attrs"), recorder.index("start", "tooltip"))
+
+    def test_failed_task_is_logged_and_does_not_cancel_dependents(self):
+        calls = []
+
+        def boom():
+            raise RuntimeError("falhou")
+
+        tasks = [
+            bulk_ingest._RefreshTask("geom", "cache geom", boom),
+            bulk_ingest._RefreshTask("attrs", "cache attrs", lambda: calls.append("attrs"), ("geom",)),
+        ]
+
+        with patch.object(bulk_ingest, "log_warn") as log_warn_mock:
+            ok = bulk_ingest._run_refresh_tasks(tasks, 2)
+
+        self.assertFalse(ok)
+        self.assertEqual(calls, ["attrs"])
+        log_warn_mock.assert_called_once_with("Falha ao atualizar cache geom: falhou")
+
+    def test_parallel_mode_rejects_cyclic_deps(self):
+        tasks = [
+            bulk_ingest._RefreshTask("a", "A", lambda: None, ("b",)),
+            bulk_ingest._RefreshTask("b", "B", lambda: None, ("a",)),
+        ]
+
+        with self.assertRaises(RuntimeError):
+            bulk_ingest._run_refresh_tasks(tasks, 2)
+
+    def test_build_tasks_splits_per_dataset_and_waits_all_geom_for_delta_tile(self):
+        tasks = bulk_ingest._build_refresh_tasks(
+            ["CAR_SP", "CAR_MT"],
+            [11, 12],
+            True,
+            ["landwatch.mv_ucs_sigla_active"],
+        )
+        by_name = {task.name: task for task in tasks}
+
+        self.assertEqual(by_name["attrs_light:CAR_MT"].deps, ("geom_active:CAR_MT",))
+        self.assertEqual(by_name["tooltip:CAR_SP"].deps, ("attrs_light:CAR_SP",))
+        self.assertEqual(by_name["sicar_meta:CAR_SP"].deps, ())
+        self.assertEqual(by_name["tile"].deps, ("geom_active:CAR_MT", "geom_active:CAR_SP"))
+        self.assertIn("mv:landwatch.mv_ucs_sigla_active", by_name)
+
+    def test_refresh_mvs_with_workers_refreshes_each_dataset_separately(self):
+        calls = []
+        lock = threading.Lock()
+
+        def record(name):
+            def run(*args):
+                with lock:
+                    calls.append((name,) + args)
+
+            return run
+
+        with (
+            patch.object(bulk_ingest, "REFRESH_WORKERS", 3),
+            patch.object(bulk_ingest, "_refresh_split_per_dataset", return_value=True),
+            patch.object(bulk_ingest, "_refresh_geom_active_cache", side_effect=record("geom")),
+            patch.object(bulk_ingest, "_refresh_active_attrs_cache", side_effect=record("attrs")),
+            patch.object(bulk_ingest, "_refresh_tooltip_cache", side_effect=record("tooltip")),
+            patch.object(bulk_ingest, "_refresh_sicar_meta_cache", side_effect=record("sicar")),
+            patch.object(bulk_ingest, "_refresh_materialized_view", side_effect=record("mv")),
+            patch.object(bulk_ingest, "_refresh_tile_cache", side_effect=record("tile")),
+        ):
+            ok = bulk_ingest._refresh_mvs(["CAR_SP", "CAR_MT"])
+
+        self.assertTrue(ok)
+        self.assertIn(("geom", ["CAR_SP"]), calls)
+        self.assertIn(("geom", ["CAR_MT"]), calls)
+        self.assertIn(("tile", ["CAR_MT"]), calls)
+        self.assertEqual(len([call for call in calls if call[0] == "mv"]), 2)
+        self.assertEqual(len(calls), 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
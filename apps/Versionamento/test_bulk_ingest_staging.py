@@ -0,0 +1,113 @@
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import bulk_ingest
+
+
+class BulkIngestStagingTest(unittest.TestCase):
+    def test_version_staging_tables_are_derived_from_version_id(self):
+        self.assertEqual(
+            bulk_ingest.version_staging_tables(42),
+            ("landwatch.stg_raw_v42", "landwatch.stg_payload_v42"),
+        )
+
+    def test_run_ingest_sql_renders_given_payload_table(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        ingest_sql = str(Path(__file__).with_name("ingest.sql"))
+        with patch.object(bulk_ingest, "INGEST_SQL_PATH", ingest_sql):
+            bulk_ingest.run_ingest_sql(
+                conn,
+                dataset_id=1,
+                version_id=42,
+                snapshot_date="2026-01-01",
+                doc_col=None,
+                date_col=None,
+                is_spatial=True,
+                srid=4674,
+                payload_table="landwatch.stg_payload_v42",
+            )
+        query = "\n".join(c.args[0] for c in cur.execute.call_args_list)
+        self.assertIn("JOIN landwatch.stg_payload_v42 p ON p.row_id = r.row_id", query)
+        self.assertNotIn("landwatch.stg_payload ", query)
+
+    def test_cleanup_orphan_staging_drops_only_orphans(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        rows = [
+            ("landwatch", "stg_payload_v7", True),
+            ("landwatch", "stg_raw_v8", False),
+        ]
+        with (
+            patch.object(bulk_ingest, "fail_dead_running_versions", return_value=[]),
+            patch.object(bulk_ingest, "fetch_all", return_value=rows),
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            dropped = bulk_ingest.cleanup_orphan_staging_tables(conn, max_age_hours=1)
+
+        self.assertEqual(dropped, ["landwatch.stg_payload_v7"])
+        self.assertEqual(cur.execute.call_count, 2)
+        conn.commit.assert_called_once()
+
+    def test_cleanup_orphan_staging_keeps_table_locked_by_live_ingest(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        cur.execute.side_effect = [None, RuntimeError("lock timeout")]
+        with (
+            patch.object(bulk_ingest, "fail_dead_running_versions", return_value=[]),
+            patch.object(bulk_ingest, "fetch_all", return_value=[("landwatch", "stg_raw_v9", True)]),
+            patch.object(bulk_ingest, "log_debug"),
+        ):
+            dropped = bulk_ingest.cleanup_orphan_staging_tables(conn)
+
+        self.assertEqual(dropped, [])
+        conn.rollback.assert_called_once()
+
+    def test_dead_running_version_is_marked_failed_and_live_one_is_kept(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        # v11: worker morto (lock livre); v12: ingest vivo segura o lock.
+        cur.fetchall.return_value = [(11,), (12,)]
+        cur.fetchone.side_effect = [(True,), (False,)]
+        with patch.object(bulk_ingest, "log_warn"):
+            failed = bulk_ingest.fail_dead_running_versions(conn, max_age_hours=1)
+
+        self.assertEqual(failed, [11])
+        calls = [(c.args[0], c.args[1] if len(c.args) > 1 else None) for c in cur.execute.call_args_list]
+        updates = [params for query, params in calls if "SET status = 'FAILED'" in query]
+        self.assertEqual(updates, [("orphaned: worker died", 11)])
+        unlocks = [params for query, params in calls if "pg_advisory_unlock" in query]
+        self.assertEqual(unlocks, [("landwatch.lw_dataset_version:11",)])
+        self.assertIn("status = 'RUNNING'", calls[0][0])
+        self.assertEqual(calls[0][1], (3600.0,))
+
+    def test_cleanup_closes_dead_versions_before_dropping_their_staging(self):
+        conn = MagicMock()
+        order = []
+        with (
+            patch.object(bulk_ingest, "fail_dead_running_versions", side_effect=lambda *_a: order.append("versions")),
+            patch.object(bulk_ingest, "fetch_all", side_effect=lambda *_a, **_k: order.append("staging") or []),
+        ):
+            bulk_ingest.cleanup_orphan_staging_tables(conn, max_age_hours=2)
+
+        self.assertEqual(order, ["versions", "staging"])
+
+    def test_running_version_lock_is_released_after_failure(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+
+        with self.assertRaises(RuntimeError):
+            with bulk_ingest.running_version_lock(conn, 5):
+                raise RuntimeError("falhou")
+
+        queries = [c.args[0] for c in cur.execute.call_args_list]
+        self.assertEqual(
+            queries,
+            ["SELECT pg_advisory_lock(hashtext(%s))", "SELECT pg_advisory_unlock(hashtext(%s))"],
+        )
+        conn.rollback.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
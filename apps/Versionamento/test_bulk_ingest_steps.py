@@ -0,0 +1,112 @@
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import bulk_ingest
+
+
+INGEST_SQL = str(Path(__file__).with_name("ingest.sql"))
+
+
+class _StepCursor:
+    def __init__(self, metric_table: bool = True):
+        self.metric_table = metric_table
+        self.executed = []
+        self.many = []
+        self.rowcount = -1
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+        head = query.lstrip().upper()
+        self.rowcount = 3 if head.startswith(("INSERT", "UPDATE", "DELETE", "CREATE TEMP TABLE")) else -1
+        if "to_regclass" in query:
+            self._rows = [(self.metric_table,)]
+        elif head.startswith("EXPLAIN"):
+            self._rows = [("Seq Scan on x",), ("Planning Time: 0.1 ms",)]
+
+    def executemany(self, query, rows):
+        self.many.append((query, list(rows)))
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+
+class IngestStepsTest(unittest.TestCase):
+    def _run(self, cur, explain=frozenset()):
+        conn = MagicMock()
+        conn.cursor.return_value = cur
+        with (
+            patch.object(bulk_ingest, "INGEST_SQL_PATH", INGEST_SQL),
+            patch.object(bulk_ingest, "INGEST_SQL_EXPLAIN", set(explain)),
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            return bulk_ingest.run_ingest_sql(
+                conn,
+                dataset_id=1,
+                version_id=42,
+                snapshot_date="2026-01-01",
+                doc_col=None,
+                date_col=None,
+                is_spatial=True,
+                srid=4674,
+            )
+
+    def test_split_ingest_steps_uses_markers_and_drops_comments(self):
+        steps = bulk_ingest.split_ingest_steps(
+            "SET x = 1;\n-- @step alpha\n-- comentario\nSELECT 1;\n-- @step beta\nSELECT 2;\n"
+        )
+        self.assertEqual(steps, [("ingest", "SET x = 1;"), ("alpha", "SELECT 1;"), ("beta", "SELECT 2;")])
+
+    def test_ingest_sql_steps_are_unique_and_ordered(self):
+        template = Path(INGEST_SQL).read_text(encoding="utf-8")
+        names = [n for n, _ in bulk_ingest.split_ingest_steps(template)]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(names[0], "stg_norm_raw")
+        self.assertLess(names.index("attr_pack_insert"), names.index("attr_hist_insert"))
+        self.assertEqual(names[-1], "state_absent")
+
+    def test_run_ingest_sql_records_metrics_per_step(self):
+        cur = _StepCursor()
+        metrics = self._run(cur)
+
+        names = [m.step_name for m in metrics]
+        self.assertIn("attr_pack_insert", names)
+        self.assertEqual([m.step_order for m in metrics], list(range(1, len(metrics) + 1)))
+        upsert = next(m for m in metrics if m.step_name == "feature_upsert")
+        self.assertEqual(upsert.row_count, 3)
+        self.assertTrue(all(not q.lstrip().startswith("--") for q in cur.executed))
+
+        (query, rows), = cur.many
+        self.assertIn("lw_ingest_step_metric", query)
+        self.assertEqual(len(rows), len(metrics))
+        self.assertEqual(rows[0][:4], (42, 1, 1, "stg_norm_raw"))
+
+    def test_run_ingest_sql_skips_metrics_without_table(self):
+        cur = _StepCursor(metric_table=False)
+        self._run(cur)
+        self.assertEqual(cur.many, [])
+
+    def test_explain_only_wraps_dml_of_selected_step(self):
+        cur = _StepCursor()
+        metrics = self._run(cur, explain={"feature_map"})
+
+        explained = [q for q in cur.executed if q.startswith("EXPLAIN")]
+        self.assertEqual(len(explained), 1)
+        self.assertIn("CREATE TEMP TABLE __stg_map AS", explained[0])
+        self.assertIn("CREATE UNIQUE INDEX ON __stg_map(feature_id)", cur.executed)
+        step = next(m for m in metrics if m.step_name == "feature_map")
+        self.assertIn("Seq Scan on x", step.explain_plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -68,6 +68,47 @@ class BulkIngestTileCacheTest(unittest.TestCase):
         self.assertIn("REFRESH MATERIALIZED VIEW landwatch.mv_feature_geom_tile_active", sql_text)
         self.assertNotIn("landwatch.refresh_feature_geom_tile_cache", sql_text)
 
+    def test_refresh_tile_cache_uses_delta_reuse_with_version_ids(self):
+        queries = []
+
+        def fake_fetch_one(_conn, query, params=None):
+            queries.append((query, params))
+            if "to_regprocedure" in query:
+                return (True,)
+            if "refresh_feature_geom_tile_cache_delta" in query:
+                return (5, 7, 6)
+            return ("r",)
+
+        with (
+            patch.object(bulk_ingest, "get_conn", return_value=_FakeConn()),
+            patch.object(bulk_ingest, "fetch_one", side_effect=fake_fetch_one),
+            patch.object(bulk_ingest, "exec_sql") as exec_sql_mock,
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            bulk_ingest._refresh_tile_cache(["PRODES_A"], [12, 11])
+
+        exec_sql_mock.assert_not_called()
+        delta_calls = [p for q, p in queries if "refresh_feature_geom_tile_cache_delta(%s" in q]
+        self.assertEqual(delta_calls, [([11, 12], ["PRODES_A"])])
+
+    def test_refresh_tile_cache_without_delta_function_rebuilds_datasets(self):
+        def fake_fetch_one(_conn, query, params=None):
+            if "to_regprocedure" in query:
+                return (False,)
+            return ("r",)
+
+        with (
+            patch.object(bulk_ingest, "get_conn", return_value=_FakeConn()),
+            patch.object(bulk_ingest, "fetch_one", side_effect=fake_fetch_one),
+            patch.object(bulk_ingest, "exec_sql") as exec_sql_mock,
+            patch.object(bulk_ingest, "log_info"),
+        ):
+            bulk_ingest._refresh_tile_cache(["PRODES_A"], [12])
+
+        query, params = exec_sql_mock.call_args.args[1:]
+        self.assertIn("landwatch.refresh_feature_geom_tile_cache(%s::text[])", query)
+        self.assertEqual(params, (["PRODES_A"],))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,71 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import bulk_ingest
+
+
+class BulkIngestWorkersTest(unittest.TestCase):
+    def test_staging_table_names_default_to_shared_tables(self):
+        self.assertEqual(
+            bulk_ingest.staging_table_names(),
+            ("landwatch.stg_raw", "landwatch.stg_payload"),
+        )
+        self.assertEqual(
+            bulk_ingest.staging_table_names("W-123"),
+            ("landwatch.stg_raw_w_123", "landwatch.stg_payload_w_123"),
+        )
+
+    def test_build_ogr_cmd_uses_given_staging_table(self):
+        with (
+            patch.object(bulk_ingest, "resolve_ogr2ogr", return_value="ogr2ogr"),
+            patch.object(bulk_ingest, "_pg_conn_str_for_ogr2ogr", return_value="PG:dbname=test"),
+        ):
+            cmd = bulk_ingest._build_ogr_cmd(
+                Path("car.shp"),
+                0,
+                False,
+                shp_encoding=None,
+                table="landwatch.stg_raw_w7",
+            )
+        self.assertEqual(cmd[cmd.index("-nln") + 1], "landwatch.stg_raw_w7")
+
+    def test_plan_ingest_jobs_groups_by_dataset_and_schedules_largest_first(self):
+        with tempfile.TemporaryDirectory(prefix="bulk_ingest_workers_") as tmp:
+            root = Path(tmp)
+            small = root / "SMALL.csv"
+            small.write_bytes(b"x" * 10)
+            big = root / "BIG.shp"
+            big.write_bytes(b"x" * 50)
+            (root / "BIG.dbf").write_bytes(b"x" * 100)
+            mid = root / "MID.csv"
+            mid.write_bytes(b"x" * 80)
+
+            jobs = bulk_ingest._plan_ingest_jobs([small, big, mid])
+
+        self.assertEqual(
+            [[idx for idx, _ in job] for job in jobs],
+            [[1], [2], [0]],
+        )
+
+    def test_run_ingest_jobs_sequential_keeps_file_order(self):
+        calls = []
+
+        def fake_ingest(file_path, root, category_arg, snapshot_date_override):
+            calls.append(file_path.name)
+            return {"dataset_code": file_path.stem, "status": "COMPLETED"}
+
+        files = [Path("B.csv"), Path("A.csv")]
+        with (
+            patch.object(bulk_ingest, "_ingest_file", side_effect=fake_ingest),
+            patch.object(bulk_ingest, "_source_size_bytes", side_effect=lambda p: 1 if p.name == "B.csv" else 9),
+        ):
+            outcomes = bulk_ingest._run_ingest_jobs(files, Path("."), None, None, workers=1)
+
+        self.assertEqual(calls, ["B.csv", "A.csv"])
+        self.assertEqual([o["dataset_code"] for o in outcomes], ["B", "A"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -66,3 +66,50 @@ def test_semantic_delta_migration_adds_columns_and_scoped_cache_delta():
     assert "WHERE r.cache_name = v_cache" in sql
     assert "WHERE cache_name = 'landwatch.mv_feature_geom_active'" not in sql
     assert "FROM __lw_cache_rebuild_scope WHERE cache_name = v_cache" not in sql
+
+
+def test_tile_cache_delta_reuses_simplifications_by_geom_id():
+    sql = (ROOT / "sql" / "feature_tile_cache_delta_apply.sql").read_text(encoding="utf-8")
+
+    assert "CREATE OR REPLACE FUNCTION landwatch.refresh_feature_geom_tile_cache_delta(" in sql
+    assert "RETURNS TABLE(deleted_count bigint, inserted_count bigint, reused_count bigint)" in sql
+    assert "fd.geom_changed" in sql
+    assert "fd.became_absent" in sql
+    assert "WHERE NOT s.missing_delta_run" in sql
+    assert "CREATE TEMP TABLE __lw_tile_reuse" in sql
+    assert "JOIN __lw_tile_reuse r ON r.geom_id = a.geom_id" in sql
+    assert "WHERE NOT EXISTS (SELECT 1 FROM __lw_tile_reuse r WHERE r.geom_id = a.geom_id)" in sql
+    # reaproveitamento capturado antes do DELETE do escopo
+    assert sql.index("CREATE TEMP TABLE __lw_tile_reuse") < sql.index("DELETE FROM landwatch.mv_feature_geom_tile_active")
+
+
+def test_tile_cache_delta_migration_routes_tile_to_reuse_function_when_available():
+    sql = (ROOT / "sql" / "feature_tile_cache_delta_apply.sql").read_text(encoding="utf-8")
+    applied = (ROOT / "sql" / "feature_semantic_delta_apply.sql").read_text(encoding="utf-8")
+
+    assert "refresh_feature_geom_tile_cache_delta" not in applied
+    assert "CREATE OR REPLACE FUNCTION landwatch.refresh_feature_caches_delta(" in sql
+    assert sql.index("FUNCTION landwatch.refresh_feature_geom_tile_cache_delta(") < sql.index(
+        "FUNCTION landwatch.refresh_feature_caches_delta("
+    )
+    assert "to_regprocedure('landwatch.refresh_feature_geom_tile_cache_delta(bigint[],text[])')" in sql
+    assert "FROM landwatch.refresh_feature_geom_tile_cache_delta(v_version_ids, v_dataset_codes) r;" in sql
+
+
+def test_cache_refresh_functions_lock_per_dataset_for_parallel_refresh():
+    caches = {
+        "mv_feature_geom_active": "mv_feature_geom_active_cache_apply.sql",
+        "mv_feature_active_attrs_light": "mv_feature_attrs_tooltip_cache_apply.sql",
+        "mv_feature_tooltip_active": "mv_feature_attrs_tooltip_cache_apply.sql",
+        "mv_sicar_meta_active": "mv_sicar_meta_cache_apply.sql",
+        "mv_feature_geom_tile_active": "mv_feature_geom_tile_cache_apply.sql",
+    }
+    for path in [ROOT / "create_functions.sql", ROOT / "schema.sql", *sorted({ROOT / "sql" / f for f in caches.values()})]:
+        sql = path.read_text(encoding="utf-8")
+        assert sql.count("CREATE OR REPLACE FUNCTION landwatch.lock_cache_scope(p_cache text, p_codes text[])") == 1
+        assert "PERFORM pg_advisory_xact_lock_shared(hashtext('landwatch.' || p_cache));" in sql
+        assert "PERFORM pg_advisory_xact_lock(hashtext('landwatch.' || p_cache || ':' || c.code))" in sql
+        assert "pg_advisory_xact_lock(hashtext('landwatch.mv_" not in sql
+        for cache, apply_file in caches.items():
+            if path.parent.name != "sql" or path.name == apply_file:
+                assert f"PERFORM landwatch.lock_cache_scope('{cache}', v_dataset_codes);" in sql
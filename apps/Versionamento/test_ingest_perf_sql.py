@@ -69,6 +69,7 @@ def test_rendered_sql_has_no_orphan_punctuation():
             "{{TOOLTIP_JSON_SQL}}": b.build_tooltip_json_sql("s.payload"),
             "{{DOC_DATE_SQL}}": b.build_doc_date_sql(None, None),
             "{{GEOM_SQL}}": b.build_geom_sql(4674, is_spatial),
+            "{{DEDUP_RANK_SQL}}": b.build_dedup_rank_sql(False),
         }.items():
             t = t.replace(k, v)
         cleaned = "\n".join(
@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest.mock import patch
+
+try:
+    from SICAR.drivers.captcha import Captcha
+    from SICAR.polygon import Polygon
+    from SICAR.state import State
+
+    from benchmarks import captcha_solver
+    from benchmarks.captcha_corpus import synthetic_corpus
+    from benchmarks.fake_sicar_server import FakeSicarServer, local_sicar_class, png_corpus
+except ImportError:  # httpx/opencv do SICAR so existem na imagem do job
+    Captcha = None
+
+
+def _oracle_driver(items, wrong=False):
+    answers = {img.convert("RGB").tobytes(): label for img, label, _name in items}
+
+    class Oracle(Captcha):
+        def get_captcha(self, captcha) -> str:
+            answer = answers.get(captcha.convert("RGB").tobytes(), "")
+            return answer[::-1] if wrong else answer
+
+    return Oracle
+
+
+@unittest.skipIf(Captcha is None, "dependencias do SICAR nao instaladas")
+class FakeSicarServerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="fake_sicar_test_"))
+        self.addCleanup(lambda: shutil.rmtree(self.tmp_dir, ignore_errors=True))
+        self.items = synthetic_corpus(4)
+        for target in ("SICAR.sicar.time.sleep", "SICAR.sicar.tqdm"):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _server(self, **kwargs):
+        server = FakeSicarServer(png_corpus(self.items), state_size=200 * 1024, **kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def test_download_state_with_correct_captcha(self):
+        server = self._server()
+        car = local_sicar_class(server.base_url)(driver=_oracle_driver(self.items))
+
+        path = car.download_state("AC", Polygon.AREA_PROPERTY, folder=self.tmp_dir, tries=3)
+
+        self.assertEqual(path.name, "AC_AREA_IMOVEL.zip")
+        self.assertIn("AREA_IMOVEL_AC.shp", zipfile.ZipFile(path).namelist())
+        self.assertEqual((server.stats["captchas"], server.stats["downloads_ok"]), (1, 1))
+
+    def test_wrong_captcha_is_rejected_until_tries_run_out(self):
+        server = self._server()
+        car = local_sicar_class(server.base_url)(driver=_oracle_driver(self.items, wrong=True))
+
+        self.assertFalse(car.download_state("AC", Polygon.AREA_PROPERTY, folder=self.tmp_dir, tries=3))
+        self.assertEqual(server.stats["captcha_rejected"], 3)
+
+    def test_cut_downloads_resume_with_range(self):
+        server = self._server(cut_probability=1.0)
+        car = local_sicar_class(server.base_url)(driver=_oracle_driver(self.items))
+
+        path = car.download_state("RR", Polygon.AREA_PROPERTY, folder=self.tmp_dir, tries=10)
+
+        self.assertTrue(zipfile.is_zipfile(path))
+        self.assertGreaterEqual(server.stats["range_requests"], 1)
+        self.assertLess(server.stats["bytes_sent"], 2 * path.stat().st_size)
+
+    def test_release_dates_page_is_parsed_by_sicar(self):
+        server = self._server(release_dates={"SP": "01/02/2026", "MG": "15/01/2026"})
+        car = local_sicar_class(server.base_url)(driver=_oracle_driver(self.items))
+
+        self.assertEqual(car.get_release_dates(), {State.MG: "15/01/2026", State.SP: "01/02/2026"})
+
+    def test_benchmark_reports_solve_rate_and_downloads(self):
+        driver_cls = _oracle_driver(self.items)
+
+        offline = captcha_solver.solve_corpus(driver_cls(), self.items)
+        e2e = captcha_solver.end_to_end(driver_cls, self.items, ["AC", "AP"], 3, 10 * 1024, 0)
+
+        self.assertEqual((offline["solve_rate"], offline["accuracy"]), (1.0, 1.0))
+        self.assertEqual(e2e["downloads_ok"], 2)
+        self.assertEqual(e2e["captchas_per_state"], 1.0)
+
+    def test_tries_for_target(self):
+        self.assertEqual(captcha_solver.tries_for_target(0.5), 7)
+        self.assertEqual(captcha_solver.tries_for_target(1.0), 1)
+        self.assertIsNone(captcha_solver.tries_for_target(0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
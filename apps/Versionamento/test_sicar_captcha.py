@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+try:
+    from SICAR.drivers.captcha import Captcha
+except ImportError:  # opencv/pytesseract so existem na imagem do job
+    Captcha = None
+
+
+def _captcha(mode: str) -> Image.Image:
+    img = Image.new("RGB", (120, 40), (230, 230, 230))
+    ImageDraw.Draw(img).text((10, 12), "AbC12", fill=(20, 20, 20))
+    return img.convert(mode)
+
+
+@unittest.skipIf(Captcha is None, "dependencias do SICAR nao instaladas")
+class CaptchaPreprocessTest(unittest.TestCase):
+    def setUp(self):
+        class _Driver(Captcha):
+            def get_captcha(self, captcha) -> str:
+                return ""
+
+        self.driver = _Driver()
+
+    def test_process_captcha_does_not_touch_disk(self):
+        with patch.object(tempfile, "NamedTemporaryFile", side_effect=AssertionError("arquivo temporario")):
+            out = self.driver._process_captcha(_captcha("RGB"))
+
+        self.assertEqual(out.shape, (40, 120))
+        self.assertEqual(out.dtype, np.uint8)
+
+    def test_grayscale_is_consistent_across_pil_modes(self):
+        rgb = self.driver._to_grayscale(_captcha("RGB"))
+
+        # o caminho antigo devolvia tudo preto para PNG em tons de cinza (modo L)
+        gray = self.driver._to_grayscale(_captcha("L")).astype(int)
+        self.assertLessEqual(np.abs(gray - rgb).max(), 1)
+        self.assertGreater(self.driver._to_grayscale(_captcha("P")).max(), 200)
+        self.assertLess(rgb.min(), 100)
+        self.assertGreater(rgb.max(), 200)
+
+    def test_transparent_pixels_become_white(self):
+        img = Image.new("RGBA", (4, 2), (0, 0, 0, 0))
+        img.putpixel((0, 0), (0, 0, 0, 255))
+
+        gray = self.driver._to_grayscale(img)
+
+        self.assertEqual(gray[0, 0], 0)
+        self.assertEqual(gray[1, 3], 255)
+
+
+if __name__ == "__main__":
+    unittest.main()
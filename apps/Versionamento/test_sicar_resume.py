@@ -0,0 +1,147 @@
+import io
+import shutil
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest.mock import patch
+
+try:
+    import httpx
+
+    from SICAR.exceptions import FailedToDownloadPolygonException
+    from SICAR.polygon import Polygon
+    from SICAR.sicar import Sicar
+    from SICAR.state import State
+except ImportError:  # pacote SICAR/httpx so existe na imagem do job
+    httpx = None
+
+
+def _zip_bytes(size: int = 64 * 1024) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("AREA_IMOVEL.shp", bytes(range(256)) * (size // 256))
+    return buf.getvalue()
+
+
+class _FakeCarServer:
+    """downloadBase falso com suporte opcional a Range; pode cortar a conexao no meio."""
+
+    def __init__(self, payload: bytes, supports_range=True, cut_at=None, etag='"v1"'):
+        self.payload = payload
+        self.supports_range = supports_range
+        self.cut_at = cut_at
+        self.etag = etag
+        self.requests = []
+
+    def _stream(self, body: bytes):
+        cut_at = self.cut_at
+        self.cut_at = None
+
+        def gen():
+            for i in range(0, len(body), 4096):
+                if cut_at is not None and i >= cut_at:
+                    raise httpx.ReadError("connection reset")
+                yield body[i : i + 4096]
+
+        return gen()
+
+    def handler(self, request):
+        self.requests.append(dict(request.headers))
+        headers = {"Content-Type": "application/zip", "ETag": self.etag}
+        range_header = request.headers.get("Range")
+        if range_header and self.supports_range and request.headers.get("If-Range", self.etag) == self.etag:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            body = self.payload[start:]
+            headers["Content-Range"] = f"bytes {start}-{len(self.payload) - 1}/{len(self.payload)}"
+            headers["Content-Length"] = str(len(body))
+            return httpx.Response(206, headers=headers, stream=_Stream(self._stream(body)))
+        headers["Content-Length"] = str(len(self.payload))
+        return httpx.Response(200, headers=headers, stream=_Stream(self._stream(self.payload)))
+
+
+if httpx is not None:
+
+    class _Stream(httpx.SyncByteStream):
+        def __init__(self, chunks):
+            self._chunks = chunks
+
+        def __iter__(self):
+            yield from self._chunks
+
+
+@unittest.skipIf(httpx is None, "httpx/SICAR nao instalados")
+class SicarResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="sicar_resume_test_"))
+        self.addCleanup(lambda: shutil.rmtree(self.tmp_dir, ignore_errors=True))
+        self.payload = _zip_bytes()
+
+    def _car(self, handler):
+        car = Sicar.__new__(Sicar)
+        car._session = httpx.Client(transport=httpx.MockTransport(handler))
+        self.addCleanup(car._session.close)
+        return car
+
+    def _download(self, car):
+        with patch("SICAR.sicar.tqdm"):
+            return car._download_polygon(State.SP, Polygon.AREA_PROPERTY, "AbC12", str(self.tmp_dir))
+
+    def test_interrupted_download_resumes_with_range(self):
+        server = _FakeCarServer(self.payload, cut_at=32 * 1024)
+        car = self._car(server.handler)
+
+        with self.assertRaises(FailedToDownloadPolygonException):
+            self._download(car)
+        part = self.tmp_dir / "SP_AREA_IMOVEL.zip.part"
+        self.assertEqual(part.stat().st_size, 32 * 1024)
+
+        path = self._download(car)
+
+        self.assertEqual(path.read_bytes(), self.payload)
+        self.assertEqual(server.requests[1]["range"], f"bytes={32 * 1024}-")
+        self.assertEqual(server.requests[1]["if-range"], '"v1"')
+        self.assertEqual(sorted(p.name for p in self.tmp_dir.iterdir()), ["SP_AREA_IMOVEL.zip"])
+
+    def test_server_without_range_restarts_from_scratch(self):
+        server = _FakeCarServer(self.payload, supports_range=False, cut_at=16 * 1024)
+        car = self._car(server.handler)
+
+        with self.assertRaises(FailedToDownloadPolygonException):
+            self._download(car)
+        path = self._download(car)
+
+        self.assertEqual(path.read_bytes(), self.payload)
+        self.assertIn("range", server.requests[1])
+
+    def test_changed_file_on_server_restarts_instead_of_mixing_bytes(self):
+        server = _FakeCarServer(self.payload, cut_at=16 * 1024)
+        car = self._car(server.handler)
+        with self.assertRaises(FailedToDownloadPolygonException):
+            self._download(car)
+
+        server.payload = _zip_bytes(size=80 * 1024)
+        server.etag = '"v2"'
+        path = self._download(car)
+
+        self.assertEqual(path.read_bytes(), server.payload)
+
+    def test_truncated_response_keeps_part_and_never_publishes_zip(self):
+        server = _FakeCarServer(self.payload)
+
+        def short_handler(request):
+            response = server.handler(request)
+            response.stream = _Stream(iter([self.payload[:1000]]))
+            return response
+
+        car = self._car(short_handler)
+
+        with self.assertRaises(FailedToDownloadPolygonException):
+            self._download(car)
+
+        self.assertFalse((self.tmp_dir / "SP_AREA_IMOVEL.zip").exists())
+        self.assertEqual((self.tmp_dir / "SP_AREA_IMOVEL.zip.part").stat().st_size, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import source_fingerprint
+
+
+def _legacy_fingerprint(paths):
+    manifest = {}
+    for p in sorted(paths, key=lambda x: x.name.lower()):
+        if p.exists():
+            manifest[p.name] = {"sha1": hashlib.sha1(p.read_bytes()).hexdigest(), "size": p.stat().st_size}
+    payload = json.dumps(manifest, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SourceFingerprintTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="fingerprint_test_"))
+        self.addCleanup(lambda: shutil.rmtree(self.tmp_dir, ignore_errors=True))
+        self.addCleanup(source_fingerprint._MEMORY.clear)
+        self.files = []
+        for ext, body in ((".shp", b"shp" * 1000), (".dbf", b"dbf"), (".prj", b"GEOGCS")):
+            path = self.tmp_dir / f"ucs{ext}"
+            path.write_bytes(body)
+            self.files.append(path)
+
+    def test_matches_legacy_format(self):
+        missing = self.tmp_dir / "ucs.cpg"
+
+        self.assertEqual(
+            source_fingerprint.fingerprint_files(self.files + [missing], workers=2),
+            _legacy_fingerprint(self.files),
+        )
+
+    def test_second_call_uses_sidecar_without_reading_files(self):
+        expected = source_fingerprint.fingerprint_files(self.files)
+        source_fingerprint._MEMORY.clear()
+        sidecar = json.loads((self.tmp_dir / source_fingerprint.CACHE_FILENAME).read_text(encoding="utf-8"))
+        self.assertEqual(sorted(sidecar), ["ucs.dbf", "ucs.prj", "ucs.shp"])
+
+        with patch.object(source_fingerprint, "sha1_file", side_effect=AssertionError("hash recalculado")):
+            self.assertEqual(source_fingerprint.fingerprint_files(self.files), expected)
+
+    def test_changed_file_is_rehashed(self):
+        source_fingerprint.fingerprint_files(self.files)
+        shp = self.files[0]
+        stat = shp.stat()
+        shp.write_bytes(b"SHP" * 1000)  # mesmo tamanho
+        os.utime(shp, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(source_fingerprint.fingerprint_files(self.files), _legacy_fingerprint(self.files))
+
+    def test_cache_disabled_writes_no_sidecar(self):
+        source_fingerprint.fingerprint_files(self.files, use_cache=False)
+
+        self.assertFalse((self.tmp_dir / source_fingerprint.CACHE_FILENAME).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()